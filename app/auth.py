@@ -1,17 +1,374 @@
-"""Autenticação simples via header X-API-Key."""
+"""Autenticação via header X-API-Key (e X-Admin-Key para rotas admin).
 
+Chaves de cliente, em ordem de precedência:
+
+- `API_KEYS_FILE`: JSON `[{"id", "prefix", "hash", "rate", "burst",
+  "concurrency"}]` com só o hash de cada chave: `sha256:<hex>` ou
+  `pbkdf2_sha256:<iterações>:<salt hex>:<hex>`. `python -m app.auth
+  nova-chave <id>` gera uma chave `<prefix>.<segredo>` e a entrada do
+  arquivo; o `prefix` é público e aponta a única entrada a conferir;
+- `API_KEY` (legado): uma chave em texto, cliente `default`;
+- nenhuma das duas: acesso aberto, cliente `anonimo`.
+
+Chave com prefixo conhecido é conferida só contra o hash daquela entrada
+(PBKDF2 em thread, no máximo um por requisição). Sem prefixo, só entradas
+sha256 sem `prefix` são comparadas, todas via `hmac.compare_digest` sem sair
+no primeiro acerto; entradas PBKDF2 exigem `prefix`. Chaves válidas ficam
+num cache LRU + TTL indexado pelo sha256 da chave (`API_KEY_CACHE_TTL_S`,
+300; `API_KEY_CACHE_MAX`, 10000); as inválidas, num cache separado e menor
+(`API_KEY_MISS_CACHE_MAX`, 1024), que não empurra as válidas para fora.
+Falhas contam por endereço de origem (`API_AUTH_FAIL_RATE`, 1/s;
+`API_AUTH_FAIL_BURST`, 10): esgotado o bucket, o endereço recebe 429 antes
+de qualquer hash.
+
+Cada cliente tem token bucket e teto de chats simultâneos (`app.ratelimit`);
+entradas sem `rate`/`burst`/`concurrency` usam `API_RATE_PER_S`,
+`API_RATE_BURST` e `API_CHAT_CONCURRENCY` (0 = sem limite).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
 import os
-from fastapi import Header, HTTPException, status
+import secrets
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
+from fastapi import Depends, Header, HTTPException, Request, status
+
+from .metrics import API_KEY_CACHE, API_REJECTIONS, API_REQUESTS
+from .ratelimit import ClientLimiter, FailureLimiter, Lease, RateLimited
 
 API_KEY = os.getenv("API_KEY")
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+
+class ApiClient(NamedTuple):
+    """Cliente autenticado e seus limites (0 = sem limite)."""
+
+    id: str
+    rate: float = 0.0
+    burst: float = 0.0
+    concurrency: int = 0
+
+
+def default_client(id: str) -> ApiClient:
+    return ApiClient(
+        id,
+        float(os.getenv("API_RATE_PER_S", "0")),
+        float(os.getenv("API_RATE_BURST", "0")),
+        int(os.getenv("API_CHAT_CONCURRENCY", "0")),
+    )
+
+
+def hash_key(key: str, iterations: int = 0) -> str:
+    """Hash para o arquivo de chaves: sha256, ou PBKDF2 com salt se `iterations`."""
+    if not iterations:
+        return "sha256:" + hashlib.sha256(key.encode()).hexdigest()
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", key.encode(), salt, iterations)
+    return f"pbkdf2_sha256:{iterations}:{salt.hex()}:{digest.hex()}"
+
+
+class KeyEntry(NamedTuple):
+    """Entrada do arquivo de chaves; `prefix` vazio = chave legada sem prefixo."""
 
+    hash: str
+    client: ApiClient
+    prefix: str = ""
+
+
+def new_key() -> Tuple[str, str]:
+    """(prefix, chave) aleatórios; a chave é `<prefix>.<segredo>`."""
+    prefix = secrets.token_hex(6)
+    return prefix, f"{prefix}.{secrets.token_urlsafe(32)}"
+
+
+class KeyStore:
+    """Hashes das chaves por cliente, com cache de verificações."""
+
+    def __init__(
+        self,
+        entries: Iterable[Tuple[Any, ...]],
+        cache_ttl: float = 300.0,
+        cache_max: int = 10_000,
+        miss_cache_max: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.cache_ttl = cache_ttl
+        self.cache_max = cache_max
+        self.miss_cache_max = miss_cache_max
+        self._clock = clock
+        # Sem prefixo: só sha256 (barato de comparar com todas).
+        self._sha256: List[Tuple[bytes, ApiClient]] = []
+        # Com prefixo: (esquema, iterações, salt, hash, cliente).
+        self._by_prefix: Dict[str, Tuple[str, int, bytes, bytes, ApiClient]] = {}
+        for hashed, client, prefix in (KeyEntry(*entry) for entry in entries):
+            scheme, _, rest = hashed.partition(":")
+            if scheme == "sha256":
+                parsed = (scheme, 0, b"", bytes.fromhex(rest), client)
+            elif scheme == "pbkdf2_sha256":
+                iterations, salt, digest = rest.split(":")
+                parsed = (
+                    scheme,
+                    int(iterations),
+                    bytes.fromhex(salt),
+                    bytes.fromhex(digest),
+                    client,
+                )
+            else:
+                raise ValueError(f"Hash de chave desconhecido para {client.id!r}.")
+            if prefix:
+                if prefix in self._by_prefix:
+                    raise ValueError(f"Prefixo de chave repetido: {prefix!r}.")
+                self._by_prefix[prefix] = parsed
+            elif scheme == "sha256":
+                self._sha256.append((parsed[3], client))
+            else:
+                # Sem prefixo, cada chave inválida custaria um PBKDF2 por entrada.
+                raise ValueError(
+                    f"Entrada PBKDF2 de {client.id!r} sem `prefix`; gere outra "
+                    "chave com `python -m app.auth nova-chave`."
+                )
+        self._cache: "OrderedDict[bytes, Tuple[ApiClient, float]]" = OrderedDict()
+        self._misses: "OrderedDict[bytes, float]" = OrderedDict()
+
+    @classmethod
+    def from_file(cls, path: Path, **kwargs: Any) -> "KeyStore":
+        with Path(path).open("r", encoding="utf-8") as f:
+            raw = json.load(f)
+        entries = []
+        for item in raw:
+            base = default_client(item["id"])
+            client = ApiClient(
+                item["id"],
+                float(item.get("rate", base.rate)),
+                float(item.get("burst", base.burst)),
+                int(item.get("concurrency", base.concurrency)),
+            )
+            entries.append(KeyEntry(item["hash"], client, item.get("prefix", "")))
+        return cls(entries, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self._sha256) + len(self._by_prefix)
+
+    def cached(self, key: str) -> Optional[ApiClient]:
+        """Cliente da chave se ela já foi validada (sem hash lento)."""
+        return self._cached(hashlib.sha256(key.encode()).digest(), self._clock())
+
+    async def verify(self, key: str) -> Optional[ApiClient]:
+        """Cliente dono da chave, ou `None`."""
+        raw = key.encode()
+        digest = hashlib.sha256(raw).digest()
+        now = self._clock()
+        client = self._cached(digest, now)
+        if client is not None:
+            return client
+        expires = self._misses.get(digest)
+        if expires is not None and expires > now:
+            API_KEY_CACHE.inc("miss_hit")
+            return None
+        API_KEY_CACHE.inc("miss")
+        prefix, dot, _ = key.partition(".")
+        entry = self._by_prefix.get(prefix) if dot else None
+        if entry is not None:
+            client = await self._match_entry(entry, raw, digest)
+        else:
+            client = self._match_sha256(digest)
+        if client is None:
+            self._remember(self._misses, digest, now + self.cache_ttl)
+            while len(self._misses) > self.miss_cache_max:
+                self._misses.popitem(last=False)
+        else:
+            self._misses.pop(digest, None)
+            self._remember(self._cache, digest, (client, now + self.cache_ttl))
+            while len(self._cache) > self.cache_max:
+                self._cache.popitem(last=False)
+        return client
+
+    def _cached(self, digest: bytes, now: float) -> Optional[ApiClient]:
+        cached = self._cache.get(digest)
+        if cached is None or cached[1] <= now:
+            return None
+        self._cache.move_to_end(digest)
+        API_KEY_CACHE.inc("hit")
+        return cached[0]
+
+    @staticmethod
+    def _remember(cache: "OrderedDict[bytes, Any]", digest: bytes, value) -> None:
+        cache[digest] = value
+        cache.move_to_end(digest)
+
+    async def _match_entry(
+        self,
+        entry: Tuple[str, int, bytes, bytes, ApiClient],
+        raw: bytes,
+        digest: bytes,
+    ) -> Optional[ApiClient]:
+        scheme, iterations, salt, stored, client = entry
+        if scheme == "sha256":
+            return client if hmac.compare_digest(stored, digest) else None
+        computed = await asyncio.to_thread(
+            hashlib.pbkdf2_hmac, "sha256", raw, salt, iterations
+        )
+        return client if hmac.compare_digest(stored, computed) else None
 
-def verify_api_key(x_api_key: str = Header(default=None)) -> None:
-    """Valida API key se configurada; se não houver, permite acesso."""
-    if API_KEY is None:
-        return
-    if x_api_key != API_KEY:
+    def _match_sha256(self, digest: bytes) -> Optional[ApiClient]:
+        found = None
+        for stored, client in self._sha256:
+            if hmac.compare_digest(stored, digest):
+                found = client
+        return found
+
+
+def keystore_from_env() -> Optional[KeyStore]:
+    """`API_KEYS_FILE`, senão `API_KEY`; `None` = acesso aberto."""
+    options = {
+        "cache_ttl": float(os.getenv("API_KEY_CACHE_TTL_S", "300")),
+        "cache_max": int(os.getenv("API_KEY_CACHE_MAX", "10000")),
+        "miss_cache_max": int(os.getenv("API_KEY_MISS_CACHE_MAX", "1024")),
+    }
+    path = os.getenv("API_KEYS_FILE")
+    if path:
+        return KeyStore.from_file(Path(path), **options)
+    if API_KEY is not None:
+        return KeyStore([(hash_key(API_KEY), default_client("default"))], **options)
+    return None
+
+
+KEYSTORE = keystore_from_env()
+LIMITER = ClientLimiter(float(os.getenv("API_CONCURRENCY_RETRY_S", "1")))
+AUTH_FAILURES = FailureLimiter(
+    float(os.getenv("API_AUTH_FAIL_RATE", "1")),
+    float(os.getenv("API_AUTH_FAIL_BURST", "10")),
+)
+ANONYMOUS = default_client("anonimo")
+
+
+def _too_many(client_id: str, exc: RateLimited) -> HTTPException:
+    API_REJECTIONS.inc(client_id, exc.reason)
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"Limite do cliente excedido; tente de novo em {exc.header} s.",
+        headers={"Retry-After": exc.header},
+    )
+
+
+async def _authenticate(request: Request, x_api_key: Optional[str]) -> ApiClient:
+    client = KEYSTORE.cached(x_api_key) if x_api_key else None
+    if client is not None:
+        return client
+    # Endereço com falhas demais nem chega ao hash da chave.
+    address = request.client.host if request.client else "-"
+    try:
+        AUTH_FAILURES.check(address)
+    except RateLimited as exc:
+        raise _too_many("-", exc) from None
+    client = await KEYSTORE.verify(x_api_key) if x_api_key else None
+    if client is None:
+        AUTH_FAILURES.fail(address)
+        API_REJECTIONS.inc("-", "unauthorized")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized"
+        )
+    return client
+
+
+async def verify_api_key(
+    request: Request, x_api_key: str = Header(default=None)
+) -> ApiClient:
+    """Valida a API key (se houver chaves configuradas) e o token bucket."""
+    if KEYSTORE is None:
+        client = ANONYMOUS
+    else:
+        client = await _authenticate(request, x_api_key)
+    try:
+        LIMITER.check_rate(client)
+    except RateLimited as exc:
+        raise _too_many(client.id, exc) from None
+    API_REQUESTS.inc(client.id)
+    return client
+
+
+def charge_item(client: ApiClient) -> Optional[RateLimited]:
+    """Cobra um token do cliente por item de lote (`/chat:batch`).
+
+    Devolve o `RateLimited` (já contado em `API_REJECTIONS`) quando o bucket
+    esvaziou, para o item ser respondido com erro sem chegar ao retrieval.
+    """
+    try:
+        LIMITER.check_rate(client)
+    except RateLimited as exc:
+        API_REJECTIONS.inc(client.id, exc.reason)
+        return exc
+    return None
+
+
+async def chat_slot(
+    client: ApiClient = Depends(verify_api_key),
+) -> AsyncIterator[Lease]:
+    """Vaga de chat do cliente, liberada ao fim do handler (ou do fluxo)."""
+    try:
+        lease = LIMITER.acquire(client)
+    except RateLimited as exc:
+        raise _too_many(client.id, exc) from None
+    try:
+        yield lease
+    finally:
+        if not lease.detached:
+            lease.release()
+
+
+def verify_admin_key(x_admin_key: str = Header(default=None)) -> None:
+    """Rotas admin exigem `ADMIN_API_KEY`; sem ela configurada ficam desligadas."""
+    if ADMIN_API_KEY is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin desabilitado"
+        )
+    if x_admin_key is None or not hmac.compare_digest(x_admin_key, ADMIN_API_KEY):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized"
         )
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Gera chaves para API_KEYS_FILE.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    nova = sub.add_parser("nova-chave", help="chave aleatória + entrada do arquivo")
+    nova.add_argument("id")
+    nova.add_argument("--rate", type=float)
+    nova.add_argument("--burst", type=float)
+    nova.add_argument("--concurrency", type=int)
+    nova.add_argument(
+        "--pbkdf2", type=int, default=0, metavar="ITERACOES", help="hash lento"
+    )
+    args = parser.parse_args()
+    prefix, key = new_key()
+    entry: Dict[str, Any] = {
+        "id": args.id,
+        "prefix": prefix,
+        "hash": hash_key(key, args.pbkdf2),
+    }
+    for name in ("rate", "burst", "concurrency"):
+        if getattr(args, name) is not None:
+            entry[name] = getattr(args, name)
+    print(f"chave (mostrada só agora): {key}")
+    print(json.dumps(entry, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,407 @@
+"""Pipeline offline: processa um JSONL de mensagens pelo mesmo fluxo do `/chat`.
+
+Uso: `python -m app.batch entrada.jsonl --output respostas.jsonl`
+
+Cada linha da entrada é uma mensagem: string JSON, `{"mensagem": ...}` (com
+`id` opcional, repassado à saída) ou um exemplo no formato de fine-tuning
+(`{"messages": [...]}`, usa a última mensagem `user`). A saída tem uma linha
+por mensagem, na ordem da entrada, com `linha` (número na entrada) e a
+resposta do chat ou `erro`.
+
+Etapas, em fluxo e com memória limitada (no máximo `--prefetch` pedaços de
+`--chunk` linhas em voo):
+
+- leitura, roteamento e retrieval: consultas exatas e um retrieval
+  vetorizado por intenção em cada pedaço (`main.prepare_many`); o próximo
+  pedaço é preparado enquanto o atual gera;
+- geração: provedores de API (OpenAI, Gemini) em paralelo até
+  `--concurrency`, com no máximo `--rate` chamadas/s por provedor; o que eles
+  não resolverem vai de uma vez para os provedores com `generate_many` (HF,
+  em lotes de `--hf-batch-size` no pipeline) e, por fim, para a resposta do KB;
+- escrita e checkpoint: após cada pedaço a saída é sincronizada em disco e o
+  checkpoint (`<saida>.checkpoint.json`) grava o offset em bytes da entrada e
+  o tamanho da saída. Se o processo cair, rodar o mesmo comando retoma do
+  último pedaço confirmado (a saída é truncada nesse tamanho, descartando
+  linhas parciais); `--restart` ignora o checkpoint.
+
+O progresso (mensagens/s da janela e média, quebra por caminho da resposta)
+sai a cada `--report-every` segundos.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import Counter
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Iterator, List, NamedTuple, Tuple
+
+from . import main
+from .generation import Provider, run_chain
+from .metrics import ANSWERS, FALLBACKS, PROVIDER_SECONDS
+from .ndjson import ndjson_line
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class Checkpoint(NamedTuple):
+    """Até onde a entrada foi processada e confirmada na saída."""
+
+    offset: int
+    lines: int
+    output_bytes: int
+    done: bool = False
+
+
+class Item(NamedTuple):
+    """Linha da entrada: mensagem a responder ou `erro` de leitura."""
+
+    linha: int
+    id: Any
+    mensagem: str | None
+    erro: str | None = None
+
+
+def checkpoint_path(output: Path) -> Path:
+    return output.with_name(output.name + ".checkpoint.json")
+
+
+def load_checkpoint(path: Path, input_path: Path) -> Checkpoint | None:
+    if not path.exists():
+        return None
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data.get("input") != str(input_path.resolve()):
+        raise SystemExit(
+            f"Checkpoint {path} é de outra entrada ({data.get('input')}); "
+            "use --restart."
+        )
+    return Checkpoint(
+        data["offset"], data["lines"], data["output_bytes"], data.get("done", False)
+    )
+
+
+def save_checkpoint(path: Path, input_path: Path, ckpt: Checkpoint) -> None:
+    """Grava atomicamente (arquivo temporário + `os.replace`)."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(
+        json.dumps({"input": str(input_path.resolve()), **ckpt._asdict()}),
+        encoding="utf-8",
+    )
+    os.replace(tmp, path)
+
+
+def parse_line(raw: bytes, linha: int) -> Item:
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return Item(linha, None, None, f"JSON inválido na linha {linha}.")
+    item_id = None
+    if isinstance(data, dict):
+        item_id = data.get("id")
+        if "messages" in data:
+            users = [
+                m.get("content")
+                for m in data["messages"] or []
+                if isinstance(m, dict) and m.get("role") == "user"
+            ]
+            data = users[-1] if users else None
+        else:
+            data = data.get("mensagem")
+    if not isinstance(data, str):
+        return Item(linha, item_id, None, "Linha sem `mensagem` (string).")
+    return Item(linha, item_id, data)
+
+
+def read_chunks(
+    path: Path, start: Checkpoint, size: int
+) -> Iterator[Tuple[List[Item], int, int]]:
+    """(itens, offset e número da linha ao fim do pedaço) a partir de `start`.
+
+    Linhas em branco são puladas, mas contam para a numeração e o offset.
+    """
+    offset, linha = start.offset, start.lines
+    emitted = offset
+    chunk: List[Item] = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            offset += len(raw)
+            linha += 1
+            if raw.strip():
+                chunk.append(parse_line(raw, linha))
+            if len(chunk) >= size:
+                yield chunk, offset, linha
+                chunk, emitted = [], offset
+    if chunk or offset != emitted:
+        yield chunk, offset, linha
+
+
+class RateLimiter:
+    """Token bucket assíncrono: até `rate` chamadas/s, rajadas de `burst`.
+
+    Quem espera entra na fila do lock, então as chamadas saem na ordem.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def rate_limited(provider: Provider, limiter: RateLimiter) -> Provider:
+    """Mesmo provedor, com cada chamada admitida pelo `limiter`.
+
+    A espera fica no `admit`, fora do `guard`: a fila do rate limit não estoura
+    o timeout adaptativo nem abre o breaker.
+    """
+    return replace(provider, admit=limiter.acquire)
+
+
+class BatchGenerator:
+    """Geração de um pedaço: API em paralelo, depois lotes locais, depois KB."""
+
+    def __init__(
+        self,
+        providers: List[Provider],
+        concurrency: int,
+        rate: float = 0,
+        hf_batch_size: int = 8,
+    ) -> None:
+        online = [p for p in providers if p.generate_many is None]
+        self.online = [
+            rate_limited(p, RateLimiter(rate)) if rate > 0 else p for p in online
+        ]
+        self.batched = [p for p in providers if p.generate_many is not None]
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.hf_batch_size = hf_batch_size
+
+    async def generate(
+        self, reqs: List[main.ChatRequest], ctxs: List[Any]
+    ) -> List[Tuple[main.ChatResponse, str]]:
+        """(resposta, caminho) por mensagem, na ordem de `reqs`."""
+        results: List[Any] = [None] * len(reqs)
+        pending = []
+        for i, ctx in enumerate(ctxs):
+            if isinstance(ctx, main.ChatResponse):
+                results[i] = (ctx, "exata")
+                continue
+            texto = main._cached_answer(ctx)
+            if texto is not None:
+                results[i] = (self._model_answer(texto, ctx), "cache")
+            else:
+                pending.append(i)
+        gerados = await asyncio.gather(
+            *(self._online(reqs[i], ctxs[i]) for i in pending)
+        )
+        falta = []
+        for i, gerado in zip(pending, gerados):
+            if gerado is None:
+                falta.append(i)
+                continue
+            self._store(ctxs[i], gerado[0], gerado[1], results, i)
+        for provider in self.batched:
+            if falta:
+                falta = await self._batched(provider, falta, reqs, ctxs, results)
+        for i in falta:
+            results[i] = (main._kb_answer(ctxs[i]), "kb")
+        return results
+
+    async def _online(self, req: main.ChatRequest, ctx: Any) -> Any:
+        if not self.online:
+            return None
+        async with self.semaphore:
+            return await run_chain(self.online, ctx.pergunta, ctx.evidencia)
+
+    async def _batched(
+        self,
+        provider: Provider,
+        indices: List[int],
+        reqs: List[main.ChatRequest],
+        ctxs: List[Any],
+        results: List[Any],
+    ) -> List[int]:
+        """Um `generate_many` para `indices`; devolve os que seguem sem resposta."""
+        pares = [(ctxs[i].pergunta, ctxs[i].evidencia) for i in indices]
+        start = time.perf_counter()
+        try:
+            textos = await provider.generate_many(pares, self.hf_batch_size)
+        except Exception as exc:
+            PROVIDER_SECONDS.observe(
+                time.perf_counter() - start, provider.name, "error"
+            )
+            FALLBACKS.inc(provider.name, "error")
+            logger.warning("Falha %s no lote, caindo para o KB: %s", provider.name, exc)
+            return indices
+        PROVIDER_SECONDS.observe(time.perf_counter() - start, provider.name, "ok")
+        for i, texto in zip(indices, textos):
+            self._store(ctxs[i], texto, provider, results, i)
+        return []
+
+    def _store(self, ctx, texto: str, provider: Provider, results, i) -> None:
+        ANSWERS.inc("model")
+        main._cache_answer(ctx, texto, provider)
+        results[i] = (self._model_answer(texto, ctx), provider.name)
+
+    @staticmethod
+    def _model_answer(texto: str, ctx: Any) -> main.ChatResponse:
+        return main.ChatResponse(
+            resposta=texto, fonte=ctx.top["pergunta"], via_modelo=True
+        )
+
+
+class Progress:
+    """Mensagens/s (da janela e média) e quebra por caminho da resposta."""
+
+    def __init__(self, every: float) -> None:
+        self.every = every
+        self.paths: Counter = Counter()
+        self.start = self._last = time.perf_counter()
+        self._last_count = 0
+
+    def add(self, path: str) -> None:
+        self.paths[path] += 1
+
+    def report(self, linha: int, force: bool = False) -> None:
+        now = time.perf_counter()
+        if not force and now - self._last < self.every:
+            return
+        total = sum(self.paths.values())
+        janela = (total - self._last_count) / max(now - self._last, 1e-9)
+        media = total / max(now - self.start, 1e-9)
+        caminhos = " ".join(f"{k}={v}" for k, v in sorted(self.paths.items()))
+        print(
+            f"[batch] linha={linha} mensagens={total} msgs/s={janela:.1f} "
+            f"(média {media:.1f}) {caminhos}",
+            flush=True,
+        )
+        self._last, self._last_count = now, total
+
+
+def _row(item: Item, resposta: main.ChatResponse | None) -> dict:
+    row: dict = {"linha": item.linha}
+    if item.id is not None:
+        row["id"] = item.id
+    if resposta is None:
+        row["erro"] = item.erro
+    else:
+        row.update(resposta.model_dump())
+    return row
+
+
+async def run(args: argparse.Namespace) -> Counter:
+    """Processa a entrada (retomando do checkpoint) e devolve a quebra por caminho."""
+    input_path, output = Path(args.input), Path(args.output)
+    ckpt_path = Path(args.checkpoint) if args.checkpoint else checkpoint_path(output)
+    start = None if args.restart else load_checkpoint(ckpt_path, input_path)
+    if start is not None and start.done:
+        print(f"[batch] {input_path} já processado ({start.lines} linhas).")
+        return Counter()
+    if start is not None and not output.exists():
+        raise SystemExit(f"Saída {output} não existe; use --restart.")
+    start = start or Checkpoint(0, 0, 0)
+    if start.lines:
+        print(f"[batch] retomando da linha {start.lines + 1}.")
+    generator = BatchGenerator(
+        await main.provider_registry.get(),
+        args.concurrency,
+        args.rate,
+        args.hf_batch_size,
+    )
+    progress = Progress(args.report_every)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.prefetch)
+
+    async def produce() -> None:
+        try:
+            for items, offset, linhas in read_chunks(input_path, start, args.chunk):
+                reqs = [
+                    main.ChatRequest(mensagem=item.mensagem)
+                    for item in items
+                    if item.erro is None
+                ]
+                ctxs = await main.prepare_many(reqs)
+                await queue.put((items, reqs, ctxs, offset, linhas))
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.ensure_future(produce())
+    offset, linhas = start.offset, start.lines
+    try:
+        with open(output, "r+b" if start.lines else "wb") as out:
+            out.truncate(start.output_bytes)
+            out.seek(start.output_bytes)
+            while (job := await queue.get()) is not None:
+                items, reqs, ctxs, offset, linhas = job
+                respostas = iter(await generator.generate(reqs, ctxs))
+                for item in items:
+                    resposta, path = (None, "erro") if item.erro else next(respostas)
+                    out.write(ndjson_line(_row(item, resposta)))
+                    progress.add(path)
+                out.flush()
+                os.fsync(out.fileno())
+                save_checkpoint(
+                    ckpt_path, input_path, Checkpoint(offset, linhas, out.tell())
+                )
+                progress.report(linhas)
+            # Propaga falha da leitura/retrieval antes de marcar como concluído.
+            await producer
+            save_checkpoint(
+                ckpt_path,
+                input_path,
+                Checkpoint(offset, linhas, out.tell(), done=True),
+            )
+    finally:
+        producer.cancel()
+    progress.report(linhas, force=True)
+    return progress.paths
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL de entrada (uma mensagem por linha).")
+    parser.add_argument("--output", required=True, help="JSONL de saída.")
+    parser.add_argument(
+        "--checkpoint", help="Arquivo de checkpoint (default: <saida>.checkpoint.json)."
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="Ignora o checkpoint e recomeça."
+    )
+    parser.add_argument("--chunk", type=int, default=main.BATCH_CHUNK)
+    parser.add_argument("--prefetch", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=float(os.getenv("BATCH_RATE", "0")),
+        help="Chamadas/s por provedor de API (0 = sem limite).",
+    )
+    parser.add_argument(
+        "--hf-batch-size", type=int, default=int(os.getenv("HF_BATCH_SIZE", "8"))
+    )
+    parser.add_argument("--report-every", type=float, default=5.0)
+    return parser
+
+
+def main_cli() -> None:
+    asyncio.run(run(build_parser().parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
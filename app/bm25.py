@@ -0,0 +1,186 @@
+"""Retriever léxico BM25, em memória ou mapeado do disco, em português.
+
+Os termos vêm de `text.analyze` (sem acento, sem stopwords, com stemmer
+leve). Os pesos BM25 de cada (termo, doc) são calculados uma vez:
+
+    idf(t) * tf * (k1 + 1) / (tf + k1 * (1 - b + b * |d| / média |d|))
+
+e guardados numa CSR termos x docs. A consulta vira um vetor de contagens de
+termos e o ranqueamento é o mesmo produto esparso + `top_k_hits` dos
+retrievers TF-IDF. Scores não são normalizados (não são cossenos).
+
+`write_bm25_index` grava essas postings na ingestão (`python -m app.ingest
+--backend bm25`, em `data/cache/kb_bm25/`) com o esquema de gerações de
+`index_store`: CSR (`data`/`indices`/`indptr.npy`), `vocab.npy` ordenado e
+os docs. `MappedBM25Retriever` abre a geração ativa com os arrays mapeados,
+sem analisar nenhum doc na carga.
+"""
+
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .index_store import (
+    current_dir,
+    doc_hash,
+    doc_ids,
+    doc_line,
+    load_array,
+    new_generation,
+    open_docs,
+    open_postings,
+    publish_generation,
+    read_meta,
+    vocab_lookup,
+    write_docs,
+    write_postings,
+)
+from .ranking import Hit, top_k_hits
+from .retrieval_backend import RetrieverBase
+from .sources import source_ranges
+from .text import analyze
+
+FORMAT_NAME = "kb-bm25"
+FORMAT_VERSION = 1
+
+
+def bm25_postings(
+    docs: Sequence[Dict[str, Any]], k1: float = 1.2, b: float = 0.75
+) -> Tuple[Dict[str, int], sparse.csr_matrix]:
+    """(termo -> linha, CSR termos x docs com os pesos BM25)."""
+    rows: List[int] = []
+    cols: List[int] = []
+    tfs: List[int] = []
+    lengths = np.zeros(len(docs), dtype=np.float64)
+    vocab: Dict[str, int] = {}
+    for i, doc in enumerate(docs):
+        terms = analyze(f"{doc['pergunta']} {doc['resposta']}")
+        lengths[i] = len(terms)
+        for term, tf in Counter(terms).items():
+            rows.append(vocab.setdefault(term, len(vocab)))
+            cols.append(i)
+            tfs.append(tf)
+    tf = np.array(tfs, dtype=np.float64)
+    rows_arr = np.array(rows, dtype=np.int64)
+    cols_arr = np.array(cols, dtype=np.int64)
+    n_docs = len(docs)
+    df = np.bincount(rows_arr, minlength=len(vocab))
+    # IDF do BM25 com +1 dentro do log (nunca negativo).
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+    avg_len = lengths.mean() if n_docs else 1.0
+    norm = k1 * (1 - b + b * lengths[cols_arr] / (avg_len or 1.0))
+    weights = idf[rows_arr] * tf * (k1 + 1) / (tf + norm)
+    matrix_t = sparse.csr_matrix(
+        (weights.astype(np.float32), (rows_arr, cols_arr)),
+        shape=(len(vocab), n_docs),
+    )
+    matrix_t.sort_indices()
+    return vocab, matrix_t
+
+
+def write_bm25_index(
+    root: str | Path,
+    docs: List[Dict[str, Any]],
+    k1: float = 1.2,
+    b: float = 0.75,
+) -> Path:
+    """Calcula as postings BM25 e publica uma nova geração."""
+    vocab, matrix_t = bm25_postings(docs, k1, b)
+    # `vocab.npy` é ordenado (busca binária): as linhas da CSR seguem a ordem.
+    terms = sorted(vocab)
+    matrix_t = matrix_t[[vocab[t] for t in terms]] if terms else matrix_t
+    tmp_dir, name, number = new_generation(root)
+    write_postings(tmp_dir, terms, matrix_t)
+    lines = [doc_line(d) for d in docs]
+    write_docs(tmp_dir, lines, doc_ids(docs), [doc_hash(line) for line in lines])
+    meta = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "generation": number,
+        "n_docs": len(docs),
+        "n_terms": len(terms),
+        "k1": k1,
+        "b": b,
+        "sources": source_ranges(docs),
+    }
+    return publish_generation(root, tmp_dir, name, meta)
+
+
+class BM25Retriever(RetrieverBase):
+    """BM25 (Okapi) sobre os docs do KB."""
+
+    def __init__(
+        self,
+        docs: Sequence[Dict[str, Any]],
+        top_k: int = 3,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> None:
+        self._docs = docs
+        self.top_k = top_k
+        self.k1 = k1
+        self.b = b
+        self.vocab, self._matrix_t = bm25_postings(docs, k1, b)
+
+    @property
+    def docs(self) -> Sequence[Dict[str, Any]]:
+        return self._docs
+
+    def _term_ids(self, terms: List[str]) -> List[int]:
+        return [self.vocab[t] for t in terms if t in self.vocab]
+
+    def vectorize_many(self, queries: Sequence[str]) -> sparse.csr_matrix:
+        """Contagens dos termos conhecidos de cada consulta (consultas x termos)."""
+        rows, cols, vals = [], [], []
+        for r, query in enumerate(queries):
+            for col, count in Counter(self._term_ids(analyze(query))).items():
+                rows.append(r)
+                cols.append(col)
+                vals.append(count)
+        return sparse.csr_matrix(
+            (np.array(vals, dtype=np.float32), (rows, cols)),
+            shape=(len(queries), self._matrix_t.shape[0]),
+        )
+
+    def retrieve_many(
+        self,
+        queries: Sequence[str],
+        top_k: int | None = None,
+        query_matrix=None,
+        sources: Sequence[str] | None = None,
+    ) -> List[List[Hit]]:
+        if not queries:
+            return []
+        if query_matrix is None:
+            query_matrix = self.vectorize_many(queries)
+        return top_k_hits(
+            query_matrix,
+            self._matrix_t,
+            top_k or self.top_k,
+            len(self._docs),
+            [not q.strip() for q in queries],
+            self.doc_ranges(sources),
+        )
+
+
+class MappedBM25Retriever(BM25Retriever):
+    """BM25 sobre a geração ativa de `write_bm25_index`, com arrays mapeados."""
+
+    def __init__(self, index_path: str | Path, top_k: int = 3) -> None:
+        self.index_path = Path(index_path)
+        meta = read_meta(self.index_path, FORMAT_NAME, FORMAT_VERSION)
+        gen_dir = current_dir(self.index_path)
+        self.top_k = top_k
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        self.vocab = load_array(gen_dir, "vocab.npy")
+        self._matrix_t = open_postings(gen_dir, meta)
+        self._docs = open_docs(gen_dir)
+        self._doc_ids = load_array(gen_dir, "doc_ids.npy")
+        self._source_ranges = meta.get("sources")
+
+    def _term_ids(self, terms: List[str]) -> List[int]:
+        return vocab_lookup(self.vocab, terms).tolist()
@@ -0,0 +1,440 @@
+"""Tabelas colunares compactas para usuários e pedidos.
+
+O dict-of-dicts carregado por `json.load` custa um dict e um objeto Python
+por campo de cada registro (~1 KB por usuário). `ColumnarTable` lê o JSON em
+fluxo (`jsonstream.iter_records`) direto para colunas tipadas:
+
+- `TEXT`: bytes UTF-8 num heap contíguo + offsets em `array('q')`;
+- `JSON`: como `TEXT`, com o valor serializado (listas, objetos);
+- `CATEGORY`: códigos `uint16`/`uint32` numa tabela de valores internados
+  (`sys.intern`; código 0 = `None`) — `regiao`, `tier`, `status`...;
+- `INT`/`FLOAT`: `array('q')`/`array('d')`.
+
+A tabela é um `Mapping` (ID normalizado -> registro), então `get_order`,
+`get_user`, `len`, `in` e `.values()` seguem funcionando. Os registros são
+`RecordView`: dois slots (tabela, linha) que decodificam cada campo só quando
+lido. O índice de IDs é um array NumPy ordenado (busca binária), e `where`
+filtra colunas categóricas por índices secundários compostos (ex.: usuários
+por `regiao`+`tier`, pedidos por `status`), montados no primeiro uso.
+
+Registros fora do schema (campo extra, faltando ou de outro tipo) são
+guardados inteiros à parte e devolvidos como vieram; as colunas recebem o
+melhor valor possível para filtros.
+"""
+
+import json
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import numpy as np
+
+from .jsonstream import iter_records
+
+TEXT = "text"
+JSON = "json"
+CATEGORY = "category"
+INT = "int"
+FLOAT = "float"
+
+# (campo, tipo) na ordem do registro original.
+Schema = Tuple[Tuple[str, str], ...]
+
+
+class _Mismatch(Exception):
+    """Valor que não cabe no tipo da coluna (o registro vai para o fallback)."""
+
+
+class _Text:
+    __slots__ = ("heap", "offsets", "nulls", "encode", "decode")
+
+    def __init__(self, kind: str) -> None:
+        self.heap = bytearray()
+        self.offsets = array("q", [0])
+        self.nulls: set = set()
+        if kind == JSON:
+            self.encode = _dump_json
+            self.decode = json.loads
+        else:
+            self.encode = _check_str
+            self.decode = None
+
+    def append(self, value: Any) -> None:
+        if value is None:
+            self.nulls.add(len(self.offsets) - 1)
+        else:
+            self.heap += self.encode(value).encode("utf-8")
+        self.offsets.append(len(self.heap))
+
+    def fill(self) -> None:
+        self.nulls.add(len(self.offsets) - 1)
+        self.offsets.append(len(self.heap))
+
+    def finish(self) -> None:
+        self.heap = bytes(self.heap)
+
+    def get(self, row: int) -> Any:
+        if row in self.nulls:
+            return None
+        text = self.heap[self.offsets[row] : self.offsets[row + 1]].decode("utf-8")
+        return self.decode(text) if self.decode else text
+
+    def nbytes(self) -> int:
+        return len(self.heap) + self.offsets.itemsize * len(self.offsets)
+
+
+class _Category:
+    __slots__ = ("codes", "values", "lookup")
+
+    def __init__(self, kind: str) -> None:
+        self.codes = array("H")
+        self.values: List[Optional[str]] = [None]
+        self.lookup: Dict[Optional[str], int] = {None: 0}
+
+    def code(self, value: Any) -> int:
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.values)
+            self.values.append(sys.intern(value))
+            if code == 1 << 16:
+                self.codes = array("I", self.codes)
+        return code
+
+    def append(self, value: Any) -> None:
+        if value is not None and not isinstance(value, str):
+            raise _Mismatch
+        code = self.code(value)  # antes do append: pode trocar o array de códigos
+        self.codes.append(code)
+
+    def fill(self) -> None:
+        self.codes.append(0)
+
+    def finish(self) -> None:
+        pass
+
+    def get(self, row: int) -> Optional[str]:
+        return self.values[self.codes[row]]
+
+    def array(self) -> np.ndarray:
+        """Códigos como array NumPy (sem cópia)."""
+        return np.frombuffer(self.codes, dtype=np.dtype(self.codes.typecode))
+
+    def nbytes(self) -> int:
+        return self.codes.itemsize * len(self.codes)
+
+
+class _Number:
+    __slots__ = ("data", "nulls", "type")
+
+    def __init__(self, kind: str) -> None:
+        self.data = array("q" if kind == INT else "d")
+        self.nulls: set = set()
+        self.type = int if kind == INT else float
+
+    def append(self, value: Any) -> None:
+        if value is None:
+            self.fill()
+        elif type(value) is self.type:
+            self.data.append(value)
+        else:
+            # bool é int, e int num campo float mudaria o tipo ao reler.
+            raise _Mismatch
+
+    def fill(self) -> None:
+        self.nulls.add(len(self.data))
+        self.data.append(0)
+
+    def finish(self) -> None:
+        pass
+
+    def get(self, row: int) -> Any:
+        return None if row in self.nulls else self.data[row]
+
+    def nbytes(self) -> int:
+        return self.data.itemsize * len(self.data)
+
+
+_COLUMNS = {TEXT: _Text, JSON: _Text, CATEGORY: _Category, INT: _Number, FLOAT: _Number}
+
+
+def _check_str(value: Any) -> str:
+    if not isinstance(value, str):
+        raise _Mismatch
+    return value
+
+
+def _dump_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class RecordView(Mapping):
+    """Registro lido sob demanda da tabela; `dict(view)` dá o registro original."""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table: "ColumnarTable", row: int) -> None:
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, field: str) -> Any:
+        table = self._table
+        raw = table._fallback.get(self._row) if table._fallback else None
+        if raw is not None:
+            return raw[field]
+        return table._columns[field].get(self._row)
+
+    def __iter__(self) -> Iterator[str]:
+        table = self._table
+        raw = table._fallback.get(self._row) if table._fallback else None
+        return iter(raw if raw is not None else table._fields)
+
+    def __len__(self) -> int:
+        table = self._table
+        raw = table._fallback.get(self._row) if table._fallback else None
+        return len(raw if raw is not None else table._fields)
+
+    def __repr__(self) -> str:
+        return f"RecordView({dict(self)!r})"
+
+
+class Rows(Sequence):
+    """Sequência preguiçosa de registros (linhas da tabela, em ordem)."""
+
+    __slots__ = ("_table", "_rows")
+
+    def __init__(self, table: "ColumnarTable", rows: np.ndarray) -> None:
+        self._table = table
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return Rows(self._table, self._rows[i])
+        return RecordView(self._table, int(self._rows[i]))
+
+    def __iter__(self) -> Iterator[RecordView]:
+        table = self._table
+        return (RecordView(table, row) for row in self._rows.tolist())
+
+    @property
+    def rows(self) -> np.ndarray:
+        return self._rows
+
+
+class ColumnarTable(Mapping):
+    """Tabela colunar imutável indexada por ID normalizado."""
+
+    def __init__(
+        self,
+        records: Iterable[Dict[str, Any]],
+        schema: Schema,
+        key: str,
+        normalize: Callable[[str], str] = str,
+        indexes: Tuple[Tuple[str, ...], ...] = (),
+    ) -> None:
+        self.schema = schema
+        self.key = key
+        self.normalize = normalize
+        self._fields = tuple(name for name, _ in schema)
+        self._columns = {name: _COLUMNS[kind](kind) for name, kind in schema}
+        self._fallback: Dict[int, Dict[str, Any]] = {}
+        self._declared = indexes
+        self._indexes: Dict[Tuple[str, ...], Tuple[np.ndarray, np.ndarray]] = {}
+        keys: List[bytes] = []
+        n = 0
+        for record in records:
+            keys.append(normalize(record[key]).encode("utf-8"))
+            self._append(n, record)
+            n += 1
+        for column in self._columns.values():
+            column.finish()
+        self._len = n
+        self._build_key_index(keys)
+
+    def _append(self, row: int, record: Dict[str, Any]) -> None:
+        exact = len(record) == len(self._fields)
+        for name, column in self._columns.items():
+            if name not in record:
+                exact = False
+                column.fill()
+                continue
+            try:
+                column.append(record[name])
+            except _Mismatch:
+                exact = False
+                column.fill()
+        if not exact:
+            self._fallback[row] = record
+
+    def _build_key_index(self, keys: List[bytes]) -> None:
+        ids = np.array(keys, dtype=f"S{max(1, max(map(len, keys), default=1))}")
+        order = np.argsort(ids, kind="stable")
+        ordered = ids[order]
+        # ID repetido: vale a última linha, como no dict.
+        last = np.ones(len(ordered), dtype=bool)
+        last[:-1] = ordered[1:] != ordered[:-1]
+        self._ids = ordered[last]
+        self._id_rows = order[last].astype(np.int64)
+        self._live = None
+        if len(self._ids) != self._len:
+            self._live = np.zeros(self._len, dtype=bool)
+            self._live[self._id_rows] = True
+
+    def _find(self, key: str) -> int:
+        if not isinstance(key, str):
+            return -1
+        needle = key.encode("utf-8")
+        ids = self._ids
+        i = int(ids.searchsorted(needle))
+        if i < len(ids) and ids[i] == needle:
+            return int(self._id_rows[i])
+        return -1
+
+    # Mapping -----------------------------------------------------------
+
+    def __getitem__(self, key: str) -> RecordView:
+        row = self._find(key)
+        if row < 0:
+            raise KeyError(key)
+        return RecordView(self, row)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._find(key)
+        return RecordView(self, row) if row >= 0 else default
+
+    def __contains__(self, key: object) -> bool:
+        return self._find(key) >= 0  # type: ignore[arg-type]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[str]:
+        for row in self._live_rows().tolist():
+            yield self.normalize(self.value(row, self.key))
+
+    def values(self) -> Rows:  # type: ignore[override]
+        return Rows(self, self._live_rows())
+
+    def row(self, row: int) -> RecordView:
+        return RecordView(self, row)
+
+    def value(self, row: int, field: str) -> Any:
+        return RecordView(self, row)[field]
+
+    def _live_rows(self) -> np.ndarray:
+        rows = np.arange(self._len, dtype=np.int64)
+        return rows if self._live is None else rows[self._live]
+
+    # Índices secundários -----------------------------------------------
+
+    def where(self, **filters: Any) -> Rows:
+        """Registros cujos campos categóricos batem com `filters`.
+
+        Cada filtro é um valor ou uma coleção de valores aceitos (IN). Usa o
+        índice declarado cujo prefixo são exatamente os campos filtrados; sem
+        índice, varre os códigos com NumPy.
+        """
+        wanted: Dict[str, List[int]] = {}
+        for field, value in filters.items():
+            column = self._columns.get(field)
+            if not isinstance(column, _Category):
+                raise ValueError(f"`{field}` não é uma coluna categórica.")
+            accepted = value if isinstance(value, (list, tuple, set)) else [value]
+            wanted[field] = [column.lookup[v] for v in accepted if v in column.lookup]
+        if not wanted:
+            return self.values()
+        fields = tuple(wanted)
+        for index in self._declared:
+            if set(index[: len(fields)]) == set(fields):
+                rows = self._lookup(index, wanted)
+                break
+        else:
+            mask = np.ones(self._len, dtype=bool)
+            for field, codes in wanted.items():
+                mask &= np.isin(self._columns[field].array(), codes)
+            rows = np.flatnonzero(mask)
+        if self._live is not None:
+            rows = rows[self._live[rows]]
+        return Rows(self, rows)
+
+    def _index(self, fields: Tuple[str, ...]) -> Tuple[np.ndarray, np.ndarray]:
+        """(chaves compostas ordenadas, linhas na mesma ordem), sob demanda."""
+        index = self._indexes.get(fields)
+        if index is None:
+            combined = np.zeros(self._len, dtype=np.int64)
+            for field in fields:
+                column = self._columns[field]
+                combined = combined * len(column.values) + column.array()
+            order = np.argsort(combined, kind="stable")
+            index = self._indexes[fields] = (combined[order], order)
+        return index
+
+    def _lookup(
+        self, fields: Tuple[str, ...], wanted: Dict[str, List[int]]
+    ) -> np.ndarray:
+        keys, order = self._index(fields)
+        # Intervalos [lo, hi) de chave composta para cada combinação pedida;
+        # campos do índice fora do filtro cobrem todos os códigos.
+        ranges = [(0, 1)]
+        for field in fields:
+            size = len(self._columns[field].values)
+            codes = wanted.get(field)
+            if codes is None:
+                ranges = [(lo * size, hi * size) for lo, hi in ranges]
+            else:
+                ranges = [
+                    (lo * size + c, lo * size + c + 1)
+                    for lo, hi in ranges
+                    for c in codes
+                ]
+        parts = [
+            order[keys.searchsorted(lo) : keys.searchsorted(hi)] for lo, hi in ranges
+        ]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(parts))
+
+    def nbytes(self) -> int:
+        """Bytes das colunas e do índice de IDs (sem os registros de fallback)."""
+        total = sum(column.nbytes() for column in self._columns.values())
+        total += self._ids.nbytes + self._id_rows.nbytes
+        return total + sum(k.nbytes + o.nbytes for k, o in self._indexes.values())
+
+
+def load_table(
+    path: Path,
+    schema: Schema,
+    key: str,
+    normalize: Callable[[str], str] = str,
+    indexes: Tuple[Tuple[str, ...], ...] = (),
+) -> ColumnarTable:
+    """`ColumnarTable` de uma lista JSON (ou NDJSON) em disco, lida em fluxo."""
+    return ColumnarTable(iter_records(path), schema, key, normalize, indexes)
+
+
+def select(table: Mapping, **filters: Any) -> Sequence:
+    """`where` na tabela colunar; varredura simples no dict-of-dicts legado."""
+    if isinstance(table, ColumnarTable):
+        return table.where(**filters)
+    accepted = {
+        field: value if isinstance(value, (list, tuple, set)) else [value]
+        for field, value in filters.items()
+    }
+    return [
+        record
+        for record in table.values()
+        if all(record.get(f) in values for f, values in accepted.items())
+    ]
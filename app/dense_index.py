@@ -0,0 +1,275 @@
+"""Índice denso em disco (embeddings quantizados + IVF), mapeado em memória.
+
+Mesmo esquema de gerações/`CURRENT` de `index_store`, com formato próprio
+(`FORMAT_NAME`). Layout de uma geração:
+
+- `vectors.npy`: embeddings dos docs (linhas x dim) em `int8` (com
+  `scales.npy`, um fator por linha) ou `float16`, já na ordem das listas IVF;
+- `rows.npy`: posição no `docs.jsonl` de cada linha de `vectors.npy`;
+- `centroids.npy` + `ivf_offsets.npy`: centroides do k-means esférico e início
+  de cada lista invertida em `vectors.npy` (ausentes se `nlist` <= 1);
+- `docs.jsonl`, `docs_offsets.npy`, `doc_ids.npy`, `doc_hashes.npy`: como no
+  índice TF-IDF.
+
+Busca aproximada (IVF): pontua os centroides, visita as `nprobe` listas mais
+próximas (fatias contíguas de `vectors.npy`) e ranqueia só esses candidatos.
+`search_exact` é a força bruta em NumPy, em blocos, sobre todas as linhas.
+Com `ranges` (filtro por fonte, intervalos de posições em `docs.jsonl`), só
+as linhas dentro dos intervalos são lidas e pontuadas: dentro de cada lista
+IVF (ou do índice todo, sem IVF) as linhas seguem a ordem de `docs.jsonl`,
+então cada intervalo é uma fatia contígua achada por busca binária em
+`rows.npy`.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .index_store import (
+    MappedDocs,
+    current_dir,
+    doc_hash,
+    doc_ids,
+    doc_line,
+    load_array,
+    new_generation,
+    publish_generation,
+    read_meta,
+    write_docs,
+)
+from .ranking import Hit
+from .sources import Ranges, source_ranges
+
+FORMAT_NAME = "kb-dense"
+FORMAT_VERSION = 1
+QUANTIZATIONS = ("int8", "float16")
+# Linhas pontuadas por vez na força bruta (limita a memória temporária).
+_BLOCK = 65536
+# Amostra máxima de vetores usada para treinar os centroides.
+_TRAIN_SAMPLE = 100_000
+
+
+def quantize(matrix: np.ndarray, kind: str) -> Tuple[np.ndarray, np.ndarray | None]:
+    """(vetores quantizados, escalas por linha ou None)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if kind == "float16":
+        return matrix.astype(np.float16), None
+    if kind != "int8":
+        raise ValueError(f"Quantização desconhecida: {kind!r}")
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    q = np.rint(matrix / scales[:, None]).astype(np.int8)
+    return q, scales.astype(np.float32)
+
+
+def default_nlist(n_docs: int) -> int:
+    """~sqrt(n) listas; KBs pequenos ficam só com força bruta."""
+    return 0 if n_docs < 4096 else int(np.sqrt(n_docs))
+
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), _BLOCK):
+        block = matrix[start : start + _BLOCK]
+        out[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def train_ivf(
+    matrix: np.ndarray, nlist: int, iters: int = 10, seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """K-means esférico (cosseno) numa amostra: (centroides, lista de cada linha)."""
+    rng = np.random.default_rng(seed)
+    sample = matrix
+    if len(matrix) > _TRAIN_SAMPLE:
+        sample = matrix[rng.choice(len(matrix), _TRAIN_SAMPLE, replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Lista vazia mantém o centroide anterior.
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+    return centroids.astype(np.float32), _assign(matrix, centroids)
+
+
+def write_dense_index(
+    root: str | Path,
+    docs: List[Dict[str, Any]],
+    vectors: np.ndarray,
+    encoder_meta: Dict[str, Any],
+    quantization: str = "int8",
+    nlist: int | None = None,
+) -> Path:
+    """Quantiza os embeddings, treina o IVF e publica uma nova geração."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    nlist = default_nlist(len(docs)) if nlist is None else min(nlist, len(docs))
+    tmp_dir, name, number = new_generation(root)
+    rows = np.arange(len(docs), dtype=np.int64)
+    if nlist > 1:
+        centroids, labels = train_ivf(vectors, nlist)
+        rows = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        np.save(tmp_dir / "centroids.npy", centroids)
+        np.save(tmp_dir / "ivf_offsets.npy", offsets)
+    stored, scales = quantize(vectors[rows], quantization)
+    np.save(tmp_dir / "vectors.npy", stored)
+    np.save(tmp_dir / "rows.npy", rows)
+    if scales is not None:
+        np.save(tmp_dir / "scales.npy", scales)
+    lines = [doc_line(d) for d in docs]
+    write_docs(tmp_dir, lines, doc_ids(docs), [doc_hash(line) for line in lines])
+
+    meta = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "generation": number,
+        "n_docs": len(docs),
+        "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+        "quantization": quantization,
+        "nlist": nlist if nlist > 1 else 0,
+        "encoder_meta": encoder_meta,
+        "sources": source_ranges(docs),
+    }
+    return publish_generation(root, tmp_dir, name, meta)
+
+
+def _top_k(
+    scores: np.ndarray, ids: np.ndarray, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k de um vetor de scores; empates pela posição do doc."""
+    if len(scores) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        scores, ids = scores[part], ids[part]
+    order = np.lexsort((ids, -scores))
+    return scores[order], ids[order]
+
+
+class DenseIndex:
+    """Geração ativa de um índice denso, com arrays mapeados em memória."""
+
+    def __init__(self, root: str | Path) -> None:
+        self.meta = read_meta(root, FORMAT_NAME, FORMAT_VERSION)
+        gen_dir = current_dir(root)
+        self.vectors = load_array(gen_dir, "vectors.npy")
+        self.rows = load_array(gen_dir, "rows.npy")
+        self.scales = (
+            load_array(gen_dir, "scales.npy")
+            if self.meta["quantization"] == "int8"
+            else None
+        )
+        self.centroids = self.offsets = None
+        if self.meta["nlist"]:
+            # Pequenos e consultados a cada busca: ficam em RAM.
+            self.centroids = np.load(gen_dir / "centroids.npy")
+            self.offsets = np.load(gen_dir / "ivf_offsets.npy")
+        self.docs = MappedDocs(
+            gen_dir / "docs.jsonl", load_array(gen_dir, "docs_offsets.npy")
+        )
+        self.doc_ids = load_array(gen_dir, "doc_ids.npy")
+        # `ranges` -> fatias de cada lista (poucos filtros distintos: um por intenção).
+        self._slices: Dict[tuple, List[List[Tuple[int, int]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def has_ivf(self) -> bool:
+        return self.centroids is not None
+
+    def _score(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        """Cosseno (consultas x linhas[start:end]) já desquantizado."""
+        block = np.asarray(self.vectors[start:end], dtype=np.float32)
+        scores = queries @ block.T
+        if self.scales is not None:
+            scores *= self.scales[start:end]
+        return scores
+
+    def _range_slices(self, ranges: Ranges) -> List[List[Tuple[int, int]]]:
+        """Fatias `[início, fim)` de `vectors.npy` dentro de `ranges`, por lista.
+
+        Sem IVF há uma só "lista" com todas as linhas. As linhas de cada lista
+        estão em ordem crescente de posição (argsort estável na escrita).
+        """
+        key = tuple(map(tuple, ranges))
+        slices = self._slices.get(key)
+        if slices is None:
+            bounds = self.offsets if self.has_ivf else np.array([0, len(self)])
+            flat = np.asarray(ranges, dtype=np.int64).reshape(-1)
+            slices = []
+            for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+                cuts = (start + np.searchsorted(self.rows[start:end], flat)).tolist()
+                slices.append([(a, b) for a, b in zip(cuts[0::2], cuts[1::2]) if a < b])
+            self._slices[key] = slices
+        return slices
+
+    def search_exact(
+        self, queries: np.ndarray, top_k: int, ranges: Ranges | None = None
+    ) -> List[List[Hit]]:
+        """Força bruta sobre as linhas (em `ranges`), em blocos de `_BLOCK`."""
+        k = min(top_k, len(self))
+        if ranges is None:
+            spans = [(0, len(self))]
+        else:
+            spans = [span for lst in self._range_slices(ranges) for span in lst]
+        blocks = [
+            (start, min(start + _BLOCK, end))
+            for first, end in spans
+            for start in range(first, end, _BLOCK)
+        ]
+        best = [(np.empty(0, np.float32), np.empty(0, np.int64)) for _ in queries]
+        for start, end in blocks:
+            scores = self._score(queries, start, end)
+            ids = np.asarray(self.rows[start:end])
+            for q in range(len(queries)):
+                vals, idx = best[q]
+                best[q] = _top_k(
+                    np.concatenate([vals, scores[q]]), np.concatenate([idx, ids]), k
+                )
+        return [_hits(vals, idx) for vals, idx in best]
+
+    def search(
+        self,
+        queries: np.ndarray,
+        top_k: int,
+        nprobe: int = 32,
+        ranges: Ranges | None = None,
+    ) -> List[List[Hit]]:
+        """Busca IVF: só as `nprobe` listas mais próximas de cada consulta."""
+        if not self.has_ivf:
+            return self.search_exact(queries, top_k, ranges)
+        nprobe = min(nprobe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)
+        # Cada lista é desquantizada uma vez e pontuada contra todas as
+        # consultas do lote que a visitam.
+        visitors: Dict[int, List[int]] = {}
+        for q, row in enumerate(probes[:, :nprobe].tolist()):
+            for c in row:
+                visitors.setdefault(c, []).append(q)
+        vals: List[List[np.ndarray]] = [[] for _ in queries]
+        idx: List[List[np.ndarray]] = [[] for _ in queries]
+        slices = self._range_slices(ranges) if ranges is not None else None
+        for c, qs in visitors.items():
+            if slices is None:
+                spans = [(int(self.offsets[c]), int(self.offsets[c + 1]))]
+            else:
+                spans = slices[c]
+            for start, end in spans:
+                if start == end:
+                    continue
+                scores = self._score(queries[qs], start, end)
+                ids = np.asarray(self.rows[start:end])
+                for j, q in enumerate(qs):
+                    vals[q].append(scores[j])
+                    idx[q].append(ids)
+        return [
+            _hits(*_top_k(np.concatenate(v), np.concatenate(i), top_k)) if v else []
+            for v, i in zip(vals, idx)
+        ]
+
+
+def _hits(scores: Sequence[float], ids: Sequence[int]) -> List[Hit]:
+    return [Hit(int(i), float(s)) for i, s in zip(ids, scores)]
@@ -0,0 +1,67 @@
+"""Retriever por embeddings densos sobre o índice de `dense_index`.
+
+Os embeddings dos docs vêm prontos da ingestão (`python -m app.ingest
+--backend dense`); na consulta só o texto do usuário é codificado, com o mesmo
+encoder gravado no `meta.json`. A busca usa o IVF quando o índice tem um
+(`DENSE_NPROBE` listas visitadas, padrão 32) e força bruta caso contrário ou
+com `DENSE_ANN=0`.
+"""
+
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from .dense_index import DenseIndex
+from .embeddings import load_encoder
+from .ranking import Hit
+from .retrieval_backend import RetrieverBase
+
+
+class DenseRetriever(RetrieverBase):
+    def __init__(
+        self,
+        index_path: str | Path,
+        top_k: int = 3,
+        nprobe: int | None = None,
+        ann: bool | None = None,
+    ) -> None:
+        self.index_path = Path(index_path)
+        self.top_k = top_k
+        self.index = DenseIndex(self.index_path)
+        self.encoder = load_encoder(self.index.meta["encoder_meta"])
+        self.nprobe = nprobe or int(os.getenv("DENSE_NPROBE", "32"))
+        self.ann = os.getenv("DENSE_ANN", "1") != "0" if ann is None else ann
+        self._source_ranges = self.index.meta.get("sources")
+        self._doc_ids = self.index.doc_ids
+
+    @property
+    def docs(self) -> Sequence[Dict[str, Any]]:
+        return self.index.docs
+
+    def vectorize_many(self, queries: Sequence[str]) -> np.ndarray:
+        """Embeddings (consultas x dim) float32 normalizados L2."""
+        return self.encoder.encode(list(queries))
+
+    def retrieve_many(
+        self,
+        queries: Sequence[str],
+        top_k: int | None = None,
+        query_matrix=None,
+        sources: Sequence[str] | None = None,
+    ) -> List[List[Hit]]:
+        if not queries:
+            return []
+        if query_matrix is None:
+            query_matrix = self.vectorize_many(queries)
+        query_matrix = np.asarray(query_matrix, dtype=np.float32).reshape(
+            len(queries), -1
+        )
+        k = top_k or self.top_k
+        ranges = self.doc_ranges(sources)
+        if self.ann:
+            hits = self.index.search(query_matrix, k, self.nprobe, ranges)
+        else:
+            hits = self.index.search_exact(query_matrix, k, ranges)
+        return [[] if not q.strip() else h for q, h in zip(queries, hits)]
@@ -0,0 +1,129 @@
+"""Encoders de texto para embeddings densos, rodando localmente na CPU.
+
+- `sentence-transformers` (opcional): `EMBED_MODEL=st:<modelo>`, ex.
+  `st:sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2`. Exige
+  torch e o pacote instalados.
+- `hashing` (padrão, sem dependências): feature hashing com sinal de palavras
+  e trigramas de caracteres (sem acento) num vetor de `dim` posições,
+  normalizado L2. Não precisa de treino nem de arquivo de modelo, e os
+  trigramas aproximam variações de grafia ("reembolso"/"reembolsar").
+
+Os embeddings dos docs são calculados na ingestão; o `meta.json` do índice
+guarda o encoder usado (`encoder_meta`) para a consulta usar o mesmo
+(`load_encoder`).
+"""
+
+import os
+import zlib
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .text import tokenize
+
+DEFAULT_ENCODER = "hashing"
+DEFAULT_DIM = 256
+# Peso de cada trigrama em relação à palavra inteira.
+_NGRAM_WEIGHT = 0.5
+# Lote de docs convertido de esparso para denso de uma vez.
+_CHUNK = 8192
+# Teto do memo de features por token (consultas trazem vocabulário aberto).
+_MEMO_MAX = 200_000
+
+
+class HashingEncoder:
+    """Embedding por feature hashing (palavras + trigramas de caracteres)."""
+
+    def __init__(self, dim: int = DEFAULT_DIM, ngram: int = 3) -> None:
+        self.dim = dim
+        self.ngram = ngram
+        self._memo: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return {"encoder": "hashing", "dim": self.dim, "ngram": self.ngram}
+
+    def _token_features(self, token: str) -> Tuple[np.ndarray, np.ndarray]:
+        cached = self._memo.get(token)
+        if cached is not None:
+            return cached
+        padded = f"<{token}>"
+        grams = [
+            padded[i : i + self.ngram] for i in range(len(padded) - self.ngram + 1)
+        ]
+        idx, val = [], []
+        for j, feature in enumerate([token, *grams]):
+            h = zlib.crc32(feature.encode("utf-8"))
+            idx.append(h % self.dim)
+            # Bit alto do hash define o sinal (colisões tendem a se cancelar).
+            sign = 1.0 if h & 0x80000000 else -1.0
+            val.append(sign * (1.0 if j == 0 else _NGRAM_WEIGHT))
+        cached = (np.array(idx, dtype=np.int32), np.array(val, dtype=np.float32))
+        if len(self._memo) >= _MEMO_MAX:
+            self._memo.clear()
+        self._memo[token] = cached
+        return cached
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """Matriz (textos x dim) float32 normalizada L2."""
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), _CHUNK):
+            rows, cols, vals = [], [], []
+            for r, text in enumerate(texts[start : start + _CHUNK]):
+                for token in tokenize(text):
+                    idx, val = self._token_features(token)
+                    rows.append(np.full(len(idx), r, dtype=np.int32))
+                    cols.append(idx)
+                    vals.append(val)
+            if not rows:
+                continue
+            n = min(_CHUNK, len(texts) - start)
+            block = sparse.csr_matrix(
+                (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                shape=(n, self.dim),
+            )
+            out[start : start + n] = block.toarray()
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class SentenceTransformerEncoder:
+    """Modelo local do `sentence-transformers` (opcional; requer torch)."""
+
+    def __init__(self, model_name: str) -> None:
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = int(self._model.get_sentence_embedding_dimension())
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return {"encoder": f"st:{self.model_name}", "dim": self.dim}
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        return self._model.encode(
+            list(texts),
+            batch_size=64,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        ).astype(np.float32)
+
+
+def get_encoder(name: str | None = None, dim: int = DEFAULT_DIM):
+    """Encoder por nome (`hashing` ou `st:<modelo>`); padrão via `EMBED_MODEL`."""
+    name = name or os.getenv("EMBED_MODEL", DEFAULT_ENCODER)
+    if name.startswith("st:"):
+        return SentenceTransformerEncoder(name[3:])
+    if name != "hashing":
+        raise ValueError(f"Encoder desconhecido: {name!r}")
+    return HashingEncoder(dim=dim)
+
+
+def load_encoder(meta: Dict[str, Any]):
+    """Recria o encoder gravado no `meta.json` do índice denso."""
+    if meta["encoder"] == "hashing":
+        return HashingEncoder(dim=meta["dim"], ngram=meta.get("ngram", 3))
+    return get_encoder(meta["encoder"])
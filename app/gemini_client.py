@@ -1,13 +1,15 @@
 """Conector simples para Gemini (Google Generative AI)."""
 
 import os
-from typing import Optional
+from typing import Any, AsyncIterator, Optional
 
 try:
     import google.generativeai as genai
 except Exception:  # pragma: no cover
     genai = None  # type: ignore
 
+from .prompts import Prompt, build_prompt, observe_prompt
+
 
 def get_gemini_model(model_name: Optional[str] = None):
     """Retorna um modelo Gemini configurado se houver API key."""
@@ -24,19 +26,63 @@ def get_gemini_model(model_name: Optional[str] = None):
         return None
 
 
+def _build_prompt(model, pergunta: str, evidencia: str) -> Prompt:
+    """Instruções fixas na frente: prefixo estável para o cache implícito do Gemini."""
+    return build_prompt(
+        pergunta, evidencia, "chat", getattr(model, "model_name", "gemini")
+    )
+
+
+def _observe_usage(prompt: Prompt, usage: Any) -> None:
+    """Tokens do prompt pelo `usage_metadata` da resposta (ou estimados, sem ele)."""
+    if usage is None:
+        observe_prompt("gemini", prompt.tokens)
+        return
+    observe_prompt(
+        "gemini",
+        usage.prompt_token_count,
+        getattr(usage, "cached_content_token_count", 0) or 0,
+    )
+
+
 def generate_with_context(
     model, pergunta: str, evidencia: str, max_output_tokens: int = 180
 ) -> str:
     """Gera resposta usando evidência como base."""
-    prompt = (
-        "Você é um atendente de suporte de entregas. Responda em português, em até 2 frases curtas, "
-        "usando apenas a evidência fornecida. Se faltar informação, peça dados adicionais.\n\n"
-        f"Pergunta: {pergunta}\n"
-        f"Evidência: {evidencia}\n"
-        "Resposta:"
-    )
+    prompt = _build_prompt(model, pergunta, evidencia)
     resp = model.generate_content(
-        prompt,
+        prompt.text,
+        generation_config={"max_output_tokens": max_output_tokens, "temperature": 0},
+    )
+    _observe_usage(prompt, getattr(resp, "usage_metadata", None))
+    return resp.text.strip()
+
+
+async def agenerate_with_context(
+    model, pergunta: str, evidencia: str, max_output_tokens: int = 180
+) -> str:
+    """Versão assíncrona via `generate_content_async` (sem bloquear o event loop)."""
+    prompt = _build_prompt(model, pergunta, evidencia)
+    resp = await model.generate_content_async(
+        prompt.text,
         generation_config={"max_output_tokens": max_output_tokens, "temperature": 0},
     )
+    _observe_usage(prompt, getattr(resp, "usage_metadata", None))
     return resp.text.strip()
+
+
+async def astream_with_context(
+    model, pergunta: str, evidencia: str, max_output_tokens: int = 180
+) -> AsyncIterator[str]:
+    """Streaming via `generate_content_async(stream=True)`."""
+    prompt = _build_prompt(model, pergunta, evidencia)
+    _observe_usage(prompt, None)
+    resp = await model.generate_content_async(
+        prompt.text,
+        generation_config={"max_output_tokens": max_output_tokens, "temperature": 0},
+        stream=True,
+    )
+    async for chunk in resp:
+        # Trechos sem `parts` (ex.: só metadados de segurança) não têm `.text`.
+        if chunk.parts:
+            yield chunk.text
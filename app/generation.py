@@ -0,0 +1,286 @@
+"""Cadeia assíncrona de geração (OpenAI -> Gemini -> HF) com modo hedged opcional.
+
+- Modo sequencial (padrão): tenta cada provedor na ordem; só passa ao próximo
+  se o anterior falhar.
+- Modo hedged (`CHAT_HEDGE_MS`): se o provedor atual não responder dentro do
+  prazo, dispara o próximo em paralelo e usa quem terminar primeiro. Quando não
+  há mais provedores, o prazo estourado devolve `None` (o chamador responde
+  direto do KB, que é instantâneo).
+- Streaming (`stream_chain`): repassa os trechos do provedor conforme chegam.
+  Falha antes do primeiro trecho cai para o próximo sem o cliente perceber;
+  falha no meio emite um `StreamChunk(reset=True)` (o cliente descarta o texto
+  parcial) e o próximo provedor (ou o KB) recomeça a resposta.
+- Provedores com `guard` (`app.resilience`) são pulados com o circuito aberto
+  e cortados pelo timeout adaptativo (no stream, até o primeiro trecho).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from .metrics import FALLBACKS, PROVIDER_SECONDS
+from .prompts import observe_completion
+from .resilience import CircuitOpen, ProviderGuard, ProviderTimeout
+
+logger = logging.getLogger("uvicorn.error")
+
+GenerateFn = Callable[[str, str], Awaitable[str]]
+StreamFn = Callable[[str, str], AsyncIterator[str]]
+GenerateManyFn = Callable[[List[Tuple[str, str]], int], Awaitable[List[str]]]
+
+
+@dataclass(frozen=True)
+class Provider:
+    """Provedor de geração: `generate(pergunta, evidencia)` é assíncrono.
+
+    `stream`, se houver, devolve a mesma resposta em trechos (tokens);
+    `generate_many(pares, batch_size)`, se houver, gera um lote de
+    (pergunta, evidencia) numa chamada (usado pelo pipeline offline);
+    `guard`, se houver, aplica circuit breaker e timeout adaptativo;
+    `admit`, se houver, é aguardado antes de cada chamada e fora do `guard`
+    (ex.: rate limit do pipeline offline), então a espera não conta no
+    timeout nem no breaker.
+    """
+
+    name: str
+    model: str
+    generate: GenerateFn
+    stream: Optional[StreamFn] = None
+    generate_many: Optional[GenerateManyFn] = None
+    guard: Optional[ProviderGuard] = None
+    admit: Optional[Callable[[], Awaitable[None]]] = None
+
+
+class StreamChunk(NamedTuple):
+    """Trecho de texto de `provider`; `reset` descarta o que ele já enviou."""
+
+    provider: Provider
+    text: str
+    reset: bool = False
+
+
+def hedge_after_from_env() -> float | None:
+    """Lê `CHAT_HEDGE_MS`; vazio/ausente desliga o modo hedged."""
+    raw = os.getenv("CHAT_HEDGE_MS")
+    if not raw:
+        return None
+    return int(raw) / 1000.0
+
+
+async def run_chain(
+    providers: List[Provider],
+    pergunta: str,
+    evidencia: str,
+    hedge_after: float | None = None,
+) -> Optional[Tuple[str, Provider]]:
+    """Retorna (texto, provedor) do primeiro sucesso ou `None` se cair no KB."""
+    if hedge_after is None:
+        return await _run_sequential(providers, pergunta, evidencia)
+    return await _run_hedged(providers, pergunta, evidencia, hedge_after)
+
+
+def _fallback_reason(exc: BaseException) -> str:
+    if isinstance(exc, CircuitOpen):
+        return "open"
+    if isinstance(exc, ProviderTimeout):
+        return "timeout"
+    return "error"
+
+
+async def _timed_generate(provider: Provider, pergunta: str, evidencia: str) -> str:
+    """`provider.generate` com a duração registrada por resultado.
+
+    Com `guard`: levanta `CircuitOpen` sem chamar o provedor se o circuito
+    estiver aberto, e `ProviderTimeout` se passar do timeout adaptativo.
+    `admit` é aguardado antes: nem o timeout nem a duração incluem a espera.
+    """
+    if provider.admit is not None:
+        await provider.admit()
+    guard = provider.guard
+    if guard is not None:
+        guard.acquire()
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        call = provider.generate(pergunta, evidencia)
+        if guard is not None:
+            call = asyncio.wait_for(call, guard.timeout)
+        text = await call
+        outcome = "ok"
+        observe_completion(
+            provider.name, provider.model, text, time.perf_counter() - start
+        )
+        return text
+    except asyncio.TimeoutError:
+        if guard is None:
+            raise
+        outcome = "timeout"
+        raise ProviderTimeout(f"{provider.name} passou de {guard.timeout:.2f}s")
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        PROVIDER_SECONDS.observe(elapsed, provider.name, outcome)
+        if guard is not None:
+            guard.record(outcome, elapsed)
+
+
+async def _run_sequential(
+    providers: List[Provider], pergunta: str, evidencia: str
+) -> Optional[Tuple[str, Provider]]:
+    for provider in providers:
+        try:
+            return await _timed_generate(provider, pergunta, evidencia), provider
+        except CircuitOpen:
+            FALLBACKS.inc(provider.name, "open")
+        except Exception as exc:
+            FALLBACKS.inc(provider.name, _fallback_reason(exc))
+            logger.warning("Falha %s, caindo para o próximo: %s", provider.name, exc)
+    return None
+
+
+async def _run_hedged(
+    providers: List[Provider], pergunta: str, evidencia: str, hedge_after: float
+) -> Optional[Tuple[str, Provider]]:
+    remaining = list(providers)
+    pending: Dict[asyncio.Task, Provider] = {}
+
+    def launch() -> None:
+        provider = remaining.pop(0)
+        task = asyncio.ensure_future(_timed_generate(provider, pergunta, evidencia))
+        pending[task] = provider
+
+    if not remaining:
+        return None
+    launch()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(
+                pending, timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                # Prazo estourado: dispara o próximo fallback ou responde pelo KB.
+                # O mais recente (último inserido) foi quem estourou o prazo.
+                FALLBACKS.inc(list(pending.values())[-1].name, "hedge")
+                if not remaining:
+                    logger.warning("Hedge: prazo estourado, respondendo pelo KB.")
+                    return None
+                launch()
+                continue
+            for task in done:
+                provider = pending.pop(task)
+                exc = task.exception()
+                if exc is None:
+                    return task.result(), provider
+                FALLBACKS.inc(provider.name, _fallback_reason(exc))
+                logger.warning(
+                    "Falha %s, caindo para o próximo: %s", provider.name, exc
+                )
+                if remaining:
+                    launch()
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _provider_stream(
+    provider: Provider,
+    pergunta: str,
+    evidencia: str,
+    first_timeout: float | None = None,
+) -> AsyncIterator[str]:
+    """Trechos do provedor; `first_timeout` limita a espera pelo primeiro."""
+    if provider.admit is not None:
+        await provider.admit()
+    if provider.stream is None:
+        # Sem modo streaming: a resposta inteira vira um único trecho.
+        yield await _within(
+            provider.generate(pergunta, evidencia), first_timeout, provider
+        )
+        return
+    stream = provider.stream(pergunta, evidencia)
+    try:
+        try:
+            first = await _within(stream.__anext__(), first_timeout, provider)
+        except StopAsyncIteration:
+            return
+        yield first
+        async for text in stream:
+            yield text
+    finally:
+        if hasattr(stream, "aclose"):
+            await stream.aclose()
+
+
+async def _within(call: Awaitable, timeout: float | None, provider: Provider):
+    if timeout is None:
+        return await call
+    try:
+        return await asyncio.wait_for(call, timeout)
+    except asyncio.TimeoutError:
+        raise ProviderTimeout(f"{provider.name} sem resposta em {timeout:.2f}s")
+
+
+async def stream_chain(
+    providers: List[Provider], pergunta: str, evidencia: str
+) -> AsyncIterator[StreamChunk]:
+    """Trechos do primeiro provedor que responder; nada se todos falharem."""
+    for provider in providers:
+        guard = provider.guard
+        if guard is not None:
+            try:
+                guard.acquire()
+            except CircuitOpen:
+                FALLBACKS.inc(provider.name, "open")
+                continue
+        emitted = False
+        agen = _provider_stream(
+            provider, pergunta, evidencia, guard.timeout if guard else None
+        )
+        start = time.perf_counter()
+        outcome = "cancelled"
+        parts: List[str] = []
+        try:
+            async for text in agen:
+                if text:
+                    emitted = True
+                    parts.append(text)
+                    yield StreamChunk(provider, text)
+            outcome = "ok"
+            observe_completion(
+                provider.name,
+                provider.model,
+                "".join(parts),
+                time.perf_counter() - start,
+            )
+            return
+        except Exception as exc:
+            outcome = _fallback_reason(exc)
+            FALLBACKS.inc(provider.name, outcome)
+            logger.warning(
+                "Falha %s no stream, caindo para o próximo: %s", provider.name, exc
+            )
+        finally:
+            elapsed = time.perf_counter() - start
+            PROVIDER_SECONDS.observe(elapsed, provider.name, outcome)
+            if guard is not None:
+                # A duração do stream inteiro não serve de amostra para o timeout.
+                guard.record(outcome, elapsed, sample=False)
+            await agen.aclose()
+        if emitted:
+            # Falhou no meio: o cliente descarta o texto parcial deste provedor.
+            yield StreamChunk(provider, "", reset=True)
@@ -0,0 +1,250 @@
+"""Motor local de inferência HF com batching dinâmico (um worker dedicado).
+
+O pipeline `text2text-generation` atende um prompt por chamada; requisições
+concorrentes só se enfileiram no pool. Aqui um único thread dono do modelo
+junta os prompts que chegam em até `HF_BATCH_WAIT_MS` (10 ms) ou
+`HF_BATCH_MAX` (16) itens, gera tudo num lote com padding e devolve cada
+saída ao future da sua requisição (via `call_soon_threadsafe`).
+
+Carregamento (`load_runner`, chamado no warm-up dos provedores):
+
+- `HF_BACKEND=torch` (padrão): `AutoModelForSeq2SeqLM`; com
+  `HF_QUANTIZE=int8`, quantização dinâmica das camadas `Linear`
+  (`torch.quantization.quantize_dynamic`), que reduz memória e acelera a CPU;
+- `HF_BACKEND=onnx`: exporta para ONNX Runtime via `optimum` (extra
+  opcional) e guarda o export em `HF_ONNX_DIR` para os próximos starts;
+- `HF_NUM_THREADS` chama `torch.set_num_threads` (e limita as threads
+  intra-op do ONNX Runtime); sem a variável vale o padrão da biblioteca;
+- o modelo é aquecido com um lote fictício antes de o provedor ficar pronto.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Tuple
+
+from .llm_hf import DEFAULT_MODEL, GENERATION_KWARGS, _build_prompt
+from .metrics import HF_BATCH_SIZE, HF_TOKENS
+
+logger = logging.getLogger("uvicorn.error")
+
+# Lote de prompts -> (textos gerados, tokens gerados no lote).
+Runner = Callable[[List[str]], Tuple[List[str], int]]
+
+_STOP = object()
+
+
+class HFEngine:
+    """Worker dedicado que agrupa prompts concorrentes em lotes."""
+
+    def __init__(
+        self, runner: Runner, max_batch: int = 16, max_wait: float = 0.01
+    ) -> None:
+        self.runner = runner
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.tokens = 0
+
+    @classmethod
+    def from_env(cls, runner: Runner) -> "HFEngine":
+        return cls(
+            runner,
+            max_batch=int(os.getenv("HF_BATCH_MAX", "16")),
+            max_wait=float(os.getenv("HF_BATCH_WAIT_MS", "10")) / 1000,
+        )
+
+    def start(self) -> "HFEngine":
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._loop, name="hf-engine", daemon=True
+                )
+                self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    async def submit(self, prompt: str) -> str:
+        """Texto gerado para `prompt`, processado no próximo lote."""
+        self.start()
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future = loop.create_future()
+        self._queue.put((prompt, loop, fut))
+        return await fut
+
+    async def generate(self, pergunta: str, evidencia: str) -> str:
+        return await self.submit(_build_prompt(pergunta, evidencia))
+
+    async def generate_many(
+        self, pares: List[Tuple[str, str]], batch_size: int | None = None
+    ) -> List[str]:
+        """Gera os pares em grupos de até `batch_size` (None = todos de uma vez).
+
+        Cada grupo só é enfileirado quando o anterior termina, então um lote
+        offline não ocupa mais que `batch_size` vagas do motor por vez e deixa
+        espaço para as requisições online. O lote de fato continua limitado
+        pelo `max_batch` do motor.
+        """
+        size = batch_size if batch_size and batch_size > 0 else len(pares) or 1
+        out: List[str] = []
+        for start in range(0, len(pares), size):
+            chunk = pares[start : start + size]
+            out.extend(await asyncio.gather(*(self.generate(p, e) for p, e in chunk)))
+        return out
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = (
+                        self._queue.get(timeout=remaining)
+                        if remaining > 0
+                        else self._queue.get_nowait()
+                    )
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._run(batch)
+            if stop:
+                return
+
+    def _run(self, batch: List[Tuple[str, Any, asyncio.Future]]) -> None:
+        # Requisições canceladas enquanto esperavam não ocupam o lote.
+        batch = [item for item in batch if not item[2].cancelled()]
+        if not batch:
+            return
+        try:
+            texts, tokens = self.runner([prompt for prompt, _, _ in batch])
+        except Exception as exc:
+            for _, loop, fut in batch:
+                loop.call_soon_threadsafe(_set_exception, fut, exc)
+            return
+        self.batches += 1
+        self.items += len(batch)
+        self.tokens += tokens
+        HF_BATCH_SIZE.observe(len(batch))
+        HF_TOKENS.inc(amount=tokens)
+        for (_, loop, fut), text in zip(batch, texts):
+            loop.call_soon_threadsafe(_set_result, fut, text)
+
+
+def _set_result(fut: asyncio.Future, value: str) -> None:
+    if not fut.done():
+        fut.set_result(value)
+
+
+def _set_exception(fut: asyncio.Future, exc: BaseException) -> None:
+    if not fut.done():
+        fut.set_exception(exc)
+
+
+class Seq2SeqRunner:
+    """Gera um lote com `model.generate` (torch ou ONNX Runtime via optimum)."""
+
+    def __init__(self, tokenizer: Any, model: Any, max_input_tokens: int = 512):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.max_input_tokens = max_input_tokens
+
+    def __call__(self, prompts: List[str]) -> Tuple[List[str], int]:
+        import torch
+
+        enc = self.tokenizer(
+            prompts,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=self.max_input_tokens,
+        )
+        with torch.inference_mode():
+            out = self.model.generate(
+                **enc,
+                max_new_tokens=GENERATION_KWARGS["max_new_tokens"],
+                do_sample=False,
+            )
+        texts = self.tokenizer.batch_decode(out, skip_special_tokens=True)
+        tokens = int((out != self.tokenizer.pad_token_id).sum())
+        return [text.strip() for text in texts], tokens
+
+
+def load_runner(model_name: Optional[str] = None) -> Seq2SeqRunner:
+    """Carrega tokenizer e modelo conforme `HF_BACKEND`/`HF_QUANTIZE`/`HF_NUM_THREADS`."""
+    import torch
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+    name = model_name or os.getenv("HF_MODEL", DEFAULT_MODEL)
+    threads = int(os.getenv("HF_NUM_THREADS", "0"))
+    if threads > 0:
+        torch.set_num_threads(threads)
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    backend = os.getenv("HF_BACKEND", "torch")
+    quantize = os.getenv("HF_QUANTIZE", "")
+    if backend == "onnx":
+        model = _load_onnx(name, threads)
+        if quantize:
+            logger.warning(
+                "HF_QUANTIZE ignorado no backend onnx (exporte já quantizado)."
+            )
+    else:
+        model = AutoModelForSeq2SeqLM.from_pretrained(name).eval()
+        if quantize == "int8":
+            model = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+    runner = Seq2SeqRunner(
+        tokenizer, model, int(os.getenv("HF_MAX_INPUT_TOKENS", "512"))
+    )
+    runner(["Instrução: responda ok.\nResposta:"])  # pré-aquecimento
+    return runner
+
+
+def _load_onnx(name: str, threads: int) -> Any:
+    try:
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as exc:
+        raise RuntimeError(
+            "HF_BACKEND=onnx requer `optimum[onnxruntime]` instalado."
+        ) from exc
+    options = onnxruntime.SessionOptions()
+    if threads > 0:
+        options.intra_op_num_threads = threads
+    export_dir = os.getenv("HF_ONNX_DIR")
+    if export_dir and os.path.isdir(export_dir):
+        return ORTModelForSeq2SeqLM.from_pretrained(export_dir, session_options=options)
+    model = ORTModelForSeq2SeqLM.from_pretrained(
+        name, export=True, session_options=options
+    )
+    if export_dir:
+        model.save_pretrained(export_dir)
+    return model
+
+
+@lru_cache(maxsize=1)
+def get_hf_engine() -> HFEngine:
+    """Motor único do processo (modelo carregado e aquecido na primeira chamada)."""
+    return HFEngine.from_env(load_runner()).start()
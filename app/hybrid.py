@@ -0,0 +1,222 @@
+"""Retrieval híbrido: BM25 + backend semântico, fusão RRF e reranker leve.
+
+- Cada backend ranqueia `candidates` docs por consulta; o BM25 roda na thread
+  chamadora e os demais num pool, em paralelo (o NumPy/SciPy solta o GIL
+  nos produtos de matriz).
+- Fusão por reciprocal rank: `sum(1 / (rrf_k + posição))` sobre os backends,
+  dividido pelo máximo possível (`n_backends / (rrf_k + 1)`), então o score
+  fica em (0, 1] e 1 significa "primeiro lugar em todos".
+- `OverlapReranker` (opcional) reordena os `rerank_depth` primeiros pela
+  cobertura dos termos da consulta na pergunta/resposta do doc, somada ao
+  score da fusão. O score do top-1 é reduzido quando o segundo fica a menos
+  de `margin` dele (consulta ambígua); fica em [0, 1] e serve de confiança
+  para `CHAT_KB_CONFIDENCE`.
+
+Os docs seguem o primeiro backend; os demais são alinhados pelo `id` (um
+índice denso defasado em relação ao `kb.json` não quebra a fusão). A
+comparação usa os arrays de ids (`doc_ids.npy` mapeado nos índices em
+disco), sem desserializar os docs; só índices divergentes montam o mapa.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from .metrics import stage
+from .ranking import Hit
+from .retrieval_backend import RetrieverBackend, RetrieverBase
+from .text import analyze
+
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid")
+
+
+class HybridQuery:
+    """Vetores de um lote de consultas, um por backend (na ordem dos backends)."""
+
+    __slots__ = ("parts",)
+
+    def __init__(self, parts: List[Any]) -> None:
+        self.parts = parts
+
+    def __len__(self) -> int:
+        return self.parts[0].shape[0]
+
+    def __getitem__(self, i: int) -> "HybridQuery":
+        return HybridQuery([part[i : i + 1] for part in self.parts])
+
+    @property
+    def cache_vector(self) -> Any:
+        """Vetor normalizado (último backend) usado pelo cache de respostas."""
+        return self.parts[-1]
+
+
+class OverlapReranker:
+    """Reranker barato: sobreposição de termos entre consulta e doc."""
+
+    # Pesos: cobertura da consulta pela pergunta, precisão da pergunta,
+    # cobertura pelo texto todo e score da fusão.
+    WEIGHTS = (0.35, 0.1, 0.25, 0.3)
+
+    def __init__(
+        self,
+        docs: Sequence[Dict[str, Any]],
+        margin: float = 0.1,
+        max_memo: int = 10_000,
+    ) -> None:
+        self.docs = docs
+        self.margin = margin
+        self.max_memo = max_memo
+        self._memo: Dict[int, tuple] = {}
+
+    def _terms(self, index: int) -> tuple:
+        terms = self._memo.get(index)
+        if terms is None:
+            doc = self.docs[index]
+            pergunta = frozenset(analyze(doc["pergunta"]))
+            terms = (pergunta, pergunta | frozenset(analyze(doc["resposta"])))
+            if len(self._memo) >= self.max_memo:
+                self._memo.clear()
+            self._memo[index] = terms
+        return terms
+
+    def rerank(self, query: str, hits: List[Hit]) -> List[Hit]:
+        query_terms = frozenset(analyze(query))
+        if not query_terms:
+            return hits
+        w_cov, w_prec, w_text, w_fused = self.WEIGHTS
+        scored = []
+        for hit in hits:
+            pergunta, texto = self._terms(hit.index)
+            common = len(query_terms & pergunta)
+            score = (
+                w_cov * common / len(query_terms)
+                + w_prec * (common / len(pergunta) if pergunta else 0.0)
+                + w_text * len(query_terms & texto) / len(query_terms)
+                + w_fused * hit.score
+            )
+            scored.append(Hit(hit.index, score))
+        scored.sort(key=lambda h: (-h.score, h.index))
+        if len(scored) > 1 and self.margin > 0:
+            # Confiança do top-1: empate com o segundo (consulta ambígua)
+            # derruba o score; folga de `margin` ou mais o mantém.
+            first, second = scored[0], scored[1]
+            gap = min(1.0, (first.score - second.score) / self.margin)
+            scored[0] = Hit(first.index, first.score * gap)
+        return scored
+
+
+class HybridRetriever(RetrieverBase):
+    """Combina backends por RRF; o primeiro define `docs`."""
+
+    def __init__(
+        self,
+        backends: Dict[str, RetrieverBackend],
+        top_k: int = 3,
+        candidates: int = 20,
+        rrf_k: int = 60,
+        rerank: bool = True,
+        rerank_depth: int = 10,
+    ) -> None:
+        self.names = list(backends)
+        self.backends = list(backends.values())
+        self.top_k = top_k
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.rerank_depth = rerank_depth
+        self._docs = self.backends[0].docs
+        self._doc_ids = self.backends[0].doc_id_array()
+        self.reranker = OverlapReranker(self._docs) if rerank else None
+        self._remaps = [None] + [self._remap(b) for b in self.backends[1:]]
+
+    @classmethod
+    def from_env(cls, backends: Dict[str, RetrieverBackend]) -> "HybridRetriever":
+        """`HYBRID_CANDIDATES`, `HYBRID_RRF_K`, `HYBRID_RERANK` (0 desliga)."""
+        return cls(
+            backends,
+            candidates=int(os.getenv("HYBRID_CANDIDATES", "20")),
+            rrf_k=int(os.getenv("HYBRID_RRF_K", "60")),
+            rerank=os.getenv("HYBRID_RERANK", "1") != "0",
+            rerank_depth=int(os.getenv("HYBRID_RERANK_DEPTH", "10")),
+        )
+
+    @property
+    def docs(self) -> Sequence[Dict[str, Any]]:
+        return self._docs
+
+    def _remap(self, backend: RetrieverBackend) -> np.ndarray | None:
+        """Posição em `self.docs` de cada doc do outro backend (-1 se ausente)."""
+        if backend.docs is self._docs:
+            return None
+        theirs = backend.doc_id_array()
+        if np.array_equal(theirs, self._doc_ids):
+            return None
+        mine = {doc_id: i for i, doc_id in enumerate(self._doc_ids.tolist())}
+        return np.array(
+            [mine.get(doc_id, -1) for doc_id in theirs.tolist()], dtype=np.int64
+        )
+
+    def vectorize_many(self, queries: Sequence[str]) -> HybridQuery:
+        return HybridQuery([b.vectorize_many(queries) for b in self.backends])
+
+    def _run(
+        self, i: int, queries: Sequence[str], query_matrix, sources
+    ) -> List[List[Hit]]:
+        t = time.perf_counter()
+        hits = self.backends[i].retrieve_many(
+            queries, top_k=self.candidates, query_matrix=query_matrix, sources=sources
+        )
+        stage(f"retrieval_{self.names[i]}", t)
+        return hits
+
+    def retrieve_many(
+        self,
+        queries: Sequence[str],
+        top_k: int | None = None,
+        query_matrix=None,
+        sources: Sequence[str] | None = None,
+    ) -> List[List[Hit]]:
+        if not queries:
+            return []
+        if query_matrix is None:
+            query_matrix = self.vectorize_many(queries)
+        futures = [
+            _pool.submit(self._run, i, queries, query_matrix.parts[i], sources)
+            for i in range(1, len(self.backends))
+        ]
+        per_backend = [self._run(0, queries, query_matrix.parts[0], sources)]
+        per_backend += [f.result() for f in futures]
+
+        k = top_k or self.top_k
+        out = []
+        for q, query in enumerate(queries):
+            if not query.strip():
+                out.append([])
+                continue
+            fused = self._fuse([hits[q] for hits in per_backend])
+            if self.reranker is not None and fused:
+                t = time.perf_counter()
+                head = self.reranker.rerank(query, fused[: self.rerank_depth])
+                fused = head + fused[self.rerank_depth :]
+                stage("rerank", t)
+            out.append(fused[:k])
+        return out
+
+    def _fuse(self, ranked: List[List[Hit]]) -> List[Hit]:
+        scores: Dict[int, float] = {}
+        for hits, remap in zip(ranked, self._remaps):
+            rank = 0
+            for hit in hits:
+                # Completar com score 0 é coisa do `top_k_hits`, não evidência.
+                if hit.score <= 0:
+                    continue
+                index = hit.index if remap is None else int(remap[hit.index])
+                rank += 1
+                if index >= 0:
+                    scores[index] = scores.get(index, 0.0) + 1.0 / (self.rrf_k + rank)
+        best = len(self.backends) / (self.rrf_k + 1)
+        fused = [Hit(i, s / best) for i, s in scores.items()]
+        fused.sort(key=lambda h: (-h.score, h.index))
+        return fused
@@ -0,0 +1,354 @@
+"""Formato de índice em disco mapeado em memória (substitui o pickle joblib).
+
+O diretório raiz do índice guarda gerações imutáveis (`gen-000001/`, ...) e um
+arquivo `CURRENT` com o nome da geração ativa, trocado com `os.replace` (troca
+atômica). Layout de uma geração (versão `FORMAT_VERSION`):
+
+- `meta.json`: versão, dimensões, parâmetros do analisador TF-IDF e
+  intervalos de docs por fonte (`sources`, ver `app.sources`);
+- `data.npy`, `indices.npy`, `indptr.npy`: CSR termos x docs (a transposta da
+  matriz TF-IDF), já no layout usado pelo produto de `top_k_hits`;
+- `vocab.npy`: termos ordenados em bytes UTF-8 de largura fixa (busca binária);
+- `idf.npy` e `df.npy`: pesos IDF e document frequency por termo;
+- `docs.jsonl` + `docs_offsets.npy`: payloads dos docs, um JSON por linha;
+- `doc_ids.npy` + `doc_hashes.npy`: id e sha1 de cada doc (diff incremental).
+
+Os arrays são abertos com `np.load(mmap_mode="r")` (um `np.memmap`) e os docs
+via `mmap`: os workers compartilham as páginas pelo page cache do SO em vez de
+cada um desserializar sua própria cópia.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+from collections.abc import Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .sources import source_ranges
+
+if TYPE_CHECKING:  # pragma: no cover
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+FORMAT_NAME = "kb-index"
+FORMAT_VERSION = 2
+CURRENT_FILE = "CURRENT"
+# Gerações antigas mantidas (workers ainda podem estar com elas mapeadas).
+KEEP_GENERATIONS = 2
+# Parâmetros do TfidfVectorizer necessários para reproduzir o analisador.
+_ANALYZER_PARAMS = (
+    "lowercase",
+    "strip_accents",
+    "token_pattern",
+    "ngram_range",
+    "analyzer",
+    "stop_words",
+)
+
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+
+def doc_line(doc: Dict[str, Any]) -> bytes:
+    """Serialização canônica de um doc (linha do `docs.jsonl`)."""
+    return _ENCODER.encode(doc).encode("utf-8") + b"\n"
+
+
+def doc_hash(line: bytes) -> bytes:
+    return hashlib.sha1(line).digest()
+
+
+def doc_ids(docs: List[Dict[str, Any]]) -> List[str]:
+    """Chave do diff incremental: campo `id` (ou a posição, se ausente)."""
+    return [str(d.get("id", i)) for i, d in enumerate(docs)]
+
+
+def analyzer_params(vectorizer: "TfidfVectorizer") -> Dict[str, Any]:
+    params = vectorizer.get_params()
+    return {
+        "analyzer": {k: params[k] for k in _ANALYZER_PARAMS},
+        "norm": params["norm"],
+        "sublinear_tf": params["sublinear_tf"],
+        "smooth_idf": params["smooth_idf"],
+    }
+
+
+def build_analyzer(meta: Dict[str, Any]):
+    # Import tardio: o sklearn só é necessário ao abrir/gravar um índice.
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    params = dict(meta["analyzer"])
+    params["ngram_range"] = tuple(params["ngram_range"])
+    return TfidfVectorizer(**params).build_analyzer()
+
+
+def _fixed_width(values: List[bytes]) -> np.ndarray:
+    width = max((len(v) for v in values), default=1) or 1
+    return np.array(values, dtype=f"S{width}")
+
+
+def current_dir(root: str | Path) -> Path:
+    """Diretório da geração ativa apontada por `CURRENT`."""
+    root = Path(root)
+    name = (root / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    return root / name
+
+
+def watch_file(root: str | Path) -> Path:
+    """Arquivo cujo mtime muda a cada nova geração publicada."""
+    return Path(root) / CURRENT_FILE
+
+
+def write_generation(
+    root: str | Path,
+    doc_lines: Iterable[bytes],
+    doc_ids: List[str],
+    doc_hashes: List[bytes],
+    terms: List[str],
+    idf: np.ndarray,
+    df: np.ndarray,
+    terms_x_docs,
+    meta_extra: Dict[str, Any],
+) -> Path:
+    """Grava uma nova geração e publica atomicamente em `CURRENT`.
+
+    `terms` deve estar ordenado (a busca no vocabulário é binária) e as linhas de
+    `terms_x_docs` seguem essa ordem. `doc_ids`/`doc_hashes` acompanham
+    `doc_lines` (o chamador já os calculou ao montar as linhas).
+    """
+    tmp_dir, name, number = new_generation(root)
+    write_postings(tmp_dir, terms, terms_x_docs)
+    np.save(tmp_dir / "idf.npy", np.asarray(idf, dtype=np.float64))
+    np.save(tmp_dir / "df.npy", np.asarray(df, dtype=np.int64))
+    write_docs(tmp_dir, doc_lines, doc_ids, doc_hashes)
+
+    meta = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "generation": number,
+        "n_docs": len(doc_ids),
+        "n_terms": len(terms),
+        **meta_extra,
+    }
+    return publish_generation(root, tmp_dir, name, meta)
+
+
+def write_postings(gen_dir: Path, terms: List[str], terms_x_docs) -> None:
+    """CSR termos x docs (`data`/`indices`/`indptr.npy`) + `vocab.npy` ordenado."""
+    terms_x_docs = sparse.csr_matrix(terms_x_docs, dtype=np.float32)
+    terms_x_docs.sort_indices()
+    # indices e indptr no mesmo dtype: o scipy não copia os arrays ao abrir.
+    idx_dtype = np.int32 if terms_x_docs.nnz < np.iinfo(np.int32).max else np.int64
+    np.save(gen_dir / "data.npy", terms_x_docs.data)
+    np.save(gen_dir / "indices.npy", terms_x_docs.indices.astype(idx_dtype))
+    np.save(gen_dir / "indptr.npy", terms_x_docs.indptr.astype(idx_dtype))
+    np.save(gen_dir / "vocab.npy", _fixed_width([t.encode("utf-8") for t in terms]))
+
+
+def new_generation(root: str | Path) -> Tuple[Path, str, int]:
+    """Diretório temporário da próxima geração: (tmp_dir, nome, número)."""
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    previous = sorted(p.name for p in root.glob("gen-*") if p.is_dir())
+    number = int(previous[-1].split("-")[1]) + 1 if previous else 1
+    name = f"gen-{number:06d}"
+    tmp_dir = root / f".{name}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir()
+    return tmp_dir, name, number
+
+
+def write_docs(
+    gen_dir: Path,
+    doc_lines: Iterable[bytes],
+    doc_ids: List[str],
+    doc_hashes: List[bytes],
+) -> None:
+    """`docs.jsonl` + offsets, ids e hashes (comuns a todos os formatos)."""
+    offsets = [0]
+    with (gen_dir / "docs.jsonl").open("wb") as f:
+        for line in doc_lines:
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(gen_dir / "docs_offsets.npy", np.array(offsets, dtype=np.int64))
+    np.save(gen_dir / "doc_ids.npy", _fixed_width([i.encode("utf-8") for i in doc_ids]))
+    np.save(gen_dir / "doc_hashes.npy", np.array(doc_hashes, dtype="S20"))
+
+
+def publish_generation(
+    root: str | Path, tmp_dir: Path, name: str, meta: Dict[str, Any]
+) -> Path:
+    """Grava `meta.json`, renomeia a geração e troca `CURRENT` atomicamente."""
+    root = Path(root)
+    (tmp_dir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+    tmp_dir.rename(root / name)
+
+    pointer = root / f".{CURRENT_FILE}.tmp"
+    pointer.write_text(name, encoding="utf-8")
+    os.replace(pointer, root / CURRENT_FILE)
+    previous = sorted(
+        p.name for p in root.glob("gen-*") if p.is_dir() and p.name != name
+    )
+    for old in previous[: max(0, len(previous) + 1 - KEEP_GENERATIONS)]:
+        shutil.rmtree(root / old, ignore_errors=True)
+    return root / name
+
+
+def write_index(
+    root: str | Path,
+    docs: List[Dict[str, Any]],
+    vectorizer: "TfidfVectorizer",
+    matrix,
+) -> Path:
+    """Publica um índice completo a partir de um TF-IDF recém-ajustado."""
+    df = np.diff(sparse.csc_matrix(matrix).indptr)
+    lines = [doc_line(d) for d in docs]
+    return write_generation(
+        root,
+        lines,
+        doc_ids(docs),
+        [doc_hash(line) for line in lines],
+        list(vectorizer.get_feature_names_out()),
+        vectorizer.idf_,
+        df,
+        matrix.T,
+        {
+            **analyzer_params(vectorizer),
+            "stale_docs": 0,
+            "sources": source_ranges(docs),
+        },
+    )
+
+
+def read_meta(
+    root: str | Path, fmt: str = FORMAT_NAME, version: int = FORMAT_VERSION
+) -> Dict[str, Any]:
+    """Lê e valida o `meta.json` da geração ativa."""
+    gen_dir = current_dir(root)
+    meta = json.loads((gen_dir / "meta.json").read_text(encoding="utf-8"))
+    if meta.get("format") != fmt or meta.get("version") != version:
+        raise ValueError(
+            f"Índice incompatível em {gen_dir}: "
+            f"{meta.get('format')} v{meta.get('version')}"
+        )
+    return meta
+
+
+class MappedVectorizer:
+    """`transform` compatível com o TF-IDF, sobre vocabulário e IDF mapeados."""
+
+    def __init__(self, vocab: np.ndarray, idf: np.ndarray, meta: Dict[str, Any]):
+        self.vocab = vocab
+        self.idf = idf
+        self._analyzer = build_analyzer(meta)
+        self._norm = meta["norm"]
+        self._sublinear_tf = meta["sublinear_tf"]
+
+    def transform(self, queries: Sequence[str]) -> sparse.csr_matrix:
+        rows: List[np.ndarray] = []
+        cols: List[np.ndarray] = []
+        vals: List[np.ndarray] = []
+        for row, query in enumerate(queries):
+            ids = self._lookup(self._analyzer(query))
+            if not len(ids):
+                continue
+            term_ids, counts = np.unique(ids, return_counts=True)
+            tf = counts.astype(np.float64)
+            if self._sublinear_tf:
+                tf = np.log(tf) + 1
+            weights = tf * self.idf[term_ids]
+            if self._norm == "l2":
+                weights /= np.sqrt((weights**2).sum())
+            elif self._norm == "l1":
+                weights /= np.abs(weights).sum()
+            rows.append(np.full(len(term_ids), row))
+            cols.append(term_ids)
+            vals.append(weights)
+        shape = (len(queries), len(self.vocab))
+        if not rows:
+            return sparse.csr_matrix(shape)
+        return sparse.csr_matrix(
+            (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+            shape=shape,
+        )
+
+    def _lookup(self, tokens: List[str]) -> np.ndarray:
+        return vocab_lookup(self.vocab, tokens)
+
+
+def vocab_lookup(vocab: np.ndarray, tokens: List[str]) -> np.ndarray:
+    """Ids dos `tokens` presentes no `vocab.npy` ordenado (busca binária)."""
+    width = vocab.dtype.itemsize
+    encoded = [t.encode("utf-8") for t in tokens]
+    encoded = [t for t in encoded if len(t) <= width]
+    if not encoded or not len(vocab):
+        return np.empty(0, dtype=np.int64)
+    needles = np.array(encoded, dtype=vocab.dtype)
+    pos = np.searchsorted(vocab, needles)
+    pos[pos >= len(vocab)] = 0
+    return pos[vocab[pos] == needles]
+
+
+class MappedDocs(Sequence):
+    """Sequência de docs lida sob demanda do `docs.jsonl` mapeado."""
+
+    def __init__(self, path: Path, offsets: np.ndarray) -> None:
+        self._offsets = offsets
+        with path.open("rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._mm = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            )
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):  # type: ignore[override]
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(self._mm[start:end])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+def load_array(gen_dir: Path, name: str) -> np.ndarray:
+    return np.load(gen_dir / name, mmap_mode="r")
+
+
+def open_postings(gen_dir: Path, meta: Dict[str, Any]) -> sparse.csr_matrix:
+    """CSR termos x docs de `write_postings`, sobre os arrays mapeados."""
+    return sparse.csr_matrix(
+        (
+            load_array(gen_dir, "data.npy"),
+            load_array(gen_dir, "indices.npy"),
+            load_array(gen_dir, "indptr.npy"),
+        ),
+        shape=(meta["n_terms"], meta["n_docs"]),
+        copy=False,
+    )
+
+
+def open_docs(gen_dir: Path) -> MappedDocs:
+    return MappedDocs(gen_dir / "docs.jsonl", load_array(gen_dir, "docs_offsets.npy"))
+
+
+def open_index(root: str | Path):
+    """Abre a geração ativa: (docs, vectorizer, matriz termos x docs)."""
+    meta = read_meta(root)
+    index_dir = current_dir(root)
+    vectorizer = MappedVectorizer(
+        load_array(index_dir, "vocab.npy"), load_array(index_dir, "idf.npy"), meta
+    )
+    return open_docs(index_dir), vectorizer, open_postings(index_dir, meta)
@@ -1,27 +1,254 @@
-"""Script simples de ingestão para gerar índice vetorial (TF-IDF) a partir do KB."""
+"""Script simples de ingestão para gerar índice vetorial (TF-IDF) a partir do KB.
 
-import json
+Por padrão grava o formato mapeado em memória (`data/cache/kb_index/`, ver
+`app.index_store`); `--format joblib` mantém o pickle legado.
+
+Com `--incremental`, compara o `kb.json` com a geração ativa pelo campo `id`
+(e hash do conteúdo) e só vetoriza entradas novas ou alteradas. A document
+frequency é atualizada no lugar e o IDF recalculado a partir dela; docs não
+alterados mantêm os pesos da ingestão anterior até a próxima compactação
+(rebuild completo), disparada quando a fração de docs "defasados" passa de
+`--compact-ratio`.
+
+Os docs indexados são os do índice unificado (`app.sources`): entradas do KB,
+cada seção de `policies.json` e fatos de usuários e pedidos, marcados por
+fonte; `--kb-only` indexa só o `kb.json`.
+
+`--backend dense` grava o índice de embeddings (`data/cache/kb_dense/`, ver
+`app.dense_index`): embeddings calculados aqui com o encoder de `--encoder`,
+quantizados (`--quantize int8|float16`) e com IVF de `--nlist` listas.
+
+`--backend bm25` grava as postings BM25 (`data/cache/kb_bm25/`, ver
+`app.bm25`) que o `RETRIEVER_BACKEND=hybrid` mapeia em vez de analisar os
+docs a cada carga.
+"""
+
+import argparse
+from collections import Counter
 from pathlib import Path
 from typing import List, Dict, Any
 
 import joblib
+import numpy as np
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+from .bm25 import write_bm25_index
+from .dense_index import QUANTIZATIONS, write_dense_index
+from .embeddings import get_encoder
+from .index_store import (
+    build_analyzer,
+    current_dir,
+    doc_hash,
+    doc_ids,
+    doc_line,
+    load_array,
+    read_meta,
+    write_generation,
+    write_index,
+)
+from .jsonstream import iter_records
+from .orders import load_orders
+from .policies import load_policies
+from .sources import build_documents, source_ranges
+from .users import load_users
+
 
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 KB_PATH = DATA_DIR / "source" / "kb.json"
 INDEX_PATH = DATA_DIR / "cache" / "kb_index.joblib"
+INDEX_DIR = DATA_DIR / "cache" / "kb_index"
+DENSE_DIR = DATA_DIR / "cache" / "kb_dense"
+BM25_DIR = DATA_DIR / "cache" / "kb_bm25"
 
 
 def load_kb() -> List[Dict[str, Any]]:
-    with KB_PATH.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    return list(iter_records(KB_PATH))
 
 
-def build_index(docs: List[Dict[str, Any]]) -> None:
-    corpus = [f"{d['pergunta']} {d['resposta']}" for d in docs]
+def load_documents() -> List[Dict[str, Any]]:
+    """Docs do índice unificado: KB, seções de políticas, usuários e pedidos."""
+    return build_documents(load_kb(), load_policies(), load_users(), load_orders())
+
+
+def doc_text(doc: Dict[str, Any]) -> str:
+    return f"{doc['pergunta']} {doc['resposta']}"
+
+
+def fit(docs: List[Dict[str, Any]]):
+    corpus = [doc_text(d) for d in docs]
     vectorizer = TfidfVectorizer(stop_words=None)
-    matrix = vectorizer.fit_transform(corpus)
+    return vectorizer, vectorizer.fit_transform(corpus)
+
+
+def build_mapped_index(docs: List[Dict[str, Any]], index_dir: Path = INDEX_DIR) -> None:
+    vectorizer, matrix = fit(docs)
+    write_index(index_dir, docs, vectorizer, matrix)
+    print(f"Índice salvo em {index_dir}")
+
+
+def update_mapped_index(
+    docs: List[Dict[str, Any]],
+    index_dir: Path = INDEX_DIR,
+    compact_ratio: float = 0.2,
+) -> Dict[str, int]:
+    """Atualiza o índice mapeado só com o diff do KB; retorna contagens do diff."""
+    try:
+        meta = read_meta(index_dir)
+    except (OSError, ValueError):
+        build_mapped_index(docs, index_dir)
+        return {"added": len(docs), "changed": 0, "removed": 0, "compacted": 1}
+    gen_dir = current_dir(index_dir)
+    old_ids = load_array(gen_dir, "doc_ids.npy").tolist()
+    old_hashes = load_array(gen_dir, "doc_hashes.npy").tolist()
+    old_pos = {oid.decode("utf-8"): i for i, oid in enumerate(old_ids)}
+
+    lines = [doc_line(d) for d in docs]
+    hashes = [doc_hash(line) for line in lines]
+    ids = doc_ids(docs)
+    kept_new, kept_old, fresh, changed_old = [], [], [], []
+    seen = set(ids)
+    for i, doc_id in enumerate(ids):
+        j = old_pos.get(doc_id)
+        if j is not None and old_hashes[j] == hashes[i]:
+            kept_new.append(i)
+            kept_old.append(j)
+            continue
+        fresh.append(i)
+        if j is not None:
+            changed_old.append(j)
+    removed_old = [j for oid, j in old_pos.items() if oid not in seen]
+    stats = {
+        "added": len(fresh) - len(changed_old),
+        "changed": len(changed_old),
+        "removed": len(removed_old),
+        "compacted": 0,
+    }
+    if not fresh and not removed_old:
+        return stats
+
+    stale = meta.get("stale_docs", 0) + len(fresh) + len(removed_old)
+    if stale > compact_ratio * max(len(docs), 1):
+        build_mapped_index(docs, index_dir)
+        return {**stats, "compacted": 1}
+
+    # Matriz docs x termos da geração atual (pesos já calculados).
+    old_terms_x_docs = sparse.csr_matrix(
+        (
+            load_array(gen_dir, "data.npy"),
+            load_array(gen_dir, "indices.npy"),
+            load_array(gen_dir, "indptr.npy"),
+        ),
+        shape=(meta["n_terms"], meta["n_docs"]),
+    )
+    old_docs_x_terms = old_terms_x_docs.T.tocsr()
+    vocab = [t.decode("utf-8") for t in load_array(gen_dir, "vocab.npy")]
+    term_ids = {t: i for i, t in enumerate(vocab)}
+    df = np.array(load_array(gen_dir, "df.npy"), dtype=np.int64)
+
+    touched = changed_old + removed_old
+    if touched:
+        np.subtract.at(df, old_docs_x_terms[touched].indices, 1)
+
+    analyzer = build_analyzer(meta)
+    fresh_counts = []
+    for i in fresh:
+        counts = Counter(analyzer(doc_text(docs[i])))
+        for term in counts:
+            if term not in term_ids:
+                term_ids[term] = len(vocab)
+                vocab.append(term)
+        fresh_counts.append({term_ids[t]: c for t, c in counts.items()})
+    df = np.concatenate([df, np.zeros(len(vocab) - len(df), dtype=np.int64)])
+    for counts in fresh_counts:
+        df[list(counts)] += 1
+
+    n_docs = len(docs)
+    if meta.get("smooth_idf", True):
+        idf = np.log((1 + n_docs) / (1 + df)) + 1
+    else:
+        idf = np.log(n_docs / np.maximum(df, 1)) + 1
+
+    rows, cols, vals = [], [], []
+    for row, counts in enumerate(fresh_counts):
+        term_idx = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        if meta.get("sublinear_tf"):
+            tf = np.log(tf) + 1
+        weights = tf * idf[term_idx]
+        norm = np.sqrt((weights**2).sum())
+        if norm:
+            weights /= norm
+        rows.append(np.full(len(term_idx), row))
+        cols.append(term_idx)
+        vals.append(weights)
+    fresh_block = sparse.csr_matrix(
+        (
+            np.concatenate(vals) if vals else [],
+            (
+                np.concatenate(rows) if rows else [],
+                np.concatenate(cols) if cols else [],
+            ),
+        ),
+        shape=(len(fresh), len(vocab)),
+    )
+    kept_block = old_docs_x_terms[kept_old]
+    kept_block = sparse.csr_matrix(
+        (kept_block.data, kept_block.indices, kept_block.indptr),
+        shape=(len(kept_old), len(vocab)),
+    )
+    stacked = sparse.vstack([kept_block, fresh_block], format="csr")
+    # Linha do bloco empilhado correspondente a cada doc, na ordem do kb.json.
+    order = np.empty(n_docs, dtype=np.int64)
+    order[kept_new + fresh] = np.arange(n_docs)
+    docs_x_terms = stacked[order]
+
+    # Vocabulário precisa ficar ordenado: remapeia as colunas.
+    term_order = np.array(sorted(range(len(vocab)), key=vocab.__getitem__))
+    remap = np.empty_like(term_order)
+    remap[term_order] = np.arange(len(term_order))
+    docs_x_terms.indices = remap[docs_x_terms.indices]
+    write_generation(
+        index_dir,
+        lines,
+        ids,
+        hashes,
+        [vocab[i] for i in term_order],
+        idf[term_order],
+        df[term_order],
+        docs_x_terms.T,
+        {
+            **{k: meta[k] for k in ("analyzer", "norm", "sublinear_tf")},
+            "smooth_idf": meta.get("smooth_idf", True),
+            "stale_docs": stale,
+            "sources": source_ranges(docs),
+        },
+    )
+    print(f"Índice atualizado em {index_dir}: {stats}")
+    return stats
+
+
+def build_dense_index(
+    docs: List[Dict[str, Any]],
+    index_dir: Path = DENSE_DIR,
+    encoder_name: str | None = None,
+    quantization: str = "int8",
+    nlist: int | None = None,
+) -> None:
+    encoder = get_encoder(encoder_name)
+    vectors = encoder.encode([doc_text(d) for d in docs])
+    write_dense_index(index_dir, docs, vectors, encoder.meta, quantization, nlist)
+    print(f"Índice denso salvo em {index_dir}")
+
+
+def build_bm25_index(docs: List[Dict[str, Any]], index_dir: Path = BM25_DIR) -> None:
+    write_bm25_index(index_dir, docs)
+    print(f"Postings BM25 salvas em {index_dir}")
+
+
+def build_index(docs: List[Dict[str, Any]]) -> None:
+    """Formato legado: um único pickle joblib."""
+    vectorizer, matrix = fit(docs)
     payload = {"docs": docs, "vectorizer": vectorizer, "matrix": matrix}
     INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
     joblib.dump(payload, INDEX_PATH)
@@ -29,5 +256,36 @@ def build_index(docs: List[Dict[str, Any]]) -> None:
 
 
 if __name__ == "__main__":
-    kb_docs = load_kb()
-    build_index(kb_docs)
+    parser = argparse.ArgumentParser(description="Gera o índice do KB.")
+    parser.add_argument(
+        "--backend", choices=("tfidf", "dense", "bm25"), default="tfidf"
+    )
+    parser.add_argument("--format", choices=("mmap", "joblib"), default="mmap")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="só vetoriza entradas novas/alteradas (formato mmap)",
+    )
+    parser.add_argument("--compact-ratio", type=float, default=0.2)
+    parser.add_argument(
+        "--encoder", default=None, help="hashing ou st:<modelo> (padrão: EMBED_MODEL)"
+    )
+    parser.add_argument("--quantize", choices=QUANTIZATIONS, default="int8")
+    parser.add_argument(
+        "--nlist", type=int, default=None, help="listas IVF (0 = só força bruta)"
+    )
+    parser.add_argument(
+        "--kb-only", action="store_true", help="indexa só o kb.json (sem fontes extras)"
+    )
+    args = parser.parse_args()
+    kb_docs = load_kb() if args.kb_only else load_documents()
+    if args.backend == "dense":
+        build_dense_index(kb_docs, DENSE_DIR, args.encoder, args.quantize, args.nlist)
+    elif args.backend == "bm25":
+        build_bm25_index(kb_docs)
+    elif args.format == "joblib":
+        build_index(kb_docs)
+    elif args.incremental:
+        update_mapped_index(kb_docs, compact_ratio=args.compact_ratio)
+    else:
+        build_mapped_index(kb_docs)
@@ -0,0 +1,140 @@
+"""Leitura em fluxo das fontes de dados (lista ou objeto JSON, NDJSON).
+
+`json.load` monta o texto e a estrutura inteiros na memória antes de
+devolver o primeiro item. Aqui os arquivos são lidos em blocos de
+`chunk_size` caracteres e decodificados um elemento por vez com
+`JSONDecoder.raw_decode`, mantendo só o bloco corrente e o item da vez:
+
+- `iter_json_array`: elementos de uma lista JSON (`kb.json`, `users.json`...);
+- `iter_json_object`: pares (chave, valor) de um objeto (`policies.json`);
+- `iter_ndjson`: um JSON por linha (`.ndjson`/`.jsonl`), com `orjson` quando
+  instalado (extra opcional, ~4x mais rápido que o `json` da stdlib);
+- `iter_records`: escolhe entre lista e NDJSON pela extensão do arquivo.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Callable, Iterator, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - extra opcional
+    orjson = None
+
+_WS = " \t\r\n"
+_NUMBER = "0123456789.eE+-"
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+
+loads: Callable[[Any], Any] = orjson.loads if orjson is not None else json.loads
+
+
+class _Reader:
+    """Buffer deslizante sobre o arquivo; `refill` descarta o já consumido."""
+
+    def __init__(self, f, chunk_size: int, path: Path) -> None:
+        self.f = f
+        self.chunk_size = chunk_size
+        self.path = path
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def refill(self) -> bool:
+        if self.eof:
+            return False
+        more = self.f.read(self.chunk_size)
+        self.buf = self.buf[self.pos :] + more
+        self.pos = 0
+        self.eof = not more
+        return bool(more)
+
+    def peek(self) -> str:
+        """Próximo caractere que não é espaço ("" no fim do arquivo)."""
+        while True:
+            buf, pos = self.buf, self.pos
+            while pos < len(buf) and buf[pos] in _WS:
+                pos += 1
+            self.pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self.refill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            found = repr(char) if char else "fim do arquivo"
+            raise ValueError(f"{self.path}: esperava `{chars}`, achou {found}.")
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decodifica o próximo valor, juntando blocos se ele estiver cortado."""
+        self.peek()
+        while True:
+            try:
+                item, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.refill():
+                    continue
+                raise
+            # Um número no fim do bloco ("3." + "5") pode continuar no próximo.
+            cut = end == len(self.buf) or (
+                isinstance(item, (int, float)) and self.buf[end] in _NUMBER
+            )
+            if cut and self.refill():
+                continue
+            self.pos = end
+            return item
+
+
+def iter_json_array(path: Path, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """Elementos da lista JSON em `path`, na ordem, sem carregar o arquivo todo."""
+    with Path(path).open("r", encoding="utf-8") as f:
+        r = _Reader(f, chunk_size, path)
+        r.expect("[")
+        if r.peek() == "]":
+            return
+        while True:
+            yield r.value()
+            if r.expect(",]") == "]":
+                return
+
+
+def iter_json_object(
+    path: Path, chunk_size: int = 1 << 20
+) -> Iterator[Tuple[str, Any]]:
+    """Pares (chave, valor) do objeto JSON em `path`, na ordem do arquivo."""
+    with Path(path).open("r", encoding="utf-8") as f:
+        r = _Reader(f, chunk_size, path)
+        r.expect("{")
+        if r.peek() == "}":
+            return
+        while True:
+            if r.peek() != '"':
+                r.expect('"')
+            key = r.value()
+            r.expect(":")
+            yield key, r.value()
+            if r.expect(",}") == "}":
+                return
+
+
+def iter_ndjson(path: Path) -> Iterator[Any]:
+    """Um valor por linha não vazia; erro aponta o número da linha."""
+    with Path(path).open("rb") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield loads(line)
+            except ValueError as exc:
+                raise ValueError(f"{path}:{number}: JSON inválido ({exc}).") from None
+
+
+def iter_records(path: Path) -> Iterator[Any]:
+    """Registros de uma fonte: NDJSON pela extensão, senão lista JSON."""
+    if Path(path).suffix in NDJSON_SUFFIXES:
+        return iter_ndjson(path)
+    return iter_json_array(path)
@@ -1,10 +1,16 @@
 """Conector simples para modelos da Hugging Face via transformers."""
 
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
-from typing import Optional, Any
+from typing import Any, AsyncIterator, List, Optional, Tuple
 
-from transformers import pipeline
+from transformers import TextIteratorStreamer, pipeline
+
+from .prompts import MAX_TOKENS, build_prompt, observe_prompt
+
+DEFAULT_MODEL = "google/flan-t5-small"
 
 
 @lru_cache(maxsize=1)
@@ -15,5 +21,120 @@ def get_hf_pipeline(model_name: Optional[str] = None) -> Any:
     - Usa task `text2text-generation` (modelos estilo T5/FLAN).
     - Requer dependências extras (torch) instaladas.
     """
-    name = model_name or os.getenv("HF_MODEL", "google/flan-t5-small")
+    name = model_name or os.getenv("HF_MODEL", DEFAULT_MODEL)
     return pipeline("text2text-generation", model=name)
+
+
+@lru_cache(maxsize=1)
+def get_hf_executor() -> ThreadPoolExecutor:
+    """Pool próprio e limitado (`HF_MAX_WORKERS`) para a inferência local.
+
+    O pipeline é CPU-bound e bloqueante; isolá-lo evita que ocupe o threadpool
+    do Starlette usado pelas demais rotas.
+    """
+    workers = int(os.getenv("HF_MAX_WORKERS", "2"))
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hf-infer")
+
+
+GENERATION_KWARGS = {
+    "max_new_tokens": 130,
+    "num_return_sequences": 1,
+    "do_sample": False,
+}
+
+
+def _build_prompt(pergunta: str, evidencia: str) -> str:
+    """Prompt T5 no orçamento do modelo (`HF_MAX_INPUT_TOKENS`).
+
+    Cortar aqui a evidência evita que o tokenizer trunque o fim do prompt,
+    que é justamente a pergunta.
+    """
+    limit = min(MAX_TOKENS, int(os.getenv("HF_MAX_INPUT_TOKENS", "512")))
+    prompt = build_prompt(
+        pergunta, evidencia, "t5", os.getenv("HF_MODEL", DEFAULT_MODEL), limit
+    )
+    observe_prompt("hf", prompt.tokens)
+    return prompt.text
+
+
+def generate_with_context(pipe: Any, pergunta: str, evidencia: str) -> str:
+    """Gera resposta com o pipeline HF usando a evidência do KB."""
+    generated = pipe(_build_prompt(pergunta, evidencia), **GENERATION_KWARGS)[0][
+        "generated_text"
+    ]
+    return generated.strip()
+
+
+async def agenerate_with_context(pipe: Any, pergunta: str, evidencia: str) -> str:
+    """Executa `generate_with_context` no pool dedicado, sem bloquear o event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_hf_executor(), generate_with_context, pipe, pergunta, evidencia
+    )
+
+
+def generate_many(
+    pipe: Any, pares: List[Tuple[str, str]], batch_size: int = 8
+) -> List[str]:
+    """Gera um lote de (pergunta, evidencia) numa chamada ao pipeline.
+
+    O pipeline agrupa os prompts em lotes de `batch_size` com padding, o que
+    amortiza o custo por item na CPU bem melhor que uma chamada por prompt.
+    """
+    prompts = [_build_prompt(pergunta, evidencia) for pergunta, evidencia in pares]
+    outputs = pipe(prompts, batch_size=batch_size, **GENERATION_KWARGS)
+    return [out[0]["generated_text"].strip() for out in outputs]
+
+
+async def agenerate_many(
+    pipe: Any, pares: List[Tuple[str, str]], batch_size: int = 8
+) -> List[str]:
+    """`generate_many` no pool dedicado, sem bloquear o event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_hf_executor(), generate_many, pipe, pares, batch_size
+    )
+
+
+class AsyncTextStreamer(TextIteratorStreamer):
+    """`TextIteratorStreamer` que entrega o texto numa `asyncio.Queue`.
+
+    A geração roda no pool HF; cada trecho decodificado é repassado ao event
+    loop com `call_soon_threadsafe`, sem thread extra bloqueada em `queue.get`.
+    """
+
+    def __init__(self, tokenizer: Any, loop: asyncio.AbstractEventLoop) -> None:
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def on_finalized_text(self, text: str, stream_end: bool = False) -> None:
+        if text:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, text)
+
+    def close(self) -> None:
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+
+def _generate_streaming(
+    pipe: Any, pergunta: str, evidencia: str, streamer: AsyncTextStreamer
+) -> None:
+    try:
+        pipe(_build_prompt(pergunta, evidencia), streamer=streamer, **GENERATION_KWARGS)
+    finally:
+        streamer.close()
+
+
+async def astream_with_context(
+    pipe: Any, pergunta: str, evidencia: str
+) -> AsyncIterator[str]:
+    """Streaming token a token do pipeline HF (gera no pool dedicado)."""
+    loop = asyncio.get_running_loop()
+    streamer = AsyncTextStreamer(pipe.tokenizer, loop)
+    job = loop.run_in_executor(
+        get_hf_executor(), _generate_streaming, pipe, pergunta, evidencia, streamer
+    )
+    while (text := await streamer.queue.get()) is not None:
+        yield text
+    # Propaga erro da geração (o fallback do stream decide o que fazer).
+    await job
@@ -5,84 +5,230 @@ Fluxo:
 - Endpoint `/chat` recebe uma mensagem, busca a entrada mais relevante e devolve a resposta do KB.
 - Se houver `HF_MODEL`, gera resposta com modelo Hugging Face usando a evidência do KB.
 - Se nada for encontrado, pede mais detalhes ao usuário.
+- A geração é assíncrona (clientes async + pool próprio para HF); com
+  `CHAT_HEDGE_MS` o fallback é disparado em paralelo após o prazo.
+- `/chat/stream` devolve a mesma resposta em Server-Sent Events, token a token.
+- `/pedidos:batch`, `/usuarios:batch` e `/chat:batch` resolvem muitos itens numa
+  requisição (JSON ou NDJSON em fluxo, ver `app.ndjson`); o chat em lote faz
+  um retrieval vetorizado por pedaço e gera com concorrência limitada.
+- O roteador (`app.router`) extrai intenção e códigos de pedido/usuário
+  (PED-123, USR-001) numa passada; códigos e tópicos de política citados
+  na mensagem respondem por consulta exata nos dicts da geração, sem
+  retrieval; o resto busca no índice unificado (`app.sources`) filtrado pelas
+  fontes da intenção.
+- Gerações idênticas em voo (mesma consulta normalizada, doc do KB e cadeia
+  de provedores) são coalescidas numa só chamada (`app.single_flight`).
+- Com `CHAT_KB_CONFIDENCE`, um top-1 com score acima do limiar responde direto
+  do KB, sem chamar o LLM (ver `app.hybrid` para um score em [0, 1]).
+- Dados (KB/índice, pedidos, usuários, políticas) ficam numa geração imutável
+  recarregada a quente (`app.reload`) sem reiniciar o processo.
+- Pedidos e usuários são tabelas colunares (`app.columnar`); `GET /usuarios` e
+  `GET /pedidos` segmentam pelos índices secundários (região+tier, status).
 """
 
+import asyncio
 import os
 import logging
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, Depends
-from pydantic import BaseModel
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Tuple,
+)
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.exceptions import RequestValidationError
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
 
-from .auth import verify_api_key
-from .retriever import KnowledgeBaseRetriever
-from .vector_retriever import VectorRetriever
-from .orders import get_order
-from .policies import get_policy
-from .users import get_user
-from .llm_hf import get_hf_pipeline
-from .openai_client import get_openai_client, generate_with_context
-from .gemini_client import get_gemini_model, generate_with_context as gemini_generate
-from .router import detect_intent
+from .auth import (
+    ApiClient,
+    charge_item,
+    chat_slot,
+    verify_admin_key,
+    verify_api_key,
+)
+from .columnar import select
+from .orders import ORDERS, get_order
+from .policies import POLICIES, find_topic
+from .users import USERS, get_user
+from .reload import DataGeneration, Reloader, resolve_index_path
+from .generation import hedge_after_from_env, run_chain, stream_chain
+from .index_store import watch_file
+from .metrics import (
+    ANSWERS,
+    CACHE_LOOKUPS,
+    CACHE_STATS,
+    CONTENT_TYPE,
+    BREAKER_STATE,
+    PATH_SECONDS,
+    PROVIDER_TIMEOUT,
+    REGISTRY,
+    SESSION_STATS,
+    SESSION_TURNS,
+    SINGLE_FLIGHT_IN_FLIGHT,
+    stage,
+)
+from .profiling import ProfilerMiddleware, profiling_options_from_env
+from .prompts import evidence_budget, select_evidence
+from .providers import DISABLED, PENDING, WARMING, ProviderRegistry
+from .resilience import STATE_VALUES
+from .response_cache import ResponseCache, normalize_query
+from .ratelimit import Lease
+from .ndjson import (
+    BadLine,
+    NDJSONResponse,
+    chunks,
+    is_ndjson,
+    iter_lines,
+    ndjson_line,
+    wants_ndjson,
+)
+from .responses import FastJSONResponse
+from .retrieval_batcher import RetrievalBatcher, retrieve_batch
+from .router import Route, route_message
+from .sessions import (
+    MAX_DOCS,
+    Session,
+    extract_id,
+    pending_slot,
+    session_key,
+    session_store_from_env,
+)
+from .single_flight import SingleFlight
+from .sources import INTENT_SOURCES, order_fact, render_policy, user_fact
+from .sse import SSE_HEADERS, sse_event
 
 logger = logging.getLogger("uvicorn.error")
 
 # Carrega variáveis do .env (OPENAI_API_KEY, OPENAI_MODEL, HF_MODEL etc.)
 load_dotenv()
 
+data_dir = Path(__file__).resolve().parent.parent / "data"
+# Geração 1 é carregada no warm-up e reaproveita os mapas dos módulos de dados.
+reloader = Reloader(
+    data_dir,
+    poll_interval=Reloader.poll_interval_from_env(),
+    initial_tables={"orders": ORDERS, "users": USERS, "policies": POLICIES},
+)
+index_path = resolve_index_path(data_dir)
+# Provedores (OpenAI -> Gemini -> HF) são importados e construídos sob demanda.
+provider_registry = ProviderRegistry()
+USE_HF = provider_registry.configured("hf")
+HEDGE_AFTER = hedge_after_from_env()
+# Score do top-1 a partir do qual a resposta sai direto do KB (None = desligado).
+KB_CONFIDENCE = (
+    float(os.environ["CHAT_KB_CONFIDENCE"]) if os.getenv("CHAT_KB_CONFIDENCE") else None
+)
+# Cache de respostas; invalida quando o índice em disco é reconstruído.
+response_cache = ResponseCache.from_env(
+    watch_file(index_path) if index_path.is_dir() else index_path
+)
+# Requisições concorrentes com a mesma geração pendente aguardam uma só chamada.
+single_flight = SingleFlight.from_env()
+# Memória das conversas com `sessao` (slots pendentes e últimos docs).
+session_store = session_store_from_env()
+# Micro-batching opcional do retrieval entre requisições concorrentes.
+retrieval_batcher = RetrievalBatcher.from_env()
+# Lotes: itens por requisição JSON, itens por pedaço processado e gerações
+# simultâneas no /chat:batch.
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+BATCH_CHUNK = int(os.getenv("BATCH_CHUNK", "64"))
+BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "8"))
 
-def _load_hf_pipeline():
-    """Tenta carregar o pipeline HF; retorna None se faltar backend ou falhar."""
-    try:
-        import torch  # noqa: F401
-    except Exception:
-        logger.warning(
-            "HF_MODEL definido, mas backend (torch) não está instalado. "
-            "Instale torch ou remova HF_MODEL para evitar erro."
-        )
-        return None
-    try:
-        return get_hf_pipeline()
-    except Exception as exc:  # pragma: no cover
-        logger.warning("Falha ao carregar pipeline HF: %s", exc)
-        return None
 
+def _on_generation_swap(gen: DataGeneration) -> None:
+    """Respostas em cache citam docs da geração anterior: descarta tudo."""
+    if response_cache is not None:
+        response_cache.invalidate()
 
-app = FastAPI(title="Chatbot Suporte Entregas", version="0.1.0")
-data_dir = Path(__file__).resolve().parent.parent / "data"
-kb_path = data_dir / "source" / "kb.json"
-retriever = KnowledgeBaseRetriever(kb_path)
-index_path = data_dir / "cache" / "kb_index.joblib"
-vector_retriever = VectorRetriever(index_path, top_k=3) if index_path.exists() else None
-USE_HF = os.getenv("HF_MODEL") is not None
-hf_pipe = _load_hf_pipeline() if USE_HF else None
-OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-openai_client = get_openai_client()
-gemini_model = get_gemini_model()
-logger.info("HF_MODEL ativo? %s | pipeline carregado? %s", USE_HF, hf_pipe is not None)
-logger.info("OPENAI ativo? %s | modelo=%s", openai_client is not None, OPENAI_MODEL)
-logger.info("GEMINI ativo? %s", gemini_model is not None)
-
-
-@app.on_event("startup")
-async def log_model_status() -> None:
-    """Loga status do modelo HF na inicialização."""
-    logger.info(
-        "Startup: HF_MODEL=%s | pipeline carregado=%s", USE_HF, hf_pipe is not None
-    )
-    logger.info(
-        "Startup: OPENAI ativo=%s modelo=%s", openai_client is not None, OPENAI_MODEL
+
+reloader.on_swap(_on_generation_swap)
+
+
+async def warm_up() -> None:
+    """Carrega dados e provedores em paralelo e loga o status final."""
+    await asyncio.gather(
+        reloader.warm_up(), asyncio.wrap_future(provider_registry.start_warm_up())
     )
-    logger.info("Startup: GEMINI ativo=%s", gemini_model is not None)
-    print(f"Startup: HF_MODEL={USE_HF} | pipeline carregado={hf_pipe is not None}")
-    print(f"Startup: OPENAI ativo={openai_client is not None} modelo={OPENAI_MODEL}")
-    print(f"Startup: GEMINI ativo={gemini_model is not None}")
+    status = provider_registry.status
+    logger.info("Startup: provedores=%s | hedge=%s", status, HEDGE_AFTER)
+    print(f"Startup: provedores={status}")
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Warm-up em background: o servidor aceita conexões (liveness) já no início."""
+    warm_task = asyncio.ensure_future(warm_up())
+    reloader.start()
+    yield
+    warm_task.cancel()
+    await reloader.stop()
+
+
+app = FastAPI(title="Chatbot Suporte Entregas", version="0.1.0", lifespan=lifespan)
+# Profiling por requisição só existe se `CHAT_PROFILE_DIR` estiver definido.
+_profiling = profiling_options_from_env()
+if _profiling is not None:
+    app.add_middleware(ProfilerMiddleware, **_profiling)
+
+
+def _collect_cache_stats() -> None:
+    if response_cache is not None:
+        for key, value in response_cache.stats().items():
+            CACHE_STATS.set(value, key)
+
+
+REGISTRY.on_collect(_collect_cache_stats)
+
+
+def _collect_single_flight() -> None:
+    if single_flight is not None:
+        SINGLE_FLIGHT_IN_FLIGHT.set(single_flight.in_flight)
+
+
+REGISTRY.on_collect(_collect_single_flight)
+
+
+def _collect_session_stats() -> None:
+    if session_store is not None:
+        for key, value in session_store.stats().items():
+            SESSION_STATS.set(value, key)
+
+
+REGISTRY.on_collect(_collect_session_stats)
+
+
+def _collect_provider_health() -> None:
+    for name, guard in provider_registry.guards().items():
+        BREAKER_STATE.set(STATE_VALUES[guard.state], name)
+        PROVIDER_TIMEOUT.set(guard.timeout, name)
+
+
+REGISTRY.on_collect(_collect_provider_health)
+
+
+async def current_generation() -> DataGeneration:
+    """Geração atual; se o warm-up ainda não terminou, carrega fora do loop."""
+    if reloader.loaded:
+        return reloader.current
+    return await reloader.warm_up()
 
 
 class ChatRequest(BaseModel):
-    """Payload de entrada para o chat."""
+    """Payload de entrada para o chat; `sessao` liga a memória da conversa."""
 
     mensagem: str
+    sessao: str | None = None
 
 
 class ChatResponse(BaseModel):
@@ -104,143 +250,763 @@ class OrderResponse(BaseModel):
     total: float
 
 
+class IdsBatch(BaseModel):
+    """Corpo JSON de `/pedidos:batch` e `/usuarios:batch`."""
+
+    ids: List[str]
+
+
+class ChatBatch(BaseModel):
+    """Corpo JSON de `/chat:batch`."""
+
+    mensagens: List[str]
+
+
 @app.get("/healthz")
+@app.get("/healthz/live")
 def healthcheck() -> dict:
     """Endpoint de liveness simples."""
     return {"status": "ok"}
 
 
-@app.post("/chat", response_model=ChatResponse, dependencies=[Depends(verify_api_key)])
-def chat(req: ChatRequest) -> ChatResponse:
-    """Busca no KB e responde; se houver modelo, gera texto usando evidência."""
-    intent = detect_intent(req.mensagem)
-    # preferir índice vetorial, se existir
-    if vector_retriever:
-        resultados = vector_retriever.retrieve(req.mensagem)
-    else:
-        resultados = retriever.retrieve(req.mensagem)
+@app.get("/healthz/ready")
+def readiness() -> JSONResponse:
+    """Readiness: 200 só depois do warm-up de dados e provedores (senão 503).
+
+    `breakers` traz o estado do circuito de cada provedor; circuito aberto não
+    derruba o readiness (a cadeia ainda responde pelo próximo provedor ou KB).
+    """
+    providers = provider_registry.status
+    pending = [n for n, st in providers.items() if st in (PENDING, WARMING)]
+    ready = reloader.loaded and provider_registry.ready
+    total = 1 + sum(st != DISABLED for st in providers.values())
+    done = total - len(pending) - (0 if reloader.loaded else 1)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "warming",
+            "progress": f"{done}/{total}",
+            "data": "ready" if reloader.loaded else "pending",
+            "providers": providers,
+            "breakers": {
+                name: guard.state for name, guard in provider_registry.guards().items()
+            },
+        },
+    )
 
-    # Respostas específicas por intenção simples
+
+@app.get("/metrics")
+def metrics() -> Response:
+    """Métricas no formato texto do Prometheus."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+class ChatContext(NamedTuple):
+    """Evidência escolhida para uma mensagem que segue para a geração.
+
+    `evidencia` junta os melhores trechos do retrieval no orçamento de tokens
+    do prompt (`app.prompts`); `top` segue sendo o doc da fonte e do KB.
+    `pergunta` é a mensagem, ou a pergunta do turno anterior completada pelo
+    slot numa sessão.
+    """
+
+    top: dict
+    doc_id: str
+    query_vec: Any
+    providers: list
+    evidencia: str
+    pergunta: str
+
+
+def _exact_answer(
+    route: Route, mensagem: str, gen: DataGeneration
+) -> ChatResponse | None:
+    """Código de pedido/usuário ou tópico de política: lookup direto nos dicts."""
+    intent = route.intent
+    order_id = route.entities.get("order_id")
+    if order_id:
+        order = get_order(order_id, gen.orders)
+        return ChatResponse(
+            resposta=(
+                order_fact(order) if order else f"Não encontrei o pedido {order_id}."
+            ),
+            fonte="orders.json" if order else None,
+            via_modelo=False,
+            aviso_modelo="Código de pedido detectado; consulta exata.",
+        )
+    user_id = route.entities.get("user_id")
+    if user_id:
+        user = get_user(user_id, gen.users)
+        return ChatResponse(
+            resposta=user_fact(user) if user else f"Não encontrei o usuário {user_id}.",
+            fonte="users.json" if user else None,
+            via_modelo=False,
+            aviso_modelo="Código de usuário detectado; consulta exata.",
+        )
     if intent == "pedido":
-        # Tentar extrair PED- na mensagem
-        # Reuso do endpoint /pedido não está integrado; aqui perguntamos pelo id.
         return ChatResponse(
             resposta="Para consultar ou agir em um pedido, compartilhe o código (PED-123).",
             fonte=None,
             via_modelo=False,
             aviso_modelo="Intent pedido detectada; aguardando ID.",
         )
+    if intent == "usuario":
+        return ChatResponse(
+            resposta="Para consultar um usuário, informe o código (ex.: USR-001).",
+            fonte=None,
+            via_modelo=False,
+            aviso_modelo="Intent usuario detectada; aguardando ID.",
+        )
     if intent == "politica":
-        pol = get_policy("reembolso") or {}
-        resposta_pol = pol.get(
-            "passos",
-            "Consigo ajudar com políticas de reembolso, atraso, cancelamento e alergia.",
+        topic = find_topic(mensagem, gen.policy_topics)
+        if topic is not None:
+            return ChatResponse(
+                resposta=render_policy(topic, gen.policies[topic]),
+                fonte="policies.json",
+                via_modelo=False,
+                aviso_modelo="Intent política detectada; tópico citado na mensagem.",
+            )
+    return None
+
+
+async def _prepare_chat(
+    req: ChatRequest, session: Session | None = None
+) -> ChatResponse | ChatContext:
+    """Consultas exatas, retrieval filtrado por intenção ou contexto para a geração."""
+    if session is not None and session.slot:
+        retomada = await _resume(session, req.mensagem)
+        if retomada is not None:
+            return retomada
+    t = time.perf_counter()
+    route = route_message(req.mensagem)
+    intent = route.intent
+    stage("intent", t)
+    if session is not None:
+        if session.turns:
+            SESSION_TURNS.inc("continued")
+        session.intent = intent
+        session.entities.update(route.entities)
+    # Uma geração por requisição: um reload no meio não troca os dados.
+    gen = await current_generation()
+    exata = _exact_answer(route, req.mensagem, gen)
+    if exata is not None:
+        ANSWERS.inc("intent")
+        return exata
+    ativo = gen.active_retriever
+    sources = INTENT_SOURCES[intent]
+    t = time.perf_counter()
+    if retrieval_batcher is not None:
+        hits, query_vec = await retrieval_batcher.submit(ativo, req.mensagem, sources)
+    else:
+        # Fora do event loop: com índice grande a conta travaria streams e health.
+        query_vec, hits = await asyncio.to_thread(
+            retrieve_batch, ativo, [req.mensagem], sources
+        )
+        hits = hits[0]
+    stage("retrieval", t)
+    ctx = await _from_hits(req.mensagem, intent, gen, ativo, hits, query_vec)
+    if session is not None and isinstance(ctx, ChatContext):
+        docs = (ativo.docs[h.index] for h in hits[:MAX_DOCS])
+        session.docs = tuple(
+            (d.get("id", d["pergunta"]), d["pergunta"], d["resposta"]) for d in docs
         )
+        session.query = req.mensagem
+    return ctx
+
+
+async def _resume(session: Session, mensagem: str) -> ChatResponse | ChatContext | None:
+    """Mensagem que só completa o dado pedido no turno anterior.
+
+    Pula roteamento e retrieval. Com docs do turno anterior e provedores, o
+    fato do pedido/usuário vira evidência junto com eles e a pergunta
+    anterior segue para a geração; senão, consulta exata. `None` quando a
+    mensagem não traz o slot (assunto novo: fluxo normal).
+    """
+    gen = await current_generation()
+    if session.slot == "topic":
+        topic = find_topic(mensagem, gen.policy_topics)
+        if topic is None:
+            return None
+        session.intent = "politica"
+        SESSION_TURNS.inc("slot_filled")
+        ANSWERS.inc("intent")
         return ChatResponse(
-            resposta=f"Política exemplo (reembolso): {resposta_pol}",
+            resposta=render_policy(topic, gen.policies[topic]),
             fonte="policies.json",
             via_modelo=False,
-            aviso_modelo="Intent política detectada; usando política mock.",
+            aviso_modelo="Tópico de política informado na sessão.",
         )
-    if intent == "usuario":
+    valor = extract_id(session.slot, mensagem)
+    if valor is None:
+        return None
+    SESSION_TURNS.inc("slot_filled")
+    session.entities[session.slot] = valor
+    exata = _exact_answer(
+        Route(session.intent or "faq", {session.slot: valor}), mensagem, gen
+    )
+    providers = await provider_registry.get()
+    if not (session.docs and session.query and exata.fonte and providers):
+        ANSWERS.inc("intent")
+        return exata
+    pergunta = f"{session.query} ({valor})"
+    trechos = [exata.resposta] + [doc[2] for doc in session.docs]
+    top = {
+        "id": f"{session.docs[0][0]}|{valor}",
+        "pergunta": exata.fonte,
+        "resposta": exata.resposta,
+    }
+    evidencia = select_evidence(trechos, evidence_budget(pergunta), k=len(trechos))
+    return ChatContext(top, top["id"], None, providers, evidencia, pergunta)
+
+
+async def _load_session(req: ChatRequest, client_id: str) -> Session | None:
+    if session_store is None or not req.sessao:
+        return None
+    key = session_key(client_id, req.sessao)
+    session = await session_store.get(key)
+    if session is None:
+        SESSION_TURNS.inc("new")
+        return Session(key)
+    return session
+
+
+async def _remember(session: Session | None, resposta: str) -> None:
+    """Grava o turno: o slot pedido na resposta fica pendente para o próximo."""
+    if session is None:
+        return
+    session.slot = pending_slot(resposta)
+    session.turns += 1
+    await session_store.put(session)
+
+
+async def _from_hits(
+    mensagem: str,
+    intent: str,
+    gen: DataGeneration,
+    ativo: Any,
+    hits: list,
+    query_vec: Any,
+) -> ChatResponse | ChatContext:
+    """Resposta pronta ou contexto a partir dos hits do retrieval."""
+    if intent == "politica":
+        # Sem tópico explícito: a seção de política mais próxima da mensagem.
+        ANSWERS.inc("intent")
+        if not hits or hits[0].score <= 0:
+            topicos = ", ".join(sorted(gen.policies))
+            return ChatResponse(
+                resposta=f"Consigo ajudar com as políticas de: {topicos}.",
+                fonte=None,
+                via_modelo=False,
+                aviso_modelo="Intent política detectada; nenhum tópico encontrado.",
+            )
+        doc = ativo.docs[hits[0].index]
         return ChatResponse(
-            resposta="Para consultar um usuário, informe o código (ex.: USR-001).",
-            fonte=None,
+            resposta=doc["resposta"],
+            fonte=doc["pergunta"],
             via_modelo=False,
-            aviso_modelo="Intent usuario detectada; aguardando ID.",
+            aviso_modelo="Intent política detectada; seção mais próxima do índice.",
         )
-    if not resultados:
+    if not hits:
+        ANSWERS.inc("not_found")
         return ChatResponse(
             resposta="Não encontrei nada no KB. Pode reformular ou dar mais detalhes?",
             fonte=None,
             via_modelo=False,
             aviso_modelo=None,
         )
-    top = resultados[0]
-    # Preferir OpenAI se disponível
-    if openai_client:
-        try:
-            generated = generate_with_context(
-                openai_client,
-                OPENAI_MODEL,
-                req.mensagem,
-                top["resposta"],
-            )
-            return ChatResponse(
-                resposta=generated,
-                fonte=top["pergunta"],
-                via_modelo=True,
-                aviso_modelo=None,
-            )
-        except Exception as exc:  # pragma: no cover
-            logger.warning("Falha OpenAI, caindo para HF/KB: %s", exc)
-    # Se Gemini estiver disponível, usar como fallback antes do HF
-    if gemini_model:
-        try:
-            generated = gemini_generate(
-                gemini_model,
-                req.mensagem,
-                top["resposta"],
-            )
-            return ChatResponse(
-                resposta=generated,
-                fonte=top["pergunta"],
-                via_modelo=True,
-                aviso_modelo=None,
-            )
-        except Exception as exc:  # pragma: no cover
-            logger.warning("Falha Gemini, caindo para HF/KB: %s", exc)
-    # Se tiver modelo HF configurado, gera resposta usando contexto do KB.
-    if hf_pipe:
-        contexto = (
-            "Instrução: responda em português em 1 frase. Use apenas a evidência. "
-            "Se a evidência já responde, repita-a exatamente (sem mudar acentuação). "
-            "Se faltar informação, peça dados adicionais.\n\n"
-            f"Evidência: {top['resposta']}\n"
-            f"Pergunta: {req.mensagem}\n"
-            "Resposta:"
-        )
-        generated = hf_pipe(
-            contexto,
-            max_new_tokens=130,
-            num_return_sequences=1,
-            do_sample=False,
-        )[0]["generated_text"]
+    top = ativo.docs[hits[0].index]
+    if KB_CONFIDENCE is not None and hits[0].score >= KB_CONFIDENCE:
+        # Evidência inequívoca: a resposta do KB basta, sem custo de LLM.
+        ANSWERS.inc("kb_confident")
         return ChatResponse(
-            resposta=generated.strip(),
+            resposta=top["resposta"],
             fonte=top["pergunta"],
-            via_modelo=True,
+            via_modelo=False,
             aviso_modelo=None,
         )
-    # Caso contrário, devolve resposta direta do KB.
+    doc_id = top.get("id", top["pergunta"])
+    providers = await provider_registry.get()
+    # Só trechos com alguma relação com a mensagem; o primeiro sempre entra.
+    trechos = [top["resposta"]] + [
+        ativo.docs[h.index]["resposta"] for h in hits[1:] if h.score > 0
+    ]
+    evidencia = select_evidence(trechos, evidence_budget(mensagem))
+    return ChatContext(top, doc_id, query_vec, providers, evidencia, mensagem)
+
+
+def _cached_answer(ctx: ChatContext) -> str | None:
+    if response_cache is None or not ctx.providers:
+        return None
+    t = time.perf_counter()
+    gerado = response_cache.lookup(
+        ctx.providers, ctx.doc_id, ctx.pergunta, ctx.query_vec
+    )
+    stage("cache", t)
+    CACHE_LOOKUPS.inc("miss" if gerado is None else "hit")
+    if gerado is None:
+        return None
+    ANSWERS.inc("cache")
+    return gerado[0]
+
+
+def _cache_answer(ctx: ChatContext, texto: str, provider) -> None:
+    if response_cache is not None:
+        response_cache.put(
+            provider.name,
+            provider.model,
+            ctx.doc_id,
+            ctx.pergunta,
+            texto,
+            ctx.query_vec,
+        )
+
+
+def _kb_answer(ctx: ChatContext) -> ChatResponse:
+    """Resposta direta do KB quando nenhum modelo gerou texto."""
+    ANSWERS.inc("kb_fallback")
     aviso = None
-    if openai_client is None and gemini_model is None and not USE_HF:
+    sem_api = not (
+        provider_registry.available("openai") or provider_registry.available("gemini")
+    )
+    if sem_api and not USE_HF:
         aviso = "Nenhum modelo configurado; usando resposta direta do KB."
-    elif openai_client is None and gemini_model is None and USE_HF and not hf_pipe:
+    elif sem_api and USE_HF and not provider_registry.available("hf"):
         aviso = "HF_MODEL definido, mas pipeline não carregou."
     return ChatResponse(
-        resposta=top["resposta"],
-        fonte=top["pergunta"],
+        resposta=ctx.top["resposta"],
+        fonte=ctx.top["pergunta"],
         via_modelo=False,
         aviso_modelo=aviso,
     )
 
 
+async def _complete(req: ChatRequest, ctx: ChatResponse | ChatContext) -> ChatResponse:
+    """Cache de respostas, geração pela cadeia de provedores ou resposta do KB."""
+    if isinstance(ctx, ChatResponse):
+        return ctx
+    texto = _cached_answer(ctx)
+    if texto is None:
+        # OpenAI -> Gemini -> HF, sem bloquear o event loop (hedged se configurado).
+        t = time.perf_counter()
+        gerado = await _generate(req, ctx)
+        _observe_generation(t, gerado[1].name if gerado else "kb")
+        if gerado is not None:
+            texto = gerado[0]
+            ANSWERS.inc("model")
+            _cache_answer(ctx, texto, gerado[1])
+    if texto is not None:
+        return ChatResponse(
+            resposta=texto,
+            fonte=ctx.top["pergunta"],
+            via_modelo=True,
+            aviso_modelo=None,
+        )
+    # Caso contrário, devolve resposta direta do KB.
+    return _kb_answer(ctx)
+
+
+async def _generate(req: ChatRequest, ctx: ChatContext) -> Any:
+    """`run_chain` coalescido: mesma consulta, doc e cadeia compartilham a chamada."""
+
+    def call() -> Awaitable[Any]:
+        return run_chain(ctx.providers, ctx.pergunta, ctx.evidencia, HEDGE_AFTER)
+
+    if single_flight is None:
+        return await call()
+    key = (
+        normalize_query(ctx.pergunta),
+        ctx.doc_id,
+        tuple((p.name, p.model) for p in ctx.providers),
+    )
+    try:
+        return await single_flight.do(key, call)
+    except asyncio.TimeoutError:
+        # Mesmo tratamento do prazo estourado no hedge: responde pelo KB.
+        logger.warning("Single-flight: prazo estourado, respondendo pelo KB.")
+        return None
+
+
+@app.post("/chat", response_model=ChatResponse, dependencies=[Depends(chat_slot)])
+async def chat(
+    req: ChatRequest, client: ApiClient = Depends(verify_api_key)
+) -> Response:
+    """Busca no KB e responde; se houver modelo, gera texto usando evidência."""
+    inicio = time.perf_counter()
+    try:
+        session = await _load_session(req, client.id)
+        resp = await _complete(req, await _prepare_chat(req, session))
+        await _remember(session, resp.resposta)
+        return FastJSONResponse(resp)
+    finally:
+        stage("total", inicio)
+
+
+def _observe_generation(start: float, path: str) -> None:
+    PATH_SECONDS.observe(stage("generation", start) - start, path)
+
+
+async def _chat_events(req: ChatRequest, client_id: str) -> AsyncIterator[bytes]:
+    """Eventos SSE: `token` (trechos), `reset` (descarta o parcial) e `done`."""
+    inicio = time.perf_counter()
+    session = await _load_session(req, client_id)
+    ctx = await _prepare_chat(req, session)
+    if isinstance(ctx, ChatResponse):
+        await _remember(session, ctx.resposta)
+        yield sse_event("token", {"texto": ctx.resposta})
+        yield sse_event("done", ctx.model_dump(exclude={"resposta"}))
+        stage("total_stream", inicio)
+        return
+    texto = _cached_answer(ctx)
+    if texto is not None:
+        yield sse_event("token", {"texto": texto})
+    else:
+        partes: list[str] = []
+        provider = None
+        t = time.perf_counter()
+        async for chunk in stream_chain(ctx.providers, ctx.pergunta, ctx.evidencia):
+            if chunk.reset:
+                partes.clear()
+                yield sse_event("reset", {"provedor": chunk.provider.name})
+                continue
+            if not partes:
+                stage("first_token", inicio)
+            partes.append(chunk.text)
+            provider = chunk.provider
+            yield sse_event("token", {"texto": chunk.text})
+        _observe_generation(t, provider.name if partes else "kb")
+        if partes:
+            texto = "".join(partes)
+            ANSWERS.inc("model")
+            _cache_answer(ctx, texto, provider)
+    if texto is not None:
+        final = ChatResponse(resposta=texto, fonte=ctx.top["pergunta"], via_modelo=True)
+    else:
+        final = _kb_answer(ctx)
+        yield sse_event("token", {"texto": final.resposta})
+    await _remember(session, final.resposta)
+    yield sse_event("done", final.model_dump(exclude={"resposta"}))
+    stage("total_stream", inicio)
+
+
+@app.post("/chat/stream")
+async def chat_stream(
+    req: ChatRequest, lease: Lease = Depends(chat_slot)
+) -> StreamingResponse:
+    """Mesmo fluxo do `/chat`, com a resposta em Server-Sent Events."""
+    return _hold(
+        lease,
+        StreamingResponse(
+            _chat_events(req, lease.client_id),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
+        ),
+    )
+
+
+def _hold(lease: Lease, response: Response) -> Response:
+    """Mantém a vaga de chat do cliente até o fim do fluxo da resposta."""
+    if not isinstance(response, StreamingResponse):
+        return response
+    lease.detach()
+    response.body_iterator = _releasing(response.body_iterator, lease)
+    # O background cobre o fluxo que nem chegou a começar.
+    response.background = BackgroundTask(lease.release)
+    return response
+
+
+async def _releasing(body: AsyncIterator[Any], lease: Lease) -> AsyncIterator[Any]:
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        lease.release()
+
+
 @app.get(
     "/pedido/{order_id}",
     response_model=OrderResponse,
     dependencies=[Depends(verify_api_key)],
 )
-def pedido(order_id: str) -> OrderResponse:
+async def pedido(order_id: str) -> Response:
     """Consulta um pedido mock pelo ID (formato PED-123)."""
-    order = get_order(order_id)
+    order = get_order(order_id, (await current_generation()).orders)
     if not order:
-        # FastAPI transformará ValueError em 422; mantemos simples.
-        raise ValueError("Pedido não encontrado.")
-    return OrderResponse(
-        order_id=order["order_id"],
-        status=order["status"],
-        eta_minutos=order["eta_minutos"],
-        itens=order["itens"],
-        total=order["total"],
+        # 422 explícito: ValueError não tratado vira 500 no servidor.
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Pedido não encontrado.",
+        )
+    return FastJSONResponse(_order_payload(order))
+
+
+def _order_payload(order: Mapping[str, Any]) -> Dict[str, Any]:
+    """Corpo do `OrderResponse` montado direto do registro (sem revalidar)."""
+    return {
+        "order_id": order["order_id"],
+        "status": order["status"],
+        "eta_minutos": int(order["eta_minutos"]),
+        "itens": order["itens"],
+        "total": float(order["total"]),
+    }
+
+
+BatchHandler = Callable[[List[Any]], Awaitable[List[Dict[str, Any]]]]
+
+
+async def _batch_response(
+    request: Request, model: type, field: str, handle: BatchHandler
+) -> Response:
+    """Lê o lote (JSON `{field: [...]}` ou NDJSON) e aplica `handle` por pedaço.
+
+    Em NDJSON a entrada é consumida e a saída escrita em fluxo, um resultado
+    por linha com o `indice` do item; em JSON o corpo é validado por `model` e
+    limitado a `BATCH_MAX_ITEMS` (413 acima disso).
+    """
+    if is_ndjson(request):
+        source = chunks(iter_lines(request), BATCH_CHUNK)
+    else:
+        try:
+            items = getattr(model.model_validate_json(await request.body()), field)
+        except ValidationError as exc:
+            raise RequestValidationError(exc.errors()) from exc
+        if len(items) > BATCH_MAX_ITEMS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Máximo de {BATCH_MAX_ITEMS} itens por lote (use NDJSON).",
+            )
+        source = _chunked_list(items)
+
+    async def results() -> AsyncIterator[Dict[str, Any]]:
+        indice = 0
+        async for chunk in source:
+            for result in await handle(chunk):
+                yield {"indice": indice, **result}
+                indice += 1
+
+    if wants_ndjson(request):
+        return NDJSONResponse(ndjson_line(r) async for r in results())
+    return FastJSONResponse({"resultados": [r async for r in results()]})
+
+
+async def _chunked_list(items: List[Any]) -> AsyncIterator[List[Any]]:
+    for start in range(0, len(items), BATCH_CHUNK):
+        yield items[start : start + BATCH_CHUNK]
+
+
+def _item_value(item: Any, field: str) -> str | None:
+    """Item de lote: string pura ou objeto com `field`."""
+    if isinstance(item, dict):
+        item = item.get(field)
+    return item if isinstance(item, str) else None
+
+
+def _invalid(item: Any, field: str) -> Dict[str, Any]:
+    if isinstance(item, BadLine):
+        return {"erro": str(item)}
+    return {"erro": f"Item sem `{field}` (string)."}
+
+
+@app.post("/pedidos:batch", dependencies=[Depends(verify_api_key)])
+async def pedidos_batch(request: Request) -> Response:
+    """Vários pedidos por ID (`{"ids": [...]}` ou NDJSON de IDs/`{"order_id"}`)."""
+
+    async def handle(chunk: List[Any]) -> List[Dict[str, Any]]:
+        orders = (await current_generation()).orders
+        out = []
+        for item in chunk:
+            order_id = _item_value(item, "order_id")
+            if order_id is None:
+                out.append(_invalid(item, "order_id"))
+                continue
+            order = get_order(order_id, orders)
+            out.append(
+                _order_payload(order)
+                if order
+                else {"order_id": order_id, "erro": "Pedido não encontrado."}
+            )
+        return out
+
+    return await _batch_response(request, IdsBatch, "ids", handle)
+
+
+@app.post("/usuarios:batch", dependencies=[Depends(verify_api_key)])
+async def usuarios_batch(request: Request) -> Response:
+    """Vários usuários por ID (`{"ids": [...]}` ou NDJSON de IDs/`{"user_id"}`)."""
+
+    async def handle(chunk: List[Any]) -> List[Dict[str, Any]]:
+        users = (await current_generation()).users
+        out = []
+        for item in chunk:
+            user_id = _item_value(item, "user_id")
+            if user_id is None:
+                out.append(_invalid(item, "user_id"))
+                continue
+            user = get_user(user_id, users)
+            out.append(
+                dict(user)
+                if user
+                else {"user_id": user_id, "erro": "Usuário não encontrado."}
+            )
+        return out
+
+    return await _batch_response(request, IdsBatch, "ids", handle)
+
+
+# Teto de registros por resposta de `GET /usuarios` e `GET /pedidos`.
+SEGMENT_MAX_LIMIT = 1000
+
+
+def _segment(
+    table: Any, limite: int, **filtros: List[str] | None
+) -> Tuple[int, List[Any]]:
+    """Total e primeiros `limite` registros que batem com os filtros dados."""
+    registros = select(table, **{k: v for k, v in filtros.items() if v})
+    return len(registros), list(registros[:limite])
+
+
+@app.get("/usuarios", dependencies=[Depends(verify_api_key)])
+async def usuarios(
+    regiao: List[str] | None = Query(None),
+    tier: List[str] | None = Query(None),
+    canal_preferido: List[str] | None = Query(None),
+    flag: List[str] | None = Query(None),
+    limite: int = Query(100, ge=0, le=SEGMENT_MAX_LIMIT),
+) -> dict:
+    """Segmento de usuários (ex.: `?regiao=RJ&tier=vip`); filtro repetido = OU."""
+    total, registros = _segment(
+        (await current_generation()).users,
+        limite,
+        regiao=regiao,
+        tier=tier,
+        canal_preferido=canal_preferido,
+        flag=flag,
     )
+    return {"total": total, "resultados": [dict(user) for user in registros]}
+
+
+@app.get("/pedidos", dependencies=[Depends(verify_api_key)])
+async def pedidos(
+    status_: List[str] | None = Query(None, alias="status"),
+    limite: int = Query(100, ge=0, le=SEGMENT_MAX_LIMIT),
+) -> dict:
+    """Pedidos por status (ex.: `?status=delayed`); filtro repetido = OU."""
+    total, registros = _segment(
+        (await current_generation()).orders, limite, status=status_
+    )
+    return {
+        "total": total,
+        "resultados": [_order_payload(o) for o in registros],
+    }
+
+
+async def prepare_many(
+    reqs: List[ChatRequest],
+) -> List[ChatResponse | ChatContext]:
+    """`_prepare_chat` de um lote: um retrieval vetorizado por intenção.
+
+    Compartilhado com o pipeline offline (`app.batch`).
+    """
+    gen = await current_generation()
+    ativo = gen.active_retriever
+    out: List[ChatResponse | ChatContext | None] = [None] * len(reqs)
+    grupos: Dict[str, List[int]] = {}
+    for i, req in enumerate(reqs):
+        route = route_message(req.mensagem)
+        exata = _exact_answer(route, req.mensagem, gen)
+        if exata is not None:
+            ANSWERS.inc("intent")
+            out[i] = exata
+        else:
+            grupos.setdefault(route.intent, []).append(i)
+    for intent, indices in grupos.items():
+        t = time.perf_counter()
+        query_matrix, hits = await asyncio.to_thread(
+            retrieve_batch,
+            ativo,
+            [reqs[i].mensagem for i in indices],
+            INTENT_SOURCES[intent],
+        )
+        stage("retrieval_batch", t)
+        for j, i in enumerate(indices):
+            out[i] = await _from_hits(
+                reqs[i].mensagem, intent, gen, ativo, hits[j], query_matrix[j]
+            )
+    return out
+
+
+@app.post("/chat:batch")
+async def chat_batch(
+    request: Request,
+    lease: Lease = Depends(chat_slot),
+    client: ApiClient = Depends(verify_api_key),
+) -> Response:
+    """Várias mensagens (`{"mensagens": [...]}` ou NDJSON de `{"mensagem"}`).
+
+    O lote respeita os limites do cliente: no máximo `concurrency` itens
+    gerando ao mesmo tempo e um token do bucket por item (o da requisição
+    paga o primeiro); sem token, o item volta com `status` 429 e
+    `retry_after`, sem passar por retrieval nem geração.
+    """
+    limite = BATCH_CONCURRENCY
+    if client.concurrency > 0:
+        limite = min(limite, client.concurrency)
+    semaforo = asyncio.Semaphore(limite)
+    pagos = 1
+
+    async def one(req: ChatRequest, ctx: ChatResponse | ChatContext) -> dict:
+        async with semaforo:
+            try:
+                return (await _complete(req, ctx)).model_dump()
+            except Exception as exc:  # um item com erro não derruba o lote
+                logger.warning("Falha no item do /chat:batch: %s", exc)
+                return {"erro": "Falha ao gerar a resposta."}
+
+    def charge() -> Dict[str, Any] | None:
+        nonlocal pagos
+        if pagos:
+            pagos -= 1
+            return None
+        exc = charge_item(client)
+        if exc is None:
+            return None
+        return {
+            "erro": f"Limite do cliente excedido; tente de novo em {exc.header} s.",
+            "status": status.HTTP_429_TOO_MANY_REQUESTS,
+            "retry_after": int(exc.header),
+        }
+
+    async def handle(chunk: List[Any]) -> List[Dict[str, Any]]:
+        inicio = time.perf_counter()
+        out = [_invalid(item, "mensagem") for item in chunk]
+        valid = []
+        for i, m in enumerate(_item_value(item, "mensagem") for item in chunk):
+            if m is None:
+                continue
+            recusa = charge()
+            if recusa is None:
+                valid.append((i, ChatRequest(mensagem=m)))
+            else:
+                out[i] = recusa
+        ctxs = await prepare_many([req for _, req in valid])
+        respostas = await asyncio.gather(
+            *(one(req, ctx) for (_, req), ctx in zip(valid, ctxs))
+        )
+        for (i, _), resposta in zip(valid, respostas):
+            out[i] = resposta
+        stage("total_batch", inicio)
+        return out
+
+    return _hold(lease, await _batch_response(request, ChatBatch, "mensagens", handle))
+
+
+@app.post("/admin/reload", dependencies=[Depends(verify_admin_key)])
+async def admin_reload() -> dict:
+    """Recarrega KB/índice e tabelas em background e publica a nova geração."""
+    gen = await reloader.reload("admin")
+    return {
+        "generation": gen.number,
+        "docs": len(gen.active_retriever.docs),
+        "orders": len(gen.orders),
+        "users": len(gen.users),
+        "policies": len(gen.policies),
+    }
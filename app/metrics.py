@@ -0,0 +1,349 @@
+"""Métricas em processo no formato texto do Prometheus (sem dependências).
+
+Contadores, gauges e histogramas com labels posicionais, pensados para o
+caminho quente: `observe`/`inc` são um lookup de dict, um `bisect` e duas
+somas (ordem de centenas de nanossegundos). A renderização em `/metrics`
+calcula os buckets cumulativos só na leitura.
+
+Série = tupla de valores de label, na ordem declarada em `labels`.
+"""
+
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Buckets em segundos: de 1 ms (retrieval) a 30 s (LLM lento).
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+def _fmt_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monotônico por série de labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        values = self._values
+        values[labels] = values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_fmt_labels(self.labels, key)} {_fmt_value(v)}"
+            for key, v in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    """Valor instantâneo; costuma ser atualizado num hook de coleta."""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+
+class Histogram:
+    """Histograma com buckets fixos; contagens não cumulativas internamente."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._slots = len(self.buckets) + 1
+        # série -> [contagens por bucket (+Inf no fim), soma]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        try:
+            series = self._series[labels]
+        except KeyError:
+            series = self._series.setdefault(labels, [[0] * self._slots, 0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[List[int], float]]:
+        """Cópia das contagens por bucket e somas (para diffs em benchmarks)."""
+        return {k: (list(c), total) for k, (c, total) in self._series.items()}
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self._series.items()):
+            acc = 0
+            for bound, n in zip((*self.buckets, float("inf")), counts):
+                acc += n
+                le = f'le="{_fmt_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_fmt_labels(self.labels, key, le)} {acc}"
+                )
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labels, key)} {total!r}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labels, key)} {acc}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas renderizadas juntas em `/metrics`."""
+
+    def __init__(self) -> None:
+        self._metrics: List = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def on_collect(self, collector: Callable[[], None]) -> None:
+        """Callback rodado antes de cada renderização (ex.: atualizar gauges)."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "chat_stage_seconds",
+    "Duração das etapas do /chat: intent, retrieval (e retrieval_<backend>/rerank "
+    "no híbrido), cache, generation, total (e first_token/total_stream no "
+    "/chat/stream).",
+    ("stage",),
+)
+STAGE_BUDGET = REGISTRY.gauge(
+    "chat_stage_budget_seconds",
+    "Orçamento de latência por etapa (CHAT_STAGE_BUDGETS_MS).",
+    ("stage",),
+)
+STAGE_OVER_BUDGET = REGISTRY.counter(
+    "chat_stage_over_budget_total",
+    "Execuções de cada etapa que passaram do orçamento de latência.",
+    ("stage",),
+)
+ANSWERS = REGISTRY.counter(
+    "chat_answers_total",
+    "Respostas do /chat por origem: kb_confident (pulou o LLM), model, cache, "
+    "kb_fallback, intent ou not_found.",
+    ("source",),
+)
+PROVIDER_SECONDS = REGISTRY.histogram(
+    "chat_provider_seconds",
+    "Duração das chamadas a cada provedor, por resultado (ok, error, timeout, "
+    "cancelled).",
+    ("provider", "outcome"),
+)
+PATH_SECONDS = REGISTRY.histogram(
+    "chat_generation_path_seconds",
+    "Duração da geração por caminho de fallback (provedor que respondeu ou kb).",
+    ("path",),
+)
+FALLBACKS = REGISTRY.counter(
+    "chat_fallbacks_total",
+    "Provedores abandonados pela cadeia, por motivo: error, timeout (timeout "
+    "adaptativo), open (circuito aberto, nem chamado) ou hedge.",
+    ("provider", "reason"),
+)
+BREAKER_STATE = REGISTRY.gauge(
+    "chat_provider_breaker_state",
+    "Estado do circuit breaker por provedor (0 fechado, 1 meio aberto, 2 aberto).",
+    ("provider",),
+)
+BREAKER_TRANSITIONS = REGISTRY.counter(
+    "chat_provider_breaker_transitions_total",
+    "Mudanças de estado do circuit breaker, por estado de destino.",
+    ("provider", "state"),
+)
+HF_BATCH_SIZE = REGISTRY.histogram(
+    "chat_hf_batch_size",
+    "Prompts por lote gerado pelo motor HF local (batching dinâmico).",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+HF_TOKENS = REGISTRY.counter(
+    "chat_hf_generated_tokens_total", "Tokens gerados pelo motor HF local."
+)
+PROMPT_TOKENS = REGISTRY.histogram(
+    "chat_prompt_tokens",
+    "Tokens do prompt enviado a cada provedor, por requisição.",
+    ("provider",),
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192),
+)
+TOKENS = REGISTRY.counter(
+    "chat_tokens_total",
+    "Tokens por provedor e tipo: prompt, completion ou cached (prefixo servido "
+    "do cache de prompt do provedor).",
+    ("provider", "kind"),
+)
+COMPLETION_SECONDS_PER_TOKEN = REGISTRY.histogram(
+    "chat_completion_seconds_per_token",
+    "Duração da geração dividida pelos tokens gerados.",
+    ("provider",),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+PROVIDER_TIMEOUT = REGISTRY.gauge(
+    "chat_provider_timeout_seconds",
+    "Timeout adaptativo atual de cada provedor.",
+    ("provider",),
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "chat_cache_lookups_total", "Consultas ao cache de respostas.", ("result",)
+)
+CACHE_STATS = REGISTRY.gauge(
+    "chat_cache_stats",
+    "Estado do cache de respostas (entradas, bytes, hits, evictions...).",
+    ("stat",),
+)
+SESSION_TURNS = REGISTRY.counter(
+    "chat_session_turns_total",
+    "Mensagens com `sessao`: new (sessão criada), continued (roteamento normal) "
+    "ou slot_filled (só completou o dado pedido, sem roteamento nem retrieval).",
+    ("kind",),
+)
+SESSION_STATS = REGISTRY.gauge(
+    "chat_session_stats",
+    "Estado do store de sessões (sessões, bytes, evictions, expirations...).",
+    ("stat",),
+)
+API_REQUESTS = REGISTRY.counter(
+    "chat_api_requests_total",
+    "Requisições autenticadas e dentro do token bucket, por cliente da API.",
+    ("client",),
+)
+API_REJECTIONS = REGISTRY.counter(
+    "chat_api_rejections_total",
+    "Requisições recusadas por cliente e motivo: unauthorized (401), rate_limited, "
+    "concurrency_limited ou auth_throttled (429, falhas de auth por endereço).",
+    ("client", "reason"),
+)
+API_IN_FLIGHT = REGISTRY.gauge(
+    "chat_api_in_flight", "Chats em andamento por cliente da API.", ("client",)
+)
+API_KEY_CACHE = REGISTRY.counter(
+    "chat_api_key_cache_total",
+    "Verificações de API key pelo cache em memória (hit), pelo cache de chaves "
+    "inválidas (miss_hit) ou pelos hashes (miss).",
+    ("result",),
+)
+SINGLE_FLIGHT = REGISTRY.counter(
+    "chat_single_flight_total",
+    "Gerações no single-flight: leader (chamou os provedores), coalesced (aguardou "
+    "a chamada idêntica em voo), timeout ou error.",
+    ("result",),
+)
+SINGLE_FLIGHT_IN_FLIGHT = REGISTRY.gauge(
+    "chat_single_flight_in_flight", "Chaves de geração em voo no single-flight."
+)
+
+
+# Orçamentos padrão (ms); `CHAT_STAGE_BUDGETS_MS="retrieval=20,total=1500"`
+# sobrescreve ou acrescenta etapas.
+DEFAULT_BUDGETS_MS = {
+    "intent": 1,
+    "retrieval": 25,
+    "rerank": 5,
+    "cache": 2,
+    "first_token": 1000,
+    "generation": 3000,
+    "total": 3500,
+}
+
+
+def budgets_from_env() -> Dict[str, float]:
+    """Orçamento por etapa, em segundos."""
+    budgets = dict(DEFAULT_BUDGETS_MS)
+    for item in os.getenv("CHAT_STAGE_BUDGETS_MS", "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            budgets[name.strip()] = float(value)
+    return {name: ms / 1000 for name, ms in budgets.items()}
+
+
+_BUDGETS = budgets_from_env()
+for _name, _seconds in _BUDGETS.items():
+    STAGE_BUDGET.set(_seconds, _name)
+
+
+def stage(name: str, start: float) -> float:
+    """Registra a etapa iniciada em `start` e devolve o instante atual."""
+    now = time.perf_counter()
+    elapsed = now - start
+    STAGE_SECONDS.observe(elapsed, name)
+    budget = _BUDGETS.get(name)
+    if budget is not None and elapsed > budget:
+        STAGE_OVER_BUDGET.inc(name)
+    return now
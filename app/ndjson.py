@@ -0,0 +1,87 @@
+"""NDJSON (`application/x-ndjson`): um JSON por linha, lido e escrito em fluxo.
+
+Os endpoints de lote aceitam o corpo inteiro em JSON ou um objeto por linha;
+em NDJSON as linhas são decodificadas à medida que chegam e processadas em
+pedaços de `size` itens, então nem a entrada nem a saída ficam inteiras em
+memória.
+"""
+
+from typing import Any, AsyncIterator, List
+
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .jsonstream import loads
+from .responses import dumps
+
+NDJSON = "application/x-ndjson"
+NDJSON_TYPES = (NDJSON, "application/jsonl", "application/x-jsonlines")
+
+
+class BadLine(ValueError):
+    """Linha que não é JSON válido (vira um item de erro, sem abortar o lote)."""
+
+
+class NDJSONResponse(StreamingResponse):
+    """Resposta NDJSON em fluxo que pode ler o corpo da requisição enquanto escreve.
+
+    O `StreamingResponse` padrão escuta `http.disconnect` em paralelo e, para
+    isso, consome as mensagens do `receive`, inclusive os pedaços do corpo que
+    o gerador ainda vai ler. Aqui só o gerador lê: uma desconexão aparece como
+    `ClientDisconnect` na leitura (ou erro no `send`) e encerra o fluxo.
+    """
+
+    media_type = NDJSON
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def is_ndjson(request: Request) -> bool:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    return content_type in NDJSON_TYPES
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Resposta em NDJSON se a entrada for NDJSON ou o `Accept` pedir."""
+    return is_ndjson(request) or NDJSON in request.headers.get("accept", "")
+
+
+def ndjson_line(data: Any) -> bytes:
+    return dumps(data) + b"\n"
+
+
+async def iter_lines(request: Request) -> AsyncIterator[Any]:
+    """Objetos do corpo NDJSON; linhas inválidas saem como `BadLine`."""
+    buffer = b""
+    number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield _decode(line, number)
+    if buffer.strip():
+        yield _decode(buffer, number + 1)
+
+
+def _decode(line: bytes, number: int) -> Any:
+    try:
+        return loads(line)
+    except ValueError:
+        return BadLine(f"JSON inválido na linha {number}.")
+
+
+async def chunks(items: AsyncIterator[Any], size: int) -> AsyncIterator[List[Any]]:
+    chunk: List[Any] = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
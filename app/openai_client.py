@@ -1,13 +1,17 @@
 """Conector simples para OpenAI Chat Completions."""
 
 import os
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List
 
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI
 except Exception:  # pragma: no cover
+    AsyncOpenAI = None  # type: ignore
+    DefaultAsyncHttpxClient = None  # type: ignore
     OpenAI = None  # type: ignore
 
+from .prompts import build_prompt, count_tokens, observe_prompt
+
 
 def get_openai_client():
     """Retorna cliente OpenAI se houver API key configurada."""
@@ -20,6 +24,71 @@ def get_openai_client():
         return None
 
 
+def _async_http_client():
+    """Pool HTTP do cliente compartilhado: conexões reaproveitadas (keep-alive).
+
+    - `OPENAI_MAX_CONNECTIONS` (100) e `OPENAI_MAX_KEEPALIVE` (20) conexões
+      ociosas mantidas por `OPENAI_KEEPALIVE_S` (30 s), evitando um handshake
+      TLS por requisição;
+    - `OPENAI_TIMEOUT_S` (30) é o teto do SDK e `OPENAI_CONNECT_TIMEOUT_S` (5)
+      o do connect; o corte normal vem do timeout adaptativo da cadeia.
+    """
+    import httpx
+
+    return DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_S", "30")),
+        ),
+        timeout=httpx.Timeout(
+            float(os.getenv("OPENAI_TIMEOUT_S", "30")),
+            connect=float(os.getenv("OPENAI_CONNECT_TIMEOUT_S", "5")),
+        ),
+    )
+
+
+def get_async_openai_client():
+    """Retorna cliente OpenAI assíncrono (não bloqueia o event loop).
+
+    Retentativas do SDK (`OPENAI_MAX_RETRIES`, default 0) ficam desligadas: a
+    cadeia de fallback e o circuit breaker já tratam a falha sem multiplicar
+    a espera.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key or not AsyncOpenAI:
+        return None
+    try:
+        return AsyncOpenAI(
+            api_key=api_key,
+            http_client=_async_http_client(),
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "0")),
+        )
+    except Exception:
+        return None
+
+
+def _build_messages(model: str, pergunta: str, evidencia: str) -> List[Dict[str, str]]:
+    """Mensagens com o system fixo na frente (prefixo do cache de prompt da OpenAI)."""
+    prompt = build_prompt(pergunta, evidencia, "chat", model)
+    return [
+        {"role": "system", "content": prompt.system},
+        {"role": "user", "content": prompt.user},
+    ]
+
+
+def _observe_usage(model: str, messages: List[Dict[str, str]], usage: Any) -> None:
+    """Tokens do prompt pelo `usage` da resposta (ou estimados, sem ele)."""
+    if usage is None:
+        tokens = sum(count_tokens(m["content"], model) for m in messages)
+        observe_prompt("openai", tokens)
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    observe_prompt(
+        "openai", usage.prompt_tokens, getattr(details, "cached_tokens", 0) or 0
+    )
+
+
 def generate_with_context(
     client: Any,
     model: str,
@@ -28,24 +97,54 @@ def generate_with_context(
     max_tokens: int = 180,
 ) -> str:
     """Gera resposta usando evidência como base."""
-    messages: List[Dict[str, str]] = [
-        {
-            "role": "system",
-            "content": (
-                "Você é um atendente de suporte de entregas. Responda em português, "
-                "em até 2 frases curtas, usando apenas a evidência fornecida. "
-                "Se faltar informação, peça dados adicionais."
-            ),
-        },
-        {
-            "role": "user",
-            "content": f"Pergunta: {pergunta}\nEvidência: {evidencia}\nResposta:",
-        },
-    ]
+    messages = _build_messages(model, pergunta, evidencia)
     completion = client.chat.completions.create(
         model=model,
         messages=messages,
         max_tokens=max_tokens,
         temperature=0,
     )
+    _observe_usage(model, messages, getattr(completion, "usage", None))
     return completion.choices[0].message.content.strip()
+
+
+async def agenerate_with_context(
+    client: Any,
+    model: str,
+    pergunta: str,
+    evidencia: str,
+    max_tokens: int = 180,
+) -> str:
+    """Versão assíncrona de `generate_with_context` (usa `AsyncOpenAI`)."""
+    messages = _build_messages(model, pergunta, evidencia)
+    completion = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=0,
+    )
+    _observe_usage(model, messages, getattr(completion, "usage", None))
+    return completion.choices[0].message.content.strip()
+
+
+async def astream_with_context(
+    client: Any,
+    model: str,
+    pergunta: str,
+    evidencia: str,
+    max_tokens: int = 180,
+) -> AsyncIterator[str]:
+    """Mesma geração em modo streaming: devolve os deltas conforme chegam."""
+    messages = _build_messages(model, pergunta, evidencia)
+    _observe_usage(model, messages, None)
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=0,
+        stream=True,
+    )
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
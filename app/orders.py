@@ -1,21 +1,42 @@
-"""Utilitário para ler pedidos mock e buscar por order_id."""
+"""Utilitário para ler pedidos mock e buscar por order_id.
 
-import json
+O mapa é indexado pelo ID em maiúsculas: `get_order("ped-123")` também acha.
+Por padrão a tabela é colunar (`app.columnar`), com índice secundário por
+`status`; `DATA_COLUMNAR=0` volta ao dict-of-dicts. Caminho `.ndjson`/`.jsonl`
+é lido como NDJSON.
+"""
+
+import os
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, Dict, Mapping
+
+from .columnar import CATEGORY, FLOAT, INT, JSON, TEXT, load_table
+from .jsonstream import iter_records
 
 ORDERS_PATH = Path(__file__).resolve().parent.parent / "data" / "source" / "orders.json"
 
+ORDER_SCHEMA = (
+    ("order_id", TEXT),
+    ("cliente", TEXT),
+    ("status", CATEGORY),
+    ("eta_minutos", INT),
+    ("total", FLOAT),
+    ("itens", JSON),
+)
+ORDER_INDEXES = (("status",),)
+
 
-def _load_orders() -> Dict[str, Any]:
-    with ORDERS_PATH.open("r", encoding="utf-8") as f:
-        orders = json.load(f)
-    return {o["order_id"]: o for o in orders}
+def load_orders(path: Path = ORDERS_PATH) -> Mapping[str, Any]:
+    if os.getenv("DATA_COLUMNAR", "1") != "0":
+        return load_table(path, ORDER_SCHEMA, "order_id", str.upper, ORDER_INDEXES)
+    return {o["order_id"].upper(): o for o in iter_records(path)}
 
 
-ORDERS = _load_orders()
+ORDERS = load_orders()
 
 
-def get_order(order_id: str) -> Dict[str, Any] | None:
-    """Retorna pedido pelo ID, se existir."""
-    return ORDERS.get(order_id)
+def get_order(
+    order_id: str, orders: Mapping[str, Any] | None = None
+) -> Dict[str, Any] | None:
+    """Retorna pedido pelo ID, se existir (em `orders` ou no mapa do módulo)."""
+    return (ORDERS if orders is None else orders).get(order_id.strip().upper())
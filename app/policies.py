@@ -1,23 +1,48 @@
-"""Utilitário para políticas mockadas carregadas de data/source/policies.json."""
+"""Utilitário para políticas mockadas carregadas de data/source/policies.json.
+
+As chaves são normalizadas por `text.fold` na carga, então `get_policy` é um
+único acesso ao dict. `topic_index` mapeia também o radical de cada tópico
+(`text.stem`) para a chave, para achar o tópico citado numa mensagem
+("cancelar o pedido" -> `cancelamento`) sem varrer as políticas.
+"""
 
-import json
 from pathlib import Path
 from typing import Any, Dict
 
-POLICIES_PATH = Path(__file__).resolve().parent.parent / "data" / "source" / "policies.json"
+from .jsonstream import iter_json_object
+from .text import analyze, fold, stem
+
+POLICIES_PATH = (
+    Path(__file__).resolve().parent.parent / "data" / "source" / "policies.json"
+)
 
 
-def load_policies() -> Dict[str, Any]:
-    with POLICIES_PATH.open("r", encoding="utf-8") as f:
-        return json.load(f)
+def load_policies(path: Path = POLICIES_PATH) -> Dict[str, Any]:
+    return {fold(k.strip()): v for k, v in iter_json_object(path)}
 
 
 POLICIES = load_policies()
 
 
-def get_policy(topic: str) -> Dict[str, Any] | None:
-    topic_norm = topic.lower()
-    for key, value in POLICIES.items():
-        if key.lower() == topic_norm:
-            return value
+def get_policy(
+    topic: str, policies: Dict[str, Any] | None = None
+) -> Dict[str, Any] | None:
+    return (POLICIES if policies is None else policies).get(fold(topic.strip()))
+
+
+def topic_index(policies: Dict[str, Any]) -> Dict[str, str]:
+    """Termo normalizado (chave e radical da chave) -> chave da política."""
+    index: Dict[str, str] = {}
+    for key in policies:
+        index[key] = key
+        index.setdefault(stem(key), key)
+    return index
+
+
+def find_topic(message: str, index: Dict[str, str]) -> str | None:
+    """Primeiro tópico de política citado na mensagem, se houver."""
+    for term in analyze(message):
+        key = index.get(term)
+        if key is not None:
+            return key
     return None
@@ -0,0 +1,104 @@
+"""Hook opt-in de profiling por requisição (cProfile) para o app ASGI.
+
+Só é instalado com `CHAT_PROFILE_DIR` definido; sem ele o app não tem
+middleware nenhum (custo zero). Com ele, perfila a requisição por amostragem
+(`CHAT_PROFILE_SAMPLE`, fração entre 0 e 1) ou quando vier o header
+`X-Profile: 1` junto com `X-Admin-Key` igual a `ADMIN_API_KEY` (sem a chave
+configurada o header é ignorado: o middleware roda antes da auth), grava
+`<dir>/<timestamp>-<rota>.prof` e devolve o nome do arquivo no header
+`X-Profile-File`. Só os `CHAT_PROFILE_MAX_FILES` (50) perfis mais recentes
+ficam no diretório. Abra com `python -m pstats` ou snakeviz.
+
+O cProfile mede a thread do event loop enquanto a requisição está aberta:
+outras requisições concorrentes entram no mesmo perfil, e apenas um perfil
+roda por vez (os pedidos seguintes passam sem profiling).
+"""
+
+import cProfile
+import hmac
+import os
+import random
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_HEADER = b"x-admin-key"
+
+
+def profiling_options_from_env() -> Dict[str, Any] | None:
+    """Parâmetros do `ProfilerMiddleware` ou `None` se desligado."""
+    out_dir = os.getenv("CHAT_PROFILE_DIR")
+    if not out_dir:
+        return None
+    return {
+        "out_dir": Path(out_dir),
+        "sample_rate": float(os.getenv("CHAT_PROFILE_SAMPLE", "0")),
+        "admin_key": os.getenv("ADMIN_API_KEY"),
+        "max_files": int(os.getenv("CHAT_PROFILE_MAX_FILES", "50")),
+    }
+
+
+class ProfilerMiddleware:
+    """Middleware ASGI puro (sem `BaseHTTPMiddleware`, que custa mais por request)."""
+
+    def __init__(
+        self,
+        app: Any,
+        out_dir: Path,
+        sample_rate: float = 0.0,
+        admin_key: str | None = None,
+        max_files: int = 50,
+    ) -> None:
+        self.app = app
+        self.out_dir = Path(out_dir)
+        self.sample_rate = sample_rate
+        self.admin_key = admin_key.encode() if admin_key else None
+        self.max_files = max_files
+        self._active = False
+
+    def _wanted(self, scope: Dict[str, Any]) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if self.admin_key is None:
+            return False
+        headers = dict(scope.get("headers", ()))
+        return headers.get(PROFILE_HEADER) == b"1" and hmac.compare_digest(
+            headers.get(ADMIN_HEADER, b""), self.admin_key
+        )
+
+    def _rotate(self) -> None:
+        """Apaga os perfis mais antigos além de `max_files`."""
+        if self.max_files <= 0:
+            return
+        # O prefixo é o timestamp em µs: ordem do nome = ordem de criação.
+        old = sorted(self.out_dir.glob("*.prof"))[: -self.max_files]
+        for path in old:
+            path.unlink(missing_ok=True)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or self._active or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        path = self.out_dir / f"{time.time_ns() // 1000}-{slug}.prof"
+
+        async def send_with_header(message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-file", path.name.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler = cProfile.Profile()
+        self._active = True
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            profiler.disable()
+            self._active = False
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(path)
+            self._rotate()
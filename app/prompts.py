@@ -0,0 +1,190 @@
+"""Montagem dos prompts com orçamento de tokens e prefixo estável.
+
+OpenAI, Gemini e o HF local montam o prompt aqui, sempre na mesma ordem:
+instruções fixas primeiro (prefixo idêntico entre requisições, que o cache
+de prompt do provedor reaproveita), depois a evidência e por último a
+pergunta. Só a evidência é cortada para caber no orçamento; a pergunta e as
+instruções chegam inteiras ao modelo.
+
+- `PROMPT_MAX_TOKENS` (1024): teto do prompt inteiro (o HF local usa o menor
+  entre ele e `HF_MAX_INPUT_TOKENS`);
+- `PROMPT_EVIDENCE_K` (1): trechos do retrieval usados como evidência, na
+  ordem do ranking, até esgotar o orçamento;
+- contagem de tokens com o tokenizer do modelo quando disponível localmente
+  (tiktoken para OpenAI, tokenizer HF já baixado) e aproximação por palavras
+  nos demais casos (Gemini, sem dependência instalada). Tokenizers e
+  contagens ficam em cache.
+"""
+
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+from .metrics import COMPLETION_SECONDS_PER_TOKEN, PROMPT_TOKENS, TOKENS
+
+logger = logging.getLogger("uvicorn.error")
+
+MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "1024"))
+EVIDENCE_K = int(os.getenv("PROMPT_EVIDENCE_K", "1"))
+# Trechos extras menores que isso depois de cortados não valem a vaga.
+MIN_SNIPPET_TOKENS = 24
+
+SYSTEM_PROMPT = (
+    "Você é um atendente de suporte de entregas. Responda em português, "
+    "em até 2 frases curtas, usando apenas a evidência fornecida. "
+    "Se faltar informação, peça dados adicionais."
+)
+# Modelos T5/FLAN pequenos seguem melhor uma instrução curta e literal.
+T5_INSTRUCTION = (
+    "Instrução: responda em português em 1 frase. Use apenas a evidência. "
+    "Se a evidência já responde, repita-a exatamente (sem mudar acentuação). "
+    "Se faltar informação, peça dados adicionais."
+)
+INSTRUCTIONS = {"chat": SYSTEM_PROMPT, "t5": T5_INSTRUCTION}
+
+_WORD = re.compile(r"\w+|[^\w\s]")
+_ELLIPSIS = "…"
+
+
+class Prompt(NamedTuple):
+    """Prompt montado: `system` é o prefixo estável, `user` a parte variável."""
+
+    system: str
+    user: str
+    tokens: int
+    truncated: bool
+
+    @property
+    def text(self) -> str:
+        """Prompt em texto único (Gemini e HF), com o prefixo na frente."""
+        return f"{self.system}\n\n{self.user}"
+
+
+def approx_tokens(text: str) -> int:
+    """Aproximação de BPE: uma peça por pontuação, ~1 token a cada 5 letras."""
+    return sum(1 + len(w) // 5 for w in _WORD.findall(text))
+
+
+@lru_cache(maxsize=16)
+def get_counter(model: str = "") -> Callable[[str], int]:
+    """Contador de tokens do modelo, carregado uma vez por processo."""
+    try:
+        import tiktoken
+
+        encoding = tiktoken.encoding_for_model(model)
+        return lambda text: len(encoding.encode(text))
+    except (ImportError, KeyError):
+        pass  # sem tiktoken ou modelo que ele não conhece (Gemini, HF)
+    except Exception as exc:
+        # O BPE é baixado no primeiro uso: offline/sandbox falha aqui.
+        logger.warning(
+            "tiktoken indisponível para %r, contando por palavras: %s", model, exc
+        )
+    if "/" in model:
+        # Id do Hub (ex.: google/flan-t5-small): só o que já está em disco.
+        try:
+            from transformers import AutoTokenizer
+
+            tokenizer = AutoTokenizer.from_pretrained(model, local_files_only=True)
+            return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+        except Exception:
+            pass
+    return approx_tokens
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str, model: str = "") -> int:
+    """Tokens de `text`; instruções e trechos do KB se repetem e saem do cache."""
+    return get_counter(model)(text)
+
+
+def truncate(text: str, max_tokens: int, model: str = "") -> str:
+    """Corta `text` no limite de palavra para caber em `max_tokens`."""
+    tokens = count_tokens(text, model)
+    if tokens <= max_tokens:
+        return text
+    counter = get_counter(model)
+    while tokens > max_tokens and text:
+        cut = int(len(text) * max_tokens / tokens * 0.95)
+        head = text[:cut]
+        text = head.rsplit(" ", 1)[0] if " " in head else head
+        tokens = counter(text + _ELLIPSIS)
+    return text + _ELLIPSIS if text else ""
+
+
+def _user(pergunta: str, evidencia: str) -> str:
+    return f"Evidência: {evidencia}\nPergunta: {pergunta}\nResposta:"
+
+
+def evidence_budget(pergunta: str, max_tokens: Optional[int] = None) -> int:
+    """Tokens que sobram para a evidência depois das instruções e da pergunta."""
+    limit = MAX_TOKENS if max_tokens is None else max_tokens
+    prefix = max(count_tokens(p) for p in INSTRUCTIONS.values())
+    return limit - prefix - count_tokens(_user(pergunta, ""))
+
+
+def select_evidence(
+    snippets: Sequence[str],
+    budget: int,
+    k: Optional[int] = None,
+    model: str = "",
+) -> str:
+    """Evidência com até `k` trechos (já ordenados pelo ranking) no orçamento.
+
+    Repetidos são descartados; o primeiro trecho sempre entra (cortado se
+    preciso) e os seguintes só se couberem com pelo menos
+    `MIN_SNIPPET_TOKENS`. Com um trecho, a evidência é o próprio texto.
+    """
+    k = EVIDENCE_K if k is None else k
+    chosen: List[str] = []
+    remaining = budget
+    for snippet in snippets:
+        if len(chosen) >= k:
+            break
+        if snippet in chosen:
+            continue
+        tokens = count_tokens(snippet, model)
+        if chosen and remaining < min(tokens, MIN_SNIPPET_TOKENS):
+            break
+        if tokens > remaining:
+            snippet = truncate(snippet, max(remaining, 1), model)
+            tokens = remaining
+        chosen.append(snippet)
+        remaining -= tokens + 2  # separador "[n] "
+    if len(chosen) <= 1:
+        return chosen[0] if chosen else ""
+    return "\n".join(f"[{i}] {s}" for i, s in enumerate(chosen, 1))
+
+
+def build_prompt(
+    pergunta: str,
+    evidencia: str,
+    style: str = "chat",
+    model: str = "",
+    max_tokens: Optional[int] = None,
+) -> Prompt:
+    """Instruções de `style` + evidência cortada ao orçamento + pergunta."""
+    limit = MAX_TOKENS if max_tokens is None else max_tokens
+    system = INSTRUCTIONS[style]
+    fixed = count_tokens(system, model) + count_tokens(_user(pergunta, ""), model)
+    cabe = truncate(evidencia, max(limit - fixed, 0), model)
+    user = _user(pergunta, cabe)
+    return Prompt(system, user, fixed + count_tokens(cabe, model), cabe != evidencia)
+
+
+def observe_prompt(provider: str, tokens: int, cached: int = 0) -> None:
+    """Tokens de entrada de uma requisição (e quantos vieram do cache de prefixo)."""
+    PROMPT_TOKENS.observe(tokens, provider)
+    TOKENS.inc(provider, "prompt", amount=tokens)
+    if cached:
+        TOKENS.inc(provider, "cached", amount=cached)
+
+
+def observe_completion(provider: str, model: str, text: str, seconds: float) -> None:
+    """Tokens gerados e a latência por token de saída."""
+    tokens = get_counter(model)(text)
+    TOKENS.inc(provider, "completion", amount=tokens)
+    if tokens:
+        COMPLETION_SECONDS_PER_TOKEN.observe(seconds / tokens, provider)
@@ -0,0 +1,211 @@
+"""Registro lazy dos provedores de geração (OpenAI -> Gemini -> HF).
+
+Importar o app não importa nenhum SDK (`openai`, `google.generativeai`,
+`transformers`): cada provedor habilitado por env é construído em paralelo,
+em threads, no warm-up disparado pelo lifespan ou na primeira requisição que
+precisar dele. O estado de cada um alimenta o readiness.
+
+Cada provedor construído ganha um `ProviderGuard` (circuit breaker + timeout
+adaptativo, ver `app.resilience`); o estado dos breakers também vai para o
+readiness e para o `/metrics`.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+from .generation import Provider
+from .resilience import ProviderGuard
+
+logger = logging.getLogger("uvicorn.error")
+
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+DISABLED = "disabled"
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    """Como habilitar (checagem barata de env) e construir um provedor."""
+
+    name: str
+    enabled: Callable[[], bool]
+    build: Callable[[], Optional[Provider]]
+
+
+def _build_openai() -> Optional[Provider]:
+    from .openai_client import (
+        agenerate_with_context,
+        astream_with_context,
+        get_async_openai_client,
+    )
+
+    client = get_async_openai_client()
+    if client is None:
+        return None
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    return Provider(
+        "openai",
+        model,
+        partial(agenerate_with_context, client, model),
+        partial(astream_with_context, client, model),
+    )
+
+
+def _build_gemini() -> Optional[Provider]:
+    from .gemini_client import (
+        agenerate_with_context,
+        astream_with_context,
+        get_gemini_model,
+    )
+
+    model = get_gemini_model()
+    if model is None:
+        return None
+    name = getattr(model, "model_name", "gemini")
+    return Provider(
+        "gemini",
+        name,
+        partial(agenerate_with_context, model),
+        partial(astream_with_context, model),
+    )
+
+
+def _build_hf() -> Optional[Provider]:
+    """Carrega o modelo HF; retorna None se faltar backend (torch) ou falhar.
+
+    Por padrão usa o motor com batching dinâmico (`app.hf_engine`), sem
+    streaming token a token; `HF_ENGINE=0` volta ao pipeline por requisição,
+    que mantém o streaming.
+    """
+    try:
+        import torch  # noqa: F401
+    except Exception:
+        logger.warning(
+            "HF_MODEL definido, mas backend (torch) não está instalado. "
+            "Instale torch ou remova HF_MODEL para evitar erro."
+        )
+        return None
+    model = os.getenv("HF_MODEL", "")
+    if os.getenv("HF_ENGINE", "1") != "0":
+        from .hf_engine import get_hf_engine
+
+        engine = get_hf_engine()
+        return Provider("hf", model, engine.generate, None, engine.generate_many)
+    from .llm_hf import (
+        agenerate_many,
+        agenerate_with_context,
+        astream_with_context,
+        get_hf_pipeline,
+    )
+
+    pipe = get_hf_pipeline()
+    return Provider(
+        "hf",
+        model,
+        partial(agenerate_with_context, pipe),
+        partial(astream_with_context, pipe),
+        partial(agenerate_many, pipe),
+    )
+
+
+DEFAULT_SPECS = (
+    ProviderSpec("openai", lambda: bool(os.getenv("OPENAI_API_KEY")), _build_openai),
+    ProviderSpec(
+        "gemini",
+        lambda: bool(os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")),
+        _build_gemini,
+    ),
+    ProviderSpec("hf", lambda: os.getenv("HF_MODEL") is not None, _build_hf),
+)
+
+
+class ProviderRegistry:
+    """Constrói os provedores uma única vez, em paralelo, fora do event loop.
+
+    O warm-up roda em threads e é exposto como `concurrent.futures.Future`, que
+    pode ser aguardado de qualquer event loop (`asyncio.wrap_future`).
+    """
+
+    def __init__(self, specs=DEFAULT_SPECS) -> None:
+        self._specs = list(specs)
+        self.status: Dict[str, str] = {
+            s.name: PENDING if s.enabled() else DISABLED for s in self._specs
+        }
+        self._providers: List[Provider] | None = None
+        self._warm: Future | None = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def static(cls, providers: List[Provider]) -> "ProviderRegistry":
+        """Registro já aquecido com provedores prontos (benchmarks e testes)."""
+        registry = cls(specs=())
+        registry._providers = list(providers)
+        registry.status = {p.name: READY for p in providers}
+        return registry
+
+    @property
+    def ready(self) -> bool:
+        return self._providers is not None
+
+    def configured(self, name: str) -> bool:
+        return self.status.get(name, DISABLED) != DISABLED
+
+    def available(self, name: str) -> bool:
+        return self.status.get(name) == READY
+
+    def guards(self) -> Dict[str, ProviderGuard]:
+        """Breaker/timeout dos provedores prontos que têm `guard`."""
+        return {p.name: p.guard for p in self._providers or () if p.guard is not None}
+
+    def start_warm_up(self) -> Future:
+        """Dispara (uma vez) a construção paralela dos provedores habilitados."""
+        with self._lock:
+            if self._warm is None:
+                self._warm = Future()
+                threading.Thread(
+                    target=self._warm_all, name="providers-warmup", daemon=True
+                ).start()
+            return self._warm
+
+    async def get(self) -> List[Provider]:
+        """Provedores prontos, na ordem de prioridade (aguarda o warm-up)."""
+        providers = self._providers
+        if providers is not None:
+            return providers
+        await asyncio.wrap_future(self.start_warm_up())
+        return self._providers or []
+
+    def _warm_all(self) -> None:
+        enabled = [s for s in self._specs if self.status[s.name] != DISABLED]
+        built: Dict[str, Provider] = {}
+        try:
+            if enabled:
+                with ThreadPoolExecutor(max_workers=len(enabled)) as pool:
+                    for spec, provider in zip(enabled, pool.map(self._build, enabled)):
+                        if provider is not None:
+                            built[spec.name] = provider
+            self._providers = [built[s.name] for s in self._specs if s.name in built]
+            self._warm.set_result(self._providers)
+        except BaseException as exc:  # pragma: no cover
+            self._providers = []
+            self._warm.set_exception(exc)
+
+    def _build(self, spec: ProviderSpec) -> Optional[Provider]:
+        self.status[spec.name] = WARMING
+        try:
+            provider = spec.build()
+            if provider is not None and provider.guard is None:
+                provider = replace(provider, guard=ProviderGuard.from_env(spec.name))
+        except Exception as exc:
+            logger.warning("Falha ao carregar provedor %s: %s", spec.name, exc)
+            provider = None
+        self.status[spec.name] = READY if provider is not None else FAILED
+        return provider
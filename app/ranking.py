@@ -0,0 +1,113 @@
+"""Ranqueamento vetorizado compartilhado pelos retrievers esparsos.
+
+Uma única multiplicação esparsa (consultas x docs) pontua o lote inteiro; o
+top-k de cada linha sai de `argpartition` sobre os scores não nulos, sem
+ordenar todos os documentos nem copiar dicts.
+
+Com `doc_ranges` (filtro por fonte), a pontuação percorre só o trecho de cada
+lista de postings que cai nos intervalos pedidos: os índices de cada linha
+da matriz termos x docs são ordenados, então o trecho sai de uma busca
+binária, e docs fora do filtro nunca são pontuados.
+"""
+
+from typing import Iterator, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+
+class Hit(NamedTuple):
+    """Resultado leve: posição do doc na lista do retriever e score cosseno."""
+
+    index: int
+    score: float
+
+
+def top_k_hits(
+    query_matrix,
+    doc_matrix_t,
+    top_k: int,
+    n_docs: int,
+    blank: Sequence[bool],
+    doc_ranges: Sequence[Tuple[int, int]] | None = None,
+) -> List[List[Hit]]:
+    """Top-k por consulta a partir de `query_matrix @ doc_matrix_t`.
+
+    Os vetores TF-IDF já são normalizados L2, então o produto interno é o
+    cosseno. Empates seguem a ordem dos docs (como o `sorted` estável antigo) e
+    linhas com menos de k scores positivos são completadas com docs de score 0
+    (só de dentro de `doc_ranges`, se houver filtro).
+    """
+    if doc_ranges is not None:
+        return _filtered_hits(query_matrix, doc_matrix_t, top_k, blank, doc_ranges)
+    scores = (query_matrix @ doc_matrix_t).tocsr()
+    k = min(top_k, n_docs)
+    out: List[List[Hit]] = []
+    for row in range(scores.shape[0]):
+        if blank[row]:
+            out.append([])
+            continue
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        hits = _select(scores.indices[start:end], scores.data[start:end], k)
+        out.append(_fill(hits, k, [(0, n_docs)]))
+    return out
+
+
+def _select(idx: np.ndarray, vals: np.ndarray, k: int) -> List[Hit]:
+    if len(vals) > k:
+        part = np.argpartition(-vals, k - 1)[:k]
+        idx, vals = idx[part], vals[part]
+    order = np.lexsort((idx, -vals))
+    return [Hit(int(i), float(v)) for i, v in zip(idx[order], vals[order])]
+
+
+def _candidates(doc_ranges: Sequence[Tuple[int, int]]) -> Iterator[int]:
+    for start, end in doc_ranges:
+        yield from range(start, end)
+
+
+def _fill(hits: List[Hit], k: int, doc_ranges: Sequence[Tuple[int, int]]):
+    if len(hits) < k:
+        taken = {h.index for h in hits}
+        for i in _candidates(doc_ranges):
+            if len(hits) >= k:
+                break
+            if i not in taken:
+                hits.append(Hit(i, 0.0))
+    return hits
+
+
+def _filtered_hits(
+    query_matrix,
+    doc_matrix_t,
+    top_k: int,
+    blank: Sequence[bool],
+    doc_ranges: Sequence[Tuple[int, int]],
+) -> List[List[Hit]]:
+    query_matrix = query_matrix.tocsr()
+    indptr, indices, data = doc_matrix_t.indptr, doc_matrix_t.indices, doc_matrix_t.data
+    bounds = np.asarray(doc_ranges, dtype=np.int64).reshape(-1)
+    k = min(top_k, sum(end - start for start, end in doc_ranges))
+    out: List[List[Hit]] = []
+    for row in range(query_matrix.shape[0]):
+        if blank[row] or k <= 0:
+            out.append([])
+            continue
+        start, end = query_matrix.indptr[row], query_matrix.indptr[row + 1]
+        idx_parts, val_parts = [], []
+        for term, weight in zip(
+            query_matrix.indices[start:end], query_matrix.data[start:end]
+        ):
+            lo, hi = int(indptr[term]), int(indptr[term + 1])
+            postings = indices[lo:hi]
+            cuts = np.searchsorted(postings, bounds)
+            for a, b in zip(cuts[0::2], cuts[1::2]):
+                if a < b:
+                    idx_parts.append(postings[a:b])
+                    val_parts.append(data[lo + a : lo + b] * weight)
+        if not idx_parts:
+            out.append(_fill([], k, doc_ranges))
+            continue
+        docs, inverse = np.unique(np.concatenate(idx_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(val_parts))
+        out.append(_fill(_select(docs, scores, k), k, doc_ranges))
+    return out
@@ -0,0 +1,170 @@
+"""Limites por cliente da API: token bucket de requisições e chats simultâneos.
+
+Os dois checks rodam nas dependências de auth, antes de roteamento,
+retrieval ou geração: um cliente acima do limite recebe o 429 em
+microssegundos, com `Retry-After` em segundos, sem ocupar a cadeia de
+provedores dos outros.
+
+- Taxa (`rate` req/s, rajada `burst`): token bucket por cliente, vale para
+  todas as rotas autenticadas. `Retry-After` = tempo até o próximo token.
+- Concorrência (`concurrency`): chats em andamento por cliente (`/chat`,
+  `/chat/stream`, `/chat:batch`); o `Lease` devolvido por `acquire` é
+  liberado no fim da resposta, inclusive do fluxo.
+
+Limite 0 desliga o check. O estado é do processo (um worker = limites
+próprios) e só é tocado no event loop, sem locks.
+
+`FailureLimiter` faz o mesmo para chaves inválidas, por endereço de origem:
+quem esgota o bucket de falhas recebe 429 antes de a chave ser hasheada.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict
+
+from .metrics import API_IN_FLIGHT
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .auth import ApiClient
+
+
+class RateLimited(Exception):
+    """Cliente acima do limite; `retry_after` em segundos."""
+
+    def __init__(self, reason: str, retry_after: float) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def header(self) -> str:
+        """Valor do `Retry-After` (segundos inteiros, no mínimo 1)."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """`burst` tokens no máximo, repostos a `rate` por segundo."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def wait(self, now: float) -> float:
+        """0 se há um token, senão os segundos até haver (sem consumir)."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> float:
+        """Consome um token; devolve 0 ou os segundos até haver um."""
+        wait = self.wait(now)
+        if not wait:
+            self.tokens -= 1
+        return wait
+
+
+class Lease:
+    """Vaga de chat de um cliente; `release` é idempotente."""
+
+    __slots__ = ("_limiter", "client_id", "released", "detached")
+
+    def __init__(self, limiter: "ClientLimiter", client_id: str) -> None:
+        self._limiter = limiter
+        self.client_id = client_id
+        self.released = False
+        self.detached = False
+
+    def detach(self) -> None:
+        """A resposta (em fluxo) passa a ser dona da vaga e a libera no fim."""
+        self.detached = True
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self._limiter._release(self.client_id)
+
+
+class ClientLimiter:
+    """Token buckets e contadores de chats em andamento, por cliente."""
+
+    def __init__(
+        self,
+        concurrency_retry: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.concurrency_retry = concurrency_retry
+        self._clock = clock
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    def check_rate(self, client: "ApiClient") -> None:
+        if client.rate <= 0:
+            return
+        now = self._clock()
+        bucket = self._buckets.get(client.id)
+        if bucket is None:
+            burst = client.burst or max(1.0, client.rate)
+            bucket = self._buckets[client.id] = TokenBucket(client.rate, burst, now)
+        wait = bucket.take(now)
+        if wait:
+            raise RateLimited("rate_limited", wait)
+
+    def acquire(self, client: "ApiClient") -> Lease:
+        current = self._in_flight.get(client.id, 0)
+        if 0 < client.concurrency <= current:
+            raise RateLimited("concurrency_limited", self.concurrency_retry)
+        self._in_flight[client.id] = current + 1
+        API_IN_FLIGHT.set(current + 1, client.id)
+        return Lease(self, client.id)
+
+    def in_flight(self, client_id: str) -> int:
+        return self._in_flight.get(client_id, 0)
+
+    def _release(self, client_id: str) -> None:
+        current = self._in_flight.get(client_id, 0) - 1
+        self._in_flight[client_id] = max(current, 0)
+        API_IN_FLIGHT.set(max(current, 0), client_id)
+
+
+class FailureLimiter:
+    """Bucket de falhas de auth por endereço, com teto de endereços (LRU)."""
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: float = 10.0,
+        max_addresses: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_addresses = max_addresses
+        self._clock = clock
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def check(self, address: str) -> None:
+        """Levanta `RateLimited` se o endereço esgotou as falhas permitidas."""
+        bucket = self._buckets.get(address)
+        if bucket is None:
+            return
+        wait = bucket.wait(self._clock())
+        if wait:
+            raise RateLimited("auth_throttled", wait)
+
+    def fail(self, address: str) -> None:
+        if self.rate <= 0:
+            return
+        now = self._clock()
+        bucket = self._buckets.get(address)
+        if bucket is None:
+            bucket = self._buckets[address] = TokenBucket(self.rate, self.burst, now)
+            while len(self._buckets) > self.max_addresses:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(address)
+        bucket.take(now)
@@ -0,0 +1,250 @@
+"""Hot-reload dos dados (KB/índice, pedidos, usuários, políticas) sem reiniciar.
+
+Tudo o que as rotas leem fica numa `DataGeneration` imutável. O `Reloader`
+monta a próxima geração fora do event loop e troca `current` numa única
+atribuição; cada requisição lê `reloader.current` uma vez e usa essa geração
+até o fim, então requisições em andamento seguem na geração antiga e o
+caminho de leitura não usa lock. Recargas são disparadas por polling do mtime
+dos arquivos (`RELOAD_POLL_SECONDS`) ou pela rota administrativa.
+
+A geração inicial é carregada sob demanda (warm-up do lifespan ou primeiro
+acesso a `current`), para que importar o app não ajuste o TF-IDF nem importe
+o sklearn.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple
+
+from .index_store import watch_file
+from .jsonstream import iter_records
+from .orders import load_orders
+from .policies import load_policies, topic_index
+from .sources import build_documents
+from .users import load_users
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .dense_retriever import DenseRetriever
+    from .hybrid import HybridRetriever
+    from .retriever import KnowledgeBaseRetriever
+    from .vector_retriever import VectorRetriever
+
+logger = logging.getLogger("uvicorn.error")
+
+
+@dataclass(frozen=True)
+class DataGeneration:
+    """Snapshot imutável dos dados servidos pela API."""
+
+    number: int
+    # TF-IDF em memória: só existe quando não há índice em disco (fallback).
+    retriever: "KnowledgeBaseRetriever | None"
+    vector_retriever: "VectorRetriever | None"
+    orders: Dict[str, Any]
+    users: Dict[str, Any]
+    policies: Dict[str, Any]
+    dense_retriever: "DenseRetriever | None" = None
+    hybrid_retriever: "HybridRetriever | None" = None
+    # Termo normalizado -> chave da política (`policies.topic_index`).
+    policy_topics: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def active_retriever(self) -> Any:
+        """Prefere o híbrido e o denso (se habilitados), depois o TF-IDF em disco.
+
+        Sem índice em disco, o TF-IDF em memória.
+        """
+        return (
+            self.hybrid_retriever
+            or self.dense_retriever
+            or self.vector_retriever
+            or self.retriever
+        )
+
+
+def resolve_index_path(data_dir: Path) -> Path:
+    """Diretório mapeado (`kb_index/`) ou, na falta dele, o joblib legado."""
+    index_dir = data_dir / "cache" / "kb_index"
+    return index_dir if index_dir.is_dir() else data_dir / "cache" / "kb_index.joblib"
+
+
+def retriever_backend() -> str:
+    """`RETRIEVER_BACKEND`: `tfidf` (padrão), `dense` ou `hybrid`.
+
+    `dense` usa `data/cache/kb_dense/` quando existir; `hybrid` funde BM25 com
+    o denso (ou, sem ele, com o TF-IDF). O BM25 mapeia as postings de
+    `data/cache/kb_bm25/` quando existirem; senão é montado em memória a
+    partir dos docs do backend semântico.
+    """
+    return os.getenv("RETRIEVER_BACKEND", "tfidf")
+
+
+def load_generation(
+    number: int, data_dir: Path, tables: Dict[str, Dict[str, Any]] | None = None
+) -> DataGeneration:
+    """Carrega uma geração completa; `tables` reaproveita mapas já carregados.
+
+    Com índice em disco (TF-IDF mapeado, denso e postings BM25, montados pelo
+    `app.ingest` já com usuários e pedidos) a geração só abre os arquivos: páginas
+    compartilhadas entre workers, sem ajuste de TF-IDF nem docs montados por
+    worker. Sem nenhum índice, o retriever em memória indexa os docs
+    unificados (`app.sources`) a partir das tabelas das consultas exatas.
+    """
+    from .retriever import KnowledgeBaseRetriever
+    from .vector_retriever import VectorRetriever
+
+    source = data_dir / "source"
+    index_path = resolve_index_path(data_dir)
+    dense_path = data_dir / "cache" / "kb_dense"
+    backend = retriever_backend()
+    dense = None
+    if backend in ("dense", "hybrid") and watch_file(dense_path).exists():
+        from .dense_retriever import DenseRetriever
+
+        dense = DenseRetriever(dense_path, top_k=3)
+    tables = tables or {}
+    orders = tables.get("orders") or load_orders(source / "orders.json")
+    users = tables.get("users") or load_users(source / "users.json")
+    policies = tables.get("policies") or load_policies(source / "policies.json")
+    vector = VectorRetriever(index_path, top_k=3) if index_path.exists() else None
+    retriever = None
+    if vector is None and dense is None:
+        kb = list(iter_records(source / "kb.json"))
+        docs = build_documents(kb, policies, users, orders)
+        retriever = KnowledgeBaseRetriever(source / "kb.json", docs=docs)
+    hybrid = None
+    if backend == "hybrid":
+        from .bm25 import BM25Retriever, MappedBM25Retriever
+        from .hybrid import HybridRetriever
+
+        semantic = ("dense", dense) if dense else ("tfidf", vector or retriever)
+        bm25_path = data_dir / "cache" / "kb_bm25"
+        if watch_file(bm25_path).exists():
+            bm25 = MappedBM25Retriever(bm25_path, top_k=3)
+        else:
+            bm25 = BM25Retriever(semantic[1].docs)
+        hybrid = HybridRetriever.from_env({"bm25": bm25, semantic[0]: semantic[1]})
+    return DataGeneration(
+        number=number,
+        retriever=retriever,
+        vector_retriever=vector,
+        orders=orders,
+        users=users,
+        policies=policies,
+        dense_retriever=dense,
+        hybrid_retriever=hybrid,
+        policy_topics=topic_index(policies),
+    )
+
+
+class Reloader:
+    """Mantém a geração atual e publica novas gerações atomicamente."""
+
+    def __init__(
+        self,
+        data_dir: Path,
+        initial: DataGeneration | None = None,
+        poll_interval: float = 0.0,
+        initial_tables: Dict[str, Dict[str, Any]] | None = None,
+    ) -> None:
+        self.data_dir = data_dir
+        self._current = initial
+        self._initial_tables = initial_tables
+        self._init_lock = threading.Lock()
+        self.poll_interval = poll_interval
+        self._listeners: List[Callable[[DataGeneration], None]] = []
+        self._lock = asyncio.Lock()
+        self._fingerprint = self._scan()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def current(self) -> DataGeneration:
+        """Geração atual; sem lock exceto na primeira carga."""
+        gen = self._current
+        if gen is None:
+            with self._init_lock:
+                if self._current is None:
+                    self._current = load_generation(
+                        1, self.data_dir, self._initial_tables
+                    )
+                gen = self._current
+        return gen
+
+    @property
+    def loaded(self) -> bool:
+        return self._current is not None
+
+    async def warm_up(self) -> DataGeneration:
+        """Carrega a geração inicial fora do event loop."""
+        return await asyncio.to_thread(lambda: self.current)
+
+    @staticmethod
+    def poll_interval_from_env() -> float:
+        """`RELOAD_POLL_SECONDS` (default 2); 0 desliga o watcher."""
+        return float(os.getenv("RELOAD_POLL_SECONDS", "2"))
+
+    def on_swap(self, listener: Callable[[DataGeneration], None]) -> None:
+        """Registra callback chamado após cada troca de geração."""
+        self._listeners.append(listener)
+
+    def watched_files(self) -> List[Path]:
+        cache = self.data_dir / "cache"
+        return [
+            *sorted((self.data_dir / "source").glob("*.json")),
+            watch_file(cache / "kb_index"),
+            watch_file(cache / "kb_dense"),
+            watch_file(cache / "kb_bm25"),
+            cache / "kb_index.joblib",
+        ]
+
+    def _scan(self) -> Tuple[Tuple[str, int], ...]:
+        fingerprint = []
+        for path in self.watched_files():
+            try:
+                fingerprint.append((str(path), path.stat().st_mtime_ns))
+            except OSError:
+                continue
+        return tuple(fingerprint)
+
+    async def reload(self, reason: str = "manual") -> DataGeneration:
+        """Monta a próxima geração em thread e a publica; recargas são serializadas."""
+        async with self._lock:
+            fingerprint = self._scan()
+            number = self._current.number + 1 if self._current else 1
+            new = await asyncio.to_thread(load_generation, number, self.data_dir)
+            self._current = new
+            self._fingerprint = fingerprint
+            for listener in self._listeners:
+                listener(new)
+            logger.info("Reload (%s): geração %s publicada", reason, new.number)
+            return new
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            fingerprint = self._scan()
+            if fingerprint == self._fingerprint:
+                continue
+            try:
+                await self.reload("watch")
+            except Exception as exc:
+                # Mantém a geração atual; tenta de novo na próxima mudança.
+                self._fingerprint = fingerprint
+                logger.warning("Falha no reload, mantendo geração atual: %s", exc)
+
+    def start(self) -> None:
+        if self.poll_interval > 0 and self._task is None:
+            self._task = asyncio.ensure_future(self.watch())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
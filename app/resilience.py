@@ -0,0 +1,175 @@
+"""Circuit breaker e timeout adaptativo por provedor de geração.
+
+Sem isso, um provedor degradado faz cada requisição esperar o timeout inteiro
+do SDK antes de cair para o próximo da cadeia. Cada provedor construído pelo
+registro ganha um `ProviderGuard`:
+
+- breaker: `BREAKER_FAILURES` (5) falhas seguidas abrem o circuito e o
+  provedor é pulado na hora; após `BREAKER_RESET_S` (30) ele fica meio aberto
+  e deixa passar `BREAKER_HALF_OPEN_CALLS` (1) chamada de prova: sucesso
+  fecha, falha reabre;
+- timeout adaptativo: percentil `PROVIDER_TIMEOUT_PCT` (99) das latências
+  recentes com sucesso, vezes `PROVIDER_TIMEOUT_FACTOR` (2), limitado a
+  [`PROVIDER_TIMEOUT_MIN_MS`, `PROVIDER_TIMEOUT_MAX_MS`] (1 s a 30 s). Até
+  juntar amostras vale o máximo.
+
+Timeouts contam como falha no breaker; chamadas canceladas (perdedoras do
+hedge, cliente que desconectou) não contam nem como sucesso nem como falha.
+"""
+
+import os
+import time
+from collections import deque
+from typing import Callable, Deque
+
+from .metrics import BREAKER_TRANSITIONS
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+# Valor do gauge `chat_provider_breaker_state`.
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(RuntimeError):
+    """Provedor pulado: circuito aberto (ou prova do meio aberto já em curso)."""
+
+
+class ProviderTimeout(TimeoutError):
+    """Chamada passou do timeout adaptativo do provedor."""
+
+
+class CircuitBreaker:
+    """Breaker de falhas consecutivas com estado meio aberto para prova."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self._clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probes = 0
+
+    def allow(self) -> bool:
+        """Se a chamada pode seguir (no meio aberto, conta como prova)."""
+        if self.state == OPEN:
+            if self._clock() - self.opened_at < self.reset_timeout:
+                return False
+            self._set(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                return False
+            self._probes += 1
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        if self.state != CLOSED:
+            self._set(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = self._clock()
+            self._set(OPEN)
+
+    def release(self) -> None:
+        """Chamada cancelada: devolve a vaga de prova sem decidir o estado."""
+        if self.state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def _set(self, state: str) -> None:
+        self.state = state
+        self._probes = 0
+        BREAKER_TRANSITIONS.inc(self.name, state)
+
+
+class AdaptiveTimeout:
+    """Timeout = percentil das latências recentes x fator, entre mínimo e máximo."""
+
+    def __init__(
+        self,
+        percentile: float = 99.0,
+        factor: float = 2.0,
+        minimum: float = 1.0,
+        maximum: float = 30.0,
+        window: int = 200,
+        min_samples: int = 20,
+    ) -> None:
+        self.percentile = percentile
+        self.factor = factor
+        self.minimum = minimum
+        self.maximum = maximum
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._since_update = 0
+        self.current = maximum
+
+    def observe(self, seconds: float) -> None:
+        """Registra uma latência com sucesso; recalcula a cada 10 amostras."""
+        self._samples.append(seconds)
+        self._since_update += 1
+        if len(self._samples) < self.min_samples or self._since_update < 10:
+            return
+        self._since_update = 0
+        ordered = sorted(self._samples)
+        rank = min(len(ordered) - 1, int(self.percentile / 100 * len(ordered)))
+        self.current = min(self.maximum, max(self.minimum, ordered[rank] * self.factor))
+
+
+class ProviderGuard:
+    """Breaker + timeout adaptativo de um provedor."""
+
+    def __init__(self, breaker: CircuitBreaker, timeout: AdaptiveTimeout) -> None:
+        self.breaker = breaker
+        self.adaptive = timeout
+
+    @classmethod
+    def from_env(cls, name: str) -> "ProviderGuard":
+        breaker = CircuitBreaker(
+            name,
+            failure_threshold=int(os.getenv("BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("BREAKER_RESET_S", "30")),
+            half_open_calls=int(os.getenv("BREAKER_HALF_OPEN_CALLS", "1")),
+        )
+        timeout = AdaptiveTimeout(
+            percentile=float(os.getenv("PROVIDER_TIMEOUT_PCT", "99")),
+            factor=float(os.getenv("PROVIDER_TIMEOUT_FACTOR", "2")),
+            minimum=float(os.getenv("PROVIDER_TIMEOUT_MIN_MS", "1000")) / 1000,
+            maximum=float(os.getenv("PROVIDER_TIMEOUT_MAX_MS", "30000")) / 1000,
+        )
+        return cls(breaker, timeout)
+
+    @property
+    def state(self) -> str:
+        return self.breaker.state
+
+    @property
+    def timeout(self) -> float:
+        return self.adaptive.current
+
+    def acquire(self) -> None:
+        """Levanta `CircuitOpen` se o provedor deve ser pulado."""
+        if not self.breaker.allow():
+            raise CircuitOpen(f"circuito de {self.breaker.name} aberto")
+
+    def record(self, outcome: str, seconds: float, sample: bool = True) -> None:
+        """Resultado de uma chamada liberada por `acquire` (ok, error, timeout...)."""
+        if outcome == "ok":
+            if sample:
+                self.adaptive.observe(seconds)
+            self.breaker.record_success()
+        elif outcome == "cancelled":
+            self.breaker.release()
+        else:
+            self.breaker.record_failure()
@@ -0,0 +1,283 @@
+"""Cache de respostas geradas, na frente da cadeia de geração.
+
+- Nível 1 (exato): chave (provedor, modelo, id do doc do KB, consulta normalizada).
+- Nível 2 (quase duplicata): no mesmo (provedor, modelo, doc), compara o vetor
+  da consulta (o mesmo que o retriever já calculou: TF-IDF esparso ou
+  embedding denso) por cosseno.
+- Eviction LRU + TTL, teto de memória aproximado em bytes e contadores.
+- Invalidação quando o arquivo vigiado (ex.: `kb_index.joblib`) muda de mtime.
+"""
+
+import os
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .text import tokenize
+
+Key = Tuple[str, str, str, str]
+Bucket = Tuple[str, str, str]
+
+# Quantas entradas recentes do mesmo bucket são comparadas no nível 2.
+_NEAR_SCAN_LIMIT = 64
+
+
+def normalize_query(text: str) -> str:
+    """Minúsculas, sem acentos/pontuação e com espaços colapsados."""
+    return " ".join(tokenize(text))
+
+
+def sparse_to_dict(query_vec: Any) -> Dict[int, float] | None:
+    """Converte a linha CSR 1xV do TF-IDF em {índice: peso}."""
+    if query_vec is None or query_vec.nnz == 0:
+        return None
+    return dict(zip(query_vec.indices.tolist(), query_vec.data.tolist()))
+
+
+def query_signature(query_vec: Any) -> Any:
+    """Vetor guardado no cache: dict esparso (TF-IDF) ou array denso 1-D."""
+    # Retrieval híbrido: usa o vetor normalizado do backend semântico.
+    query_vec = getattr(query_vec, "cache_vector", query_vec)
+    if isinstance(query_vec, np.ndarray):
+        return query_vec.reshape(-1) if query_vec.any() else None
+    return sparse_to_dict(query_vec)
+
+
+def _cosine(a: Any, b: Any) -> float:
+    """Produto interno de vetores já normalizados L2 (mesmo backend)."""
+    if isinstance(a, dict):
+        if not isinstance(b, dict):
+            return 0.0
+        return sum(w * b.get(i, 0.0) for i, w in a.items())
+    if not isinstance(b, np.ndarray) or b.shape != a.shape:
+        return 0.0
+    return float(a @ b)
+
+
+class _Entry:
+    __slots__ = ("answer", "vec", "expires", "size")
+
+    def __init__(self, answer: str, vec, expires: float, size: int) -> None:
+        self.answer = answer
+        self.vec = vec
+        self.expires = expires
+        self.size = size
+
+
+class ResponseCache:
+    """Cache LRU+TTL de respostas com busca de quase duplicatas por cosseno."""
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl: float = 600.0,
+        similarity: float = 0.9,
+        watch_path: str | Path | None = None,
+        check_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity = similarity
+        self.watch_path = Path(watch_path) if watch_path else None
+        self.check_interval = check_interval
+        self._clock = clock
+        self._entries: "OrderedDict[Key, _Entry]" = OrderedDict()
+        self._buckets: Dict[Bucket, "OrderedDict[Key, None]"] = {}
+        self._bytes = 0
+        self._watch_mtime = self._stat_watch()
+        self._next_check = clock() + check_interval
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls, watch_path: str | Path | None = None) -> "ResponseCache | None":
+        """Configura via env; `CHAT_CACHE=0` desliga o cache."""
+        if os.getenv("CHAT_CACHE", "1") == "0":
+            return None
+        return cls(
+            max_bytes=int(os.getenv("CHAT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+            ttl=float(os.getenv("CHAT_CACHE_TTL", "600")),
+            similarity=float(os.getenv("CHAT_CACHE_SIM", "0.9")),
+            watch_path=watch_path,
+        )
+
+    def get(
+        self,
+        provider: str,
+        model: str,
+        doc_id: str,
+        query: str,
+        query_vec: Any = None,
+    ) -> Optional[str]:
+        """Busca exata e, se falhar, quase duplicata no mesmo bucket."""
+        self._maybe_invalidate()
+        return self._count(self._find(provider, model, doc_id, query, query_vec))
+
+    def _find(
+        self, provider: str, model: str, doc_id: str, query: str, query_vec: Any
+    ) -> Tuple[Optional[str], bool]:
+        """(resposta ou None, se veio de quase duplicata), sem mexer nos contadores."""
+        now = self._clock()
+        key = (provider, model, doc_id, normalize_query(query))
+        entry = self._live(key, now)
+        if entry is not None:
+            return entry.answer, False
+        vec = query_signature(query_vec)
+        if vec is not None:
+            found = self._nearest(key[:3], vec, now)
+            if found is not None:
+                return found.answer, True
+        return None, False
+
+    def _count(self, found: Tuple[Optional[str], bool]) -> Optional[str]:
+        answer, near = found
+        if answer is None:
+            self.misses += 1
+        elif near:
+            self.near_hits += 1
+        else:
+            self.hits += 1
+        return answer
+
+    def put(
+        self,
+        provider: str,
+        model: str,
+        doc_id: str,
+        query: str,
+        answer: str,
+        query_vec: Any = None,
+    ) -> None:
+        key = (provider, model, doc_id, normalize_query(query))
+        vec = query_signature(query_vec)
+        if vec is None:
+            vec_size = 0
+        elif isinstance(vec, dict):
+            vec_size = len(vec) * 48
+        else:
+            vec_size = vec.nbytes + 112
+        size = (
+            sys.getsizeof(answer)
+            + sum(sys.getsizeof(part) for part in key)
+            + vec_size
+            + 128
+        )
+        if size > self.max_bytes:
+            return
+        self._discard(key)
+        self._entries[key] = _Entry(answer, vec, self._clock() + self.ttl, size)
+        self._buckets.setdefault(key[:3], OrderedDict())[key] = None
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def lookup(
+        self, providers: List[Any], doc_id: str, query: str, query_vec: Any = None
+    ) -> Optional[Tuple[str, Any]]:
+        """Procura resposta de qualquer provedor da cadeia, na ordem de prioridade.
+
+        Conta um hit ou um miss por busca, não um por provedor sondado.
+        """
+        self._maybe_invalidate()
+        for provider in providers:
+            found = self._find(provider.name, provider.model, doc_id, query, query_vec)
+            if found[0] is not None:
+                return self._count(found), provider
+        self._count((None, False))
+        return None
+
+    def invalidate(self) -> None:
+        """Descarta tudo (ex.: índice do KB reconstruído)."""
+        self._entries.clear()
+        self._buckets.clear()
+        self._bytes = 0
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+    def _live(self, key: Key, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= now:
+            self._discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _nearest(self, bucket: Bucket, vec: Any, now: float) -> Optional[_Entry]:
+        keys = self._buckets.get(bucket)
+        if not keys:
+            return None
+        best_key, best_score = None, self.similarity
+        expired: List[Key] = []
+        for scanned, key in enumerate(reversed(keys)):
+            if scanned >= _NEAR_SCAN_LIMIT:
+                break
+            entry = self._entries[key]
+            if entry.expires <= now:
+                # Vencidas saem do cache e não tiram a vez da próxima melhor.
+                expired.append(key)
+                continue
+            if entry.vec is None:
+                continue
+            score = _cosine(vec, entry.vec)
+            if score >= best_score:
+                best_key, best_score = key, score
+        for key in expired:
+            self._discard(key)
+        if best_key is None:
+            return None
+        self._entries.move_to_end(best_key)
+        return self._entries[best_key]
+
+    def _discard(self, key: Key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        bucket = self._buckets.get(key[:3])
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._buckets[key[:3]]
+
+    def _stat_watch(self) -> int | None:
+        if self.watch_path is None:
+            return None
+        try:
+            return self.watch_path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _maybe_invalidate(self) -> None:
+        """Confere o mtime do arquivo vigiado no máximo a cada `check_interval`."""
+        if self.watch_path is None:
+            return
+        now = self._clock()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        mtime = self._stat_watch()
+        if mtime != self._watch_mtime:
+            self._watch_mtime = mtime
+            self.invalidate()
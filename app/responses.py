@@ -0,0 +1,43 @@
+"""Resposta JSON sem revalidação para as rotas quentes (`/chat`, `/pedido`).
+
+Com `response_model`, o FastAPI revalida o que a rota devolve (dump do
+modelo, validação contra o `response_model`, serialização) e codifica com o
+`json` da stdlib. Nas rotas quentes o conteúdo é montado pelo próprio app: o
+`ChatResponse` já foi validado ao ser criado e o pedido sai da tabela com
+schema. `FastJSONResponse` serializa direto:
+
+- modelos Pydantic pelo serializador em Rust do próprio modelo;
+- dicts/listas com `orjson` (extra opcional), senão `pydantic_core.to_json`.
+
+As rotas mantêm o `response_model` no decorator, só para o OpenAPI.
+"""
+
+from typing import Any
+
+import pydantic_core
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - extra opcional
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """JSON compacto em UTF-8 (sem escapar acentos), como o `JSONResponse`."""
+    if isinstance(content, BaseModel):
+        return content.__pydantic_serializer__.to_json(content)
+    if orjson is not None:
+        try:
+            return orjson.dumps(content)
+        except TypeError:
+            pass  # chave não-string, tipo que o orjson não conhece...
+    return pydantic_core.to_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """`JSONResponse` que aceita modelos Pydantic e serializa via `dumps`."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,99 @@
+"""Interface comum dos backends de retrieval (TF-IDF em memória, TF-IDF em
+disco, embeddings densos, BM25 e híbrido).
+
+O app só depende de `RetrieverBackend`: vetoriza a consulta uma vez (o vetor
+também alimenta o cache de respostas) e ranqueia lotes com `retrieve_many`,
+que devolve `Hit(index, score)` apontando para `docs`. `sources` restringe o
+ranqueamento às fontes pedidas (ver `app.sources`) dentro do próprio índice.
+`RetrieverBase` é a base abstrata dos backends: cada um implementa esses dois
+métodos e herda o resto.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Protocol, Sequence, Tuple, runtime_checkable
+
+import numpy as np
+
+from .index_store import doc_ids
+from .ranking import Hit
+from .sources import Ranges, ranges_for, source_ranges
+
+
+@runtime_checkable
+class RetrieverBackend(Protocol):
+    top_k: int
+
+    @property
+    def docs(self) -> Sequence[Dict[str, Any]]: ...
+
+    def vectorize(self, query: str) -> Any: ...
+
+    def doc_id_array(self) -> np.ndarray: ...
+
+    def vectorize_many(self, queries: Sequence[str]) -> Any: ...
+
+    def retrieve_many(
+        self,
+        queries: Sequence[str],
+        top_k: int | None = None,
+        query_matrix=None,
+        sources: Sequence[str] | None = None,
+    ) -> List[List[Hit]]: ...
+
+    def retrieve(
+        self, query: str, query_vec=None, sources: Sequence[str] | None = None
+    ) -> List[Dict[str, Any]]: ...
+
+
+class RetrieverBase(ABC):
+    """Implementação padrão de `vectorize`/`retrieve` sobre os métodos em lote."""
+
+    top_k: int = 3
+    # Intervalos por fonte; backends em disco os leem do `meta.json`.
+    _source_ranges: Dict[str, Ranges] | None = None
+    # Id de cada doc; backends em disco mapeiam o `doc_ids.npy`.
+    _doc_ids: np.ndarray | None = None
+
+    @property
+    def source_ranges(self) -> Dict[str, Ranges]:
+        if self._source_ranges is None:
+            self._source_ranges = source_ranges(self.docs)
+        return self._source_ranges
+
+    def doc_id_array(self) -> np.ndarray:
+        """Ids dos docs em bytes, na ordem de `docs` (alinha backends no híbrido)."""
+        if self._doc_ids is None:
+            ids = [i.encode("utf-8") for i in doc_ids(list(self.docs))]
+            self._doc_ids = np.array(ids, dtype=bytes)
+        return self._doc_ids
+
+    def doc_ranges(self, sources: Sequence[str] | None) -> List[Tuple[int, int]] | None:
+        """Intervalos de docs das `sources` (None = sem filtro)."""
+        if sources is None:
+            return None
+        return ranges_for(sources, self.source_ranges)
+
+    def vectorize(self, query: str):
+        """Vetor da consulta (linha 1 x d, no formato do backend)."""
+        return self.vectorize_many([query])
+
+    @abstractmethod
+    def vectorize_many(self, queries: Sequence[str]):
+        """Matriz das consultas (uma linha por consulta)."""
+
+    @abstractmethod
+    def retrieve_many(
+        self,
+        queries: Sequence[str],
+        top_k: int | None = None,
+        query_matrix=None,
+        sources: Sequence[str] | None = None,
+    ) -> List[List[Hit]]:
+        """Top-k `Hit`s por consulta, restritos às `sources` pedidas."""
+
+    def retrieve(
+        self, query: str, query_vec=None, sources: Sequence[str] | None = None
+    ) -> List[Dict[str, Any]]:
+        """Retorna top-k entradas do KB com o score de similaridade."""
+        hits = self.retrieve_many([query], query_matrix=query_vec, sources=sources)[0]
+        return [{**self.docs[h.index], "score": h.score} for h in hits]
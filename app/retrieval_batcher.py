@@ -0,0 +1,94 @@
+"""Micro-batching de retrieval para requisições /chat concorrentes.
+
+Cada `submit` entra numa fila; o primeiro da janela espera até `max_wait`
+segundos (ou `max_batch` itens) e então o lote inteiro é vetorizado e
+ranqueado numa única chamada `retrieve_many`, executada fora do event loop.
+O retriever vem em cada `submit` (a geração de dados da requisição), e o lote
+é agrupado por retriever e filtro de fontes (`sources`): consultas nunca são
+ranqueadas contra outra geração nem com o filtro de outra intenção.
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, List, Sequence, Tuple
+
+from .ranking import Hit
+
+
+class RetrievalBatcher:
+    """Agrupa consultas concorrentes numa só chamada ao retriever."""
+
+    def __init__(self, max_wait: float = 0.002, max_batch: int = 64):
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self._queue: List[Tuple[Any, str, asyncio.Future, Any]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self.batches = 0
+        self.queries = 0
+
+    @classmethod
+    def from_env(cls) -> "RetrievalBatcher | None":
+        """`RETRIEVAL_BATCH_MS` > 0 liga o micro-batching (desligado por padrão)."""
+        wait_ms = float(os.getenv("RETRIEVAL_BATCH_MS", "0"))
+        if wait_ms <= 0:
+            return None
+        max_batch = int(os.getenv("RETRIEVAL_BATCH_SIZE", "64"))
+        return cls(max_wait=wait_ms / 1000, max_batch=max_batch)
+
+    async def submit(
+        self, retriever: Any, query: str, sources: Sequence[str] | None = None
+    ) -> Tuple[List[Hit], Any]:
+        """Retorna (hits, vetor da consulta) quando o lote for processado."""
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future = loop.create_future()
+        self._queue.append((retriever, query, fut, sources))
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._queue = self._queue, []
+        groups: Dict[tuple, list] = {}
+        for item in batch:
+            key = (id(item[0]), None if item[3] is None else tuple(item[3]))
+            groups.setdefault(key, []).append(item)
+        for group in groups.values():
+            asyncio.ensure_future(self._run(group[0][0], group, group[0][3]))
+
+    async def _run(
+        self,
+        retriever: Any,
+        batch: List[Tuple[Any, str, asyncio.Future, Any]],
+        sources: Sequence[str] | None,
+    ) -> None:
+        queries = [q for _, q, _, _ in batch]
+        loop = asyncio.get_running_loop()
+        try:
+            query_matrix, hits = await loop.run_in_executor(
+                None, retrieve_batch, retriever, queries, sources
+            )
+        except Exception as exc:
+            for _, _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+        self.batches += 1
+        self.queries += len(batch)
+        for i, (_, _, fut, _) in enumerate(batch):
+            if not fut.done():
+                fut.set_result((hits[i], query_matrix[i]))
+
+
+def retrieve_batch(
+    retriever: Any, queries: List[str], sources: Sequence[str] | None = None
+):
+    """(matriz das consultas, hits) de um lote numa única chamada."""
+    query_matrix = retriever.vectorize_many(queries)
+    return query_matrix, retriever.retrieve_many(
+        queries, query_matrix=query_matrix, sources=sources
+    )
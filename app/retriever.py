@@ -1,54 +1,77 @@
-import json
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Sequence
 
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
+from .jsonstream import iter_records
+from .ranking import Hit, top_k_hits
+from .retrieval_backend import RetrieverBase
 
-class KnowledgeBaseRetriever:
-    """Carrega o KB de FAQ/políticas e faz busca por similaridade."""
 
-    def __init__(self, kb_path: str | Path, top_k: int = 3) -> None:
+class KnowledgeBaseRetriever(RetrieverBase):
+    """Carrega o KB de FAQ/políticas e faz busca por similaridade.
+
+    `docs` (opcional) substitui o conteúdo do `kb_path`, ex.: a lista unificada
+    de `app.sources.build_documents`.
+    """
+
+    def __init__(
+        self,
+        kb_path: str | Path,
+        top_k: int = 3,
+        docs: List[Dict[str, Any]] | None = None,
+    ) -> None:
         self.kb_path = Path(kb_path)
         self.top_k = top_k
-        self._docs: List[Dict[str, Any]] = []
+        self._docs: List[Dict[str, Any]] | None = docs
         self._vectorizer: TfidfVectorizer | None = None
         self._matrix = None
+        self._matrix_t = None
         self._load()
 
-        # NOTA: Para trocar TF-IDF por embeddings + índice vetorial:
-        # - Use embeddings (local ex.: sentence-transformers) ou API (OpenAI).
-        # - Índice local: FAISS (IndexFlatIP para similaridade). Passos:
-        #     1) gerar embedding de cada doc e empilhar em uma matriz numpy;
-        #     2) index = faiss.IndexFlatIP(dim); index.add(matrix);
-        #     3) no retrieve: embedding da query -> index.search(query_vec, top_k).
-        # - Índice em banco: Postgres + pgvector. Passos:
-        #     1) criar tabela com coluna vector(d);
-        #     2) inserir docs com embeddings já calculados;
-        #     3) query SQL: ORDER BY embedding <=> :query_embedding LIMIT k.
+        # NOTA: embeddings densos + índice ANN ficam em `DenseRetriever`
+        # (`app/dense_retriever.py`), atrás da mesma interface
+        # (`RetrieverBackend`). Para um índice em banco (Postgres + pgvector),
+        # basta outro backend com `retrieve_many` fazendo
+        # ORDER BY embedding <=> :query_embedding LIMIT k.
 
     def _load(self) -> None:
         """Carrega documentos do JSON e monta a matriz TF-IDF."""
-        with self.kb_path.open("r", encoding="utf-8") as f:
-            self._docs = json.load(f)
+        if self._docs is None:
+            self._docs = list(iter_records(self.kb_path))
         corpus = [f"{d['pergunta']} {d['resposta']}" for d in self._docs]
         # Nota: sklearn não tem stopwords nativas em português; usando None para simplicidade.
         self._vectorizer = TfidfVectorizer(stop_words=None)
         self._matrix = self._vectorizer.fit_transform(corpus)
+        # Transposta em CSR (termos x docs) para o produto em lote.
+        self._matrix_t = self._matrix.T.tocsr()
+        self._matrix_t.sort_indices()
+
+    @property
+    def docs(self) -> List[Dict[str, Any]]:
+        return self._docs
+
+    def vectorize_many(self, queries: Sequence[str]):
+        """Matriz TF-IDF (consultas x termos) do lote inteiro."""
+        return self._vectorizer.transform(queries)
 
-    def retrieve(self, query: str) -> List[Dict[str, Any]]:
-        """Retorna top-k entradas do KB ranqueadas por similaridade cosseno."""
-        if not query.strip():
+    def retrieve_many(
+        self,
+        queries: Sequence[str],
+        top_k: int | None = None,
+        query_matrix=None,
+        sources: Sequence[str] | None = None,
+    ) -> List[List[Hit]]:
+        """Top-k de várias consultas com um único produto esparso."""
+        if not queries:
             return []
-        query_vec = self._vectorizer.transform([query])
-        scores = cosine_similarity(query_vec, self._matrix).flatten()
-        ranked = sorted(zip(self._docs, scores), key=lambda x: x[1], reverse=True)[
-            : self.top_k
-        ]
-        results = []
-        for doc, score in ranked:
-            entry = doc.copy()
-            entry["score"] = float(score)
-            results.append(entry)
-        return results
+        if query_matrix is None:
+            query_matrix = self.vectorize_many(queries)
+        return top_k_hits(
+            query_matrix,
+            self._matrix_t,
+            top_k or self.top_k,
+            len(self._docs),
+            [not q.strip() for q in queries],
+            self.doc_ranges(sources),
+        )
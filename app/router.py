@@ -1,21 +1,164 @@
-"""Roteador simples de intenções para o chat."""
+"""Roteador de intenções do chat: intenção + entidades numa única passada.
 
-from typing import Literal
+Palavras-chave por intenção e padrões de IDs (`PED-123`, `USR-001`) vêm de
+`data/source/router.json` (ou `ROUTER_CONFIG`) e são compilados numa só
+regex: os padrões das entidades e uma trie das palavras-chave (prefixos
+comuns fatorados, como num autômato Aho-Corasick). `route` dobra o texto uma
+vez (`text.fold`: minúsculas, sem acento) e faz um único `finditer`; o
+grupo nomeado que casou (`lastgroup`) já diz se o trecho é palavra-chave
+(lookup num dict) ou qual entidade, sem testar o trecho de novo. A
+intenção é a de maior prioridade (ordem do config) entre as encontradas, e
+cada entidade achada também conta a favor da sua intenção. Os padrões de
+entidade não podem ter grupos de captura e devem começar por um literal (a
+`re` só pula direto para os candidatos quando todo ramo começa assim).
+
+Com `ROUTER_CLASSIFIER=1`, mensagens ambíguas (nenhuma ou mais de uma
+intenção encontrada) passam por um TF-IDF + regressão logística treinado nos
+`examples` do config; a previsão só vale com probabilidade >=
+`ROUTER_MIN_PROBA` e, no caso de empate entre intenções, só entre elas.
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Literal, NamedTuple, Sequence
+
+from .text import fold
 
 Intent = Literal["pedido", "politica", "usuario", "faq"]
 
+ROUTER_PATH = Path(__file__).resolve().parent.parent / "data" / "source" / "router.json"
+
+
+class Route(NamedTuple):
+    intent: str
+    # Entidade -> valor normalizado (primeira ocorrência), ex. order_id -> PED-123.
+    entities: Dict[str, str]
+
+
+def load_router_config(path: Path | None = None) -> Dict[str, Any]:
+    path = path or Path(os.getenv("ROUTER_CONFIG", str(ROUTER_PATH)))
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class IntentClassifier:
+    """TF-IDF de n-gramas de caracteres + regressão logística (sklearn)."""
+
+    def __init__(self, examples: Dict[str, Sequence[str]]) -> None:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+
+        texts = [fold(t) for ts in examples.values() for t in ts]
+        labels = [intent for intent, ts in examples.items() for _ in ts]
+        self._vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4))
+        self._model = LogisticRegression(max_iter=1000, C=10.0)
+        self._model.fit(self._vectorizer.fit_transform(texts), labels)
+        self.classes: List[str] = [str(c) for c in self._model.classes_]
+
+    def predict(self, folded: str, candidates: Sequence[str] = ()) -> tuple:
+        """(intenção, probabilidade), restrita a `candidates` se houver."""
+        proba = self._model.predict_proba(self._vectorizer.transform([folded]))[0]
+        scores = dict(zip(self.classes, proba))
+        if candidates:
+            total = sum(scores.get(c, 0.0) for c in candidates) or 1.0
+            scores = {c: scores.get(c, 0.0) / total for c in candidates}
+        best = max(scores, key=scores.get)
+        return best, scores[best]
+
+
+def _trie_pattern(words: Sequence[str]) -> str:
+    """Regex de alternância de `words` com os prefixos comuns fatorados."""
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, Any]) -> str:
+        alts = [re.escape(ch) + emit(child) for ch, child in node.items() if ch]
+        if not alts:
+            return ""
+        body = "|".join(alts)
+        if "" in node:
+            # Palavra que é prefixo de outra: o resto é opcional (guloso).
+            return f"(?:{body})?"
+        return body if len(alts) == 1 else f"(?:{body})"
+
+    return emit(trie)
+
+
+class IntentRouter:
+    """Regex única compilada a partir do config de intenções e entidades."""
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        classifier: IntentClassifier | None = None,
+        min_proba: float = 0.5,
+    ) -> None:
+        self.default: str = config.get("default", "faq")
+        self.priority = {intent: i for i, intent in enumerate(config["intents"])}
+        self.classifier = classifier
+        self.min_proba = min_proba
+        # Palavra-chave dobrada -> intenção (a de maior prioridade, se repetida).
+        self._keywords: Dict[str, str] = {}
+        for intent, keywords in config["intents"].items():
+            for keyword in keywords:
+                self._keywords.setdefault(fold(keyword), intent)
+        # Grupo nomeado de cada entidade -> (nome, intenção, caixa do valor).
+        self._entities: Dict[str, tuple] = {}
+        parts = []
+        for i, (name, spec) in enumerate(config.get("entities", {}).items()):
+            self._entities[f"e{i}"] = (name, spec.get("intent"), spec.get("case"))
+            parts.append(f"(?P<e{i}>{spec['pattern']})")
+        parts.append(f"(?P<kw>{_trie_pattern(list(self._keywords))})")
+        self._pattern = re.compile("|".join(parts))
+
+    @classmethod
+    def from_env(cls, config: Dict[str, Any] | None = None) -> "IntentRouter":
+        """`ROUTER_CLASSIFIER=1` liga o classificador; `ROUTER_MIN_PROBA` (0.5)."""
+        config = config or load_router_config()
+        classifier = None
+        if os.getenv("ROUTER_CLASSIFIER", "0") == "1" and config.get("examples"):
+            classifier = IntentClassifier(config["examples"])
+        return cls(config, classifier, float(os.getenv("ROUTER_MIN_PROBA", "0.5")))
+
+    def route(self, message: str) -> Route:
+        folded = fold(message)
+        found: set = set()
+        entities: Dict[str, str] = {}
+        for match in self._pattern.finditer(folded):
+            # O grupo que casou já diz se é palavra-chave ou qual entidade.
+            group = match.lastgroup
+            if group == "kw":
+                found.add(self._keywords[match.group()])
+                continue
+            name, intent, case = self._entities[group]
+            if intent:
+                found.add(intent)
+            if name not in entities:
+                token = match.group()
+                entities[name] = token.upper() if case == "upper" else token
+        if len(found) == 1:
+            return Route(found.pop(), entities)
+        if self.classifier is not None:
+            intent, proba = self.classifier.predict(folded, sorted(found))
+            if proba >= self.min_proba:
+                return Route(intent, entities)
+        if not found:
+            return Route(self.default, entities)
+        return Route(min(found, key=self.priority.__getitem__), entities)
+
+
+ROUTER = IntentRouter.from_env()
+
+
+def route_message(message: str) -> Route:
+    return ROUTER.route(message)
+
 
 def detect_intent(message: str) -> Intent:
-    text = message.lower()
-    if "ped-" in text or "pedido" in text or "status" in text:
-        return "pedido"
-    if (
-        "política" in text
-        or "politica" in text
-        or "reembolso" in text
-        or "atraso" in text
-    ):
-        return "politica"
-    if "user" in text or "usr-" in text or "cliente" in text:
-        return "usuario"
-    return "faq"
+    return ROUTER.route(message).intent
@@ -0,0 +1,317 @@
+"""Sessões de conversa: memória curta por `sessao` (id enviado pelo cliente).
+
+A chave no store é `<id do cliente da API>:<sessao>` (`session_key`): um
+cliente não lê nem continua a conversa de outro adivinhando o id.
+
+Cada sessão guarda a intenção da última mensagem, as entidades já
+extraídas, o slot que o bot pediu e ainda não veio (`order_id`, `user_id`
+ou `topic`) e os docs do último retrieval. A mensagem seguinte que só
+preenche o slot ("123", "é o PED-123", "cancelamento") pula o roteamento e o
+retrieval: vira consulta exata, ou, se o turno anterior veio do KB, uma
+geração com os mesmos docs mais o fato do pedido/usuário.
+
+Backends (`SESSION_BACKEND`):
+
+- `memory` (padrão): `MemorySessionStore`, registros com `__slots__` num
+  `OrderedDict` com eviction LRU + TTL, teto de sessões (`SESSION_MAX`,
+  100000) e de memória aproximada (`SESSION_MAX_BYTES`, 64 MiB). Os docs
+  apontam para as strings do KB carregado, sem copiá-las;
+- `redis`: `KeyValueSessionStore` sobre `redis.asyncio` (extra opcional,
+  `SESSION_REDIS_URL`), com a sessão em JSON compacto e TTL no próprio
+  servidor. `LocalKeyValue` é o substituto local com a mesma interface
+  (testes, benchmark e desenvolvimento sem Redis).
+
+`SESSION_TTL_S` (1800) vale para os dois; `CHAT_SESSIONS=0` desliga.
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Protocol, Tuple
+
+from .text import fold
+
+logger = logging.getLogger("uvicorn.error")
+
+# Doc do KB guardado na sessão: (id, pergunta, resposta).
+Doc = Tuple[str, str, str]
+
+# Docs do último retrieval guardados por sessão.
+MAX_DOCS = 3
+SLOT_PREFIXES = {"order_id": "PED-", "user_id": "USR-"}
+
+# Pedidos de dado na resposta do bot (texto já dobrado por `fold`).
+_ASKS = (
+    (
+        "order_id",
+        re.compile(
+            r"\b(compartilh|inform|solicit|envi|pass|dig|qual)\w*[^?!\n]{0,40}"
+            r"\b(codigo|numero)\b[^?!\n]{0,20}\b(pedido|ped)\b"
+        ),
+    ),
+    (
+        "user_id",
+        re.compile(
+            r"\b(compartilh|inform|solicit|envi|pass|dig|qual)\w*[^?!\n]{0,40}"
+            r"\b(codigo|numero|id)\b[^?!\n]{0,20}\b(usuario|usr)\b"
+        ),
+    ),
+    ("topic", re.compile(r"\bconsigo ajudar com as politicas de\b")),
+)
+_IDS = {
+    "order_id": re.compile(r"\bped-?\s?(\d+)\b"),
+    "user_id": re.compile(r"\busr-?\s?(\d+)\b"),
+}
+# Número sem prefixo só vale se a mensagem for praticamente só ele ("123",
+# "#123", "é o 123"): "atrasou 20 minutos" não é o pedido 20.
+_BARE_NUMBER = re.compile(r"\s*(?:e\s+)?(?:o\s+)?(?:numero\s+)?#?(\d{1,12})[\s.!]*")
+
+
+def pending_slot(resposta: str) -> Optional[str]:
+    """Slot que a resposta do bot pediu ao usuário, se pediu algum."""
+    folded = fold(resposta)
+    for slot, pattern in _ASKS:
+        if pattern.search(folded):
+            return slot
+    return None
+
+
+def extract_id(slot: str, mensagem: str) -> Optional[str]:
+    """Código do slot na mensagem: `PED-123`/`ped 123` ou só o número."""
+    folded = fold(mensagem)
+    match = _IDS[slot].search(folded) or _BARE_NUMBER.fullmatch(folded)
+    return f"{SLOT_PREFIXES[slot]}{match.group(1)}" if match else None
+
+
+def session_key(client_id: str, sessao: str) -> str:
+    """Chave da sessão no store, restrita ao cliente autenticado."""
+    return f"{client_id}:{sessao}"
+
+
+class Session:
+    """Estado de uma conversa; `size` é a estimativa usada no teto de memória."""
+
+    __slots__ = (
+        "id",
+        "intent",
+        "slot",
+        "entities",
+        "docs",
+        "query",
+        "turns",
+        "expires",
+        "size",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        intent: Optional[str] = None,
+        slot: Optional[str] = None,
+        entities: Optional[Dict[str, str]] = None,
+        docs: Tuple[Doc, ...] = (),
+        query: Optional[str] = None,
+        turns: int = 0,
+    ) -> None:
+        self.id = id
+        self.intent = intent
+        self.slot = slot
+        self.entities = entities or {}
+        self.docs = docs
+        self.query = query
+        self.turns = turns
+        self.expires = 0.0
+        self.size = 0
+
+    def estimate_size(self) -> int:
+        """Bytes próprios da sessão; strings dos docs são do KB e não contam."""
+        size = sys.getsizeof(self) + sys.getsizeof(self.id)
+        size += sys.getsizeof(self.docs) + len(self.docs) * sys.getsizeof(())
+        if self.entities:
+            size += sys.getsizeof(self.entities)
+            size += sum(sys.getsizeof(v) for v in self.entities.values())
+        if self.query is not None:
+            size += sys.getsizeof(self.query)
+        return size
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "intent": self.intent,
+            "slot": self.slot,
+            "entities": self.entities,
+            "docs": [list(doc) for doc in self.docs],
+            "query": self.query,
+            "turns": self.turns,
+        }
+
+    @classmethod
+    def from_dict(cls, id: str, data: Dict[str, Any]) -> "Session":
+        return cls(
+            id,
+            data.get("intent"),
+            data.get("slot"),
+            data.get("entities") or {},
+            tuple(tuple(doc) for doc in data.get("docs") or ()),
+            data.get("query"),
+            data.get("turns", 0),
+        )
+
+
+class SessionStore(Protocol):
+    """Interface dos backends de sessão."""
+
+    async def get(self, session_id: str) -> Optional[Session]: ...
+
+    async def put(self, session: Session) -> None: ...
+
+    async def delete(self, session_id: str) -> None: ...
+
+    def stats(self) -> Dict[str, float]: ...
+
+
+class MemorySessionStore:
+    """Sessões em processo com LRU + TTL e tetos de quantidade e de bytes."""
+
+    def __init__(
+        self,
+        max_sessions: int = 100_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 1800.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if session.expires <= self._clock():
+            self._discard(session_id)
+            self.expirations += 1
+            return None
+        self._sessions.move_to_end(session_id)
+        return session
+
+    async def put(self, session: Session) -> None:
+        self._discard(session.id)
+        session.expires = self._clock() + self.ttl
+        session.size = session.estimate_size()
+        self._sessions[session.id] = session
+        self._bytes += session.size
+        while self._sessions and (
+            len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes
+        ):
+            self._discard(next(iter(self._sessions)))
+            self.evictions += 1
+
+    async def delete(self, session_id: str) -> None:
+        self._discard(session_id)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _discard(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.size
+
+
+class KeyValueSessionStore:
+    """Sessões num key-value externo com TTL (API de `redis.asyncio.Redis`)."""
+
+    def __init__(self, client: Any, ttl: float = 1800.0, prefix: str = "sessao:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.errors = 0
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        try:
+            raw = await self.client.get(self.prefix + session_id)
+        except Exception as exc:
+            # Backend fora do ar: a conversa segue sem memória, não falha.
+            self.errors += 1
+            logger.warning("Sessão indisponível (%s): %s", session_id, exc)
+            return None
+        if raw is None:
+            return None
+        return Session.from_dict(session_id, json.loads(raw))
+
+    async def put(self, session: Session) -> None:
+        payload = json.dumps(
+            session.to_dict(), ensure_ascii=False, separators=(",", ":")
+        )
+        try:
+            await self.client.set(
+                self.prefix + session.id, payload, ex=max(int(self.ttl), 1)
+            )
+        except Exception as exc:
+            self.errors += 1
+            logger.warning("Falha ao gravar a sessão %s: %s", session.id, exc)
+
+    async def delete(self, session_id: str) -> None:
+        await self.client.delete(self.prefix + session_id)
+
+    def stats(self) -> Dict[str, float]:
+        return {"errors": self.errors}
+
+
+class LocalKeyValue:
+    """Substituto local do Redis (`get`/`set(ex=)`/`delete` assíncronos)."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._data: Dict[str, Tuple[str, float]] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None or item[1] <= self._clock():
+            self._data.pop(key, None)
+            return None
+        return item[0]
+
+    async def set(self, key: str, value: str, ex: int) -> None:
+        self._data[key] = (value, self._clock() + ex)
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+
+def session_store_from_env() -> Optional[SessionStore]:
+    """Backend configurado via env; `CHAT_SESSIONS=0` desliga as sessões."""
+    if os.getenv("CHAT_SESSIONS", "1") == "0":
+        return None
+    ttl = float(os.getenv("SESSION_TTL_S", "1800"))
+    if os.getenv("SESSION_BACKEND", "memory") == "redis":
+        try:
+            from redis.asyncio import Redis
+
+            client = Redis.from_url(
+                os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+            )
+            return KeyValueSessionStore(client, ttl)
+        except ImportError:
+            logger.warning(
+                "SESSION_BACKEND=redis requer o pacote `redis`; usando memória."
+            )
+    return MemorySessionStore(
+        max_sessions=int(os.getenv("SESSION_MAX", "100000")),
+        max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024))),
+        ttl=ttl,
+    )
@@ -0,0 +1,85 @@
+"""Single-flight: chamadas idênticas em voo compartilham uma só execução.
+
+Em incidentes (ex.: atraso geral numa região) centenas de usuários mandam a
+mesma mensagem em segundos, e o cache de respostas não ajuda enquanto a
+primeira geração ainda não terminou. Aqui a primeira requisição de uma chave
+(a "líder") dispara a chamada numa task; as demais com a mesma chave só
+aguardam o mesmo resultado ou a mesma exceção.
+
+- A chamada roda numa task própria: se a líder for cancelada (cliente
+  desconectou), quem ainda espera continua recebendo o resultado.
+- `timeout` vale para cada requisição que espera (líder ou não) e levanta
+  `asyncio.TimeoutError` só para ela; quando ninguém mais espera, a chamada
+  compartilhada é cancelada.
+- A chave sai do mapa assim que a chamada termina: o que vier depois dispara
+  uma nova chamada (o cache de respostas cobre esse caso).
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from .metrics import SINGLE_FLIGHT
+
+T = TypeVar("T")
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Agrupa chamadas concorrentes com a mesma chave numa só execução."""
+
+    def __init__(self, timeout: float | None = None) -> None:
+        self.timeout = timeout
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    @classmethod
+    def from_env(cls) -> "SingleFlight | None":
+        """`CHAT_COALESCE=0` desliga; `CHAT_COALESCE_TIMEOUT_MS` (default 30 s)."""
+        if os.getenv("CHAT_COALESCE", "1") == "0":
+            return None
+        timeout_ms = float(os.getenv("CHAT_COALESCE_TIMEOUT_MS", "30000"))
+        return cls(timeout=timeout_ms / 1000 if timeout_ms > 0 else None)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Resultado de `fn()`, compartilhado com quem chamar a mesma chave em voo."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda t: self._done(key, flight, t))
+            SINGLE_FLIGHT.inc("leader")
+        else:
+            SINGLE_FLIGHT.inc("coalesced")
+        flight.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), self.timeout)
+        except asyncio.TimeoutError:
+            SINGLE_FLIGHT.inc("timeout")
+            raise
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Ninguém mais espera (timeout ou cancelamento): aborta a chamada.
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _done(self, key: Hashable, flight: _Flight, task: asyncio.Task) -> None:
+        # Erro conta uma vez por chamada, não uma vez por quem esperava.
+        if not task.cancelled() and task.exception() is not None:
+            SINGLE_FLIGHT.inc("error")
+        self._forget(key, flight)
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,127 @@
+"""Documentos do índice unificado: KB, seções de políticas, usuários e pedidos.
+
+Cada doc leva `fonte` (`kb`, `politica`, `usuario`, `pedido`) e segue o
+formato do KB (`id`, `pergunta`, `resposta`), então todos os retrievers o
+indexam sem mudança. Os docs ficam agrupados por fonte, na ordem de
+`SOURCES`: cada fonte ocupa um intervalo contíguo de posições e o filtro por
+intenção (`INTENT_SOURCES`) vira um recorte de intervalos no próprio índice,
+em vez de pontuar tudo e descartar depois.
+"""
+
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+SOURCES = ("kb", "politica", "usuario", "pedido")
+# Fontes consultadas por intenção. `pedido`/`usuario` com código explícito
+# resolvem por lookup exato e nem chegam ao retrieval.
+INTENT_SOURCES: Dict[str, Tuple[str, ...]] = {
+    "faq": ("kb", "politica"),
+    "politica": ("politica",),
+    "pedido": ("pedido",),
+    "usuario": ("usuario",),
+}
+
+Ranges = List[Tuple[int, int]]
+
+
+def _humanize(key: str) -> str:
+    return key.replace("_", " ")
+
+
+def _render_value(value: Any) -> str:
+    if isinstance(value, list):
+        return "; ".join(_render_value(v) for v in value)
+    if isinstance(value, dict):
+        return "; ".join(
+            f"{_humanize(k)}: {_render_value(v)}" for k, v in value.items()
+        )
+    return str(value)
+
+
+def render_policy(name: str, policy: Dict[str, Any]) -> str:
+    """Texto de uma política inteira, seção por seção."""
+    secoes = ". ".join(
+        f"{_humanize(k).capitalize()}: {_render_value(v)}" for k, v in policy.items()
+    )
+    return f"Política de {_humanize(name)}. {secoes}."
+
+
+def order_fact(order: Dict[str, Any]) -> str:
+    itens = ", ".join(f"{i['qtd']}x {i['nome']}" for i in order.get("itens", []))
+    return (
+        f"Pedido {order['order_id']} ({order.get('cliente', '?')}): status "
+        f"{order['status']}, previsão {order['eta_minutos']} min, total "
+        f"R$ {order['total']:.2f}. Itens: {itens}."
+    )
+
+
+def user_fact(user: Dict[str, Any]) -> str:
+    return (
+        f"Usuário {user['user_id']} ({user.get('nome', '?')}): região "
+        f"{user.get('regiao')}, tier {user.get('tier')}, canal "
+        f"{user.get('canal_preferido')}, {user.get('pedidos', 0)} pedidos, "
+        f"ticket médio R$ {user.get('ticket_medio', 0):.2f}, última interação "
+        f"{user.get('ultima_interacao')}, flag {user.get('flag') or '-'}."
+    )
+
+
+def policy_docs(policies: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    """Um doc por seção de cada política."""
+    for name, policy in policies.items():
+        for section, value in policy.items():
+            yield {
+                "id": f"politica:{name}:{section}",
+                "fonte": "politica",
+                "topico": name,
+                "pergunta": f"Política de {_humanize(name)}: {_humanize(section)}",
+                "resposta": f"{_humanize(section).capitalize()}: {_render_value(value)}",
+            }
+
+
+def build_documents(
+    kb: Sequence[Dict[str, Any]],
+    policies: Dict[str, Any],
+    users: Dict[str, Any],
+    orders: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """Lista unificada, agrupada por fonte na ordem de `SOURCES`."""
+    docs = [{**doc, "fonte": "kb"} for doc in kb]
+    docs.extend(policy_docs(policies))
+    docs.extend(
+        {
+            "id": f"usuario:{user['user_id']}",
+            "fonte": "usuario",
+            "pergunta": f"Usuário {user['user_id']} {user.get('nome', '')}".strip(),
+            "resposta": user_fact(user),
+        }
+        for user in users.values()
+    )
+    docs.extend(
+        {
+            "id": f"pedido:{order['order_id']}",
+            "fonte": "pedido",
+            "pergunta": f"Pedido {order['order_id']} {order.get('cliente', '')}".strip(),
+            "resposta": order_fact(order),
+        }
+        for order in orders.values()
+    )
+    return docs
+
+
+def source_ranges(docs: Iterable[Dict[str, Any]]) -> Dict[str, Ranges]:
+    """Intervalos `[início, fim)` de cada fonte (docs sem `fonte` contam como kb)."""
+    ranges: Dict[str, Ranges] = {}
+    current, start, i = None, 0, 0
+    for i, doc in enumerate(docs):
+        fonte = doc.get("fonte", "kb")
+        if fonte != current:
+            if current is not None:
+                ranges.setdefault(current, []).append((start, i))
+            current, start = fonte, i
+    if current is not None:
+        ranges.setdefault(current, []).append((start, i + 1))
+    return ranges
+
+
+def ranges_for(sources: Sequence[str], ranges: Dict[str, Ranges]) -> Ranges:
+    """Intervalos (ordenados) das fontes pedidas."""
+    return sorted(tuple(r) for fonte in sources for r in ranges.get(fonte, ()))
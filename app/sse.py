@@ -0,0 +1,13 @@
+"""Formatação de Server-Sent Events (`text/event-stream`)."""
+
+import json
+from typing import Any, Dict
+
+# Sem cache e sem buffering em proxies (nginx), para o token sair na hora.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> bytes:
+    """Um evento SSE com payload JSON numa única linha `data:`."""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n".encode("utf-8")
@@ -0,0 +1,78 @@
+"""Normalização de texto compartilhada (cache, embeddings e busca léxica).
+
+Português: minúsculas e sem acentos ("reembolso"/"Reembólso" e
+"política"/"politica" viram o mesmo termo), pontuação vira separador.
+`analyze` (busca léxica) também remove stopwords e aplica um stemmer leve de
+sufixos ("reembolso"/"reembolsar" -> "reembols").
+"""
+
+import re
+import unicodedata
+from typing import FrozenSet, List
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def fold(text: str) -> str:
+    """Minúsculas e sem diacríticos (NFKD sem os caracteres combinantes)."""
+    if text.isascii():
+        # Caso comum: nada a decompor.
+        return text.lower()
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    """Palavras normalizadas por `fold`, separadas por qualquer não-palavra."""
+    return _NON_WORD.sub(" ", fold(text)).split()
+
+
+# Stopwords do português já sem acento (mesma forma que sai de `tokenize`).
+STOPWORDS: FrozenSet[str] = frozenset(
+    """
+    a ao aos as ate com como da das de dela dele deles do dos e ela elas ele eles
+    em entre era essa essas esse esses esta estas este estes eu foi ha isso isto
+    ja la lhe lhes mais mas me mesmo meu meus minha minhas muito na nas nem no nos
+    nossa nosso num numa o os ou para pela pelas pelo pelos por qual quando que
+    quem se sem seu seus so sua suas tambem te tem tu um uma umas uns voce voces
+    vos
+    """.split()
+)
+# Sufixos removidos por `stem`, do mais longo ao mais curto (sem acento).
+_SUFFIXES = (
+    "amentos",
+    "imentos",
+    "amento",
+    "imento",
+    "mente",
+    "coes",
+    "cao",
+    "ado",
+    "ada",
+    "ido",
+    "ida",
+    "ar",
+    "er",
+    "ir",
+    "os",
+    "as",
+    "es",
+    "o",
+    "a",
+    "e",
+    "s",
+)
+_MIN_STEM = 4
+
+
+def stem(token: str) -> str:
+    """Remove o primeiro sufixo da lista que deixe um radical de 4+ letras."""
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM:
+            return token[: -len(suffix)]
+    return token
+
+
+def analyze(text: str) -> List[str]:
+    """Termos da busca léxica: `tokenize` sem stopwords e com `stem`."""
+    return [stem(t) for t in tokenize(text) if t not in STOPWORDS]
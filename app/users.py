@@ -1,20 +1,43 @@
-"""Utilitário para usuários mockados carregados de data/source/users.json."""
+"""Utilitário para usuários mockados carregados de data/source/users.json.
 
-import json
+Por padrão a tabela é colunar (`app.columnar`), com índice secundário por
+`regiao`+`tier` para segmentação; `DATA_COLUMNAR=0` volta ao dict-of-dicts.
+Caminho `.ndjson`/`.jsonl` é lido como NDJSON.
+"""
+
+import os
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Mapping
+
+from .columnar import CATEGORY, FLOAT, INT, TEXT, load_table
+from .jsonstream import iter_records
 
 USERS_PATH = Path(__file__).resolve().parent.parent / "data" / "source" / "users.json"
 
+USER_SCHEMA = (
+    ("user_id", TEXT),
+    ("nome", TEXT),
+    ("regiao", CATEGORY),
+    ("tier", CATEGORY),
+    ("canal_preferido", CATEGORY),
+    ("pedidos", INT),
+    ("ticket_medio", FLOAT),
+    ("ultima_interacao", TEXT),
+    ("flag", CATEGORY),
+)
+USER_INDEXES = (("regiao", "tier"),)
+
 
-def load_users() -> Dict[str, Any]:
-    with USERS_PATH.open("r", encoding="utf-8") as f:
-        users = json.load(f)
-    return {u["user_id"].lower(): u for u in users}
+def load_users(path: Path = USERS_PATH) -> Mapping[str, Any]:
+    if os.getenv("DATA_COLUMNAR", "1") != "0":
+        return load_table(path, USER_SCHEMA, "user_id", str.lower, USER_INDEXES)
+    return {u["user_id"].lower(): u for u in iter_records(path)}
 
 
 USERS = load_users()
 
 
-def get_user(user_id: str) -> Dict[str, Any] | None:
-    return USERS.get(user_id.lower())
+def get_user(
+    user_id: str, users: Mapping[str, Any] | None = None
+) -> Dict[str, Any] | None:
+    return (USERS if users is None else users).get(user_id.strip().lower())
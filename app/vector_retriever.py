@@ -1,32 +1,56 @@
-"""Retriever baseado em índice TF-IDF salvo em disco (joblib)."""
+"""Retriever baseado em índice TF-IDF salvo em disco.
+
+Aceita o diretório mapeado em memória de `index_store` (padrão) ou o arquivo
+`kb_index.joblib` legado.
+"""
 
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Sequence
 
 import joblib
-from sklearn.metrics.pairwise import cosine_similarity
+
+from .index_store import current_dir, load_array, open_index, read_meta
+from .ranking import Hit, top_k_hits
+from .retrieval_backend import RetrieverBase
 
 
-class VectorRetriever:
+class VectorRetriever(RetrieverBase):
     def __init__(self, index_path: str | Path, top_k: int = 3) -> None:
         self.index_path = Path(index_path)
+        self.top_k = top_k
+        if self.index_path.is_dir():
+            # Arrays mapeados: compartilhados entre workers via page cache.
+            self.docs, self.vectorizer, self.matrix_t = open_index(self.index_path)
+            self._source_ranges = read_meta(self.index_path).get("sources")
+            self._doc_ids = load_array(current_dir(self.index_path), "doc_ids.npy")
+            return
         payload = joblib.load(self.index_path)
-        self.docs: List[Dict[str, Any]] = payload["docs"]
+        self.docs: Sequence[Dict[str, Any]] = payload["docs"]
         self.vectorizer = payload["vectorizer"]
-        self.matrix = payload["matrix"]
-        self.top_k = top_k
+        self.matrix_t = payload["matrix"].T.tocsr()
+        self.matrix_t.sort_indices()
+
+    def vectorize_many(self, queries: Sequence[str]):
+        """Matriz TF-IDF (esparsa, normalizada L2) das consultas."""
+        return self.vectorizer.transform(queries)
 
-    def retrieve(self, query: str) -> List[Dict[str, Any]]:
-        if not query.strip():
+    def retrieve_many(
+        self,
+        queries: Sequence[str],
+        top_k: int | None = None,
+        query_matrix=None,
+        sources: Sequence[str] | None = None,
+    ) -> List[List[Hit]]:
+        """Top-k de várias consultas com um único produto esparso."""
+        if not queries:
             return []
-        query_vec = self.vectorizer.transform([query])
-        scores = cosine_similarity(query_vec, self.matrix).flatten()
-        ranked = sorted(zip(self.docs, scores), key=lambda x: x[1], reverse=True)[
-            : self.top_k
-        ]
-        results = []
-        for doc, score in ranked:
-            entry = doc.copy()
-            entry["score"] = float(score)
-            results.append(entry)
-        return results
+        if query_matrix is None:
+            query_matrix = self.vectorize_many(queries)
+        return top_k_hits(
+            query_matrix,
+            self.matrix_t,
+            top_k or self.top_k,
+            len(self.docs),
+            [not q.strip() for q in queries],
+            self.doc_ranges(sources),
+        )
@@ -0,0 +1 @@
+"""Benchmarks locais (provedores stub, sem rede). Rode com `python -m benchmarks.<nome>`."""
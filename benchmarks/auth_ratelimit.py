@@ -0,0 +1,148 @@
+"""Benchmark da auth multi-chave e dos limites por cliente.
+
+1. Verificação de chave: sha256 e PBKDF2 (`--pbkdf2-iterations`), com 50
+   clientes, primeira verificação (miss) vs cache em memória (hit) e chave
+   inválida sem prefixo conhecido, em µs por chamada.
+2. Vizinho barulhento: o cliente `ruidoso` dispara `--flood` chats
+   simultâneos enquanto `normal` manda `--requests` chats, 8 por vez, no app
+   em processo. O provedor stub demora `--latency-ms` e atende no máximo
+   `--provider-slots` chamadas ao mesmo tempo. Sem limites o `normal` espera
+   na fila atrás da rajada; com `concurrency`/`rate` no `ruidoso`, a rajada
+   recebe 429 antes do retrieval e o `normal` fica perto da latência do
+   provedor.
+
+Uso: `python -m benchmarks.auth_ratelimit --flood 400 --requests 100`
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app import auth, main
+from app.providers import ProviderRegistry
+from app.ratelimit import ClientLimiter
+
+from .common import percentile, print_row, summarize
+from .single_flight import quota_stub
+from .synthetic import synthetic_queries
+
+
+async def verification(iterations: int, calls: int) -> None:
+    prefix, key = auth.new_key()
+    for label, hashed in (
+        ("sha256", auth.hash_key(key)),
+        (f"pbkdf2 ({iterations})", auth.hash_key(key, iterations)),
+    ):
+        # 50 clientes: chave sem prefixo conhecido não confere hash lento nenhum.
+        entries = [(hashed, auth.ApiClient("c"), prefix)]
+        entries += [
+            (auth.hash_key(f"p{i}.x", iterations), auth.ApiClient(f"c{i}"), f"p{i}")
+            for i in range(49)
+        ]
+        store = auth.KeyStore(entries)
+        t0 = time.perf_counter()
+        await store.verify(key)
+        miss_us = (time.perf_counter() - t0) * 1e6
+        t0 = time.perf_counter()
+        for _ in range(calls):
+            await store.verify(key)
+        hit_us = (time.perf_counter() - t0) / calls * 1e6
+        t0 = time.perf_counter()
+        for i in range(100):
+            await store.verify(f"chute-{i}")
+        bogus_us = (time.perf_counter() - t0) / 100 * 1e6
+        print(
+            f"{label:<28} miss_us={miss_us:.1f} hit_us={hit_us:.2f} "
+            f"chave_invalida_us={bogus_us:.1f}"
+        )
+
+
+async def neighbors(args: argparse.Namespace, limited: bool) -> None:
+    ruidoso = auth.ApiClient(
+        "ruidoso",
+        rate=args.rate if limited else 0,
+        burst=args.rate if limited else 0,
+        concurrency=args.concurrency if limited else 0,
+    )
+    auth.KEYSTORE = auth.KeyStore(
+        [
+            (auth.hash_key("k-ruidoso"), ruidoso),
+            (auth.hash_key("k-normal"), auth.ApiClient("normal")),
+        ]
+    )
+    auth.LIMITER = ClientLimiter()
+    provider, calls = quota_stub(args.latency_ms / 1000, args.provider_slots)
+    main.provider_registry = ProviderRegistry.static([provider])
+    queries = synthetic_queries(args.flood + args.requests, seed=3)
+    normal: list = []
+    rejected: list = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as cli:
+
+        async def one(key: str, mensagem: str, out: list) -> None:
+            t0 = time.perf_counter()
+            resp = await cli.post(
+                "/chat", json={"mensagem": mensagem}, headers={"X-API-Key": key}
+            )
+            elapsed = time.perf_counter() - t0
+            if resp.status_code == 429:
+                rejected.append(elapsed)
+            else:
+                resp.raise_for_status()
+                out.append(elapsed)
+
+        async def steady() -> None:
+            gate = asyncio.Semaphore(8)
+
+            async def paced(mensagem: str) -> None:
+                async with gate:
+                    await one("k-normal", mensagem, normal)
+
+            await asyncio.gather(*(paced(q) for q in queries[args.flood :]))
+
+        t0 = time.perf_counter()
+        flood = [one("k-ruidoso", q, []) for q in queries[: args.flood]]
+        await asyncio.gather(*flood, steady())
+        elapsed = time.perf_counter() - t0
+    label = "com limites" if limited else "sem limites"
+    print_row(
+        f"{label}: normal",
+        summarize(normal, elapsed),
+        chamadas_provedor=len(calls),
+        recusas_429=len(rejected),
+        p50_429_ms=percentile(rejected, 50) * 1000,
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    print("-- verificação de chave")
+    await verification(args.pbkdf2_iterations, args.calls)
+    print(
+        f"-- vizinho barulhento (rajada={args.flood}, normal={args.requests}, "
+        f"latência={args.latency_ms}ms, cota={args.provider_slots})"
+    )
+    main.response_cache = None
+    main.single_flight = None
+    main.session_store = None
+    await main.current_generation()
+    for limited in (False, True):
+        await neighbors(args, limited)
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--pbkdf2-iterations", type=int, default=200_000)
+    parser.add_argument("--flood", type=int, default=400)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--provider-slots", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
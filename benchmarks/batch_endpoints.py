@@ -0,0 +1,126 @@
+"""Benchmark das rotas de lote vs uma requisição por item (app em processo).
+
+- pedidos: `--items` GETs em `/pedido/{id}` vs um `POST /pedidos:batch`
+  (JSON e NDJSON);
+- chat: `--items` POSTs em `/chat` (com `--concurrency` em paralelo) vs um
+  `POST /chat:batch`, com o provedor stub de `benchmarks.chat_async`
+  (`--latency-ms`); reporta itens/s, número de chamadas ao retrieval e o
+  pico de gerações simultâneas (limitado por `CHAT_BATCH_CONCURRENCY`).
+
+Uso: `python -m benchmarks.batch_endpoints --items 2000`
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from app import main
+from app.providers import ProviderRegistry
+
+from .chat_async import StubLatency, async_stub
+
+NDJSON = {"content-type": "application/x-ndjson"}
+
+
+def count_retrieval_calls() -> list:
+    """Conta chamadas a `retrieve_many` do retriever ativo."""
+    retriever = main.reloader.current.active_retriever
+    calls: list = []
+    original = retriever.retrieve_many
+
+    def counted(queries, *args, **kwargs):
+        calls.append(len(queries))
+        return original(queries, *args, **kwargs)
+
+    retriever.retrieve_many = counted
+    return calls
+
+
+def report(label: str, items: int, elapsed: float, **extra) -> None:
+    cols = " ".join(f"{k}={v}" for k, v in extra.items())
+    print(f"   {label:<26} itens/s={items / elapsed:9.1f} {cols}")
+
+
+async def run(args: argparse.Namespace) -> None:
+    main.response_cache = None
+    main.BATCH_CONCURRENCY = args.batch_concurrency
+    await main.current_generation()
+    ids = [f"PED-{(123, 456, 789, 0)[i % 4]}" for i in range(args.items)]
+    mensagens = [f"Posso trocar o item {i} por alergia?" for i in range(args.items)]
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as cli:
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def get(order_id: str) -> None:
+            async with sem:
+                await cli.get(f"/pedido/{order_id}")
+
+        print(f"-- pedidos itens={args.items}")
+        t0 = time.perf_counter()
+        await asyncio.gather(*(get(i) for i in ids))
+        report("GET /pedido/{id}", args.items, time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        resp = await cli.post(
+            "/pedidos:batch", json={"ids": ids[: main.BATCH_MAX_ITEMS]}
+        )
+        resp.raise_for_status()
+        report(
+            "POST /pedidos:batch (json)",
+            min(args.items, main.BATCH_MAX_ITEMS),
+            time.perf_counter() - t0,
+        )
+        body = "\n".join(json.dumps(i) for i in ids).encode()
+        t0 = time.perf_counter()
+        resp = await cli.post("/pedidos:batch", content=body, headers=NDJSON)
+        resp.raise_for_status()
+        report("POST /pedidos:batch (ndjson)", args.items, time.perf_counter() - t0)
+
+        print(f"-- chat itens={args.items} latência={args.latency_ms}ms")
+        latency = StubLatency(args.latency_ms / 1000)
+        main.provider_registry = ProviderRegistry.static([async_stub("stub", latency)])
+        calls = count_retrieval_calls()
+
+        async def chat(mensagem: str) -> None:
+            async with sem:
+                (
+                    await cli.post("/chat", json={"mensagem": mensagem})
+                ).raise_for_status()
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(chat(m) for m in mensagens))
+        report(
+            "POST /chat",
+            args.items,
+            time.perf_counter() - t0,
+            retrievals=len(calls),
+            pico_geracao=latency.peak,
+        )
+        calls.clear()
+        latency.peak = 0
+        body = "\n".join(json.dumps({"mensagem": m}) for m in mensagens).encode()
+        t0 = time.perf_counter()
+        resp = await cli.post("/chat:batch", content=body, headers=NDJSON)
+        resp.raise_for_status()
+        report(
+            "POST /chat:batch (ndjson)",
+            args.items,
+            time.perf_counter() - t0,
+            retrievals=len(calls),
+            pico_geracao=latency.peak,
+        )
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-concurrency", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,109 @@
+"""Benchmark do pipeline offline (`app.batch`) com provedores stub.
+
+Gera um JSONL de `--messages` consultas sintéticas e mede mensagens/s de:
+
+- `api`: provedor stub com `--latency-ms`, com concorrência 1 (um por vez,
+  como um loop simples) e `--concurrency`; com `--rate` o limite de
+  chamadas/s entra em jogo;
+- `local`: só um provedor com `generate_many`, cujo custo imita um forward
+  com padding: `--hf-call-ms` por lote de `--hf-batch-size` mais
+  `--hf-item-ms` por item; compara batch_size 1 com o configurado.
+
+Uso: `python -m benchmarks.batch_pipeline --messages 2000`
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import tempfile
+import time
+from pathlib import Path
+
+from app import batch, main
+from app.generation import Provider
+from app.providers import ProviderRegistry
+
+from .chat_async import StubLatency, async_stub
+from .synthetic import synthetic_queries
+
+
+def local_stub(call_ms: float, item_ms: float) -> Provider:
+    async def generate(pergunta: str, evidencia: str) -> str:
+        await asyncio.sleep((call_ms + item_ms) / 1000)
+        return evidencia
+
+    async def generate_many(pares, batch_size: int) -> list:
+        lotes = math.ceil(len(pares) / batch_size)
+        await asyncio.sleep((lotes * call_ms + len(pares) * item_ms) / 1000)
+        return [evidencia for _, evidencia in pares]
+
+    return Provider("hf", "stub", generate, None, generate_many)
+
+
+async def measure(label: str, workdir: Path, provider: Provider, *flags) -> None:
+    main.provider_registry = ProviderRegistry.static([provider])
+    args = batch.build_parser().parse_args(
+        [
+            str(workdir / "in.jsonl"),
+            "--output",
+            str(workdir / "out.jsonl"),
+            "--restart",
+            "--report-every",
+            "1e9",
+            *flags,
+        ]
+    )
+    t0 = time.perf_counter()
+    paths = await batch.run(args)
+    elapsed = time.perf_counter() - t0
+    total = sum(paths.values())
+    print(f"   {label:<28} msgs/s={total / elapsed:9.1f} caminhos={dict(paths)}")
+
+
+async def run(args: argparse.Namespace) -> None:
+    main.response_cache = None
+    await main.current_generation()
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        with open(workdir / "in.jsonl", "w", encoding="utf-8") as f:
+            for query in synthetic_queries(args.messages, seed=5):
+                f.write(json.dumps({"mensagem": query}, ensure_ascii=False) + "\n")
+        print(f"-- api mensagens={args.messages} latência={args.latency_ms}ms")
+        for concurrency in (1, args.concurrency):
+            latency = StubLatency(args.latency_ms / 1000)
+            flags = ["--concurrency", str(concurrency), "--rate", str(args.rate)]
+            await measure(
+                f"concorrência={concurrency}",
+                workdir,
+                async_stub("api", latency),
+                *flags,
+            )
+        print(
+            f"-- local chamada={args.hf_call_ms}ms item={args.hf_item_ms}ms "
+            f"(custo simulado)"
+        )
+        for size in (1, args.hf_batch_size):
+            await measure(
+                f"batch_size={size}",
+                workdir,
+                local_stub(args.hf_call_ms, args.hf_item_ms),
+                "--hf-batch-size",
+                str(size),
+            )
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=0)
+    parser.add_argument("--hf-call-ms", type=float, default=20)
+    parser.add_argument("--hf-item-ms", type=float, default=1)
+    parser.add_argument("--hf-batch-size", type=int, default=16)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,85 @@
+"""Benchmark do circuit breaker + timeout adaptativo com o primário degradado.
+
+Cadeia primário -> reserva com provedores stub (`benchmarks.stubs`). O
+primário passa `--healthy` requisições saudável e depois degrada: cada
+chamada demora `--degraded` e falha com `--error-rate`. Compara a cadeia
+sem guard (cada requisição espera o primário antes de cair para a reserva)
+com a cadeia com `ProviderGuard` (o timeout adaptativo corta a espera e o
+breaker passa a pular o primário). Reporta RPS, p50/p95/p99 e chamadas
+ao primário.
+
+Uso: `python -m benchmarks.breaker --requests 400 --concurrency 20`
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from dataclasses import replace
+
+from app.generation import run_chain
+from app.resilience import AdaptiveTimeout, CircuitBreaker, ProviderGuard
+
+from .common import print_row, summarize
+from .stubs import StubProvider
+
+
+async def drive(args: argparse.Namespace, guarded: bool) -> None:
+    healthy = StubProvider("primario", args.latency, seed=1)
+    degraded = StubProvider("primario", args.degraded, args.error_rate, seed=2)
+    reserva = StubProvider("reserva", args.latency, seed=3).provider()
+    guard = None
+    if guarded:
+        breaker = CircuitBreaker("primario", reset_timeout=args.reset_s)
+        guard = ProviderGuard(breaker, AdaptiveTimeout(minimum=0.05))
+    sem = asyncio.Semaphore(args.concurrency)
+    latencies: list = []
+    done = 0
+
+    async def one() -> None:
+        nonlocal done
+        async with sem:
+            stub = healthy if done < args.healthy else degraded
+            primario = stub.provider()
+            if guard is not None:
+                primario = replace(primario, guard=guard)
+            t0 = time.perf_counter()
+            await run_chain([primario, reserva], "p", "ev")
+            latencies.append(time.perf_counter() - t0)
+            done += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - t0
+    print_row(
+        "com guard" if guarded else "sem guard",
+        summarize(latencies, elapsed),
+        chamadas_degradado=degraded.calls,
+        timeout_final_ms=guard.timeout * 1000 if guard else 0.0,
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    logging.getLogger("uvicorn.error").setLevel(logging.ERROR)
+    print(
+        f"-- requisições={args.requests} saudáveis={args.healthy} "
+        f"degradado={args.degraded} erros={args.error_rate:.0%}"
+    )
+    await drive(args, guarded=False)
+    await drive(args, guarded=True)
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--healthy", type=int, default=100)
+    parser.add_argument("--latency", default="lognormal:80,0.3")
+    parser.add_argument("--degraded", default="fixed:1500")
+    parser.add_argument("--error-rate", type=float, default=0.5)
+    parser.add_argument("--reset-s", type=float, default=5.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
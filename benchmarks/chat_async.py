@@ -0,0 +1,141 @@
+"""Benchmark do /chat síncrono (antes) vs assíncrono e hedged (depois).
+
+Usa provedores stub locais com latência configurável, sem rede:
+
+- `sync`: handler `def` com chamada bloqueante (como o /chat original); cada
+  requisição ocupa uma thread do pool do Starlette (limite padrão de 40).
+- `async`: o app real com `provider_registry` trocado por um stub assíncrono.
+- `hedged`: primário com cauda lenta + fallback rápido, com `HEDGE_AFTER`.
+
+Uso: `python -m benchmarks.chat_async --requests 400 --concurrency 200`
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app import main
+from app.generation import Provider
+from app.providers import ProviderRegistry
+
+from .common import print_row, summarize
+
+MESSAGE = {"mensagem": "Posso trocar um item por alergia?"}
+
+
+class StubLatency:
+    """Latência base com cauda: `tail_ratio` das chamadas demora `tail` segundos."""
+
+    def __init__(self, base: float, tail: float = 0.0, tail_ratio: float = 0.0):
+        self.base = base
+        self.tail = tail
+        self.tail_ratio = tail_ratio
+        self.rng = random.Random(42)
+        self.in_flight = 0
+        self.peak = 0
+
+    def sample(self) -> float:
+        if self.tail_ratio and self.rng.random() < self.tail_ratio:
+            return self.tail
+        return self.base
+
+    def enter(self) -> None:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+
+    def leave(self) -> None:
+        self.in_flight -= 1
+
+
+def async_stub(name: str, latency: StubLatency) -> Provider:
+    async def generate(pergunta: str, evidencia: str) -> str:
+        latency.enter()
+        try:
+            await asyncio.sleep(latency.sample())
+            return evidencia
+        finally:
+            latency.leave()
+
+    return Provider(name, "stub", generate)
+
+
+def sync_app(latency: StubLatency) -> FastAPI:
+    """Réplica do /chat antigo: `def` + chamada bloqueante ao provedor."""
+    app = FastAPI()
+
+    @app.post("/chat")
+    def chat(req: main.ChatRequest) -> main.ChatResponse:
+        top = main.reloader.current.active_retriever.retrieve(req.mensagem)[0]
+        latency.enter()
+        try:
+            time.sleep(latency.sample())
+        finally:
+            latency.leave()
+        return main.ChatResponse(resposta=top["resposta"], fonte=top["pergunta"])
+
+    return app
+
+
+async def drive(app: FastAPI, total: int, concurrency: int) -> tuple[list, float]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as cli:
+
+        async def one() -> None:
+            async with sem:
+                t0 = time.perf_counter()
+                resp = await cli.post("/chat", json=MESSAGE)
+                resp.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return latencies, time.perf_counter() - t0
+
+
+async def run(args: argparse.Namespace) -> None:
+    main.response_cache = None  # mede só a cadeia de geração
+    base, tail = args.latency_ms / 1000, args.tail_ms / 1000
+
+    lat = StubLatency(base, tail, args.tail_ratio)
+    lats, elapsed = await drive(sync_app(lat), args.requests, args.concurrency)
+    print_row("antes (sync def)", summarize(lats, elapsed), pico_concorrencia=lat.peak)
+
+    lat = StubLatency(base, tail, args.tail_ratio)
+    main.provider_registry = ProviderRegistry.static([async_stub("primario", lat)])
+    main.HEDGE_AFTER = None
+    lats, elapsed = await drive(main.app, args.requests, args.concurrency)
+    print_row("depois (async)", summarize(lats, elapsed), pico_concorrencia=lat.peak)
+
+    lat = StubLatency(base, tail, args.tail_ratio)
+    fallback = StubLatency(base)
+    main.provider_registry = ProviderRegistry.static(
+        [async_stub("primario", lat), async_stub("fallback", fallback)]
+    )
+    main.HEDGE_AFTER = args.hedge_ms / 1000
+    lats, elapsed = await drive(main.app, args.requests, args.concurrency)
+    print_row(
+        f"depois (hedged {args.hedge_ms}ms)",
+        summarize(lats, elapsed),
+        pico_concorrencia=lat.peak + fallback.peak,
+    )
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--tail-ms", type=float, default=2000)
+    parser.add_argument("--tail-ratio", type=float, default=0.03)
+    parser.add_argument("--hedge-ms", type=int, default=400)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,120 @@
+"""Benchmark de time-to-first-token: `/chat` (resposta inteira) vs `/chat/stream`.
+
+O provedor fake emite `--tokens` trechos com `--token-ms` de intervalo (após
+`--first-token-ms` de latência inicial), como um LLM em modo streaming. O app
+é chamado direto via ASGI, registrando o instante de cada pedaço do corpo:
+
+- `/chat`: o primeiro byte só sai com a geração completa (TTFB = total).
+- `/chat/stream`: TTFT = primeiro evento `token`.
+
+Uso: `python -m benchmarks.chat_stream --requests 200 --concurrency 50`
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from app import main
+from app.generation import Provider
+from app.providers import ProviderRegistry
+
+from .common import print_row, summarize
+
+MESSAGE = {"mensagem": "Posso trocar um item por alergia?"}
+
+
+def fake_provider(first: float, gap: float, tokens: int) -> Provider:
+    async def stream(pergunta: str, evidencia: str):
+        await asyncio.sleep(first)
+        for i in range(tokens):
+            if i:
+                await asyncio.sleep(gap)
+            yield f"tok{i} "
+
+    async def generate(pergunta: str, evidencia: str) -> str:
+        return "".join([t async for t in stream(pergunta, evidencia)])
+
+    return Provider("fake", "fake-stream", generate, stream)
+
+
+async def call(path: str) -> tuple[float, float]:
+    """(segundos até o primeiro pedaço útil do corpo, segundos até o fim)."""
+    body = json.dumps(MESSAGE).encode()
+    sent = False
+    first: float | None = None
+    t0 = time.perf_counter()
+
+    async def receive() -> dict:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()  # cliente nunca desconecta
+
+    async def send(message: dict) -> None:
+        nonlocal first
+        if message["type"] != "http.response.body" or first is not None:
+            return
+        chunk = message.get("body", b"")
+        if chunk and (path == "/chat" or chunk.startswith(b"event: token")):
+            first = time.perf_counter() - t0
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("bench", 1),
+        "server": ("bench", 80),
+    }
+    await main.app(scope, receive, send)
+    return first or 0.0, time.perf_counter() - t0
+
+
+async def drive(path: str, total: int, concurrency: int):
+    sem = asyncio.Semaphore(concurrency)
+    firsts: list[float] = []
+    totals: list[float] = []
+
+    async def one() -> None:
+        async with sem:
+            first, full = await call(path)
+            firsts.append(first)
+            totals.append(full)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return firsts, totals, time.perf_counter() - t0
+
+
+async def run(args: argparse.Namespace) -> None:
+    main.response_cache = None  # toda requisição passa pelo provedor
+    main.provider_registry = ProviderRegistry.static(
+        [fake_provider(args.first_token_ms / 1000, args.token_ms / 1000, args.tokens)]
+    )
+    await main.reloader.warm_up()
+    for path in ("/chat", "/chat/stream"):
+        firsts, totals, elapsed = await drive(path, args.requests, args.concurrency)
+        print_row(f"{path} primeiro byte", summarize(firsts, elapsed))
+        print_row(f"{path} total", summarize(totals, elapsed))
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--first-token-ms", type=float, default=150)
+    parser.add_argument("--token-ms", type=float, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
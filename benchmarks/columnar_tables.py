@@ -0,0 +1,115 @@
+"""Benchmark das tabelas colunares vs o dict-of-dicts de `json.load`.
+
+Para cada tamanho de `--sizes` grava usuários e pedidos sintéticos
+(`benchmarks.synthetic`) e compara, nos dois formatos:
+
+1. carga: tempo, pico e memória retida (tracemalloc) da tabela pronta;
+2. lookup por ID (`get_user`/`get_order`) + leitura de um campo, e o
+   registro inteiro (`dict(view)`, o que `/usuarios:batch` serializa);
+3. segmentação: usuários `regiao=RJ&tier=vip` e pedidos `status=delayed`
+   pelo índice secundário vs varredura do dict.
+
+Uso: `python -m benchmarks.columnar_tables --sizes 10000 100000 1000000`
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+from app.columnar import load_table, select
+from app.orders import ORDER_INDEXES, ORDER_SCHEMA, get_order
+from app.users import USER_INDEXES, USER_SCHEMA, get_user
+
+from .synthetic import synthetic_orders, synthetic_users, write_json_array
+
+
+def _legacy(path: Path, key: str, normalize: Callable[[str], str]) -> Dict:
+    with path.open("r", encoding="utf-8") as f:
+        return {normalize(r[key]): r for r in json.load(f)}
+
+
+TABLES = {
+    "users": (
+        synthetic_users,
+        "user_id",
+        str.lower,
+        USER_SCHEMA,
+        USER_INDEXES,
+        get_user,
+        "ticket_medio",
+        {"regiao": "RJ", "tier": "vip"},
+    ),
+    "orders": (
+        synthetic_orders,
+        "order_id",
+        str.upper,
+        ORDER_SCHEMA,
+        ORDER_INDEXES,
+        get_order,
+        "status",
+        {"status": "delayed"},
+    ),
+}
+
+
+def _per_op_us(fn: Callable[[], Any], ops: int) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) / ops * 1e6
+
+
+def bench(name: str, n: int, tmp: Path, lookups: int) -> None:
+    make, key, normalize, schema, indexes, get, field, filtros = TABLES[name]
+    path = tmp / f"{name}_{n}.json"
+    write_json_array(path, make(n))
+    loaders = {
+        "dict": lambda: _legacy(path, key, normalize),
+        "colunar": lambda: load_table(path, schema, key, normalize, indexes),
+    }
+    rng = random.Random(0)
+    prefix = "USR" if name == "users" else "PED"
+    ids = [f"{prefix}-{100000 + rng.randrange(n)}" for _ in range(lookups)]
+    for label, load in loaders.items():
+        t0 = time.perf_counter()
+        table = load()
+        load_s = time.perf_counter() - t0
+        del table
+        tracemalloc.start()
+        table = load()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        lookup_us = _per_op_us(lambda: [get(i, table)[field] for i in ids], len(ids))
+        record_us = _per_op_us(lambda: [dict(get(i, table)) for i in ids], len(ids))
+        select(table, **filtros)  # monta o índice (lazy) fora da medição
+        hits = len(select(table, **filtros))
+        segment_ms = _per_op_us(lambda: list(select(table, **filtros)), 1) / 1000
+        print(
+            f"{name:<7} n={n:<8} {label:<8} carga_s={load_s:.2f} "
+            f"mem_mb={retained / 2**20:.1f} pico_mb={peak / 2**20:.1f} "
+            f"lookup_us={lookup_us:.2f} registro_us={record_us:.2f} "
+            f"segmento_ms={segment_ms:.2f} ({hits})"
+        )
+        del table
+
+
+def run(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            for name in TABLES:
+                bench(name, n, Path(tmp), args.lookups)
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--lookups", type=int, default=20_000)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main_cli()
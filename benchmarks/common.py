@@ -0,0 +1,29 @@
+"""Utilitários compartilhados pelos benchmarks: percentis e relatório."""
+
+import math
+from typing import Dict, List, Sequence
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Percentil por nearest-rank (sem numpy, para valores em segundos)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Resumo padrão: RPS e p50/p95/p99 em milissegundos."""
+    return {
+        "n": len(latencies),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def print_row(label: str, stats: Dict[str, float], **extra: float) -> None:
+    cols = " ".join(f"{k}={v:.1f}" for k, v in {**stats, **extra}.items())
+    print(f"{label:<28} {cols}")
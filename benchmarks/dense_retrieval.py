@@ -0,0 +1,134 @@
+"""Benchmark de retrieval denso (IVF / força bruta) vs TF-IDF em KBs sintéticos.
+
+As consultas são docs do KB perturbados (palavras removidas, erros de
+digitação e parte da resposta), e o doc de origem é o gabarito. Para cada
+tamanho reporta:
+
+- `recall@k`: fração de consultas cujo doc de origem está no top-k;
+- `vs exato`: sobreposição do top-k do IVF com o da força bruta densa;
+- consultas/s por consulta (`retrieve_many` de 1) e em lote (`--batch`).
+
+Uso: `python -m benchmarks.dense_retrieval --sizes 10000,100000,1000000`
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from app.dense_index import write_dense_index
+from app.dense_retriever import DenseRetriever
+from app.embeddings import HashingEncoder
+from app.ingest import doc_text
+from app.retriever import KnowledgeBaseRetriever
+
+from .synthetic import synthetic_kb
+
+
+def perturb(doc: Dict[str, str], rng: random.Random) -> str:
+    """Pergunta + metade da resposta, sem uma palavra e com um erro de digitação."""
+    words = doc["pergunta"].split() + doc["resposta"].split()[:6]
+    words.pop(rng.randrange(len(words)))
+    i = rng.randrange(len(words))
+    if len(words[i]) > 3:
+        j = rng.randrange(len(words[i]))
+        words[i] = words[i][:j] + words[i][j + 1 :]
+    return " ".join(words)
+
+
+def recall(hits: List[List], truth: List[int], k: int) -> float:
+    found = sum(t in [h.index for h in row[:k]] for row, t in zip(hits, truth))
+    return found / len(truth)
+
+
+def overlap(hits: List[List], exact: List[List]) -> float:
+    inter = sum(
+        len({h.index for h in a} & {h.index for h in b}) for a, b in zip(hits, exact)
+    )
+    return inter / max(1, sum(len(b) for b in exact))
+
+
+def timed(retriever, queries: List[str], k: int, batch: int):
+    """(hits, q/s uma a uma, q/s em lote)."""
+    t0 = time.perf_counter()
+    hits = [retriever.retrieve_many([q], top_k=k)[0] for q in queries]
+    single = len(queries) / (time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    for i in range(0, len(queries), batch):
+        retriever.retrieve_many(queries[i : i + batch], top_k=k)
+    batched = len(queries) / (time.perf_counter() - t0)
+    return hits, single, batched
+
+
+def run(args: argparse.Namespace) -> None:
+    nprobes = [int(n) for n in args.nprobe.split(",")]
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(prefix="chatbot-dense-") as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            docs = synthetic_kb(size)
+            truth = [rng.randrange(size) for _ in range(args.queries)]
+            queries = [perturb(docs[t], rng) for t in truth]
+            rows = []
+
+            if size <= args.tfidf_max:
+                kb_path = Path(tmp) / "kb.json"
+                kb_path.write_text(json.dumps(docs), encoding="utf-8")
+                t0 = time.perf_counter()
+                tfidf = KnowledgeBaseRetriever(kb_path)
+                build = time.perf_counter() - t0
+                hits, single, batched = timed(tfidf, queries, args.k, args.batch)
+                rec = recall(hits, truth, args.k)
+                rows.append(("tfidf", build, rec, None, single, batched))
+
+            encoder = HashingEncoder(dim=args.dim)
+            t0 = time.perf_counter()
+            vectors = encoder.encode([doc_text(d) for d in docs])
+            root = Path(tmp) / f"dense-{size}"
+            write_dense_index(
+                root, docs, vectors, encoder.meta, args.quantize, args.nlist
+            )
+            build = time.perf_counter() - t0
+            dense = DenseRetriever(root, ann=False)
+            exact, single, batched = timed(dense, queries, args.k, args.batch)
+            rec = recall(exact, truth, args.k)
+            rows.append(("denso exato", build, rec, 1.0, single, batched))
+            if dense.index.has_ivf:
+                for nprobe in nprobes:
+                    dense.ann, dense.nprobe = True, nprobe
+                    hits, single, batched = timed(dense, queries, args.k, args.batch)
+                    rec, vs_exact = recall(hits, truth, args.k), overlap(hits, exact)
+                    label = f"ivf nprobe={nprobe}"
+                    rows.append((label, build, rec, vs_exact, single, batched))
+
+            nlist = dense.index.meta["nlist"]
+            print(f"-- docs={size} nlist={nlist} {args.quantize} dim={args.dim}")
+            for label, build, rec, vs_exact, single, batched in rows:
+                vs = f"{vs_exact:.3f}" if vs_exact is not None else "  -  "
+                print(
+                    f"   {label:<16} build={build:6.1f}s recall@{args.k}={rec:.3f} "
+                    f"vs exato={vs} q/s={single:8.1f} lote={batched:8.1f}"
+                )
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--quantize", choices=("int8", "float16"), default="int8")
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", default="8,32,64")
+    parser.add_argument(
+        "--tfidf-max", type=int, default=1_000_000, help="maior KB medido com TF-IDF"
+    )
+    parser.add_argument("--seed", type=int, default=3)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,121 @@
+"""Benchmark do filtro por fonte no índice vs pontuar tudo e descartar depois.
+
+Monta o índice unificado (`app.sources`) com um KB sintético de `n` docs e
+`n` usuários e `n` pedidos sintéticos (as políticas são as versionadas) e
+ranqueia as consultas genéricas de `synthetic_queries` restritas às fontes da
+intenção FAQ (`kb` + `politica`, ~1/3 dos docs). Para TF-IDF e BM25 reporta
+consultas/s em lote de:
+
+- `pós-filtro`: produto esparso contra todos os docs, descarte das outras
+  fontes e top-k (o que o app fazia sem `sources`);
+- `filtro no índice`: `retrieve_many(..., sources=...)`, que só percorre os
+  trechos das listas de postings dentro dos intervalos das fontes;
+
+e a concordância dos dois top-k.
+
+Uso: `python -m benchmarks.filtered_retrieval --sizes 1000,10000,100000`
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.bm25 import BM25Retriever
+from app.policies import load_policies
+from app.ranking import Hit
+from app.retriever import KnowledgeBaseRetriever
+from app.sources import INTENT_SOURCES, build_documents
+
+from .synthetic import (
+    synthetic_kb,
+    synthetic_orders,
+    synthetic_queries,
+    synthetic_users,
+)
+
+
+def post_filter(retriever, query_matrix, sources, k):
+    """Pontua todos os docs e só então descarta as fontes fora do filtro."""
+    keep = np.zeros(len(retriever.docs), dtype=bool)
+    for start, end in retriever.doc_ranges(sources):
+        keep[start:end] = True
+    scores = (query_matrix @ retriever._matrix_t).tocsr()
+    out = []
+    for row in range(scores.shape[0]):
+        lo, hi = scores.indptr[row], scores.indptr[row + 1]
+        idx, vals = scores.indices[lo:hi], scores.data[lo:hi]
+        mask = keep[idx]
+        idx, vals = idx[mask], vals[mask]
+        order = np.lexsort((idx, -vals))[:k]
+        out.append([Hit(int(i), float(v)) for i, v in zip(idx[order], vals[order])])
+    return out
+
+
+def agreement(a, b) -> float:
+    same = sum(
+        np.allclose([h.score for h in x], [h.score for h in y[: len(x)]], rtol=1e-4)
+        for x, y in zip(a, b)
+    )
+    return same / max(1, len(a))
+
+
+def run(args: argparse.Namespace) -> None:
+    sources = INTENT_SOURCES["faq"]
+    queries = synthetic_queries(args.queries)
+    with tempfile.TemporaryDirectory(prefix="chatbot-filtered-") as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            kb = synthetic_kb(size)
+            users = {u["user_id"].lower(): u for u in synthetic_users(size)}
+            orders = {o["order_id"].upper(): o for o in synthetic_orders(size)}
+            docs = build_documents(kb, load_policies(), users, orders)
+            kb_path = Path(tmp) / "kb.json"
+            kb_path.write_text(json.dumps(kb), encoding="utf-8")
+            retrievers = {
+                "tfidf": KnowledgeBaseRetriever(kb_path, docs=docs),
+                "bm25": BM25Retriever(docs),
+            }
+            print(f"-- docs={len(docs)} consultas={len(queries)} fontes={sources}")
+            for label, retriever in retrievers.items():
+                query_matrix = retriever.vectorize_many(queries)
+                t0 = time.perf_counter()
+                for i in range(0, len(queries), args.batch):
+                    post_filter(
+                        retriever, query_matrix[i : i + args.batch], sources, args.k
+                    )
+                base = len(queries) / (time.perf_counter() - t0)
+                t0 = time.perf_counter()
+                for i in range(0, len(queries), args.batch):
+                    retriever.retrieve_many(
+                        queries[i : i + args.batch],
+                        top_k=args.k,
+                        query_matrix=query_matrix[i : i + args.batch],
+                        sources=sources,
+                    )
+                filtered = len(queries) / (time.perf_counter() - t0)
+                expected = post_filter(retriever, query_matrix, sources, args.k)
+                got = retriever.retrieve_many(
+                    queries, top_k=args.k, query_matrix=query_matrix, sources=sources
+                )
+                got = [[h for h in row if h.score > 0] for row in got]
+                print(
+                    f"   {label:<6} pós-filtro q/s={base:9.1f} "
+                    f"filtro no índice q/s={filtered:9.1f} "
+                    f"({filtered / base:.2f}x) concordância={agreement(got, expected):.3f}"
+                )
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=32)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main_cli()
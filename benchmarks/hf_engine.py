@@ -0,0 +1,87 @@
+"""Benchmark do motor HF local: tokens/s e latência com 1, 8 e 32 clientes.
+
+Cada cliente manda `--requests` prompts em sequência (loop fechado). Compara
+o motor com `max_batch=1` (um prompt por vez, como o pipeline antigo) com o
+batching dinâmico (`--max-batch`, `--wait-ms`).
+
+Com torch instalado usa o modelo de `HF_MODEL` (respeitando `HF_BACKEND`,
+`HF_QUANTIZE` e `HF_NUM_THREADS`, ver `app.hf_engine`); `--stub`, ou a falta
+de torch, troca por um runner que simula o custo de um forward com padding:
+`--call-ms` por lote mais `--item-ms` por prompt.
+
+Uso: `python -m benchmarks.hf_engine --clients 1,8,32`
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.hf_engine import HFEngine, load_runner
+
+from .common import print_row, summarize
+from .synthetic import synthetic_queries
+
+
+def stub_runner(call_ms: float, item_ms: float, tokens: int = 24):
+    def run(prompts):
+        time.sleep((call_ms + item_ms * len(prompts)) / 1000)
+        return [p[-20:] for p in prompts], tokens * len(prompts)
+
+    return run
+
+
+async def drive(engine: HFEngine, clients: int, requests: int) -> tuple:
+    queries = synthetic_queries(clients * requests, seed=9)
+    latencies: list = []
+
+    async def client(offset: int) -> None:
+        for i in range(requests):
+            t0 = time.perf_counter()
+            await engine.generate(queries[offset + i], "evidência do KB")
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(c * requests) for c in range(clients)))
+    return latencies, time.perf_counter() - t0
+
+
+async def run(args: argparse.Namespace) -> None:
+    stub = args.stub
+    if not stub:
+        try:
+            runner = load_runner()
+        except ImportError:
+            print("torch não instalado: usando o runner simulado (--stub).")
+            stub = True
+    if stub:
+        runner = stub_runner(args.call_ms, args.item_ms)
+    for clients in (int(c) for c in args.clients.split(",")):
+        print(f"-- clientes={clients}")
+        for label, max_batch in (("sem batching", 1), ("dinâmico", args.max_batch)):
+            engine = HFEngine(runner, max_batch=max_batch, max_wait=args.wait_ms / 1000)
+            try:
+                lats, elapsed = await drive(engine, clients, args.requests)
+            finally:
+                engine.stop()
+            print_row(
+                f"   {label}",
+                summarize(lats, elapsed),
+                tokens_s=engine.tokens / elapsed,
+                lote_medio=engine.items / max(engine.batches, 1),
+            )
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--wait-ms", type=float, default=10)
+    parser.add_argument("--stub", action="store_true")
+    parser.add_argument("--call-ms", type=float, default=40)
+    parser.add_argument("--item-ms", type=float, default=4)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
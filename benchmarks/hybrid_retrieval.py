@@ -0,0 +1,116 @@
+"""Benchmark do retrieval híbrido (BM25 + denso, RRF, reranker) em KBs sintéticos.
+
+Mesmas consultas perturbadas de `benchmarks.dense_retrieval` (o doc de origem
+é o gabarito). Para cada tamanho reporta recall@1/recall@k e consultas/s de
+TF-IDF, BM25, denso exato, híbrido e híbrido + reranker, e, para cada limiar
+de `--thresholds`, a fração de consultas que pularia o LLM
+(`CHAT_KB_CONFIDENCE`) e a precisão do top-1 nessas consultas, além da fração
+de consultas genéricas (`synthetic_queries`, que casam com muitos docs) que
+passariam do limiar. Por fim, o tempo de carga do BM25 (montado em memória vs
+postings mapeadas de `write_bm25_index`) e o de montagem do híbrido.
+
+Uso: `python -m benchmarks.hybrid_retrieval --sizes 1000,10000,100000`
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app.bm25 import BM25Retriever, MappedBM25Retriever, write_bm25_index
+from app.dense_index import write_dense_index
+from app.dense_retriever import DenseRetriever
+from app.embeddings import HashingEncoder
+from app.hybrid import HybridRetriever
+from app.ingest import doc_text
+from app.retriever import KnowledgeBaseRetriever
+
+from .dense_retrieval import perturb, recall, timed
+from .synthetic import synthetic_kb, synthetic_queries
+
+
+def confidence_table(hits, truth, thresholds):
+    rows = []
+    for limiar in thresholds:
+        confiantes = [(h, t) for h, t in zip(hits, truth) if h and h[0].score >= limiar]
+        certos = sum(h[0].index == t for h, t in confiantes)
+        rows.append(
+            (limiar, len(confiantes) / len(truth), certos / max(1, len(confiantes)))
+        )
+    return rows
+
+
+def run(args: argparse.Namespace) -> None:
+    thresholds = [float(x) for x in args.thresholds.split(",")]
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(prefix="chatbot-hybrid-") as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            docs = synthetic_kb(size)
+            truth = [rng.randrange(size) for _ in range(args.queries)]
+            queries = [perturb(docs[t], rng) for t in truth]
+
+            kb_path = Path(tmp) / "kb.json"
+            kb_path.write_text(json.dumps(docs), encoding="utf-8")
+            tfidf = KnowledgeBaseRetriever(kb_path)
+            bm25 = BM25Retriever(tfidf.docs)
+            encoder = HashingEncoder()
+            root = Path(tmp) / f"dense-{size}"
+            vectors = encoder.encode([doc_text(d) for d in docs])
+            write_dense_index(root, docs, vectors, encoder.meta, nlist=0)
+            dense = DenseRetriever(root, ann=False)
+            backends = {"bm25": bm25, "dense": dense}
+            retrievers = {
+                "tfidf": tfidf,
+                "bm25": bm25,
+                "denso": dense,
+                "híbrido": HybridRetriever(backends, rerank=False),
+                "híbrido+rerank": HybridRetriever(backends),
+            }
+
+            print(f"-- docs={size} consultas={len(queries)}")
+            for label, retriever in retrievers.items():
+                hits, single, batched = timed(retriever, queries, args.k, args.batch)
+                print(
+                    f"   {label:<15} recall@1={recall(hits, truth, 1):.3f} "
+                    f"recall@{args.k}={recall(hits, truth, args.k):.3f} "
+                    f"q/s={single:8.1f} lote={batched:8.1f}"
+                )
+            genericas = retriever.retrieve_many(synthetic_queries(len(queries)))
+            for limiar, fracao, precisao in confidence_table(hits, truth, thresholds):
+                falsos = sum(h[0].score >= limiar for h in genericas if h)
+                print(
+                    f"   confiança≥{limiar:.2f}: pula LLM em {fracao:.1%} "
+                    f"(top-1 correto em {precisao:.1%}; genéricas "
+                    f"{falsos / len(genericas):.1%})"
+                )
+            t0 = time.perf_counter()
+            BM25Retriever(docs)
+            memoria = time.perf_counter() - t0
+            bm25_root = Path(tmp) / f"bm25-{size}"
+            write_bm25_index(bm25_root, docs)
+            t0 = time.perf_counter()
+            mapeado = MappedBM25Retriever(bm25_root)
+            print(
+                f"   carga do BM25: memória {memoria:.2f}s, "
+                f"mapeado {time.perf_counter() - t0:.3f}s"
+            )
+            t0 = time.perf_counter()
+            HybridRetriever({"bm25": mapeado, "dense": dense})
+            print(f"   montagem do híbrido: {time.perf_counter() - t0:.3f}s")
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--thresholds", default="0.7,0.8,0.9")
+    parser.add_argument("--seed", type=int, default=5)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main_cli()
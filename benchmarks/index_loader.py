@@ -0,0 +1,110 @@
+"""Benchmark de carga do índice: joblib (pickle) vs diretório mapeado em memória.
+
+Gera um KB sintético, grava os dois formatos e sobe `--workers` processos que
+abrem o índice e respondem uma consulta (como workers do uvicorn). Reporta o
+tempo de cold start e a memória por worker: RSS e PSS (`/proc/<pid>/smaps_rollup`,
+que divide as páginas compartilhadas entre os processos que as mapeiam).
+
+Uso: `python -m benchmarks.index_loader --docs 200000 --workers 4`
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+
+from app import ingest
+from app.index_store import write_index
+
+from .synthetic import synthetic_kb
+
+
+def _mem_kb(field: str) -> int:
+    for name in ("/proc/self/smaps_rollup", "/proc/self/status"):
+        try:
+            for line in Path(name).read_text().splitlines():
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+        except OSError:
+            continue
+    return 0
+
+
+def worker(index_path: str) -> None:
+    """Processo filho: abre o índice, responde uma consulta e reporta métricas."""
+    t0 = time.perf_counter()
+    from app.vector_retriever import VectorRetriever
+
+    retriever = VectorRetriever(index_path)
+    retriever.retrieve("como peço reembolso do pedido atrasado")
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({"s": elapsed, "rss": _mem_kb("Rss"), "pss": _mem_kb("Pss")}))
+    sys.stdout.flush()
+    # Mantém o mapeamento vivo até todos os workers medirem.
+    sys.stdin.read()
+
+
+def spawn(index_path: Path, n: int) -> list:
+    procs = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.index_loader",
+                "--worker",
+                str(index_path),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(n)
+    ]
+    results = [json.loads(p.stdout.readline()) for p in procs]
+    for p in procs:
+        p.communicate("")
+    return results
+
+
+def report(label: str, results: list) -> None:
+    cold = max(r["s"] for r in results)
+    rss = sum(r["rss"] for r in results) / len(results) / 1024
+    pss = sum(r["pss"] for r in results) / len(results) / 1024
+    print(
+        f"{label:<8} cold_start={cold:6.2f}s rss/worker={rss:7.1f}MiB pss/worker={pss:7.1f}MiB"
+    )
+
+
+def run(n_docs: int, workers: int) -> None:
+    docs = synthetic_kb(n_docs)
+    vectorizer, matrix = ingest.fit(docs)
+    with tempfile.TemporaryDirectory() as tmp:
+        joblib_path = Path(tmp) / "kb_index.joblib"
+        joblib.dump(
+            {"docs": docs, "vectorizer": vectorizer, "matrix": matrix}, joblib_path
+        )
+        mapped_dir = write_index(Path(tmp) / "kb_index", docs, vectorizer, matrix)
+        print(f"docs={n_docs} workers={workers}")
+        report("joblib", spawn(joblib_path, workers))
+        report("mmap", spawn(mapped_dir, workers))
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.worker)
+    else:
+        run(args.docs, args.workers)
+
+
+if __name__ == "__main__":
+    main_cli()
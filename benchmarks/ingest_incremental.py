@@ -0,0 +1,67 @@
+"""Benchmark de ingestão: rebuild completo vs atualização incremental.
+
+Para cada tamanho de KB sintético, publica um índice completo, altera/adiciona
+`--churn` (fração) das entradas e mede `build_mapped_index` contra
+`update_mapped_index` sobre o mesmo KB alterado.
+
+Uso: `python -m benchmarks.ingest_incremental --sizes 10000,100000,1000000`
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app import ingest
+
+from .synthetic import synthetic_kb
+
+
+def timed(fn, *args, **kwargs) -> float:
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(*args, **kwargs)
+    return time.perf_counter() - t0
+
+
+def mutate(docs: list, churn: float, seed: int = 3) -> list:
+    rng = random.Random(seed)
+    docs = list(docs)
+    n = max(1, int(len(docs) * churn))
+    for i in rng.sample(range(len(docs)), n // 2):
+        docs[i] = {**docs[i], "resposta": docs[i]["resposta"] + f" revisado{i}"}
+    for i in range(n - n // 2):
+        docs.append(
+            {"id": f"novo_{i}", "pergunta": f"pergunta nova {i}", "resposta": "nova"}
+        )
+    return docs
+
+
+def run(sizes, churn: float) -> None:
+    for size in sizes:
+        base = synthetic_kb(size)
+        changed = mutate(base, churn)
+        with tempfile.TemporaryDirectory() as tmp:
+            full_dir, inc_dir = Path(tmp) / "full", Path(tmp) / "inc"
+            timed(ingest.build_mapped_index, base, inc_dir)
+            full = timed(ingest.build_mapped_index, changed, full_dir)
+            inc = timed(ingest.update_mapped_index, changed, inc_dir, 1.0)
+        print(
+            f"docs={size:>8} churn={churn:.1%} full={full:7.2f}s "
+            f"incremental={inc:7.2f}s speedup={full / inc:5.1f}x"
+        )
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--churn", type=float, default=0.01)
+    args = parser.parse_args()
+    run([int(s) for s in args.sizes.split(",")], args.churn)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,178 @@
+"""Benchmark de parse e serialização JSON na camada de dados e nas respostas.
+
+1. Parse de `--sizes` usuários sintéticos: `json.load` do arquivo inteiro vs
+   `iter_json_array` (lista em fluxo) vs `iter_ndjson` (stdlib e `orjson`,
+   se instalado). Tempo e pico de memória (tracemalloc) consumindo item a
+   item, sem reter os registros.
+2. Serialização de `--sizes` pedidos: lista inteira e uma linha por pedido
+   (NDJSON), `json.dumps` vs `pydantic_core.to_json` vs `orjson`.
+3. Rotas: `/pedido` e `/chat` com `response_model` validando o retorno
+   (como antes) vs `FastJSONResponse`, num app mínimo em processo
+   (`--requests` chamadas cada, conteúdo fixo).
+
+Uso: `python -m benchmarks.json_io --sizes 1000 10000 100000 1000000`
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import httpx
+import pydantic_core
+from fastapi import FastAPI
+
+from app import jsonstream
+from app.jsonstream import iter_json_array, iter_ndjson
+from app.main import ChatResponse, OrderResponse, _order_payload
+from app.responses import FastJSONResponse, orjson
+
+from .common import print_row, summarize
+from .synthetic import synthetic_orders, synthetic_users, write_json_array
+
+
+def _measure(fn: Callable[[], Any]) -> Dict[str, float]:
+    t0 = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - t0
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"s": seconds, "pico_mb": peak / 2**20}
+
+
+def _ndjson_with(loads: Callable[[Any], Any], path: Path) -> int:
+    original = jsonstream.loads
+    jsonstream.loads = loads
+    try:
+        return sum(1 for _ in iter_ndjson(path))
+    finally:
+        jsonstream.loads = original
+
+
+def parse(n: int, tmp: Path) -> None:
+    array_path = tmp / f"users_{n}.json"
+    ndjson_path = tmp / f"users_{n}.ndjson"
+    write_json_array(array_path, synthetic_users(n))
+    with ndjson_path.open("w", encoding="utf-8") as f:
+        for user in synthetic_users(n):
+            f.write(json.dumps(user, ensure_ascii=False) + "\n")
+
+    def whole() -> int:
+        with array_path.open("r", encoding="utf-8") as f:
+            return sum(1 for _ in json.load(f))
+
+    cases = {
+        "json.load": whole,
+        "iter_json_array": lambda: sum(1 for _ in iter_json_array(array_path)),
+        "iter_ndjson (json)": lambda: _ndjson_with(json.loads, ndjson_path),
+    }
+    if orjson is not None:
+        cases["iter_ndjson (orjson)"] = lambda: _ndjson_with(orjson.loads, ndjson_path)
+    for label, fn in cases.items():
+        stats = _measure(fn)
+        print(
+            f"parse n={n:<8} {label:<22} s={stats['s']:.3f} "
+            f"registros_s={n / stats['s']:.0f} pico_mb={stats['pico_mb']:.1f}"
+        )
+
+
+def serialize(n: int) -> None:
+    orders = list(synthetic_orders(n))
+    encoders: Dict[str, Callable[[Any], bytes]] = {
+        "json.dumps": lambda v: json.dumps(
+            v, ensure_ascii=False, separators=(",", ":")
+        ).encode(),
+        "pydantic_core": pydantic_core.to_json,
+    }
+    if orjson is not None:
+        encoders["orjson"] = orjson.dumps
+    for label, encode in encoders.items():
+        t0 = time.perf_counter()
+        encode(orders)
+        whole = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for order in orders:
+            encode(order)
+        lines = time.perf_counter() - t0
+        print(
+            f"dump  n={n:<8} {label:<22} lista_s={whole:.3f} "
+            f"linhas_s={lines:.3f} registros_s={n / lines:.0f}"
+        )
+
+
+def routes_app() -> FastAPI:
+    """App mínimo com as duas variantes de `/pedido` e `/chat`."""
+    order = {
+        "order_id": "PED-123",
+        "cliente": "Ana",
+        "status": "out_for_delivery",
+        "eta_minutos": 8,
+        "total": 72.5,
+        "itens": [{"nome": "Pizza Marguerita", "qtd": 1}, {"nome": "Refri", "qtd": 2}],
+    }
+    chat = ChatResponse(resposta="Seu pedido sai em 8 minutos." * 4, fonte="faq")
+    app = FastAPI()
+
+    @app.get("/antes/pedido", response_model=OrderResponse)
+    async def pedido_antes() -> OrderResponse:
+        return OrderResponse(**_order_payload(order))
+
+    @app.get("/depois/pedido", response_model=OrderResponse)
+    async def pedido_depois() -> FastJSONResponse:
+        return FastJSONResponse(_order_payload(order))
+
+    @app.get("/antes/chat", response_model=ChatResponse)
+    async def chat_antes() -> ChatResponse:
+        return chat.model_copy()
+
+    @app.get("/depois/chat", response_model=ChatResponse)
+    async def chat_depois() -> FastJSONResponse:
+        return FastJSONResponse(chat.model_copy())
+
+    return app
+
+
+async def routes(requests: int) -> None:
+    transport = httpx.ASGITransport(app=routes_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as cli:
+        for rota in ("pedido", "chat"):
+            for variante in ("antes", "depois"):
+                url = f"/{variante}/{rota}"
+                await cli.get(url)
+                lats: List[float] = []
+                t_all = time.perf_counter()
+                for _ in range(requests):
+                    t0 = time.perf_counter()
+                    await cli.get(url)
+                    lats.append(time.perf_counter() - t0)
+                print_row(url, summarize(lats, time.perf_counter() - t_all))
+
+
+def run(args: argparse.Namespace) -> None:
+    print(f"-- orjson: {'sim' if orjson is not None else 'não instalado'}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            parse(n, Path(tmp))
+    for n in args.sizes:
+        serialize(n)
+    print(f"-- rotas ({args.requests} chamadas)")
+    asyncio.run(routes(args.requests))
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--requests", type=int, default=3000)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,295 @@
+"""Teste de carga em processo: replay de um corpus JSONL contra /chat e /pedido.
+
+Monta o app real com provedores stub (OpenAI -> Gemini -> HF, ver
+`benchmarks.stubs`) e dispara as requisições por `httpx.ASGITransport`, com
+concorrência limitada. Reporta, por rota, RPS, p50/p95/p99 e status HTTP, e a
+quebra por etapa do /chat lida das métricas do app (`chat_stage_seconds`,
+`chat_provider_seconds`, `chat_generation_path_seconds`).
+
+Baseline: `--save-baseline` grava o resultado em `--baseline` (JSON); nas
+execuções seguintes, os percentis/RPS são comparados com ele e o que piorar
+mais que `--tolerance` aparece como regressão (`--fail-on-regression` faz o
+processo sair com código 1, útil em CI). O baseline só vale para a mesma
+máquina e os mesmos parâmetros, que ficam gravados junto.
+
+Uso:
+    python -m benchmarks.loadtest --requests 2000 --concurrency 64
+    python -m benchmarks.loadtest --scale 1000 --openai lognormal:400,0.6 \\
+        --openai-errors 0.05 --hedge-ms 800
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+from app import main, metrics
+from app.providers import ProviderRegistry
+from app.reload import Reloader
+
+from .common import summarize
+from .stubs import StubProvider
+from .synthetic import write_dataset
+
+BENCH_DIR = Path(__file__).resolve().parent
+CORPUS = BENCH_DIR / "corpus" / "mensagens.jsonl"
+BASELINE = BENCH_DIR / "baselines" / "loadtest.json"
+PROVIDERS = ("openai", "gemini", "hf")
+# Métricas comparadas com o baseline: maior é pior, exceto RPS.
+COMPARED = ("p50_ms", "p95_ms", "p99_ms", "rps")
+# Parâmetros que definem a carga (gravados junto do baseline).
+WORKLOAD_ARGS = (
+    "requests",
+    "concurrency",
+    "scale",
+    "openai",
+    "gemini",
+    "hf",
+    "openai_errors",
+    "gemini_errors",
+    "hf_errors",
+    "disable",
+    "hedge_ms",
+    "cache",
+    "seed",
+)
+
+
+def load_corpus(path: Path) -> List[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_workload(
+    corpus: List[Dict[str, Any]], order_ids: List[str], total: int, seed: int
+) -> List[Dict[str, Any]]:
+    """Sorteia `total` requisições; `order_id: null` vira um pedido existente."""
+    rng = random.Random(seed)
+    workload = []
+    for _ in range(total):
+        item = rng.choice(corpus)
+        if item["rota"] == "pedido" and item.get("order_id") is None:
+            item = {**item, "order_id": rng.choice(order_ids)}
+        workload.append(item)
+    return workload
+
+
+def histogram_quantile(bounds, counts: List[int], q: float) -> float:
+    """Quantil aproximado (limite superior do bucket), como no Prometheus."""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    acc = 0
+    for bound, n in zip((*bounds, float("inf")), counts):
+        acc += n
+        if acc >= q * total:
+            return bound
+    return float("inf")
+
+
+def histogram_delta(hist: metrics.Histogram, before) -> Dict[str, Dict[str, float]]:
+    """Média, p95 aproximado e contagem de cada série desde `before`."""
+    out = {}
+    for key, (counts, total) in hist.snapshot().items():
+        old_counts, old_total = before.get(key, ([0] * len(counts), 0.0))
+        delta = [a - b for a, b in zip(counts, old_counts)]
+        n = sum(delta)
+        if not n:
+            continue
+        out["/".join(key)] = {
+            "n": n,
+            "mean_ms": (total - old_total) / n * 1000,
+            "p95_ms": histogram_quantile(hist.buckets, delta, 0.95) * 1000,
+        }
+    return out
+
+
+async def replay(workload: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: Dict[str, List[float]] = {"chat": [], "pedido": []}
+    status: Dict[str, Dict[str, int]] = {"chat": {}, "pedido": {}}
+    headers = {"X-API-Key": os.environ["API_KEY"]} if os.getenv("API_KEY") else {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", headers=headers, timeout=None
+    ) as cli:
+
+        async def one(item: Dict[str, Any]) -> None:
+            rota = item["rota"]
+            async with sem:
+                t0 = time.perf_counter()
+                if rota == "chat":
+                    resp = await cli.post("/chat", json={"mensagem": item["mensagem"]})
+                else:
+                    resp = await cli.get(f"/pedido/{item['order_id']}")
+                latencies[rota].append(time.perf_counter() - t0)
+            code = str(resp.status_code)
+            status[rota][code] = status[rota].get(code, 0) + 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(item) for item in workload))
+        elapsed = time.perf_counter() - t0
+    routes = {
+        rota: {**summarize(lats, elapsed), "status": status[rota]}
+        for rota, lats in latencies.items()
+        if lats
+    }
+    all_lats = [x for lats in latencies.values() for x in lats]
+    routes["total"] = summarize(all_lats, elapsed)
+    return routes
+
+
+def compare(
+    result: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float,
+    min_delta_ms: float = 25.0,
+):
+    """Lista de regressões (rota, métrica, baseline, atual).
+
+    Latência só conta como regressão se piorar mais que `tolerance` e mais que
+    `min_delta_ms` em valor absoluto (caudas de rotas de ~ms são ruidosas).
+    """
+    regressions = []
+    for rota, stats in result["routes"].items():
+        base = baseline.get("routes", {}).get(rota)
+        if not base:
+            continue
+        for key in COMPARED:
+            old, new = base.get(key), stats.get(key)
+            if not old or new is None:
+                continue
+            if key == "rps":
+                worse = new < old * (1 - tolerance)
+            else:
+                worse = new > old * (1 + tolerance) and new - old > min_delta_ms
+            if worse:
+                regressions.append((rota, key, old, new))
+    return regressions
+
+
+def setup(args: argparse.Namespace, data_dir: Path | None) -> List[StubProvider]:
+    if data_dir is not None:
+        print(f"dataset sintético x{args.scale}: {write_dataset(data_dir, args.scale)}")
+        main.reloader = Reloader(data_dir)
+    main.HEDGE_AFTER = args.hedge_ms / 1000 if args.hedge_ms else None
+    if not args.cache:
+        main.response_cache = None
+    stubs = [
+        StubProvider(
+            name,
+            latency=getattr(args, name),
+            error_rate=getattr(args, f"{name}_errors"),
+            seed=args.seed + i,
+        )
+        for i, name in enumerate(PROVIDERS)
+        if name not in args.disable
+    ]
+    main.provider_registry = ProviderRegistry.static([s.provider() for s in stubs])
+    return stubs
+
+
+async def run(args: argparse.Namespace, data_dir: Path | None) -> Dict[str, Any]:
+    stubs = setup(args, data_dir)
+    gen = await main.reloader.warm_up()
+    workload = build_workload(
+        load_corpus(args.corpus), list(gen.orders), args.requests, args.seed
+    )
+    tracked = (metrics.STAGE_SECONDS, metrics.PROVIDER_SECONDS, metrics.PATH_SECONDS)
+    before = [h.snapshot() for h in tracked]
+    routes = await replay(workload, args.concurrency)
+    stages, providers, paths = (
+        histogram_delta(h, snap) for h, snap in zip(tracked, before)
+    )
+    return {
+        "config": {k: v for k, v in vars(args).items() if k in WORKLOAD_ARGS}
+        | {
+            "corpus": args.corpus.name,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "routes": routes,
+        "stages": stages,
+        "providers": providers,
+        "paths": paths,
+        "stubs": {s.name: s.stats() for s in stubs},
+    }
+
+
+def report(result: Dict[str, Any]) -> None:
+    for rota, stats in result["routes"].items():
+        cols = " ".join(
+            f"{k}={v:.1f}" for k, v in stats.items() if isinstance(v, (int, float))
+        )
+        print(f"{rota:<8} {cols} {stats.get('status', '')}")
+    for section in ("stages", "providers", "paths"):
+        print(f"-- {section}")
+        for name, s in sorted(result[section].items()):
+            print(
+                f"   {name:<22} n={s['n']:<6} média={s['mean_ms']:.2f}ms "
+                f"p95≤{s['p95_ms']:.1f}ms"
+            )
+    print(f"-- stubs {result['stubs']}")
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, default=CORPUS)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument(
+        "--scale", type=int, default=0, help="fator do dataset sintético (0 = data/)"
+    )
+    parser.add_argument("--openai", default="lognormal:350,0.5")
+    parser.add_argument("--gemini", default="lognormal:450,0.5")
+    parser.add_argument("--hf", default="normal:900,150")
+    parser.add_argument("--openai-errors", type=float, default=0.02)
+    parser.add_argument("--gemini-errors", type=float, default=0.02)
+    parser.add_argument("--hf-errors", type=float, default=0.0)
+    parser.add_argument("--disable", nargs="*", default=[], choices=PROVIDERS)
+    parser.add_argument("--hedge-ms", type=float, default=0)
+    parser.add_argument("--cache", action="store_true", help="mantém o cache ligado")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--min-delta-ms", type=float, default=25.0)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    # Falhas simuladas dos stubs gerariam um warning por requisição.
+    logging.getLogger("uvicorn.error").setLevel(logging.ERROR)
+    if args.scale:
+        with tempfile.TemporaryDirectory(prefix="chatbot-load-") as tmp:
+            result = asyncio.run(run(args, Path(tmp)))
+    else:
+        result = asyncio.run(run(args, None))
+    report(result)
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+        print(f"baseline salvo em {args.baseline}")
+        return
+    if not args.baseline.exists():
+        return
+    regressions = compare(result, json.loads(args.baseline.read_text()), args.tolerance)
+    for rota, key, old, new in regressions:
+        print(f"REGRESSÃO {rota}.{key}: {old:.1f} -> {new:.1f}")
+    if not regressions:
+        print(f"sem regressões vs {args.baseline} (tolerância {args.tolerance:.0%})")
+    elif args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,92 @@
+"""Custo da instrumentação do /chat (spans, histogramas, contadores).
+
+- `por requisição`: executa, em loop, exatamente as chamadas de métricas que
+  uma requisição /chat com geração faz (5 etapas, 1 provedor, caminho e
+  lookup de cache) e reporta microssegundos por requisição.
+- `ponta a ponta`: `main.chat` com provedor stub instantâneo, com as
+  métricas reais vs. `stage`/`observe` trocados por no-op.
+
+Uso: `python -m benchmarks.metrics_overhead --iterations 200000`
+"""
+
+import argparse
+import asyncio
+import time
+
+from app import auth, main, metrics
+from app.generation import Provider
+from app.providers import ProviderRegistry
+
+from .common import percentile
+
+MESSAGE = "Posso trocar um item por alergia?"
+
+
+def per_request(iterations: int) -> float:
+    perf = time.perf_counter
+    stage = metrics.stage
+    provider_seconds = metrics.PROVIDER_SECONDS
+    path_seconds = metrics.PATH_SECONDS
+    cache_lookups = metrics.CACHE_LOOKUPS
+    t0 = perf()
+    for _ in range(iterations):
+        inicio = t = perf()
+        stage("intent", t)
+        t = perf()
+        stage("retrieval", t)
+        t = perf()
+        stage("cache", t)
+        cache_lookups.inc("miss")
+        t = perf()
+        provider_seconds.observe(perf() - t, "stub", "ok")
+        path_seconds.observe(stage("generation", t) - t, "stub")
+        stage("total", inicio)
+    return (perf() - t0) / iterations * 1e6
+
+
+def _noop(*args, **kwargs) -> float:
+    return 0.0
+
+
+async def end_to_end(requests: int) -> list:
+    async def generate(pergunta: str, evidencia: str) -> str:
+        return evidencia
+
+    main.response_cache = None
+    main.provider_registry = ProviderRegistry.static([Provider("stub", "s", generate)])
+    await main.reloader.warm_up()
+    req = main.ChatRequest(mensagem=MESSAGE)
+    lats = []
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        await main.chat(req, auth.ANONYMOUS)
+        lats.append(time.perf_counter() - t0)
+    return lats
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=3000)
+    args = parser.parse_args()
+
+    print(f"por requisição: {per_request(args.iterations):.2f}µs de instrumentação")
+
+    ligado = asyncio.run(end_to_end(args.requests))
+    originals = (main.stage, metrics.Histogram.observe, metrics.Counter.inc)
+    main.stage = lambda name, start: time.perf_counter()
+    metrics.Histogram.observe = _noop
+    metrics.Counter.inc = _noop
+    try:
+        desligado = asyncio.run(end_to_end(args.requests))
+    finally:
+        main.stage, metrics.Histogram.observe, metrics.Counter.inc = originals
+    for label, lats in (("métricas ligadas", ligado), ("métricas no-op", desligado)):
+        print(
+            f"{label:<18} p50={percentile(lats, 50) * 1e6:.1f}µs "
+            f"p99={percentile(lats, 99) * 1e6:.1f}µs"
+        )
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,81 @@
+"""Benchmark da montagem de prompts: tokens, prefixo estável e custo por prompt.
+
+Para cada combinação de `--k` (trechos de evidência) e `--budget` (teto de
+tokens), monta o prompt de `--queries` consultas sintéticas com os `k`
+trechos seguintes do KB sintético e reporta: tokens médios e máximos do
+prompt, fração ocupada pelo prefixo estável (reaproveitável pelo cache de
+prompt do provedor), trechos que couberam e o custo de montagem (µs, contagem
+de tokens em cache). A linha `sem orçamento` junta todos os trechos, como
+seria sem o corte.
+
+Uso: `python -m benchmarks.prompt_budget --k 1,3,5 --budget 256,1024`
+"""
+
+import argparse
+import time
+
+from app.prompts import (
+    SYSTEM_PROMPT,
+    build_prompt,
+    count_tokens,
+    evidence_budget,
+    select_evidence,
+)
+
+from .common import percentile
+from .synthetic import synthetic_kb, synthetic_queries
+
+
+def measure(queries, snippets, k: int, budget: int) -> dict:
+    prefix = count_tokens(SYSTEM_PROMPT)
+    tokens, custos, trechos_usados = [], [], 0
+    for i, pergunta in enumerate(queries):
+        trechos = [snippets[(i + j) % len(snippets)] for j in range(k)]
+        t0 = time.perf_counter()
+        evidencia = select_evidence(trechos, evidence_budget(pergunta, budget), k)
+        prompt = build_prompt(pergunta, evidencia, max_tokens=budget)
+        custos.append(time.perf_counter() - t0)
+        tokens.append(prompt.tokens)
+        trechos_usados += evidencia.count("\n[") + 1
+    return {
+        "tokens_med": sum(tokens) / len(tokens),
+        "tokens_max": max(tokens),
+        "prefixo_pct": 100 * prefix * len(tokens) / sum(tokens),
+        "trechos_med": trechos_usados / len(queries),
+        "p50_us": percentile(custos, 50) * 1e6,
+        "p99_us": percentile(custos, 99) * 1e6,
+    }
+
+
+def run(args: argparse.Namespace) -> None:
+    queries = synthetic_queries(args.queries, seed=5)
+    # Evidências longas (várias respostas coladas) para o orçamento fazer efeito.
+    kb = synthetic_kb(args.queries + 8, seed=5)
+    snippets = [
+        " ".join(kb[(i + j) % len(kb)]["resposta"] for j in range(args.snippet_docs))
+        for i in range(len(kb))
+    ]
+    print(f"-- prefixo estável: {count_tokens(SYSTEM_PROMPT)} tokens")
+    for k in (int(v) for v in args.k.split(",")):
+        livre = measure(queries, snippets, k, 10**9)
+        print(
+            f"k={k} sem orçamento".ljust(28),
+            f"tokens_med={livre['tokens_med']:.1f} tokens_max={livre['tokens_max']}",
+        )
+        for budget in (int(v) for v in args.budget.split(",")):
+            stats = measure(queries, snippets, k, budget)
+            cols = " ".join(f"{n}={v:.1f}" for n, v in stats.items())
+            print(f"k={k} orçamento={budget}".ljust(28), cols)
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", default="1,3,5")
+    parser.add_argument("--budget", default="256,1024")
+    parser.add_argument("--snippet-docs", type=int, default=6)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,96 @@
+"""Benchmark do cache de respostas: latência do hit e chamadas evitadas ao provedor.
+
+Replaya variações das perguntas mais comuns contra o /chat (in-process) com um
+provedor stub que conta chamadas, com e sem `response_cache`.
+
+Uso: `python -m benchmarks.response_cache --requests 2000`
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from app import auth, main
+from app.generation import Provider
+from app.providers import ProviderRegistry
+
+from .common import percentile
+
+VARIACOES = [
+    "Meu pedido está atrasado, o que faço?",
+    "meu pedido esta atrasado o que faco",
+    "Como peço reembolso?",
+    "como peco reembolso",
+    "Quero reembolso, como peço?",
+    "Posso trocar um item por alergia?",
+    "posso trocar item por alergia",
+    "Como cancelar meu pedido?",
+    "como cancelar o meu pedido",
+    "Como falo com o entregador?",
+    "como falo com entregador",
+    "Quero falar com o entregador, como falo?",
+]
+
+
+def counting_stub(latency: float) -> tuple[Provider, list]:
+    calls: list = []
+
+    async def generate(pergunta: str, evidencia: str) -> str:
+        calls.append(pergunta)
+        await asyncio.sleep(latency)
+        return evidencia
+
+    return Provider("stub", "stub-1", generate), calls
+
+
+async def replay(total: int, latency: float) -> tuple[list, int]:
+    provider, calls = counting_stub(latency)
+    main.provider_registry = ProviderRegistry.static([provider])
+    main.HEDGE_AFTER = None
+    rng = random.Random(7)
+    lats = []
+    for _ in range(total):
+        req = main.ChatRequest(mensagem=rng.choice(VARIACOES))
+        t0 = time.perf_counter()
+        await main.chat(req, auth.ANONYMOUS)
+        lats.append(time.perf_counter() - t0)
+    return lats, len(calls)
+
+
+def bench_lookup(cache, n: int = 20000) -> float:
+    """Custo médio de um `get` com hit exato, em microssegundos."""
+    cache.put("stub", "stub-1", "faq_reembolso", "Como peço reembolso?", "resp")
+    t0 = time.perf_counter()
+    for _ in range(n):
+        cache.get("stub", "stub-1", "faq_reembolso", "Como peço reembolso?")
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+async def run(args: argparse.Namespace) -> None:
+    latency = args.latency_ms / 1000
+    saved = main.response_cache
+    main.response_cache = None
+    lats, calls = await replay(args.requests, latency)
+    print(f"sem cache: chamadas={calls} p50={percentile(lats, 50)*1e3:.2f}ms")
+
+    main.response_cache = saved or main.ResponseCache()
+    main.response_cache.invalidate()
+    lats, calls = await replay(args.requests, latency)
+    stats = main.response_cache.stats()
+    print(
+        f"com cache: chamadas={calls} p50={percentile(lats, 50)*1e3:.2f}ms "
+        f"hits={stats['hits']} near_hits={stats['near_hits']} misses={stats['misses']}"
+    )
+    print(f"get (hit exato): {bench_lookup(main.response_cache):.2f}µs")
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,78 @@
+"""Benchmark de retrieval: caminho antigo (uma consulta, sorted) vs `retrieve_many`.
+
+Gera KBs sintéticos de 1k a 1M entradas e mede consultas/s de:
+- `antigo`: `cosine_similarity` + `sorted(zip(docs, scores))` + `doc.copy()`;
+- `retrieve`: API por consulta, agora via argpartition;
+- `retrieve_many`: lote de `--batch` consultas num único produto esparso.
+
+Uso: `python -m benchmarks.retrieval --sizes 1000,10000,100000,1000000`
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from sklearn.metrics.pairwise import cosine_similarity
+
+from app.retriever import KnowledgeBaseRetriever
+
+from .synthetic import synthetic_kb, synthetic_queries
+
+
+def old_retrieve(retriever: KnowledgeBaseRetriever, query: str, top_k: int = 3):
+    query_vec = retriever.vectorize(query)
+    scores = cosine_similarity(query_vec, retriever._matrix).flatten()
+    ranked = sorted(zip(retriever.docs, scores), key=lambda x: x[1], reverse=True)[
+        :top_k
+    ]
+    results = []
+    for doc, score in ranked:
+        entry = doc.copy()
+        entry["score"] = float(score)
+        results.append(entry)
+    return results
+
+
+def qps(fn, queries, per_call: int = 1) -> float:
+    t0 = time.perf_counter()
+    calls = 0
+    for q in queries:
+        fn(q)
+        calls += per_call
+    return calls / (time.perf_counter() - t0)
+
+
+def run(sizes, n_queries: int, batch: int) -> None:
+    queries = synthetic_queries(n_queries)
+    lotes = [queries[i : i + batch] for i in range(0, len(queries), batch)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            kb_path = Path(tmp) / "kb.json"
+            kb_path.write_text(json.dumps(synthetic_kb(size)), encoding="utf-8")
+            t0 = time.perf_counter()
+            retriever = KnowledgeBaseRetriever(kb_path)
+            fit = time.perf_counter() - t0
+            # O caminho antigo é O(N log N) em Python; limita as consultas.
+            poucas = queries[: max(5, min(n_queries, 2_000_000 // size))]
+            antigo = qps(lambda q: old_retrieve(retriever, q), poucas)
+            atual = qps(retriever.retrieve, queries)
+            lote = qps(retriever.retrieve_many, lotes, per_call=batch)
+            print(
+                f"docs={size:>8} fit={fit:6.2f}s antigo={antigo:9.1f} q/s "
+                f"retrieve={atual:9.1f} q/s retrieve_many={lote:9.1f} q/s"
+            )
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--batch", type=int, default=32)
+    args = parser.parse_args()
+    run([int(s) for s in args.sizes.split(",")], args.queries, args.batch)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,132 @@
+"""Benchmark das sessões: memória por sessão, vazão do store e conversas de 2 turnos.
+
+1. Memória (tracemalloc) de `--sessions` sessões com 2 docs e um pedido nas
+   entidades: `Session` com `__slots__` vs o mesmo registro num dict, e a
+   estimativa usada pelo teto `SESSION_MAX_BYTES`.
+2. Vazão de get+put no `MemorySessionStore` e no `KeyValueSessionStore`
+   sobre o `LocalKeyValue` (custo da serialização JSON, sem rede).
+3. `--conversations` conversas no app em processo: "Qual o status do meu
+   pedido?" e depois só o número. Com sessão o 2º turno pula roteamento e
+   retrieval; sem sessão o cliente precisa repetir a pergunta com o código.
+
+Uso: `python -m benchmarks.sessions --sessions 100000 --conversations 500`
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+import httpx
+
+from app import main
+from app.providers import ProviderRegistry
+from app.sessions import (
+    KeyValueSessionStore,
+    LocalKeyValue,
+    MemorySessionStore,
+    Session,
+)
+
+from .common import print_row, summarize
+
+DOCS = (
+    ("faq_reembolso", "Como peço reembolso?", "Se o pedido não foi entregue..."),
+    ("faq_atraso", "Meu pedido atrasou", "Pedidos atrasados têm cupom..."),
+)
+
+
+def _session(i: int) -> Session:
+    return Session(f"sessao-{i:08d}", "faq", "order_id", {"order_id": "PED-123"}, DOCS)
+
+
+def _record(i: int) -> dict:
+    return {
+        "id": f"sessao-{i:08d}",
+        "intent": "faq",
+        "slot": "order_id",
+        "entities": {"order_id": "PED-123"},
+        "docs": DOCS,
+        "query": None,
+        "turns": 0,
+        "expires": 0.0,
+        "size": 0,
+    }
+
+
+def memory(n: int) -> None:
+    for label, make in (("dict", _record), ("__slots__", _session)):
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        items = [make(i) for i in range(n)]
+        used = tracemalloc.get_traced_memory()[0] - base
+        tracemalloc.stop()
+        print(f"{label:<28} bytes_por_sessao={used / n:.0f}")
+        del items
+    print(f"{'estimativa do store':<28} bytes_por_sessao={_session(0).estimate_size()}")
+
+
+async def throughput(n: int) -> None:
+    stores = (
+        ("memória", MemorySessionStore(max_sessions=n)),
+        ("key-value (local)", KeyValueSessionStore(LocalKeyValue())),
+    )
+    for label, store in stores:
+        t0 = time.perf_counter()
+        for i in range(n):
+            session = await store.get(f"sessao-{i:08d}") or _session(i)
+            session.turns += 1
+            await store.put(session)
+        elapsed = time.perf_counter() - t0
+        print(f"{label:<28} get_put_s={n / elapsed:.0f}")
+
+
+async def conversations(n: int, with_session: bool) -> None:
+    main.session_store = MemorySessionStore() if with_session else None
+    transport = httpx.ASGITransport(app=main.app)
+    first, second = [], []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as cli:
+        await cli.post("/chat", json={"mensagem": "aquecimento"})
+        t_all = time.perf_counter()
+        for i in range(n):
+            sessao = f"c{i}" if with_session else None
+            t0 = time.perf_counter()
+            await cli.post(
+                "/chat",
+                json={"mensagem": "Qual o status do meu pedido?", "sessao": sessao},
+            )
+            first.append(time.perf_counter() - t0)
+            mensagem = "123" if with_session else "Qual o status do pedido PED-123?"
+            t0 = time.perf_counter()
+            resp = await cli.post(
+                "/chat", json={"mensagem": mensagem, "sessao": sessao}
+            )
+            second.append(time.perf_counter() - t0)
+            assert resp.json()["fonte"] == "orders.json"
+        elapsed = time.perf_counter() - t_all
+    label = "com sessão" if with_session else "sem sessão"
+    print_row(f"{label}: 1º turno", summarize(first, elapsed / 2))
+    print_row(f"{label}: 2º turno", summarize(second, elapsed / 2))
+
+
+async def run(args: argparse.Namespace) -> None:
+    print(f"-- memória ({args.sessions} sessões)")
+    memory(args.sessions)
+    print(f"-- store ({args.sessions} get+put)")
+    await throughput(args.sessions)
+    print(f"-- conversas de 2 turnos ({args.conversations})")
+    main.provider_registry = ProviderRegistry.static([])
+    await main.current_generation()
+    for with_session in (False, True):
+        await conversations(args.conversations, with_session)
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--conversations", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
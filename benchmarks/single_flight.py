@@ -0,0 +1,103 @@
+"""Benchmark do single-flight: rajada de mensagens quase iguais num incidente.
+
+`--requests` requisições `/chat` simultâneas (app em processo, cache de
+respostas desligado); uma fração `--duplicate-ratio` é a mesma reclamação com
+variações de caixa e pontuação, o resto são consultas sintéticas distintas.
+O provedor stub demora `--latency-ms` e atende no máximo `--provider-slots`
+chamadas ao mesmo tempo (a cota do provedor). Compara com e sem
+coalescência: chamadas ao provedor, RPS e p50/p95/p99.
+
+Uso: `python -m benchmarks.single_flight --requests 500`
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from app import main
+from app.generation import Provider
+from app.providers import ProviderRegistry
+from app.single_flight import SingleFlight
+
+from .common import print_row, summarize
+from .synthetic import synthetic_queries
+
+INCIDENT = (
+    "Meu lanche ainda não chegou",
+    "meu lanche ainda nao chegou!",
+    "MEU LANCHE AINDA NÃO CHEGOU??",
+    "meu lanche ainda não chegou...",
+)
+
+
+def quota_stub(latency: float, slots: int) -> tuple[Provider, list]:
+    calls: list = []
+    quota = asyncio.Semaphore(slots)
+
+    async def generate(pergunta: str, evidencia: str) -> str:
+        calls.append(pergunta)
+        async with quota:
+            await asyncio.sleep(latency)
+        return evidencia
+
+    return Provider("stub", "stub", generate), calls
+
+
+def burst(n: int, ratio: float, seed: int) -> list:
+    rng = random.Random(seed)
+    others = iter(synthetic_queries(n, seed))
+    return [
+        rng.choice(INCIDENT) if rng.random() < ratio else next(others) for _ in range(n)
+    ]
+
+
+async def drive(messages: list) -> tuple[list, float]:
+    latencies: list = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as cli:
+
+        async def one(mensagem: str) -> None:
+            t0 = time.perf_counter()
+            resp = await cli.post("/chat", json={"mensagem": mensagem})
+            resp.raise_for_status()
+            latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(m) for m in messages))
+        return latencies, time.perf_counter() - t0
+
+
+async def run(args: argparse.Namespace) -> None:
+    main.response_cache = None
+    await main.current_generation()
+    messages = burst(args.requests, args.duplicate_ratio, args.seed)
+    print(
+        f"-- requisições={args.requests} duplicadas={args.duplicate_ratio:.0%} "
+        f"latência={args.latency_ms}ms cota={args.provider_slots}"
+    )
+    for label, single_flight in (
+        ("sem coalescência", None),
+        ("com single-flight", SingleFlight(timeout=30)),
+    ):
+        provider, calls = quota_stub(args.latency_ms / 1000, args.provider_slots)
+        main.provider_registry = ProviderRegistry.static([provider])
+        main.single_flight = single_flight
+        lats, elapsed = await drive(messages)
+        print_row(label, summarize(lats, elapsed), chamadas_provedor=len(calls))
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.8)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--provider-slots", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=11)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
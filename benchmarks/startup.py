@@ -0,0 +1,89 @@
+"""Benchmark de startup: tempo de import do app e tempo até a primeira resposta.
+
+Cada medida roda num processo novo (caches de import frios no interpretador):
+
+- `import`: tempo cumulativo de `import app.main` via `python -X importtime`.
+- `liveness`: processo novo até o primeiro `GET /healthz` respondido.
+- `primeiro chat`: processo novo até o primeiro `POST /chat` respondido
+  (carrega a geração de dados sob demanda).
+- `eager`: carrega dados e provedores antes de servir, como o startup antigo.
+
+Uso: `python -m benchmarks.startup --runs 5`
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from .common import percentile
+
+MESSAGE = {"mensagem": "Posso trocar um item por alergia?"}
+
+
+def import_time() -> float:
+    """Segundos cumulativos de `import app.main` reportados pelo importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in proc.stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == "app.main":
+            return int(parts[1]) / 1e6
+    raise RuntimeError("app.main não apareceu no importtime")
+
+
+def worker(mode: str) -> None:
+    """Processo filho: mede do início do processo até a primeira resposta."""
+    t0 = time.perf_counter()
+    import asyncio
+
+    from fastapi.testclient import TestClient
+
+    from app import main
+
+    if mode == "eager":
+        asyncio.run(main.warm_up())
+    client = TestClient(main.app)
+    if mode == "liveness":
+        client.get("/healthz").raise_for_status()
+    else:
+        client.post("/chat", json=MESSAGE).raise_for_status()
+    print(json.dumps({"s": time.perf_counter() - t0}))
+
+
+def first_response(mode: str) -> float:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--worker", mode],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])["s"]
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--worker", choices=("liveness", "chat", "eager"))
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.worker)
+        return
+    rows = {
+        "import app.main": import_time,
+        "liveness (/healthz)": lambda: first_response("liveness"),
+        "primeiro /chat": lambda: first_response("chat"),
+        "eager (warm-up + /chat)": lambda: first_response("eager"),
+    }
+    for name, measure in rows.items():
+        samples = [measure() for _ in range(args.runs)]
+        print(f"{name:<26} p50={percentile(samples, 50):.3f}s max={max(samples):.3f}s")
+
+
+if __name__ == "__main__":
+    main_cli()
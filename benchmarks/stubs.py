@@ -0,0 +1,92 @@
+"""Provedores stub (OpenAI/Gemini/HF) em processo, sem rede.
+
+Cada stub sorteia a latência de uma distribuição e falha com uma taxa
+configurável. Distribuições em milissegundos, no formato `tipo:parâmetros`:
+
+- `fixed:80`
+- `uniform:50,150`
+- `normal:100,20` (média, desvio; truncada em 0)
+- `lognormal:300,0.6` (mediana, sigma; cauda longa típica de APIs de LLM)
+
+Os stubs também implementam `stream`, emitindo `tokens` trechos ao longo da
+mesma latência (primeiro trecho após `first_token_ratio` do total).
+"""
+
+import asyncio
+import math
+import random
+from dataclasses import dataclass, field
+from typing import Callable, Dict
+
+from app.generation import Provider
+
+
+def parse_distribution(spec: str, seed: int = 0) -> Callable[[], float]:
+    """Converte `tipo:params` (ms) num sorteador que devolve segundos."""
+    kind, _, raw = spec.partition(":")
+    params = [float(p) for p in raw.split(",") if p]
+    rng = random.Random(seed)
+    if kind == "fixed":
+        return lambda: params[0] / 1000
+    if kind == "uniform":
+        return lambda: rng.uniform(params[0], params[1]) / 1000
+    if kind == "normal":
+        return lambda: max(0.0, rng.gauss(params[0], params[1])) / 1000
+    if kind == "lognormal":
+        mu = math.log(params[0])
+        return lambda: rng.lognormvariate(mu, params[1]) / 1000
+    raise ValueError(f"Distribuição desconhecida: {spec!r}")
+
+
+@dataclass
+class StubProvider:
+    """Provedor fake com latência sorteada e taxa de erro; conta chamadas."""
+
+    name: str
+    latency: str = "lognormal:300,0.5"
+    error_rate: float = 0.0
+    tokens: int = 20
+    first_token_ratio: float = 0.3
+    seed: int = 0
+    calls: int = 0
+    errors: int = 0
+    _sample: Callable[[], float] = field(init=False, repr=False)
+    _rng: random.Random = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._sample = parse_distribution(self.latency, self.seed)
+        self._rng = random.Random(self.seed + 1)
+
+    def _should_fail(self) -> bool:
+        self.calls += 1
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.errors += 1
+            return True
+        return False
+
+    async def generate(self, pergunta: str, evidencia: str) -> str:
+        fail = self._should_fail()
+        await asyncio.sleep(self._sample())
+        if fail:
+            raise RuntimeError(f"{self.name}: erro simulado")
+        return f"[{self.name}] {evidencia}"
+
+    async def stream(self, pergunta: str, evidencia: str):
+        fail = self._should_fail()
+        total = self._sample()
+        await asyncio.sleep(total * self.first_token_ratio)
+        gap = total * (1 - self.first_token_ratio) / max(self.tokens - 1, 1)
+        words = f"[{self.name}] {evidencia}".split()
+        step = max(1, math.ceil(len(words) / self.tokens))
+        for i in range(0, len(words), step):
+            if i:
+                await asyncio.sleep(gap)
+            if fail and i >= len(words) // 2:
+                raise RuntimeError(f"{self.name}: erro simulado no stream")
+            yield " ".join(words[i : i + step]) + " "
+
+    def provider(self) -> Provider:
+        return Provider(self.name, f"stub-{self.name}", self.generate, self.stream)
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "errors": self.errors}
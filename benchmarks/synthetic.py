@@ -0,0 +1,209 @@
+"""Geradores de dados sintéticos (KB, pedidos, usuários) para benchmarks em escala.
+
+`python -m benchmarks.synthetic --scale 1000 --out /tmp/chatbot-data` grava um
+diretório no formato de `data/` (`source/*.json`) com o KB, os pedidos e os
+usuários multiplicados pelo fator em relação aos arquivos versionados; as
+políticas são copiadas. Os JSON são escritos em streaming, item a item.
+"""
+
+import argparse
+import json
+import random
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+TEMAS = [
+    "pedido",
+    "entrega",
+    "atraso",
+    "reembolso",
+    "cancelamento",
+    "alergia",
+    "entregador",
+    "cupom",
+    "pagamento",
+    "pix",
+    "cartao",
+    "loja",
+    "cardapio",
+    "endereco",
+    "troca",
+    "item",
+    "faltando",
+    "frio",
+    "quebrado",
+    "horario",
+]
+VERBOS = [
+    "como",
+    "posso",
+    "quero",
+    "preciso",
+    "onde",
+    "quando",
+    "devo",
+    "consigo",
+    "solicitar",
+    "alterar",
+    "verificar",
+    "confirmar",
+    "falar",
+    "receber",
+]
+COMPLEMENTOS = [
+    "meu",
+    "do",
+    "no",
+    "para",
+    "com",
+    "sem",
+    "hoje",
+    "agora",
+    "app",
+    "suporte",
+    "prazo",
+    "status",
+    "valor",
+    "taxa",
+    "regiao",
+    "vip",
+    "novo",
+    "recorrente",
+]
+
+
+def synthetic_kb(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """KB com `n` entradas; o sufixo numérico torna cada doc distinguível."""
+    rng = random.Random(seed)
+    docs = []
+    for i in range(n):
+        tema = rng.sample(TEMAS, 2)
+        pergunta = " ".join(
+            [rng.choice(VERBOS), *tema, rng.choice(COMPLEMENTOS), f"tema{i % 5000}"]
+        )
+        resposta = " ".join(rng.choices(TEMAS + COMPLEMENTOS, k=12))
+        docs.append(
+            {"id": f"syn_{i}", "pergunta": pergunta, "resposta": resposta, "tags": tema}
+        )
+    return docs
+
+
+def synthetic_queries(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return [
+        " ".join([rng.choice(VERBOS), *rng.sample(TEMAS, 2), rng.choice(COMPLEMENTOS)])
+        for _ in range(n)
+    ]
+
+
+STATUS = ["preparing", "out_for_delivery", "delivered", "delayed", "cancelled"]
+ITENS = [
+    "Pizza Marguerita",
+    "Refrigerante",
+    "Hamburguer",
+    "Sushi Combo",
+    "Suco de Laranja",
+    "Açaí 500ml",
+    "Salada Caesar",
+    "Pastel de Queijo",
+    "Marmita Fit",
+    "Brigadeiro",
+]
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Hugo"]
+REGIOES = ["SP", "RJ", "MG", "BA", "PR", "RS", "PE", "DF"]
+TIERS = ["novo", "recorrente", "vip"]
+CANAIS = ["app", "web", "whatsapp"]
+FLAGS = ["", "pedido_atraso", "reembolso_em_andamento", "alergia", "cupom_ativo"]
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def synthetic_orders(n: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """Pedidos `PED-<n>` no mesmo formato de `orders.json`."""
+    rng = random.Random(seed)
+    for i in range(n):
+        status = rng.choice(STATUS)
+        itens = [
+            {"nome": nome, "qtd": rng.randint(1, 3)}
+            for nome in rng.sample(ITENS, rng.randint(1, 3))
+        ]
+        yield {
+            "order_id": f"PED-{100000 + i}",
+            "cliente": rng.choice(NOMES),
+            "status": status,
+            "eta_minutos": 0 if status == "delivered" else rng.randint(5, 60),
+            "total": round(rng.uniform(15, 250), 2),
+            "itens": itens,
+        }
+
+
+def synthetic_users(n: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """Usuários `USR-<n>` no mesmo formato de `users.json`."""
+    rng = random.Random(seed)
+    for i in range(n):
+        yield {
+            "user_id": f"USR-{100000 + i}",
+            "nome": rng.choice(NOMES),
+            "regiao": rng.choice(REGIOES),
+            "tier": rng.choice(TIERS),
+            "canal_preferido": rng.choice(CANAIS),
+            "pedidos": rng.randint(0, 80),
+            "ticket_medio": round(rng.uniform(20, 120), 1),
+            "ultima_interacao": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "flag": rng.choice(FLAGS),
+        }
+
+
+def write_json_array(path: Path, items: Iterable[Dict[str, Any]]) -> int:
+    """Grava uma lista JSON item a item (sem montar a lista em memória)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with path.open("w", encoding="utf-8") as f:
+        f.write("[\n")
+        for item in items:
+            if count:
+                f.write(",\n")
+            f.write(json.dumps(item, ensure_ascii=False))
+            count += 1
+        f.write("\n]\n")
+    return count
+
+
+def base_counts(data_dir: Path = DATA_DIR) -> Dict[str, int]:
+    """Tamanho atual de cada fonte versionada (referência para `--scale`)."""
+    source = data_dir / "source"
+    return {
+        name: len(json.loads((source / f"{name}.json").read_text(encoding="utf-8")))
+        for name in ("kb", "orders", "users")
+    }
+
+
+def write_dataset(out_dir: Path, scale: int, seed: int = 0) -> Dict[str, int]:
+    """Gera `out_dir/source/` com KB, pedidos e usuários `scale` vezes maiores."""
+    counts = {name: n * scale for name, n in base_counts().items()}
+    source = out_dir / "source"
+    written = {
+        "kb": write_json_array(source / "kb.json", synthetic_kb(counts["kb"], seed)),
+        "orders": write_json_array(
+            source / "orders.json", synthetic_orders(counts["orders"], seed)
+        ),
+        "users": write_json_array(
+            source / "users.json", synthetic_users(counts["users"], seed)
+        ),
+    }
+    shutil.copy(DATA_DIR / "source" / "policies.json", source / "policies.json")
+    return written
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(write_dataset(args.out, args.scale, args.seed))
+
+
+if __name__ == "__main__":
+    main_cli()
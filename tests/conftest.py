@@ -0,0 +1,18 @@
+"""Fixtures compartilhadas pelos testes."""
+
+import pytest
+
+
+class FakeClock:
+    """Relógio controlado pelo teste: `clock.now += 1` avança o tempo."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
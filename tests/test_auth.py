@@ -0,0 +1,209 @@
+"""Testes de auth multi-chave, cache de verificação e limites por cliente."""
+
+import asyncio
+import hashlib
+import json
+import os
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.pop("API_KEY", None)
+
+from app import auth, main  # noqa: E402
+from app.generation import Provider  # noqa: E402
+from app.metrics import API_KEY_CACHE, API_REJECTIONS  # noqa: E402
+from app.providers import ProviderRegistry  # noqa: E402
+from app.ratelimit import ClientLimiter, FailureLimiter  # noqa: E402
+
+
+def _keys_file(tmp_path, *entries) -> str:
+    path = tmp_path / "api_keys.json"
+    path.write_text(json.dumps(list(entries)), encoding="utf-8")
+    return str(path)
+
+
+def _count_pbkdf2(monkeypatch) -> list:
+    chamadas = []
+    original = hashlib.pbkdf2_hmac
+
+    def pbkdf2(name, raw, salt, iterations):
+        chamadas.append(raw)
+        return original(name, raw, salt, iterations)
+
+    monkeypatch.setattr(hashlib, "pbkdf2_hmac", pbkdf2)
+    return chamadas
+
+
+def test_hashed_keys_cache_and_token_bucket(tmp_path, monkeypatch, clock):
+    path = _keys_file(
+        tmp_path,
+        {"id": "app", "hash": auth.hash_key("chave-app"), "rate": 1, "burst": 2},
+        {
+            "id": "parceiro",
+            "prefix": "p1",
+            "hash": auth.hash_key("p1.chave-lenta", iterations=1000),
+        },
+    )
+    assert "chave-app" not in open(path, encoding="utf-8").read()
+    monkeypatch.setenv("API_KEYS_FILE", path)
+    monkeypatch.setattr(auth, "KEYSTORE", auth.keystore_from_env())
+    monkeypatch.setattr(auth, "LIMITER", ClientLimiter(clock=clock))
+    monkeypatch.setattr(auth, "AUTH_FAILURES", FailureLimiter(clock=clock))
+    chamadas = _count_pbkdf2(monkeypatch)
+    client = TestClient(main.app)
+
+    def pedido(chave):
+        headers = {"X-API-Key": chave} if chave else {}
+        return client.get("/pedido/PED-123", headers=headers)
+
+    assert pedido(None).status_code == 401
+    negadas = API_REJECTIONS.value("-", "unauthorized")
+    assert pedido("errada").status_code == 401
+    assert pedido("outra.errada").status_code == 401
+    assert chamadas == []  # sem prefixo conhecido: nenhum PBKDF2
+    assert pedido("p1.errada").status_code == 401
+    assert pedido("p1.errada").status_code == 401
+    assert API_REJECTIONS.value("-", "unauthorized") == negadas + 4
+    assert chamadas == [b"p1.errada"]  # a 2ª veio do cache de inválidas
+
+    hits = API_KEY_CACHE.value("hit")
+    for _ in range(3):
+        assert pedido("p1.chave-lenta").status_code == 200  # sem limite próprio
+    assert chamadas == [b"p1.errada", b"p1.chave-lenta"]
+    assert API_KEY_CACHE.value("hit") == hits + 2
+
+    assert [pedido("chave-app").status_code for _ in range(3)] == [200, 200, 429]
+    resp = pedido("chave-app")
+    assert resp.headers["Retry-After"] == "1"
+    assert pedido("p1.chave-lenta").status_code == 200  # outro cliente segue livre
+    clock.now += 1.0
+    assert pedido("chave-app").status_code == 200
+    assert API_REJECTIONS.value("app", "rate_limited") >= 2
+
+
+def test_invalid_keys_are_throttled_and_do_not_evict_valid_ones(monkeypatch, clock):
+    prefix, key = auth.new_key()
+    assert key.startswith(prefix + ".")
+    with pytest.raises(ValueError, match="sem `prefix`"):
+        auth.KeyStore([(auth.hash_key("k", 1000), auth.ApiClient("sem-prefixo"))])
+    store = auth.KeyStore(
+        [(auth.hash_key(key, 1000), auth.ApiClient("c"), prefix)],
+        cache_max=1,
+        miss_cache_max=4,
+    )
+    monkeypatch.setattr(auth, "KEYSTORE", store)
+    monkeypatch.setattr(auth, "LIMITER", ClientLimiter(clock=clock))
+    monkeypatch.setattr(
+        auth, "AUTH_FAILURES", FailureLimiter(rate=1, burst=3, clock=clock)
+    )
+    chamadas = _count_pbkdf2(monkeypatch)
+    client = TestClient(main.app)
+
+    def pedido(chave):
+        return client.get("/pedido/PED-123", headers={"X-API-Key": chave})
+
+    assert pedido(key).status_code == 200
+    status = [pedido(f"{prefix}.chute-{i}").status_code for i in range(5)]
+    # 3 falhas esgotam o bucket do endereço: as seguintes nem são hasheadas.
+    assert status == [401, 401, 401, 429, 429]
+    assert len(chamadas) == 4
+    assert API_REJECTIONS.value("-", "auth_throttled") >= 2
+    # A chave válida continua no cache: responde sem hash e sem cair no 429.
+    assert pedido(key).status_code == 200
+    assert len(chamadas) == 4
+    clock.now += 1.0
+    assert pedido(f"{prefix}.chute-9").status_code == 401
+
+
+def test_concurrency_limit_rejects_before_retrieval(monkeypatch):
+    liberar = asyncio.Event()
+
+    async def gera(pergunta: str, evidencia: str) -> str:
+        await liberar.wait()
+        return "Resposta gerada."
+
+    store = auth.KeyStore(
+        [
+            (auth.hash_key("k1"), auth.ApiClient("k1", concurrency=1)),
+            (auth.hash_key("k2"), auth.ApiClient("k2", concurrency=1)),
+        ]
+    )
+    monkeypatch.setattr(auth, "KEYSTORE", store)
+    monkeypatch.setattr(auth, "LIMITER", ClientLimiter(concurrency_retry=2))
+    monkeypatch.setattr(main, "response_cache", None)
+    monkeypatch.setattr(main, "session_store", None)
+    monkeypatch.setattr(
+        main, "provider_registry", ProviderRegistry.static([Provider("p", "m", gera)])
+    )
+    rotas = []
+    original = main.route_message
+    monkeypatch.setattr(main, "route_message", lambda m: rotas.append(m) or original(m))
+
+    async def go():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as cli:
+
+            def chat(chave, rota="/chat"):
+                return cli.post(
+                    rota,
+                    json={"mensagem": "O item veio frio"},
+                    headers={"X-API-Key": chave},
+                )
+
+            primeira = asyncio.create_task(chat("k1"))
+            while auth.LIMITER.in_flight("k1") == 0:
+                await asyncio.sleep(0.001)
+            recusada = await chat("k1")
+            assert recusada.status_code == 429
+            assert recusada.headers["Retry-After"] == "2"
+            assert len(rotas) == 1  # o 429 não chegou ao roteamento
+            pedido = await cli.get("/pedido/PED-123", headers={"X-API-Key": "k1"})
+            assert pedido.status_code == 200  # só chats contam na concorrência
+            outra = asyncio.create_task(chat("k2", "/chat/stream"))
+            while auth.LIMITER.in_flight("k2") == 0:
+                await asyncio.sleep(0.001)
+            liberar.set()
+            assert (await primeira).json()["resposta"] == "Resposta gerada."
+            assert "Resposta gerada." in (await outra).text
+        assert auth.LIMITER.in_flight("k1") == auth.LIMITER.in_flight("k2") == 0
+
+    asyncio.run(go())
+    assert API_REJECTIONS.value("k1", "concurrency_limited") >= 1
+
+
+def test_chat_batch_respects_client_rate_and_concurrency(monkeypatch, clock):
+    ativos = [0]
+    pico = [0]
+
+    async def gera(pergunta: str, evidencia: str) -> str:
+        ativos[0] += 1
+        pico[0] = max(pico[0], ativos[0])
+        await asyncio.sleep(0.01)
+        ativos[0] -= 1
+        return "Resposta gerada."
+
+    cliente = auth.ApiClient("lote", rate=1, burst=4, concurrency=2)
+    monkeypatch.setattr(
+        auth, "KEYSTORE", auth.KeyStore([(auth.hash_key("k"), cliente)])
+    )
+    monkeypatch.setattr(auth, "LIMITER", ClientLimiter(clock=clock))
+    monkeypatch.setattr(main, "response_cache", None)
+    monkeypatch.setattr(main, "session_store", None)
+    monkeypatch.setattr(
+        main, "provider_registry", ProviderRegistry.static([Provider("p", "m", gera)])
+    )
+    recusas = API_REJECTIONS.value("lote", "rate_limited")
+    mensagens = [f"O item {i} veio frio" for i in range(6)]
+    resp = TestClient(main.app).post(
+        "/chat:batch", json={"mensagens": mensagens}, headers={"X-API-Key": "k"}
+    )
+    assert resp.status_code == 200
+    itens = resp.json()["resultados"]
+    # 4 tokens: 1 da requisição + 3 itens cobrados; os 2 últimos ficam sem.
+    assert [item.get("resposta") for item in itens[:4]] == ["Resposta gerada."] * 4
+    assert [item["status"] for item in itens[4:]] == [429, 429]
+    assert itens[4]["retry_after"] == 1
+    assert API_REJECTIONS.value("lote", "rate_limited") == recusas + 2
+    assert pico[0] == 2  # concurrency do cliente, não CHAT_BATCH_CONCURRENCY
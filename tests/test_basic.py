@@ -1,4 +1,5 @@
 """Testes básicos de saúde, chat e pedido (sem API_KEY)."""
+
 import os
 
 import pytest
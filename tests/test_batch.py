@@ -0,0 +1,92 @@
+"""Testes dos endpoints de lote (`/pedidos:batch`, `/usuarios:batch`, `/chat:batch`)."""
+
+import asyncio
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+os.environ.pop("API_KEY", None)
+
+from app import main  # noqa: E402
+from app.generation import Provider  # noqa: E402
+from app.providers import ProviderRegistry  # noqa: E402
+
+NDJSON = {"content-type": "application/x-ndjson"}
+
+
+def _lines(resp):
+    return [json.loads(line) for line in resp.text.splitlines()]
+
+
+def test_orders_and_users_batch_json_and_ndjson():
+    client = TestClient(main.app)
+    resp = client.post("/pedidos:batch", json={"ids": ["PED-123", "ped-456", "PED-0"]})
+    out = resp.json()["resultados"]
+    assert [r["indice"] for r in out] == [0, 1, 2]
+    assert out[1]["order_id"] == "PED-456" and out[1]["status"] == "preparing"
+    assert out[2] == {
+        "indice": 2,
+        "order_id": "PED-0",
+        "erro": "Pedido não encontrado.",
+    }
+
+    body = b'"USR-001"\n{"user_id": "usr-002"}\nnao e json\n\n{"x": 1}'
+    resp = client.post("/usuarios:batch", content=body, headers=NDJSON)
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    out = _lines(resp)
+    assert [r.get("user_id") for r in out] == ["USR-001", "USR-002", None, None]
+    assert out[2]["erro"] == "JSON inválido na linha 3."
+
+
+def test_batch_limits_and_validation(monkeypatch):
+    client = TestClient(main.app)
+    monkeypatch.setattr(main, "BATCH_MAX_ITEMS", 2)
+    resp = client.post("/pedidos:batch", json={"ids": ["PED-1"] * 3})
+    assert resp.status_code == 413
+    assert client.post("/chat:batch", json={"ids": []}).status_code == 422
+    # NDJSON não tem limite de itens: é processado em pedaços.
+    monkeypatch.setattr(main, "BATCH_CHUNK", 2)
+    body = "\n".join(json.dumps(f"PED-{i}") for i in range(5)).encode()
+    resp = client.post("/pedidos:batch", content=body, headers=NDJSON)
+    assert [r["indice"] for r in _lines(resp)] == [0, 1, 2, 3, 4]
+
+
+def test_chat_batch_single_retrieval_and_bounded_generation(monkeypatch):
+    ativas, pico = 0, 0
+
+    async def gera(pergunta: str, evidencia: str) -> str:
+        nonlocal ativas, pico
+        ativas += 1
+        pico = max(pico, ativas)
+        await asyncio.sleep(0.01)
+        ativas -= 1
+        return f"gerado: {pergunta}"
+
+    retriever = main.reloader.current.active_retriever
+    chamadas = []
+    original = type(retriever).retrieve_many
+
+    def conta(self, queries, *args, **kwargs):
+        chamadas.append(len(queries))
+        return original(self, queries, *args, **kwargs)
+
+    monkeypatch.setattr(type(retriever), "retrieve_many", conta)
+    monkeypatch.setattr(main, "response_cache", None)
+    monkeypatch.setattr(main, "BATCH_CONCURRENCY", 3)
+    monkeypatch.setattr(
+        main, "provider_registry", ProviderRegistry.static([Provider("p", "m", gera)])
+    )
+    mensagens = [f"Posso trocar o item {i} por alergia?" for i in range(10)]
+    mensagens += ["status do PED-123", {"sem": "mensagem"}]
+    body = "\n".join(json.dumps({"mensagem": m}) for m in mensagens[:-1])
+    body += "\n" + json.dumps(mensagens[-1])
+    client = TestClient(main.app)
+    out = _lines(client.post("/chat:batch", content=body.encode(), headers=NDJSON))
+
+    assert chamadas == [10]  # um retrieval vetorizado para as 10 FAQs
+    assert 1 < pico <= 3
+    assert all(r["via_modelo"] for r in out[:10])
+    assert out[0]["resposta"] == f"gerado: {mensagens[0]}"
+    assert out[10]["fonte"] == "orders.json" and not out[10]["via_modelo"]
+    assert out[11] == {"indice": 11, "erro": "Item sem `mensagem` (string)."}
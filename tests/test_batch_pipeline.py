@@ -0,0 +1,160 @@
+"""Testes do pipeline offline (`python -m app.batch`): lotes, fallback e retomada."""
+
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+os.environ.pop("API_KEY", None)
+
+from app import batch, main  # noqa: E402
+from app.generation import Provider, run_chain  # noqa: E402
+from app.providers import ProviderRegistry  # noqa: E402
+from app.resilience import AdaptiveTimeout, CircuitBreaker, ProviderGuard  # noqa: E402
+
+FAQ = "Posso trocar o item {} por alergia?"
+
+
+class Crash(BaseException):
+    """Simula o processo morrendo no meio de um pedaço."""
+
+
+def _write_input(path, n=9):
+    lines = [json.dumps({"id": f"m{i}", "mensagem": FAQ.format(i)}) for i in range(n)]
+    lines[2] = json.dumps("status do PED-123")
+    lines[4] = "nao e json"
+    lines[5] = ""
+    lines[6] = json.dumps(
+        {"messages": [{"role": "user", "content": "falha: posso trocar por alergia?"}]}
+    )
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def _providers(monkeypatch, crash_on=None):
+    calls = {"api": 0, "hf": []}
+
+    async def api(pergunta: str, evidencia: str) -> str:
+        calls["api"] += 1
+        if calls["api"] == crash_on:
+            raise Crash()
+        if pergunta.startswith("falha"):
+            raise RuntimeError("provedor fora")
+        await asyncio.sleep(0.001)
+        return f"api: {pergunta}"
+
+    async def hf_many(pares, batch_size):
+        calls["hf"].append((len(pares), batch_size))
+        return [f"hf: {pergunta}" for pergunta, _ in pares]
+
+    async def hf(pergunta: str, evidencia: str) -> str:
+        raise AssertionError("o pipeline offline usa generate_many")
+
+    registry = ProviderRegistry.static(
+        [Provider("api", "m", api), Provider("hf", "t5", hf, None, hf_many)]
+    )
+    monkeypatch.setattr(main, "provider_registry", registry)
+    monkeypatch.setattr(main, "response_cache", None)
+    return calls
+
+
+def _args(tmp_path, *extra):
+    return batch.build_parser().parse_args(
+        [
+            str(tmp_path / "in.jsonl"),
+            "--output",
+            str(tmp_path / "out.jsonl"),
+            "--chunk",
+            "4",
+            "--report-every",
+            "0",
+            *extra,
+        ]
+    )
+
+
+def _output(tmp_path):
+    text = (tmp_path / "out.jsonl").read_text(encoding="utf-8")
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def test_pipeline_batches_local_fallback_and_keeps_order(tmp_path, monkeypatch):
+    _write_input(tmp_path / "in.jsonl")
+    calls = _providers(monkeypatch)
+    paths = asyncio.run(batch.run(_args(tmp_path, "--hf-batch-size", "16")))
+
+    out = _output(tmp_path)
+    assert [r["linha"] for r in out] == [1, 2, 3, 4, 5, 7, 8, 9]
+    assert out[0] == {
+        "linha": 1,
+        "id": "m0",
+        "resposta": f"api: {FAQ.format(0)}",
+        "fonte": out[0]["fonte"],
+        "via_modelo": True,
+        "aviso_modelo": None,
+    }
+    assert out[2]["fonte"] == "orders.json"
+    assert out[3]["id"] == "m3" and out[3]["via_modelo"]
+    assert out[4] == {"linha": 5, "erro": "JSON inválido na linha 5."}
+    # A API falhou: a mensagem segue para o lote local, numa chamada só.
+    assert out[5]["resposta"].startswith("hf: falha")
+    assert calls["hf"] == [(1, 16)]
+    assert paths == {"api": 5, "exata": 1, "erro": 1, "hf": 1}
+
+
+def test_pipeline_resumes_from_checkpoint_after_crash(tmp_path, monkeypatch):
+    _write_input(tmp_path / "in.jsonl")
+    _providers(monkeypatch)
+    asyncio.run(batch.run(_args(tmp_path)))
+    expected = _output(tmp_path)
+
+    # A 4ª chamada à API cai no segundo pedaço (linhas 5-9).
+    _providers(monkeypatch, crash_on=4)
+    with pytest.raises(Crash):
+        asyncio.run(batch.run(_args(tmp_path, "--restart")))
+    ckpt = json.loads((tmp_path / "out.jsonl.checkpoint.json").read_text())
+    assert ckpt["lines"] == 4 and not ckpt["done"]
+    with open(tmp_path / "out.jsonl", "ab") as out:
+        out.write(b'{"linha": 5, "resp')  # escrita parcial antes da queda
+
+    calls = _providers(monkeypatch)
+    asyncio.run(batch.run(_args(tmp_path)))
+    assert _output(tmp_path) == expected
+    assert calls["api"] == 3  # só o que faltava (linhas 7-9)
+    assert json.loads((tmp_path / "out.jsonl.checkpoint.json").read_text())["done"]
+    assert asyncio.run(batch.run(_args(tmp_path))) == {}
+
+
+def test_rate_limiter_spaces_calls():
+    async def go():
+        limiter = batch.RateLimiter(rate=200)
+        start = time.perf_counter()
+        await asyncio.gather(*(limiter.acquire() for _ in range(6)))
+        return time.perf_counter() - start
+
+    assert asyncio.run(go()) >= 5 / 200 * 0.9
+
+
+def test_rate_limit_wait_does_not_count_against_provider_timeout():
+    async def api(pergunta: str, evidencia: str) -> str:
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    guard = ProviderGuard(
+        CircuitBreaker("api", failure_threshold=3),
+        AdaptiveTimeout(minimum=0.2, maximum=0.2),
+    )
+    provider = batch.rate_limited(
+        Provider("api", "m", api, guard=guard), batch.RateLimiter(rate=40)
+    )
+
+    async def go():
+        # 16 chamadas a 40/s: as últimas esperam ~0.4 s na fila, mais que o
+        # timeout de 0.2 s; a espera fica fora do guard.
+        return await asyncio.gather(
+            *(run_chain([provider], "p", "e") for _ in range(16))
+        )
+
+    assert [r and r[0] for r in asyncio.run(go())] == ["ok"] * 16
+    assert guard.state == "closed"
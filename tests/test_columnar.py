@@ -0,0 +1,91 @@
+"""Testes das tabelas colunares de usuários/pedidos e do leitor JSON em fluxo."""
+
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+os.environ.pop("API_KEY", None)
+
+from app import main  # noqa: E402
+from app.columnar import ColumnarTable, select  # noqa: E402
+from app.jsonstream import iter_json_array  # noqa: E402
+from app.orders import ORDER_SCHEMA, ORDERS_PATH, load_orders  # noqa: E402
+from app.users import USER_SCHEMA, USERS_PATH, load_users  # noqa: E402
+
+
+def _raw(path):
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def test_tables_round_trip_source_records_and_keep_mapping_semantics(monkeypatch):
+    users, orders = load_users(), load_orders()
+    assert isinstance(users, ColumnarTable) and isinstance(orders, ColumnarTable)
+    assert users == {u["user_id"].lower(): u for u in _raw(USERS_PATH)}
+    assert orders == {o["order_id"].upper(): o for o in _raw(ORDERS_PATH)}
+    pedido = orders["PED-123"]
+    assert pedido["itens"][0] == {"nome": "Pizza Marguerita", "qtd": 1}
+    assert not hasattr(pedido, "__dict__")  # view com slots, sem cópia do registro
+    assert "PED-999" not in orders and orders.get("ped-123") is None
+    assert next(iter(users.values()))["user_id"] == "USR-001"
+
+    # Campo extra, faltando ou de outro tipo: o registro volta como veio.
+    estranhos = [
+        {"order_id": "a", "status": "x", "brinde": True},
+        {"order_id": "b", "cliente": 1, "status": "y", "eta_minutos": 1,
+         "total": 10, "itens": []},
+        {"order_id": "A", "cliente": "Z", "status": "x", "eta_minutos": None,
+         "total": 1.5, "itens": None},
+    ]  # fmt: skip
+    tabela = ColumnarTable(estranhos, ORDER_SCHEMA, "order_id", str.upper)
+    assert tabela == {"A": estranhos[2], "B": estranhos[1]}  # ID repetido: o último
+    assert [dict(r) for r in tabela.where(status="x")] == [estranhos[2]]
+
+    monkeypatch.setenv("DATA_COLUMNAR", "0")
+    assert type(load_users()) is dict and load_users() == users
+
+
+def test_secondary_indexes_match_a_full_scan():
+    users = load_users()
+    legado = {u["user_id"].lower(): u for u in _raw(USERS_PATH)}
+    for filtros in (
+        {"regiao": "RJ"},
+        {"regiao": "RJ", "tier": "vip"},
+        {"tier": "vip"},  # fora do prefixo do índice: varredura
+        {"regiao": ["RJ", "SP"], "tier": ["novo", "vip"]},
+        {"flag": None},
+        {"regiao": "XX"},
+    ):
+        esperado = select(legado, **filtros)
+        assert [dict(u) for u in users.where(**filtros)] == esperado, filtros
+    assert ("regiao", "tier") in users._indexes
+
+    grande = ColumnarTable(
+        ({"user_id": f"u{i}", "regiao": f"R{i % 70000}"} for i in range(70001)),
+        USER_SCHEMA,
+        "user_id",
+    )
+    assert [u["user_id"] for u in grande.where(regiao="R0")] == ["u0", "u70000"]
+
+    client = TestClient(main.app)
+    resp = client.get("/usuarios", params={"regiao": ["RJ", "SP"], "tier": "vip"})
+    corpo = resp.json()
+    assert corpo["total"] == len(users.where(regiao=["RJ", "SP"], tier="vip"))
+    assert {(u["regiao"], u["tier"]) for u in corpo["resultados"]} <= {
+        ("RJ", "vip"),
+        ("SP", "vip"),
+    }
+    pedidos = client.get("/pedidos", params={"status": "delivered"}).json()
+    assert [p["order_id"] for p in pedidos["resultados"]] == ["PED-789"]
+    assert client.get("/pedidos", params={"limite": 5000}).status_code == 422
+
+
+def test_json_stream_reads_items_split_across_chunks(tmp_path):
+    itens = [{"a": i, "v": 3.5 * i, "s": "ç" * i} for i in range(50)] + [12, -1e-5]
+    path = tmp_path / "lista.json"
+    for indent in (None, 2):
+        path.write_text(json.dumps(itens, indent=indent), encoding="utf-8")
+        for chunk_size in (1, 3, 1 << 20):
+            assert list(iter_json_array(path, chunk_size)) == itens
+    path.write_text(" [ ] ", encoding="utf-8")
+    assert list(iter_json_array(path)) == []
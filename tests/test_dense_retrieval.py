@@ -0,0 +1,113 @@
+"""Testes do backend denso (embeddings quantizados + IVF)."""
+
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app import ingest
+from app.dense_index import DenseIndex, quantize, write_dense_index
+from app.dense_retriever import DenseRetriever
+from app.embeddings import HashingEncoder
+from app.reload import load_generation
+from app.retrieval_backend import RetrieverBackend
+from app.retriever import KnowledgeBaseRetriever
+from app.vector_retriever import VectorRetriever
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def _docs(n):
+    temas = ["entrega", "reembolso", "cupom", "alergia", "cancelamento", "troca"]
+    return [
+        {
+            "id": f"doc-{i}",
+            "pergunta": f"Dúvida {i} sobre {temas[i % len(temas)]}",
+            "resposta": f"Resposta {i} sobre {temas[(i * 7) % len(temas)]} código{i}",
+        }
+        for i in range(n)
+    ]
+
+
+def test_backends_share_interface(tmp_path):
+    ingest.build_mapped_index(ingest.load_kb(), tmp_path / "kb_index")
+    ingest.build_dense_index(ingest.load_kb(), tmp_path / "kb_dense")
+    for retriever in (
+        KnowledgeBaseRetriever(ingest.KB_PATH),
+        VectorRetriever(tmp_path / "kb_index"),
+        DenseRetriever(tmp_path / "kb_dense"),
+    ):
+        assert isinstance(retriever, RetrieverBackend)
+        top = retriever.retrieve("Como peço reembolso?")
+        assert top[0]["id"] == "faq_reembolso" and "score" in top[0]
+        assert retriever.retrieve_many([" "]) == [[]]
+
+
+@pytest.mark.parametrize("kind", ["int8", "float16"])
+def test_quantized_scores_close_to_float(kind):
+    matrix = HashingEncoder().encode([doc["resposta"] for doc in _docs(50)])
+    stored, scales = quantize(matrix, kind)
+    restored = stored.astype(np.float32)
+    if scales is not None:
+        restored *= scales[:, None]
+    np.testing.assert_allclose(restored @ matrix[0], matrix @ matrix[0], atol=0.02)
+
+
+def test_ivf_matches_exact_with_all_lists(tmp_path):
+    docs = _docs(600)
+    encoder = HashingEncoder()
+    vectors = encoder.encode([ingest.doc_text(d) for d in docs])
+    write_dense_index(tmp_path, docs, vectors, encoder.meta, nlist=12)
+    index = DenseIndex(tmp_path)
+    assert index.has_ivf and index.meta["nlist"] == 12
+    queries = encoder.encode([ingest.doc_text(docs[17]), "alergia", "troca de cupom"])
+    exact = index.search_exact(queries, 5)
+    # Todas as listas visitadas = força bruta (a menos de empates/arredondamento).
+    for got, want in zip(index.search(queries, 5, nprobe=12), exact):
+        np.testing.assert_allclose(
+            [h.score for h in got], [h.score for h in want], atol=1e-5
+        )
+    assert exact[0][0].index == 17
+    approx = index.search(queries, 5, nprobe=2)
+    assert all(len(hits) == 5 for hits in approx)
+
+
+def test_generation_prefers_dense_when_enabled(tmp_path, monkeypatch):
+    shutil.copytree(DATA_DIR / "source", tmp_path / "source")
+    ingest.build_dense_index(ingest.load_kb(), tmp_path / "cache" / "kb_dense")
+    assert not isinstance(load_generation(1, tmp_path).active_retriever, DenseRetriever)
+    monkeypatch.setenv("RETRIEVER_BACKEND", "dense")
+    gen = load_generation(2, tmp_path)
+    assert isinstance(gen.active_retriever, DenseRetriever)
+
+
+@pytest.mark.parametrize("nlist", [0, 12])
+def test_source_filter_scores_only_rows_in_range(tmp_path, monkeypatch, nlist):
+    docs = _docs(600)
+    encoder = HashingEncoder()
+    vectors = encoder.encode([ingest.doc_text(d) for d in docs])
+    write_dense_index(tmp_path, docs, vectors, encoder.meta, nlist=nlist)
+    index = DenseIndex(tmp_path)
+    queries = encoder.encode(["alergia", "troca de cupom", ingest.doc_text(docs[40])])
+    ranges = [(0, 90), (450, 470)]  # ex.: só o kb e um trecho de políticas
+    dentro = {i for a, b in ranges for i in range(a, b)}
+    tudo = index.search_exact(queries, 600)
+    esperado = [[h for h in hits if h.index in dentro][:5] for hits in tudo]
+
+    pontuadas = []
+    original = index._score
+    monkeypatch.setattr(
+        index, "_score", lambda q, s, e: pontuadas.append(e - s) or original(q, s, e)
+    )
+    for busca in (index.search_exact, index.search):
+        pontuadas.clear()
+        kwargs = {"nprobe": 12} if busca is index.search else {}
+        got = busca(queries, 5, ranges=ranges, **kwargs)
+        assert sum(pontuadas) == len(dentro)  # nenhuma linha fora do filtro
+        for hits, want in zip(got, esperado):
+            assert all(h.index in dentro for h in hits)
+            np.testing.assert_allclose(
+                [h.score for h in hits], [h.score for h in want], atol=1e-5
+            )
+    assert tudo[2][0].index == 40
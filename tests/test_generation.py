@@ -0,0 +1,33 @@
+"""Testes da cadeia de geração assíncrona (sequencial e hedged) com provedores fake."""
+
+import asyncio
+
+from app.generation import Provider, run_chain
+
+
+def _fake(name: str, delay: float, fail: bool = False) -> Provider:
+    async def generate(pergunta: str, evidencia: str) -> str:
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError(f"{name} indisponível")
+        return f"{name}: {evidencia}"
+
+    return Provider(name, "fake", generate)
+
+
+def test_sequential_falls_back_on_error():
+    providers = [_fake("a", 0, fail=True), _fake("b", 0)]
+    texto, provider = asyncio.run(run_chain(providers, "p", "ev"))
+    assert provider.name == "b"
+    assert texto == "b: ev"
+
+
+def test_hedged_returns_fastest_after_deadline():
+    providers = [_fake("lento", 1.0), _fake("rapido", 0.01)]
+    texto, provider = asyncio.run(run_chain(providers, "p", "ev", hedge_after=0.02))
+    assert provider.name == "rapido"
+
+
+def test_hedged_without_fallback_returns_none():
+    assert asyncio.run(run_chain([_fake("lento", 1.0)], "p", "ev", 0.02)) is None
+    assert asyncio.run(run_chain([], "p", "ev", 0.02)) is None
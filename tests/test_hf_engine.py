@@ -0,0 +1,98 @@
+"""Testes do motor HF com batching dinâmico (runner fake, sem torch)."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.hf_engine import HFEngine
+
+
+class FakeRunner:
+    """Custo fixo por lote; devolve o prompt em maiúsculas."""
+
+    def __init__(self, delay: float = 0.02, fail: bool = False) -> None:
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+        self.thread_names = set()
+
+    def __call__(self, prompts):
+        self.batches.append(len(prompts))
+        self.thread_names.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("modelo caiu")
+        return [p.upper() for p in prompts], 3 * len(prompts)
+
+
+def test_concurrent_prompts_share_batches_and_get_own_output():
+    runner = FakeRunner()
+    engine = HFEngine(runner, max_batch=8, max_wait=0.01)
+
+    async def go():
+        return await asyncio.gather(*(engine.submit(f"p{i}") for i in range(20)))
+
+    try:
+        out = asyncio.run(go())
+    finally:
+        engine.stop()
+    assert out == [f"P{i}" for i in range(20)]
+    assert max(runner.batches) == 8 and sum(runner.batches) == 20
+    assert len(runner.batches) <= 4  # 20 prompts em lotes de até 8, não 20 chamadas
+    assert runner.thread_names == {"hf-engine"}
+    assert engine.tokens == 60
+
+
+def test_batch_failure_reaches_every_request_and_engine_keeps_serving():
+    runner = FakeRunner(fail=True)
+    engine = HFEngine(runner, max_batch=4, max_wait=0.01)
+
+    async def go():
+        results = await asyncio.gather(
+            *(engine.submit(f"p{i}") for i in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        runner.fail = False
+        return await engine.generate("pergunta", "evidência")
+
+    try:
+        texto = asyncio.run(go())
+    finally:
+        engine.stop()
+    assert "PERGUNTA: PERGUNTA" in texto and "EVIDÊNCIA" in texto
+
+
+def test_cancelled_request_is_dropped_from_batch():
+    runner = FakeRunner(delay=0.05)
+    engine = HFEngine(runner, max_batch=4, max_wait=0.0)
+
+    async def go():
+        first = asyncio.ensure_future(engine.submit("ocupa"))
+        await asyncio.sleep(0.01)  # o motor já está gerando o primeiro lote
+        cancelada = asyncio.ensure_future(engine.submit("cancelada"))
+        await asyncio.sleep(0)
+        cancelada.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelada
+        return await asyncio.gather(first, engine.submit("depois"))
+
+    try:
+        assert asyncio.run(go()) == ["OCUPA", "DEPOIS"]
+    finally:
+        engine.stop()
+    assert sum(runner.batches) == 2
+
+
+def test_generate_many_submits_in_groups_of_batch_size():
+    runner = FakeRunner(delay=0.0)
+    engine = HFEngine(runner, max_batch=16, max_wait=0.01)
+    pares = [(f"q{i}", "ev") for i in range(10)]
+
+    try:
+        out = asyncio.run(engine.generate_many(pares, batch_size=4))
+    finally:
+        engine.stop()
+    assert len(out) == 10 and all("Q" in text for text in out)
+    assert runner.batches == [4, 4, 2]
@@ -0,0 +1,119 @@
+"""Testes do retrieval híbrido (BM25 + RRF + reranker) e do atalho de confiança."""
+
+import shutil
+from dataclasses import replace
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import ingest, main
+from app.bm25 import BM25Retriever, MappedBM25Retriever
+from app.generation import Provider
+from app.hybrid import HybridRetriever
+from app.index_store import MappedDocs
+from app.metrics import ANSWERS
+from app.providers import ProviderRegistry
+from app.reload import load_generation
+from app.response_cache import query_signature
+from app.retriever import KnowledgeBaseRetriever
+from app.text import analyze
+from app.vector_retriever import VectorRetriever
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+KB_PATH = DATA_DIR / "source" / "kb.json"
+
+
+def _hybrid(**kwargs):
+    tfidf = KnowledgeBaseRetriever(KB_PATH)
+    return HybridRetriever(
+        {"bm25": BM25Retriever(tfidf.docs), "tfidf": tfidf}, **kwargs
+    )
+
+
+def test_analyze_folds_accents_and_stems():
+    assert analyze("Reembólso") == analyze("reembolsar") == ["reembols"]
+    assert analyze("Posso trocar o item?") == ["poss", "troc", "item"]
+
+
+def test_bm25_matches_inflections():
+    bm25 = BM25Retriever(KnowledgeBaseRetriever(KB_PATH).docs)
+    top = bm25.retrieve("quero reembolsar")[0]
+    assert top["id"] == "faq_reembolso" and top["score"] > 0
+    assert bm25.retrieve_many([" "]) == [[]]
+
+
+def test_hybrid_fuses_and_reranks():
+    hybrid = _hybrid()
+    query_vec = hybrid.vectorize("Posso trocar um item por alergia?")
+    hits = hybrid.retrieve_many(
+        ["Posso trocar um item por alergia?"], query_matrix=query_vec
+    )[0]
+    assert hybrid.docs[hits[0].index]["id"] == "faq_alergia"
+    assert 0.9 < hits[0].score <= 1.0
+    # Docs sem nenhum termo em comum não entram na fusão.
+    assert all(h.score > 0 for h in hits)
+    # O cache de respostas usa o vetor TF-IDF normalizado do lote.
+    assert abs(sum(w * w for w in query_signature(query_vec[0]).values()) - 1) < 1e-6
+
+    plain = _hybrid(rerank=False).retrieve_many(["alergia"])[0]
+    assert plain[0].score == 1.0  # primeiro lugar nos dois backends
+
+
+def test_confident_hit_skips_generation(monkeypatch):
+    chamadas = []
+
+    async def gera(pergunta: str, evidencia: str) -> str:
+        chamadas.append(pergunta)
+        return "gerado"
+
+    gen = replace(main.reloader.current, hybrid_retriever=_hybrid())
+    monkeypatch.setattr(main.reloader, "_current", gen)
+    monkeypatch.setattr(main, "KB_CONFIDENCE", 0.9)
+    monkeypatch.setattr(main, "response_cache", None)
+    monkeypatch.setattr(
+        main, "provider_registry", ProviderRegistry.static([Provider("p", "m", gera)])
+    )
+    antes = ANSWERS.value("kb_confident"), ANSWERS.value("model")
+    client = TestClient(main.app)
+    resp = client.post("/chat", json={"mensagem": "Posso trocar um item por alergia?"})
+    assert resp.json()["via_modelo"] is False and chamadas == []
+    resp = client.post("/chat", json={"mensagem": "Troca de endereço de entrega?"})
+    assert resp.json()["via_modelo"] is True and len(chamadas) == 1
+    assert (ANSWERS.value("kb_confident"), ANSWERS.value("model")) == (
+        antes[0] + 1,
+        antes[1] + 1,
+    )
+
+
+def test_mapped_bm25_postings_and_remap_without_docs(tmp_path, monkeypatch):
+    docs = ingest.load_documents()
+    ingest.build_bm25_index(docs, tmp_path / "cache" / "kb_bm25")
+    ingest.build_mapped_index(docs, tmp_path / "cache" / "kb_index")
+    mapped = MappedBM25Retriever(tmp_path / "cache" / "kb_bm25")
+    memory = BM25Retriever(docs)
+    queries = ["quero reembolsar", "Posso trocar um item por alergia?", " "]
+    for sources in (None, ("kb",), ("politica", "pedido")):
+        got = mapped.retrieve_many(queries, top_k=5, sources=sources)
+        want = memory.retrieve_many(queries, top_k=5, sources=sources)
+        assert [[h.index for h in hits] for hits in got] == [
+            [h.index for h in hits] for hits in want
+        ]
+
+    # Mesmos ids nos dois índices: o alinhamento não desserializa nenhum doc.
+    lidos = []
+    original = MappedDocs.__getitem__
+    monkeypatch.setattr(
+        MappedDocs, "__getitem__", lambda self, i: lidos.append(i) or original(self, i)
+    )
+    tfidf = VectorRetriever(tmp_path / "cache" / "kb_index")
+    assert HybridRetriever({"bm25": mapped, "tfidf": tfidf})._remaps == [None, None]
+    assert lidos == []
+    # Índice defasado (sem o primeiro doc): ainda alinha pelo id.
+    stale = BM25Retriever(docs[1:])
+    remap = HybridRetriever({"bm25": mapped, "stale": stale})._remaps[1]
+    assert remap.tolist() == list(range(1, len(docs)))
+
+    shutil.copytree(DATA_DIR / "source", tmp_path / "source")
+    monkeypatch.setenv("RETRIEVER_BACKEND", "hybrid")
+    hybrid = load_generation(1, tmp_path).hybrid_retriever
+    assert isinstance(hybrid.backends[0], MappedBM25Retriever)
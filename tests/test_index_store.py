@@ -0,0 +1,89 @@
+"""Testes do índice mapeado em memória (formato de `app.index_store`)."""
+
+import json
+
+import numpy as np
+import pytest
+
+from app import ingest
+from app.index_store import current_dir, read_meta
+from app.retriever import KnowledgeBaseRetriever
+from app.vector_retriever import VectorRetriever
+
+QUERIES = ["Meu pedido atrasou", "como peço reembolso?", "entregador", "ñ existe"]
+
+
+@pytest.fixture()
+def mapped_dir(tmp_path):
+    index_dir = tmp_path / "kb_index"
+    ingest.build_mapped_index(ingest.load_kb(), index_dir)
+    return index_dir
+
+
+def test_mapped_vectorizer_matches_sklearn(mapped_dir):
+    vectorizer, _ = ingest.fit(ingest.load_kb())
+    mapped = VectorRetriever(mapped_dir).vectorizer
+    expected = vectorizer.transform(QUERIES).toarray()
+    np.testing.assert_allclose(mapped.transform(QUERIES).toarray(), expected)
+
+
+def test_mapped_retriever_matches_in_memory(mapped_dir):
+    mapped = VectorRetriever(mapped_dir)
+    memory = KnowledgeBaseRetriever(ingest.KB_PATH)
+    assert (
+        isinstance(mapped.matrix_t.data, np.memmap)
+        or mapped.matrix_t.data.base is not None
+    )
+    for query in QUERIES:
+        got = [(d["id"], round(d["score"], 5)) for d in mapped.retrieve(query)]
+        want = [(d["id"], round(d["score"], 5)) for d in memory.retrieve(query)]
+        assert got == want
+
+
+def test_rebuild_replaces_index_and_rejects_unknown_version(mapped_dir):
+    ingest.build_mapped_index(ingest.load_kb()[:2], mapped_dir)
+    assert read_meta(mapped_dir)["n_docs"] == 2
+    assert len(VectorRetriever(mapped_dir).docs) == 2
+    meta = current_dir(mapped_dir) / "meta.json"
+    meta.write_text(json.dumps({**json.loads(meta.read_text()), "version": 99}))
+    with pytest.raises(ValueError):
+        VectorRetriever(mapped_dir)
+
+
+def test_incremental_update_applies_diff(mapped_dir):
+    docs = ingest.load_kb()
+    docs[1] = {**docs[1], "resposta": "Reembolso via pix em até 2 dias."}
+    del docs[4]
+    docs.append(
+        {
+            "id": "faq_cupom",
+            "pergunta": "Como uso meu cupom?",
+            "resposta": "No checkout.",
+        }
+    )
+    stats = ingest.update_mapped_index(docs, mapped_dir, compact_ratio=1.0)
+    assert stats == {"added": 1, "changed": 1, "removed": 1, "compacted": 0}
+
+    retriever = VectorRetriever(mapped_dir)
+    assert [d["id"] for d in retriever.docs] == [d["id"] for d in docs]
+    assert retriever.retrieve("cupom checkout")[0]["id"] == "faq_cupom"
+    assert retriever.retrieve("pix")[0]["id"] == "faq_reembolso"
+    vocab = list(retriever.vectorizer.vocab)
+    assert vocab == sorted(vocab)
+
+    # A document frequency mantida no lugar bate com um ajuste completo.
+    vectorizer, _ = ingest.fit(docs)
+    meta_df = np.load(current_dir(mapped_dir) / "df.npy")
+    terms = [t.decode() for t in vocab]
+    fitted = dict(zip(vectorizer.get_feature_names_out(), np.diff(_csc(docs).indptr)))
+    assert {t: int(d) for t, d in zip(terms, meta_df) if d} == fitted
+
+    assert ingest.update_mapped_index(docs, mapped_dir)["added"] == 0
+    docs[0] = {**docs[0], "resposta": "Nova resposta."}
+    assert ingest.update_mapped_index(docs, mapped_dir, compact_ratio=0.0)["compacted"]
+    assert read_meta(mapped_dir)["stale_docs"] == 0
+
+
+def _csc(docs):
+    _, matrix = ingest.fit(docs)
+    return matrix.tocsc()
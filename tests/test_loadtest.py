@@ -0,0 +1,58 @@
+"""Testes do harness de carga (dados sintéticos, stubs e baseline)."""
+
+import asyncio
+
+import pytest
+
+from app.orders import load_orders
+from app.users import load_users
+from benchmarks.loadtest import build_workload, compare
+from benchmarks.stubs import StubProvider, parse_distribution
+from benchmarks.synthetic import base_counts, write_dataset
+
+
+def test_synthetic_dataset_matches_source_format(tmp_path):
+    counts = write_dataset(tmp_path, scale=10)
+    assert counts == {k: v * 10 for k, v in base_counts().items()}
+    orders = load_orders(tmp_path / "source" / "orders.json")
+    users = load_users(tmp_path / "source" / "users.json")
+    assert len(orders) == counts["orders"] and len(users) == counts["users"]
+    assert {"order_id", "status", "eta_minutos", "itens", "total"} <= set(
+        next(iter(orders.values()))
+    )
+
+
+def test_stub_distributions_and_error_rate():
+    assert parse_distribution("fixed:80")() == pytest.approx(0.08)
+    sample = parse_distribution("uniform:10,20")
+    assert all(0.01 <= sample() <= 0.02 for _ in range(100))
+    with pytest.raises(ValueError):
+        parse_distribution("pareto:1")
+
+    stub = StubProvider("openai", latency="fixed:0", error_rate=0.5, seed=3)
+
+    async def call_many() -> int:
+        ok = 0
+        for _ in range(200):
+            try:
+                await stub.generate("p", "evidência")
+                ok += 1
+            except RuntimeError:
+                pass
+        return ok
+
+    ok = asyncio.run(call_many())
+    assert stub.calls == 200 and ok + stub.errors == 200
+    assert 60 < stub.errors < 140
+
+
+def test_workload_and_regression_check():
+    corpus = [{"rota": "chat", "mensagem": "oi"}, {"rota": "pedido", "order_id": None}]
+    workload = build_workload(corpus, ["PED-1"], 50, seed=1)
+    assert {w.get("order_id") for w in workload if w["rota"] == "pedido"} == {"PED-1"}
+
+    base = {"routes": {"chat": {"p95_ms": 100.0, "rps": 200.0}}}
+    atual = {"routes": {"chat": {"p95_ms": 160.0, "rps": 195.0}}}
+    assert compare(atual, base, tolerance=0.15) == [("chat", "p95_ms", 100.0, 160.0)]
+    atual["routes"]["chat"]["p95_ms"] = 120.0  # +20%, mas só 20 ms
+    assert compare(atual, base, tolerance=0.15) == []
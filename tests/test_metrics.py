@@ -0,0 +1,93 @@
+"""Testes das métricas Prometheus e do hook de profiling."""
+
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import main
+from app.generation import Provider
+from app import metrics as metrics_mod
+from app.metrics import FALLBACKS, PATH_SECONDS, STAGE_OVER_BUDGET, Registry
+from app.profiling import ProfilerMiddleware
+from app.providers import ProviderRegistry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    hist = registry.histogram("lat_seconds", "Latência.", ("rota",), (0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        hist.observe(value, "chat")
+    registry.counter("erros_total", "Erros.").inc()
+    text = registry.render()
+    assert "# TYPE lat_seconds histogram" in text
+    assert 'lat_seconds_bucket{rota="chat",le="0.1"} 1' in text
+    assert 'lat_seconds_bucket{rota="chat",le="1.0"} 3' in text
+    assert 'lat_seconds_bucket{rota="chat",le="+Inf"} 4' in text
+    assert 'lat_seconds_count{rota="chat"} 4' in text
+    assert "erros_total 1" in text
+
+
+def test_chat_records_stages_and_fallback_path(monkeypatch):
+    async def falha(pergunta: str, evidencia: str) -> str:
+        raise RuntimeError("fora do ar")
+
+    async def ok(pergunta: str, evidencia: str) -> str:
+        await asyncio.sleep(0)
+        return "resposta gerada"
+
+    monkeypatch.setattr(main, "response_cache", None)
+    monkeypatch.setattr(
+        main,
+        "provider_registry",
+        ProviderRegistry.static([Provider("p1", "m", falha), Provider("p2", "m", ok)]),
+    )
+    antes = PATH_SECONDS.count("p2"), FALLBACKS.value("p1", "error")
+    client = TestClient(main.app)
+    resp = client.post("/chat", json={"mensagem": "Posso trocar um item por alergia?"})
+    assert resp.json()["resposta"] == "resposta gerada"
+    assert (PATH_SECONDS.count("p2"), FALLBACKS.value("p1", "error")) == (
+        antes[0] + 1,
+        antes[1] + 1,
+    )
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'chat_stage_seconds_count{stage="retrieval"}' in metrics.text
+    assert 'chat_provider_seconds_count{provider="p1",outcome="error"}' in metrics.text
+
+
+def test_stage_budgets_from_env(monkeypatch):
+    monkeypatch.setenv("CHAT_STAGE_BUDGETS_MS", "retrieval=5, bm25=2")
+    budgets = metrics_mod.budgets_from_env()
+    assert budgets["retrieval"] == 0.005 and budgets["bm25"] == 0.002
+    monkeypatch.setattr(metrics_mod, "_BUDGETS", {"lento": 0.0})
+    antes = STAGE_OVER_BUDGET.value("lento")
+    metrics_mod.stage("lento", 0.0)
+    assert STAGE_OVER_BUDGET.value("lento") == antes + 1
+
+
+def test_profiler_dumps_only_when_requested(tmp_path):
+    inner = FastAPI()
+
+    @inner.get("/ping")
+    def ping() -> dict:
+        return {"ok": True}
+
+    client = TestClient(ProfilerMiddleware(inner, tmp_path))
+    # Sem ADMIN_API_KEY o header não liga o profiler.
+    assert (
+        "x-profile-file" not in client.get("/ping", headers={"X-Profile": "1"}).headers
+    )
+
+    client = TestClient(ProfilerMiddleware(inner, tmp_path, admin_key="s", max_files=2))
+    assert "x-profile-file" not in client.get("/ping").headers
+    for key in ("errada", ""):
+        resp = client.get("/ping", headers={"X-Profile": "1", "X-Admin-Key": key})
+        assert "x-profile-file" not in resp.headers
+    nomes = []
+    for _ in range(3):
+        resp = client.get("/ping", headers={"X-Profile": "1", "X-Admin-Key": "s"})
+        assert resp.json() == {"ok": True}
+        nomes.append(resp.headers["x-profile-file"])
+    assert (tmp_path / nomes[-1]).stat().st_size > 0
+    assert sorted(p.name for p in tmp_path.glob("*.prof")) == nomes[1:]
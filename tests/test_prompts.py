@@ -0,0 +1,111 @@
+"""Testes do orçamento de tokens e do prefixo estável dos prompts."""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+os.environ.pop("API_KEY", None)
+
+from app import main, prompts  # noqa: E402
+from app.generation import Provider  # noqa: E402
+from app.metrics import PROMPT_TOKENS, TOKENS  # noqa: E402
+from app.openai_client import agenerate_with_context  # noqa: E402
+from app.providers import ProviderRegistry  # noqa: E402
+from app.prompts import (  # noqa: E402
+    SYSTEM_PROMPT,
+    build_prompt,
+    count_tokens,
+    select_evidence,
+)
+
+LONGA = " ".join(f"palavra{i}" for i in range(600))
+
+
+def test_static_prefix_and_evidence_cut_to_budget():
+    a = build_prompt("Meu pedido atrasou", "Entregas levam até 40 minutos.")
+    b = build_prompt("Posso trocar por alergia?", LONGA, max_tokens=200)
+    # Instruções fixas na frente, idênticas: o provedor reaproveita o prefixo.
+    assert a.system == b.system == SYSTEM_PROMPT
+    assert a.text.startswith(SYSTEM_PROMPT) and b.text.startswith(SYSTEM_PROMPT)
+    assert not a.truncated and "Entregas levam até 40 minutos." in a.user
+
+    # Só a evidência é cortada; a pergunta fica inteira, por último.
+    assert b.truncated and b.tokens <= 200
+    assert b.user.endswith("Pergunta: Posso trocar por alergia?\nResposta:")
+    assert "…" in b.user and count_tokens(b.text) <= 200
+
+    t5 = build_prompt("p", "ev", style="t5", max_tokens=8)
+    assert t5.system.startswith("Instrução:") and "Evidência: \n" in t5.user
+
+
+def test_select_evidence_ranks_dedupes_and_fits_budget(monkeypatch):
+    trechos = ["primeiro trecho", "primeiro trecho", "segundo trecho", LONGA]
+    assert select_evidence(trechos, 500, k=1) == "primeiro trecho"
+    assert (
+        select_evidence(trechos, 500, k=2) == "[1] primeiro trecho\n[2] segundo trecho"
+    )
+    # O terceiro trecho só entra cortado no que sobra do orçamento.
+    tres = select_evidence(trechos, 100, k=3)
+    assert tres.startswith("[1] primeiro trecho\n[2] segundo trecho\n[3] palavra0")
+    assert count_tokens(tres) <= 100
+    # Orçamento esgotado: o primeiro sempre entra, os demais ficam de fora.
+    assert select_evidence([LONGA, "outro"], 10, k=2).endswith("…")
+
+    # tiktoken sem rede (BPE não baixado): cai na aproximação por palavras.
+    def offline(model):
+        raise OSError("sem rede")
+
+    monkeypatch.setitem(
+        sys.modules, "tiktoken", SimpleNamespace(encoding_for_model=offline)
+    )
+    prompts.get_counter.cache_clear()
+    try:
+        assert prompts.get_counter("gpt-offline") is prompts.approx_tokens
+    finally:
+        prompts.get_counter.cache_clear()
+
+
+def test_chat_sends_ranked_snippets_and_reports_tokens(monkeypatch):
+    recebidas = []
+
+    async def gera(pergunta: str, evidencia: str) -> str:
+        recebidas.append(evidencia)
+        return "resposta gerada em cinco tokens"
+
+    monkeypatch.setattr(prompts, "EVIDENCE_K", 2)
+    monkeypatch.setattr(main, "response_cache", None)
+    monkeypatch.setattr(
+        main, "provider_registry", ProviderRegistry.static([Provider("p", "m", gera)])
+    )
+    antes = TOKENS.value("p", "completion")
+    resp = TestClient(main.app).post(
+        "/chat", json={"mensagem": "Posso trocar um item por alergia?"}
+    )
+    assert resp.json()["via_modelo"] is True
+    assert recebidas[0].startswith("[1] ") and "\n[2] " in recebidas[0]
+    assert TOKENS.value("p", "completion") > antes
+
+    # OpenAI: tokens do `usage`, incluindo o prefixo servido do cache.
+    usage = SimpleNamespace(
+        prompt_tokens=1200,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=1024),
+    )
+    enviados = []
+
+    async def create(**kwargs):
+        enviados.append(kwargs["messages"])
+        message = SimpleNamespace(content=" ok ")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    cached = TOKENS.value("openai", "cached")
+    texto = asyncio.run(agenerate_with_context(client, "gpt-x", "p", "ev"))
+    assert texto == "ok"
+    assert enviados[0][0] == {"role": "system", "content": SYSTEM_PROMPT}
+    assert TOKENS.value("openai", "cached") == cached + 1024
+    assert "chat_prompt_tokens_count" in "\n".join(PROMPT_TOKENS.samples())
@@ -0,0 +1,67 @@
+"""Testes do warm-up lazy/paralelo dos provedores e do readiness."""
+
+import asyncio
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.generation import Provider
+from app.providers import (
+    DISABLED,
+    FAILED,
+    READY,
+    ProviderRegistry,
+    ProviderSpec,
+)
+
+
+def _slow_spec(name: str, delay: float, fail: bool = False) -> ProviderSpec:
+    def build():
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError("sem credencial")
+
+        async def generate(pergunta: str, evidencia: str) -> str:
+            return name
+
+        return Provider(name, "stub", generate)
+
+    return ProviderSpec(name, lambda: True, build)
+
+
+def test_registry_builds_in_parallel_and_keeps_order():
+    specs = [
+        _slow_spec("a", 0.2),
+        _slow_spec("b", 0.2, fail=True),
+        ProviderSpec("c", lambda: False, lambda: None),
+        _slow_spec("d", 0.2),
+    ]
+    registry = ProviderRegistry(specs)
+    assert not registry.ready and registry.status["c"] == DISABLED
+    t0 = time.perf_counter()
+    providers = asyncio.run(registry.get())
+    assert time.perf_counter() - t0 < 0.5  # paralelo, não 3 x 0.2s
+    assert [p.name for p in providers] == ["a", "d"]
+    assert registry.status == {"a": READY, "b": FAILED, "c": DISABLED, "d": READY}
+    # Warm-up só acontece uma vez e pode ser aguardado de outro loop.
+    assert asyncio.run(registry.get()) is providers
+
+
+def test_readiness_reports_warm_up(monkeypatch):
+    gate = threading.Event()
+    spec = ProviderSpec("lento", lambda: True, lambda: gate.wait(5) and None)
+    monkeypatch.setattr(main, "provider_registry", ProviderRegistry([spec]))
+    client = TestClient(main.app)
+    assert client.get("/healthz/live").status_code == 200
+    main.provider_registry.start_warm_up()
+    resp = client.get("/healthz/ready")
+    assert resp.status_code == 503
+    assert resp.json()["providers"]["lento"] in ("pending", "warming")
+    gate.set()
+    main.provider_registry.start_warm_up().result(timeout=5)
+    main.reloader.current  # dados carregados
+    resp = client.get("/healthz/ready")
+    assert resp.status_code == 200
+    assert resp.json()["providers"] == {"lento": FAILED}
@@ -0,0 +1,82 @@
+"""Testes do hot-reload de dados (gerações imutáveis + rota admin)."""
+
+import asyncio
+import json
+import shutil
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import auth
+from app.main import app
+from app.reload import Reloader, load_generation
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def test_reload_swaps_generation_and_keeps_old_snapshot(tmp_path):
+    shutil.copytree(DATA_DIR / "source", tmp_path / "source")
+    reloader = Reloader(tmp_path, load_generation(1, tmp_path))
+    antiga = reloader.current
+    swapped = []
+    reloader.on_swap(lambda gen: swapped.append(gen.number))
+
+    orders_path = tmp_path / "source" / "orders.json"
+    orders = json.loads(orders_path.read_text(encoding="utf-8"))
+    orders.append({**orders[0], "order_id": "PED-999"})
+    orders_path.write_text(json.dumps(orders), encoding="utf-8")
+
+    nova = asyncio.run(reloader.reload("teste"))
+    assert reloader.current is nova and nova.number == 2 and swapped == [2]
+    assert "PED-999" in nova.orders
+    assert "PED-999" not in antiga.orders
+
+
+def test_watch_detects_changes(tmp_path):
+    shutil.copytree(DATA_DIR / "source", tmp_path / "source")
+    reloader = Reloader(tmp_path, load_generation(1, tmp_path), poll_interval=0.01)
+
+    async def run():
+        reloader.start()
+        kb = tmp_path / "source" / "kb.json"
+        docs = json.loads(kb.read_text(encoding="utf-8"))[:2]
+        kb.write_text(json.dumps(docs), encoding="utf-8")
+        for _ in range(100):
+            if reloader.current.number > 1:
+                break
+            await asyncio.sleep(0.01)
+        await reloader.stop()
+
+    asyncio.run(run())
+    assert reloader.current.number == 2
+    kb_docs = [d for d in reloader.current.retriever.docs if d["fonte"] == "kb"]
+    assert len(kb_docs) == 2
+
+
+def test_admin_reload_requires_key(monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(auth, "ADMIN_API_KEY", None)
+    assert client.post("/admin/reload").status_code == 403
+    monkeypatch.setattr(auth, "ADMIN_API_KEY", "segredo")
+    assert client.post("/admin/reload").status_code == 401
+    resp = client.post("/admin/reload", headers={"X-Admin-Key": "segredo"})
+    assert resp.status_code == 200
+    assert resp.json()["generation"] >= 2
+
+
+def test_generation_opens_ingest_index_without_rebuilding_docs(tmp_path, monkeypatch):
+    from app import ingest, reload
+
+    shutil.copytree(DATA_DIR / "source", tmp_path / "source")
+    ingest.build_mapped_index(ingest.load_documents(), tmp_path / "cache" / "kb_index")
+
+    def no_rebuild(*args, **kwargs):
+        raise AssertionError("docs unificados montados com índice em disco")
+
+    monkeypatch.setattr(reload, "build_documents", no_rebuild)
+    gen = load_generation(1, tmp_path)
+    assert gen.retriever is None
+    ativo = gen.active_retriever
+    assert ativo is gen.vector_retriever
+    hits = ativo.retrieve_many(["pedido da Ana"], sources=("pedido",))[0]
+    assert hits and ativo.docs[hits[0].index]["fonte"] == "pedido"
@@ -0,0 +1,125 @@
+"""Testes do circuit breaker e do timeout adaptativo com um provedor fake local."""
+
+import asyncio
+import os
+
+from fastapi.testclient import TestClient
+
+os.environ.pop("API_KEY", None)
+
+from app import main  # noqa: E402
+from app.generation import Provider, run_chain, stream_chain  # noqa: E402
+from app.metrics import FALLBACKS  # noqa: E402
+from app.providers import ProviderRegistry  # noqa: E402
+from app.resilience import (  # noqa: E402
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    AdaptiveTimeout,
+    CircuitBreaker,
+    ProviderGuard,
+)
+
+
+class FlakyProvider:
+    """Provedor local com latência e falha ajustáveis entre chamadas."""
+
+    def __init__(self, name: str, latency: float = 0.0, fail: bool = False):
+        self.name = name
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+
+    async def generate(self, pergunta: str, evidencia: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError(f"{self.name} fora do ar")
+        return f"{self.name}: {evidencia}"
+
+    async def stream(self, pergunta: str, evidencia: str):
+        yield await self.generate(pergunta, evidencia)
+
+    def provider(self, guard: ProviderGuard | None = None) -> Provider:
+        return Provider(self.name, "fake", self.generate, self.stream, guard=guard)
+
+
+def _guard(name: str, clock, **timeout) -> ProviderGuard:
+    breaker = CircuitBreaker(name, failure_threshold=3, reset_timeout=10, clock=clock)
+    return ProviderGuard(breaker, AdaptiveTimeout(**timeout))
+
+
+def test_breaker_opens_skips_and_probes_half_open(clock):
+    primary, fallback = FlakyProvider("primario", fail=True), FlakyProvider("reserva")
+    guard = _guard("primario", clock)
+    chain = [primary.provider(guard), fallback.provider()]
+
+    for _ in range(5):
+        texto, provider = asyncio.run(run_chain(chain, "p", "ev"))
+        assert provider.name == "reserva"
+    # 3 falhas abrem o circuito; as 2 seguintes nem chamam o primário.
+    assert primary.calls == 3 and guard.state == OPEN
+    assert FALLBACKS.value("primario", "open") >= 2
+
+    clock.now = 10.5
+    primary.fail = False
+    assert guard.breaker.allow() and guard.state == HALF_OPEN
+    assert not guard.breaker.allow()  # só uma prova por vez
+    guard.breaker.release()
+    texto, provider = asyncio.run(run_chain(chain, "p", "ev"))
+    assert provider.name == "primario" and guard.state == CLOSED
+
+    # Falha na prova reabre na hora, sem esperar outras 3 falhas.
+    primary.fail = True
+    clock.now = 20
+    for _ in range(3):
+        asyncio.run(run_chain(chain, "p", "ev"))
+    assert guard.state == OPEN and guard.breaker.opened_at == 20
+    clock.now = 30.5
+    asyncio.run(run_chain(chain, "p", "ev"))
+    assert guard.state == OPEN and guard.breaker.opened_at == 30.5
+    assert primary.calls == 8
+
+
+def test_adaptive_timeout_cuts_degraded_provider_and_stream(clock):
+    primary, fallback = FlakyProvider("lento", latency=0.01), FlakyProvider("reserva")
+    guard = _guard("lento", clock, minimum=0.02, maximum=5.0, min_samples=10)
+    assert guard.timeout == 5.0  # sem amostras vale o teto
+    chain = [primary.provider(guard), fallback.provider()]
+
+    async def warm():
+        for _ in range(10):
+            await run_chain(chain, "p", "ev")
+
+    asyncio.run(warm())
+    assert 0.02 <= guard.timeout < 0.1  # p99 de ~10ms x 2, com piso de 20ms
+
+    primary.latency = 1.0  # degradou: corta no timeout e cai para a reserva
+    texto, provider = asyncio.run(run_chain(chain, "p", "ev"))
+    assert provider.name == "reserva"
+    assert FALLBACKS.value("lento", "timeout") >= 1
+
+    async def collect():
+        return [c async for c in stream_chain(chain, "p", "ev")]
+
+    chunks = asyncio.run(collect())
+    assert [c.provider.name for c in chunks] == ["reserva"]
+    assert guard.breaker.failures == 2
+
+
+def test_breaker_state_in_readiness_and_metrics(monkeypatch, clock):
+    guard = _guard("fake", clock)
+    registry = ProviderRegistry.static([FlakyProvider("fake").provider(guard)])
+    monkeypatch.setattr(main, "provider_registry", registry)
+    for _ in range(3):
+        guard.breaker.record_failure()
+    client = TestClient(main.app)
+    main.reloader.current  # dados carregados
+    ready = client.get("/healthz/ready").json()
+    assert ready["breakers"] == {"fake": OPEN}
+    text = client.get("/metrics").text
+    assert 'chat_provider_breaker_state{provider="fake"} 2' in text
+    assert 'chat_provider_timeout_seconds{provider="fake"} 30.0' in text
+    assert (
+        'chat_provider_breaker_transitions_total{provider="fake",state="open"}' in text
+    )
@@ -0,0 +1,76 @@
+"""Testes do cache de respostas (exato, quase duplicata, TTL, memória, invalidação)."""
+
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.response_cache import ResponseCache, normalize_query
+from app.retriever import KnowledgeBaseRetriever
+
+KB_PATH = Path(__file__).resolve().parent.parent / "data" / "source" / "kb.json"
+
+
+def test_normalize_query():
+    assert normalize_query("  Como PEÇO reembolso?? ") == "como peco reembolso"
+
+
+def test_exact_hit_and_ttl(clock):
+    cache = ResponseCache(ttl=10, clock=clock)
+    cache.put("openai", "m", "faq_reembolso", "Como peço reembolso?", "resp")
+    assert cache.get("openai", "m", "faq_reembolso", "como peco reembolso") == "resp"
+    assert cache.get("gemini", "m", "faq_reembolso", "como peco reembolso") is None
+    clock.now = 11
+    assert cache.get("openai", "m", "faq_reembolso", "como peco reembolso") is None
+    assert cache.hits == 1 and cache.misses == 2
+
+    # Cadeia de 3 provedores: uma busca conta um só hit ou miss.
+    chain = [SimpleNamespace(name=n, model="m") for n in ("openai", "gemini", "hf")]
+    cache.put("gemini", "m", "faq_reembolso", "reembolso", "resp")
+    assert cache.lookup(chain, "faq_reembolso", "outra") is None
+    assert cache.lookup(chain, "faq_reembolso", "reembolso")[1] is chain[1]
+    assert cache.hits == 2 and cache.misses == 3
+
+
+def test_near_duplicate_uses_query_vector():
+    retriever = KnowledgeBaseRetriever(KB_PATH)
+    cache = ResponseCache(similarity=0.8)
+    q1 = "Como peço reembolso do pedido?"
+    cache.put("openai", "m", "faq_reembolso", q1, "resp", retriever.vectorize(q1))
+    q2 = "reembolso do pedido, como peço"
+    assert (
+        cache.get("openai", "m", "faq_reembolso", q2, retriever.vectorize(q2)) == "resp"
+    )
+    assert cache.near_hits == 1
+
+
+def test_expired_best_match_is_evicted_and_next_best_served(clock):
+    cache = ResponseCache(ttl=10, similarity=0.8, clock=clock)
+    unit = lambda *v: np.array(v) / np.linalg.norm(v)  # noqa: E731
+    cache.put("p", "m", "doc", "antiga", "velha", unit(1.0, 0.0))
+    clock.now = 5
+    cache.put("p", "m", "doc", "recente", "nova", unit(0.9, 0.3))
+    clock.now = 12  # só a mais parecida venceu
+    assert cache.get("p", "m", "doc", "outra", unit(1.0, 0.01)) == "nova"
+    assert cache.stats()["entries"] == 1 and cache.near_hits == 1
+
+
+def test_memory_cap_evicts_lru():
+    cache = ResponseCache(max_bytes=2000)
+    for i in range(50):
+        cache.put("p", "m", "doc", f"pergunta {i}", "x" * 100)
+    assert cache.stats()["bytes"] <= 2000
+    assert cache.evictions > 0
+    assert cache.get("p", "m", "doc", "pergunta 49") is not None
+
+
+def test_invalidates_when_watched_file_changes(tmp_path, clock):
+    index = tmp_path / "kb_index.joblib"
+    index.write_text("v1")
+    cache = ResponseCache(watch_path=index, clock=clock)
+    cache.put("p", "m", "doc", "q", "a")
+    os.utime(index, ns=(1, 1))
+    clock.now = 5
+    assert cache.get("p", "m", "doc", "q") is None
+    assert cache.invalidations == 1
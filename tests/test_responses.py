@@ -0,0 +1,78 @@
+"""Testes dos loaders em fluxo (JSON/NDJSON) e da resposta JSON rápida."""
+
+import json
+import os
+import tracemalloc
+
+from fastapi.testclient import TestClient
+
+os.environ.pop("API_KEY", None)
+
+from app import main  # noqa: E402
+from app.jsonstream import iter_json_array, iter_json_object  # noqa: E402
+from app.orders import ORDERS_PATH, load_orders  # noqa: E402
+from app.policies import POLICIES_PATH, load_policies  # noqa: E402
+from app.responses import dumps  # noqa: E402
+from app.users import USERS_PATH, load_users  # noqa: E402
+from benchmarks.synthetic import synthetic_users, write_json_array  # noqa: E402
+
+
+def _ndjson(path, records):
+    path.write_text(
+        "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records),
+        encoding="utf-8",
+    )
+    return path
+
+
+def test_loaders_read_json_and_ndjson_sources_alike(tmp_path, monkeypatch):
+    users = json.loads(USERS_PATH.read_text(encoding="utf-8"))
+    orders = json.loads(ORDERS_PATH.read_text(encoding="utf-8"))
+    assert load_users(_ndjson(tmp_path / "users.ndjson", users)) == load_users()
+    assert load_orders(_ndjson(tmp_path / "orders.jsonl", orders)) == load_orders()
+    monkeypatch.setenv("DATA_COLUMNAR", "0")
+    assert load_users(tmp_path / "users.ndjson") == load_users()
+
+    policies = json.loads(POLICIES_PATH.read_text(encoding="utf-8"))
+    assert list(iter_json_object(POLICIES_PATH)) == list(policies.items())
+    assert len(load_policies()) == len(policies)
+
+
+def test_json_array_stream_keeps_memory_bounded(tmp_path):
+    path = tmp_path / "users.json"
+    write_json_array(path, synthetic_users(20_000))
+    tracemalloc.start()
+    count = sum(1 for _ in iter_json_array(path, chunk_size=1 << 16))
+    _, peak_stream = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    with path.open(encoding="utf-8") as f:
+        json.load(f)
+    _, peak_load = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert count == 20_000
+    assert peak_stream < 1 << 20 < peak_load // 4
+
+
+def test_fast_responses_match_the_pydantic_models():
+    for value in (
+        {"resposta": "Olá, ação!", "fonte": None, "n": [1, 2.5, True]},
+        [{"itens": [{"nome": "Açaí 500ml", "qtd": 2}]}],
+        "texto",
+    ):
+        esperado = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        assert dumps(value) == esperado.encode()
+    assert dumps({1: "a"}) == b'{"1":"a"}'  # fora do orjson: pydantic_core
+
+    client = TestClient(main.app)
+    resp = client.get("/pedido/ped-123")
+    assert resp.headers["content-type"] == "application/json"
+    raw = {o["order_id"]: o for o in json.loads(ORDERS_PATH.read_text("utf-8"))}
+    assert resp.json() == main.OrderResponse(**raw["PED-123"]).model_dump()
+    assert client.get("/pedido/PED-000").status_code == 422
+
+    resp = client.post("/chat", json={"mensagem": "Qual o status do PED-123?"})
+    corpo = main.ChatResponse.model_validate_json(resp.content)
+    assert corpo.fonte == "orders.json" and "PED-123" in corpo.resposta
+    schema = client.get("/openapi.json").json()["paths"]
+    assert "ChatResponse" in json.dumps(schema["/chat"])
+    assert "OrderResponse" in json.dumps(schema["/pedido/{order_id}"])
@@ -0,0 +1,66 @@
+"""Testes do retrieval em lote (argpartition) e do micro-batching."""
+
+import asyncio
+import threading
+from pathlib import Path
+
+from sklearn.metrics.pairwise import cosine_similarity
+
+from app import main
+from app.retrieval_batcher import RetrievalBatcher, retrieve_batch
+from app.retriever import KnowledgeBaseRetriever
+
+KB_PATH = Path(__file__).resolve().parent.parent / "data" / "source" / "kb.json"
+QUERIES = ["Meu pedido atrasou", "reembolso", "", "alergia no item", "xyz"]
+
+
+def _reference(retriever, query, k):
+    """Ranqueamento antigo: cosine_similarity + sorted estável sobre todos os docs."""
+    scores = cosine_similarity(retriever.vectorize(query), retriever._matrix).flatten()
+    ranked = sorted(enumerate(scores), key=lambda x: x[1], reverse=True)[:k]
+    return [(i, round(float(s), 9)) for i, s in ranked]
+
+
+def test_retrieve_many_matches_reference_ranking():
+    retriever = KnowledgeBaseRetriever(KB_PATH)
+    batch = retriever.retrieve_many(QUERIES, top_k=2)
+    for query, hits in zip(QUERIES, batch):
+        if not query.strip():
+            assert hits == []
+            continue
+        got = [(h.index, round(h.score, 9)) for h in hits]
+        assert got == _reference(retriever, query, 2)
+
+
+def test_retrieve_keeps_dict_results():
+    retriever = KnowledgeBaseRetriever(KB_PATH)
+    top = retriever.retrieve("Como peço reembolso?")[0]
+    assert top["id"] == "faq_reembolso"
+    assert "score" not in retriever.docs[1]
+
+
+def test_batcher_shares_one_call():
+    retriever = KnowledgeBaseRetriever(KB_PATH)
+    batcher = RetrievalBatcher(max_wait=0.01, max_batch=16)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(retriever, q) for q in QUERIES))
+
+    results = asyncio.run(run())
+    assert batcher.batches == 1 and batcher.queries == len(QUERIES)
+    assert results[1][0][0].index == 1
+
+
+def test_chat_retrieval_without_batcher_runs_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def spy(*args):
+        threads.append(threading.current_thread())
+        return retrieve_batch(*args)
+
+    monkeypatch.setattr(main, "retrieval_batcher", None)
+    monkeypatch.setattr(main, "retrieve_batch", spy)
+    req = main.ChatRequest(mensagem="Posso trocar um item por alergia?")
+    ctx = asyncio.run(main._prepare_chat(req))
+    assert threads and threads[0] is not threading.main_thread()
+    assert ctx.top["id"] == "faq_alergia"
@@ -0,0 +1,56 @@
+"""Testes do roteador compilado (intenção + entidades) e do fallback classificador."""
+
+import os
+import re
+
+from fastapi.testclient import TestClient
+
+os.environ.pop("API_KEY", None)
+
+from app import main  # noqa: E402
+from app.router import (  # noqa: E402
+    IntentClassifier,
+    IntentRouter,
+    _trie_pattern,
+    load_router_config,
+    route_message,
+)
+from benchmarks.router import messages, old_detect_intent  # noqa: E402
+
+
+def test_router_matches_legacy_chain_and_extracts_ids():
+    for msg in messages(2000, seed=7) + ["Política de atraso", "cliente VIP"]:
+        assert route_message(msg).intent == old_detect_intent(msg), msg
+    route = route_message("Reembolso do ped-123 para o usr-004, por favor")
+    assert route.intent == "pedido"
+    assert route.entities == {"order_id": "PED-123", "user_id": "USR-004"}
+    assert route_message("Posso trocar um item por alergia?").entities == {}
+
+
+def test_trie_pattern_prefers_longest_keyword():
+    pattern = re.compile(_trie_pattern(["user", "users", "usr", "atraso"]))
+    assert pattern.findall("users usr user atraso") == [
+        "users",
+        "usr",
+        "user",
+        "atraso",
+    ]
+
+
+def test_classifier_breaks_ties_and_routes_unmatched():
+    config = load_router_config()
+    router = IntentRouter(config, IntentClassifier(config["examples"]))
+    assert router.route("meu lanche não chegou").intent == "pedido"
+    assert router.route("reembolso do pedido atrasado").intent == "politica"
+    assert router.route("Posso trocar um item por alergia?").intent == "faq"
+    # Sem classificador vale a prioridade do config.
+    assert IntentRouter(config).route("reembolso do pedido").intent == "pedido"
+
+
+def test_chat_answers_order_and_user_directly():
+    client = TestClient(main.app)
+    data = client.post("/chat", json={"mensagem": "Cadê o PED-123?"}).json()
+    assert data["fonte"] == "orders.json" and not data["via_modelo"]
+    assert "PED-123" in data["resposta"]
+    data = client.post("/chat", json={"mensagem": "perfil do user USR-002"}).json()
+    assert data["fonte"] == "users.json" and "USR-002" in data["resposta"]
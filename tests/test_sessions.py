@@ -0,0 +1,170 @@
+"""Testes das sessões de conversa (slots pendentes e backends de sessão)."""
+
+import asyncio
+import os
+
+from fastapi.testclient import TestClient
+
+os.environ.pop("API_KEY", None)
+
+from app import auth, main  # noqa: E402
+from app.generation import Provider  # noqa: E402
+from app.providers import ProviderRegistry  # noqa: E402
+from app.sessions import (  # noqa: E402
+    KeyValueSessionStore,
+    LocalKeyValue,
+    MemorySessionStore,
+    Session,
+    extract_id,
+    pending_slot,
+    session_key,
+)
+
+
+def _count_routing(monkeypatch) -> list:
+    chamadas = []
+    original = main.route_message
+
+    def route(mensagem):
+        chamadas.append(mensagem)
+        return original(mensagem)
+
+    monkeypatch.setattr(main, "route_message", route)
+    return chamadas
+
+
+def test_follow_up_fills_slot_without_routing(monkeypatch):
+    monkeypatch.setattr(main, "session_store", MemorySessionStore())
+    monkeypatch.setattr(main, "provider_registry", ProviderRegistry.static([]))
+    chamadas = _count_routing(monkeypatch)
+    client = TestClient(main.app)
+
+    def chat(mensagem, sessao="s1"):
+        return client.post("/chat", json={"mensagem": mensagem, "sessao": sessao})
+
+    assert "PED-123" in chat("Qual o status do meu pedido?").json()["resposta"]
+    resp = chat("é o 123").json()
+    assert resp["resposta"].startswith("Pedido PED-123 (Ana)")
+    assert resp["fonte"] == "orders.json"
+    assert chamadas == ["Qual o status do meu pedido?"]
+
+    # Sem sessão o número solto não vira pedido.
+    assert chat("é o 123", sessao=None).json()["fonte"] != "orders.json"
+
+    # Lista de políticas pedida: a próxima mensagem só diz o tópico.
+    s2 = session_key(auth.ANONYMOUS.id, "s2")
+    asyncio.run(main.session_store.put(Session(s2, "politica", "topic")))
+    resp = chat("cancelamento", sessao="s2").json()
+    assert resp["fonte"] == "policies.json" and "ancelamento" in resp["resposta"]
+    assert chamadas == ["Qual o status do meu pedido?", "é o 123"]
+    # Assunto novo com slot pendente segue o fluxo normal.
+    chat("Qual o status do meu pedido?", sessao="s3")
+    chat("aceitam pix?", sessao="s3")
+    assert chamadas[-1] == "aceitam pix?"
+
+
+def test_slot_after_kb_answer_reuses_docs_for_generation(monkeypatch):
+    recebidas = []
+
+    async def gera(pergunta: str, evidencia: str) -> str:
+        recebidas.append((pergunta, evidencia))
+        if len(recebidas) == 1:
+            return "Sinto muito! Pode me passar o número do pedido?"
+        return "Abrimos a ocorrência do pedido."
+
+    monkeypatch.setattr(main, "session_store", MemorySessionStore())
+    monkeypatch.setattr(main, "response_cache", None)
+    monkeypatch.setattr(
+        main, "provider_registry", ProviderRegistry.static([Provider("p", "m", gera)])
+    )
+    client = TestClient(main.app)
+    client.post("/chat", json={"mensagem": "O item veio frio", "sessao": "k"})
+    session = asyncio.run(main.session_store.get(session_key("anonimo", "k")))
+    assert session.slot == "order_id" and session.docs
+    chamadas = _count_routing(monkeypatch)
+    resp = client.post("/chat", json={"mensagem": "PED-123", "sessao": "k"}).json()
+    assert resp == {
+        "resposta": "Abrimos a ocorrência do pedido.",
+        "fonte": "orders.json",
+        "via_modelo": True,
+        "aviso_modelo": None,
+    }
+    assert chamadas == []  # nem roteamento nem retrieval
+    pergunta, evidencia = recebidas[1]
+    assert pergunta == "O item veio frio (PED-123)"
+    assert (
+        evidencia.startswith("[1] Pedido PED-123") and session.docs[0][2] in evidencia
+    )
+    assert session.slot is None and session.entities == {"order_id": "PED-123"}
+
+
+def test_stores_evict_by_lru_ttl_and_bytes_and_round_trip(clock):
+    store = MemorySessionStore(max_sessions=3, ttl=10, clock=clock)
+
+    async def go():
+        for i in range(4):
+            await store.put(Session(f"s{i}", intent="faq"))
+        assert await store.get("s0") is None  # LRU: o mais antigo saiu
+        await store.get("s1")  # s1 vira o mais recente
+        await store.put(Session("s4"))
+        assert await store.get("s2") is None and await store.get("s1") is not None
+        clock.now = 11
+        assert await store.get("s1") is None
+        assert store.stats()["expirations"] == 1 and store.stats()["evictions"] == 2
+
+        pequeno = MemorySessionStore(max_bytes=3 * Session("x").estimate_size())
+        for i in range(10):
+            await pequeno.put(Session(f"x{i}"))
+        assert 1 <= pequeno.stats()["sessions"] <= 3
+        assert pequeno.stats()["bytes"] <= pequeno.max_bytes
+
+        kv = KeyValueSessionStore(LocalKeyValue(clock), ttl=5)
+        doc = ("faq_1", "Pergunta?", "Resposta.")
+        await kv.put(Session("a", "faq", "order_id", {"order_id": "PED-1"}, (doc,)))
+        lida = await kv.get("a")
+        assert (lida.slot, lida.entities, lida.docs) == (
+            "order_id",
+            {"order_id": "PED-1"},
+            (doc,),
+        )
+        clock.now += 6
+        assert await kv.get("a") is None
+
+    asyncio.run(go())
+    assert not hasattr(Session("z"), "__dict__")
+    assert pending_slot("Para consultar um usuário, informe o código (ex.: USR-001).")
+    assert pending_slot("Pedido PED-123 (Ana): status ok.") is None
+    assert pending_slot("Consigo ajudar com as políticas de: atraso.") == "topic"
+    assert extract_id("user_id", "usr 7") == "USR-7"
+    assert extract_id("order_id", "sem código") is None
+    assert extract_id("order_id", " #42. ") == "PED-42"
+    assert extract_id("order_id", "meu pedido atrasou 20 minutos") is None
+
+
+def test_sessions_are_scoped_to_the_api_client(monkeypatch):
+    monkeypatch.setattr(main, "session_store", MemorySessionStore())
+    monkeypatch.setattr(main, "provider_registry", ProviderRegistry.static([]))
+    monkeypatch.setattr(
+        auth,
+        "KEYSTORE",
+        auth.KeyStore(
+            [
+                (auth.hash_key("k-a"), auth.ApiClient("a")),
+                (auth.hash_key("k-b"), auth.ApiClient("b")),
+            ]
+        ),
+    )
+    client = TestClient(main.app)
+
+    def chat(key, mensagem):
+        return client.post(
+            "/chat",
+            json={"mensagem": mensagem, "sessao": "mesma"},
+            headers={"X-API-Key": key},
+        ).json()
+
+    chat("k-a", "Qual o status do meu pedido?")
+    # Mesmo id de sessão, outro cliente: não herda o slot pendente de `a`.
+    assert chat("k-b", "é o 123")["fonte"] != "orders.json"
+    assert chat("k-a", "é o 123")["fonte"] == "orders.json"
+    assert asyncio.run(main.session_store.get("mesma")) is None
@@ -0,0 +1,104 @@
+"""Testes do single-flight (coalescência de gerações idênticas em voo)."""
+
+import asyncio
+import os
+
+import httpx
+import pytest
+
+os.environ.pop("API_KEY", None)
+
+from app import main  # noqa: E402
+from app.generation import Provider  # noqa: E402
+from app.metrics import SINGLE_FLIGHT  # noqa: E402
+from app.providers import ProviderRegistry  # noqa: E402
+from app.single_flight import SingleFlight  # noqa: E402
+
+
+def test_shares_result_and_failure_then_forgets_key():
+    calls = []
+
+    async def slow(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        if value == "erro":
+            raise RuntimeError("provedor fora")
+        return value
+
+    async def go():
+        sf = SingleFlight()
+        out = await asyncio.gather(*(sf.do("k", lambda: slow("ok")) for _ in range(20)))
+        assert out == ["ok"] * 20 and calls == ["ok"]
+        results = await asyncio.gather(
+            *(sf.do("k", lambda: slow("erro")) for _ in range(3)),
+            return_exceptions=True,
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert sf.in_flight == 0
+        assert await sf.do("k", lambda: slow("de novo")) == "de novo"
+
+    coalesced = SINGLE_FLIGHT.value("coalesced")
+    errors = SINGLE_FLIGHT.value("error")
+    asyncio.run(go())
+    assert calls == ["ok", "erro", "de novo"]
+    assert SINGLE_FLIGHT.value("coalesced") - coalesced == 21
+    assert SINGLE_FLIGHT.value("error") - errors == 1
+
+
+def test_timeout_is_per_waiter_and_orphan_call_is_cancelled():
+    cancelled = []
+
+    async def slow(delay):
+        try:
+            await asyncio.sleep(delay)
+            return "pronto"
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+
+    async def go():
+        sf = SingleFlight(timeout=0.05)
+        leader = asyncio.ensure_future(sf.do("k", lambda: slow(0.08)))
+        await asyncio.sleep(0.04)
+        follower = asyncio.ensure_future(sf.do("k", lambda: slow(0.08)))
+        # O prazo da líder estoura; a chamada segue para quem ainda espera.
+        with pytest.raises(asyncio.TimeoutError):
+            await leader
+        assert await follower == "pronto"
+        with pytest.raises(asyncio.TimeoutError):
+            await sf.do("lenta", lambda: slow(1.0))
+        assert sf.in_flight == 0
+
+    asyncio.run(go())
+    assert cancelled == [1.0]
+
+
+def test_concurrent_identical_chats_make_one_provider_call(monkeypatch):
+    calls = []
+
+    async def gera(pergunta: str, evidencia: str) -> str:
+        calls.append(pergunta)
+        await asyncio.sleep(0.05)
+        return f"gerado: {evidencia}"
+
+    monkeypatch.setattr(main, "response_cache", None)
+    monkeypatch.setattr(main, "single_flight", SingleFlight(timeout=5))
+    monkeypatch.setattr(
+        main, "provider_registry", ProviderRegistry.static([Provider("p", "m", gera)])
+    )
+
+    async def go():
+        await main.current_generation()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as cli:
+            mensagens = ["Posso trocar um item por alergia?"] * 10
+            mensagens += ["posso trocar um item, por alergia"] * 5
+            mensagens += ["Posso trocar um item por alergia? Urgente"]
+            return await asyncio.gather(
+                *(cli.post("/chat", json={"mensagem": m}) for m in mensagens)
+            )
+
+    respostas = asyncio.run(go())
+    assert len(calls) == 2  # a variante com "Urgente" é outra chave
+    assert all(r.json()["via_modelo"] for r in respostas)
+    assert len({r.json()["resposta"] for r in respostas[:15]}) == 1
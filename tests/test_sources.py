@@ -0,0 +1,108 @@
+"""Testes do índice unificado (KB + políticas + usuários + pedidos) e das consultas exatas."""
+
+import os
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+os.environ.pop("API_KEY", None)
+
+from app import main  # noqa: E402
+from app.bm25 import BM25Retriever  # noqa: E402
+from app.dense_index import write_dense_index  # noqa: E402
+from app.dense_retriever import DenseRetriever  # noqa: E402
+from app.embeddings import HashingEncoder  # noqa: E402
+from app.ingest import KB_PATH, doc_text, load_documents  # noqa: E402
+from app.policies import POLICIES, get_policy  # noqa: E402
+from app.retriever import KnowledgeBaseRetriever  # noqa: E402
+from app.sources import SOURCES, ranges_for, source_ranges  # noqa: E402
+
+QUERIES = ["atraso do pedido", "reembolso", "alergia no item", "Bruno RJ", "xyz", ""]
+FILTERS = [("kb",), ("politica",), ("kb", "politica"), ("pedido", "usuario")]
+
+
+def _post_filter(retriever, query, sources):
+    """Referência: ranqueia tudo e descarta o que está fora das fontes."""
+    everything = retriever.retrieve_many([query], top_k=len(retriever.docs))[0]
+    return {
+        h.index: h.score
+        for h in everything
+        if retriever.docs[h.index]["fonte"] in sources and h.score > 0
+    }
+
+
+def test_unified_docs_are_grouped_by_source():
+    docs = load_documents()
+    ranges = source_ranges(docs)
+    assert list(ranges) == list(SOURCES)
+    assert all(len(r) == 1 for r in ranges.values())
+    for fonte, [(start, end)] in ranges.items():
+        assert {d["fonte"] for d in docs[start:end]} == {fonte}
+    assert ranges_for(("pedido", "kb"), ranges) == [
+        ranges["kb"][0],
+        ranges["pedido"][0],
+    ]
+    n_sections = sum(len(p) for p in POLICIES.values())
+    assert ranges["politica"][0][1] - ranges["politica"][0][0] == n_sections
+
+
+def test_filtered_ranking_matches_post_filter(tmp_path):
+    docs = load_documents()
+    tfidf = KnowledgeBaseRetriever(KB_PATH, docs=docs)
+    encoder = HashingEncoder()
+    vectors = encoder.encode([doc_text(d) for d in docs])
+    write_dense_index(tmp_path, docs, vectors, encoder.meta, "float16", nlist=4)
+    dense = DenseRetriever(tmp_path, nprobe=4)
+    for retriever in (tfidf, BM25Retriever(docs), dense):
+        for sources in FILTERS:
+            got = retriever.retrieve_many(QUERIES, top_k=3, sources=sources)
+            for query, hits in zip(QUERIES, got):
+                assert all(docs[h.index]["fonte"] in sources for h in hits)
+                expected = _post_filter(retriever, query, sources)
+                top = sorted(expected.values(), reverse=True)[:3]
+                positive = [h for h in hits if h.score > 0]
+                # Empates podem sair em outra ordem (soma em outra precisão).
+                np.testing.assert_allclose([h.score for h in positive], top, rtol=1e-5)
+                for h in positive:
+                    assert np.isclose(expected[h.index], h.score, rtol=1e-5)
+    assert dense.index.has_ivf
+
+
+def test_kb_filter_only_returns_faq_entries():
+    unified = KnowledgeBaseRetriever(KB_PATH, docs=load_documents())
+    got = unified.retrieve("Posso trocar um item por alergia?", sources=("kb",))
+    assert got[0]["id"] == "faq_alergia"
+    assert {d["fonte"] for d in got} == {"kb"}
+    assert np.all(np.diff([d["score"] for d in got]) <= 0)
+
+
+def test_policy_lookup_is_normalized():
+    assert get_policy(" Reembolso ") is POLICIES["reembolso"]
+    assert get_policy("SEGURANÇA") is POLICIES["seguranca"]
+    assert get_policy("inexistente") is None
+
+
+def test_chat_exact_lookups():
+    client = TestClient(main.app)
+
+    def ask(mensagem):
+        resp = client.post("/chat", json={"mensagem": mensagem})
+        assert resp.status_code == 200
+        return resp.json()
+
+    data = ask("qual o status do ped-456?")
+    assert "PED-456" in data["resposta"] and data["fonte"] == "orders.json"
+    assert ask("status do PED-000")["resposta"] == "Não encontrei o pedido PED-000."
+    data = ask("dados do cliente usr-001")
+    assert "Bruno" in data["resposta"] and data["fonte"] == "users.json"
+
+    data = ask("Qual a política para cancelar?")
+    assert data["resposta"].startswith("Política de cancelamento.")
+    assert data["fonte"] == "policies.json"
+    # Sem tópico citado: seção mais próxima, só entre as políticas.
+    data = ask("politica sobre minutos de SLA")
+    assert data["fonte"] == "Política de atraso: sla minutos"
+    assert data["resposta"] == "Sla minutos: 15"
+    # FAQ continua vindo do KB.
+    data = ask("Posso trocar um item por alergia?")
+    assert data["fonte"] == "Posso trocar um item por alergia?"
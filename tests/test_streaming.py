@@ -0,0 +1,87 @@
+"""Testes do /chat/stream (SSE) e do fallback no meio do stream."""
+
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.generation import Provider, stream_chain
+from app.providers import ProviderRegistry
+
+
+def stub(name: str, tokens, fail_after: int | None = None) -> Provider:
+    async def stream(pergunta: str, evidencia: str):
+        for i, token in enumerate(tokens):
+            if fail_after is not None and i == fail_after:
+                raise RuntimeError("conexão caiu")
+            await asyncio.sleep(0)
+            yield token
+
+    async def generate(pergunta: str, evidencia: str) -> str:
+        return "".join(tokens)
+
+    return Provider(name, "stub", generate, stream)
+
+
+def parse_sse(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def collect(providers) -> list:
+    return [c async for c in stream_chain(providers, "oi", "evidência")]
+
+
+def test_stream_chain_resets_on_mid_stream_failure():
+    chunks = asyncio.run(
+        collect([stub("a", ["x", "y", "z"], fail_after=2), stub("b", ["ok"])])
+    )
+    assert [(c.provider.name, c.text, c.reset) for c in chunks] == [
+        ("a", "x", False),
+        ("a", "y", False),
+        ("a", "", True),
+        ("b", "ok", False),
+    ]
+    # Falha antes do primeiro token: cai para o próximo sem reset.
+    chunks = asyncio.run(collect([stub("a", ["x"], fail_after=0), stub("b", ["ok"])]))
+    assert [(c.provider.name, c.reset) for c in chunks] == [("b", False)]
+
+
+def test_chat_stream_emits_tokens_and_metadata(monkeypatch):
+    monkeypatch.setattr(main, "response_cache", None)
+    monkeypatch.setattr(
+        main,
+        "provider_registry",
+        ProviderRegistry.static(
+            [stub("a", ["Par", "cial"], fail_after=1), stub("b", ["Olá", ", tudo"])]
+        ),
+    )
+    client = TestClient(main.app)
+    resp = client.post(
+        "/chat/stream", json={"mensagem": "Posso trocar o endereço de entrega?"}
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(resp.text)
+    assert [e for e, _ in events] == ["token", "reset", "token", "token", "done"]
+    assert "".join(d["texto"] for e, d in events[2:] if e == "token") == "Olá, tudo"
+    done = events[-1][1]
+    assert done["via_modelo"] is True and done["fonte"]
+
+
+def test_chat_stream_falls_back_to_kb(monkeypatch):
+    monkeypatch.setattr(main, "response_cache", None)
+    monkeypatch.setattr(
+        main, "provider_registry", ProviderRegistry.static([stub("a", ["x"], 0)])
+    )
+    client = TestClient(main.app)
+    resp = client.post(
+        "/chat/stream", json={"mensagem": "Posso trocar o endereço de entrega?"}
+    )
+    events = parse_sse(resp.text)
+    assert [e for e, _ in events] == ["token", "done"]
+    assert events[-1][1]["via_modelo"] is False